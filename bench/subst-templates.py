@@ -0,0 +1,98 @@
+# __COPYRIGHT__
+#
+# Functions and data for timing the expansion of a typical compilation
+# command line with the Templates that src/engine/SCons/Subst.py keeps
+# for the strings it substitutes, against splitting every string up
+# again with the regular expressions on each call (which is what the
+# StringSubber and ListSubber classes did before the Templates were
+# cached).  Run it from the top of the source tree with the engine in
+# the path:
+#
+#       PYTHONPATH=src/engine python bench/bench.py bench/subst-templates.py
+
+import SCons.Subst
+
+def _concat(prefix, list, suffix, env):
+    return [prefix + x + suffix for x in list]
+
+def Func1(cmd, gvars, lvars):
+    """scons_subst_list(), splitting the strings every time"""
+    SCons.Subst.set_template_cache_size(0)
+    for i in IterationList:
+        SCons.Subst.scons_subst_list(cmd, None, SCons.Subst.SUBST_CMD,
+                                     gvars=gvars, lvars=lvars)
+
+def Func2(cmd, gvars, lvars):
+    """scons_subst_list(), with cached Templates"""
+    SCons.Subst.set_template_cache_size(2048)
+    for i in IterationList:
+        SCons.Subst.scons_subst_list(cmd, None, SCons.Subst.SUBST_CMD,
+                                     gvars=gvars, lvars=lvars)
+
+def Func3(cmd, gvars, lvars):
+    """scons_subst(), splitting the strings every time"""
+    SCons.Subst.set_template_cache_size(0)
+    for i in IterationList:
+        SCons.Subst.scons_subst(cmd, None, SCons.Subst.SUBST_SIG,
+                                gvars=gvars, lvars=lvars)
+
+def Func4(cmd, gvars, lvars):
+    """scons_subst(), with cached Templates"""
+    SCons.Subst.set_template_cache_size(2048)
+    for i in IterationList:
+        SCons.Subst.scons_subst(cmd, None, SCons.Subst.SUBST_SIG,
+                                gvars=gvars, lvars=lvars)
+
+gvars = {
+    '_concat'       : _concat,
+    'CC'            : 'gcc',
+    'CCCOM'         : '$CC -o $TARGET -c $CFLAGS $CCFLAGS $_CCCOMCOM $SOURCES',
+    '_CCCOMCOM'     : '$CPPFLAGS $_CPPDEFFLAGS $_CPPINCFLAGS',
+    'CFLAGS'        : [],
+    'CCFLAGS'       : ['-O2', '-Wall'],
+    'CPPFLAGS'      : [],
+    'CPPDEFINES'    : ['NDEBUG', 'HAVE_CONFIG_H'],
+    'CPPDEFPREFIX'  : '-D',
+    'CPPDEFSUFFIX'  : '',
+    '_CPPDEFFLAGS'  : '${_concat(CPPDEFPREFIX, CPPDEFINES, CPPDEFSUFFIX, __env__)}',
+    'CPPPATH'       : ['include', 'src/include'],
+    'INCPREFIX'     : '-I',
+    'INCSUFFIX'     : '',
+    '_CPPINCFLAGS'  : '$( ${_concat(INCPREFIX, CPPPATH, INCSUFFIX, __env__)} $)',
+    '__env__'       : None,
+}
+
+lvars = {
+    'TARGET'        : 'foo.o',
+    'TARGETS'       : ['foo.o'],
+    'SOURCE'        : 'foo.c',
+    'SOURCES'       : ['foo.c'],
+}
+
+# Data to pass to the functions on each run.  Each entry is a
+# three-element tuple:
+#
+#   (
+#       "Label to print describing this data run",
+#       ('positional', 'arguments'),
+#       {'keyword' : 'arguments'},
+#   ),
+
+Data = [
+    (
+        "Single variable",
+        ('$CC', gvars, lvars),
+        {},
+    ),
+    (
+        "$CCCOM",
+        ('$CCCOM', gvars, lvars),
+        {},
+    ),
+]
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
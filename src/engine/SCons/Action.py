@@ -115,6 +115,11 @@ import SCons.Executor
 import SCons.Util
 import SCons.Subst
 
+# The SCons.Job.ProcessPool that function actions with a pool= argument
+# hand their work to, set while a parallel build with --process-jobs
+# is running.
+process_pool = None
+
 # we use these a lot, so try to optimize them
 is_String = SCons.Util.is_String
 is_List = SCons.Util.is_List
@@ -989,6 +994,7 @@ class FunctionAction(_ActionAction):
         if __debug__: logInstanceCreation(self, 'Action.FunctionAction')
 
         self.execfunction = execfunction
+        self.pool = kw.get('pool')
         try:
             self.funccontents = _callable_contents(execfunction)
         except AttributeError:
@@ -1059,7 +1065,17 @@ class FunctionAction(_ActionAction):
                 source = executor.get_all_sources()
             rsources = list(map(rfile, source))
             try:
-                result = self.execfunction(target=target, source=rsources, env=env)
+                pool = process_pool
+                if pool is not None and self.pool is not None:
+                    # Let the action pick out the picklable part of
+                    # its work to run in a worker process.
+                    call = self.pool(target, rsources, env)
+                else:
+                    call = None
+                if call is None:
+                    result = self.execfunction(target=target, source=rsources, env=env)
+                else:
+                    result = pool.call(*call)
             except KeyboardInterrupt, e:
                 raise
             except SystemExit, e:
@@ -1660,6 +1660,56 @@ class FunctionActionTestCase(unittest.TestCase):
         assert self.build_it
         assert self.string_it
 
+    def test_pool(self):
+        """Test executing a function Action through a process pool
+        """
+        class FakePool(object):
+            def __init__(self):
+                self.calls = []
+            def call(self, function, args):
+                self.calls.append((function, args))
+                return function(*args)
+
+        done = []
+        def work(value):
+            done.append(value)
+            return 0
+        def marshal(target, source, env):
+            if env.get('LOCAL'):
+                return None
+            return (work, (env['VALUE'],))
+        def f(target, source, env):
+            done.append('local')
+            return 0
+
+        act = SCons.Action.FunctionAction(f, {'pool' : marshal})
+        save_pool = SCons.Action.process_pool
+        try:
+            SCons.Action.process_pool = None
+            r = act([], [], Environment(VALUE = 3))
+            assert r == 0, r
+            assert done == ['local'], done
+
+            pool = FakePool()
+            SCons.Action.process_pool = pool
+            r = act([], [], Environment(VALUE = 3))
+            assert r == 0, r
+            assert done == ['local', 3], done
+            assert pool.calls == [(work, (3,))], pool.calls
+
+            r = act([], [], Environment(VALUE = 3, LOCAL = 1))
+            assert r == 0, r
+            assert done == ['local', 3, 'local'], done
+            assert len(pool.calls) == 1, pool.calls
+
+            act = SCons.Action.FunctionAction(f, {})
+            r = act([], [], Environment(VALUE = 3))
+            assert r == 0, r
+            assert done == ['local', 3, 'local', 'local'], done
+            assert len(pool.calls) == 1, pool.calls
+        finally:
+            SCons.Action.process_pool = save_pool
+
     def test_get_contents(self):
         """Test fetching the contents of a function Action
         """
@@ -100,6 +100,7 @@ There are the following methods for internal use within this module:
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import collections
+import copy
 
 import SCons.Action
 from SCons.Debug import logInstanceCreation
@@ -870,6 +871,80 @@ def is_a_Builder(obj):
             or isinstance(obj, CompositeBuilder)
             or callable(obj))
 
+def _copy_builder(builder):
+    if not isinstance(builder, (BuilderBase, CompositeBuilder)):
+        # A function or other callable used as a Builder.
+        return builder
+    cmdgen = None
+    if isinstance(builder, CompositeBuilder):
+        cmdgen = builder.cmdgen
+        new_cmdgen = cmdgen.__class__(cmdgen, cmdgen.source_ext_match)
+        builder = builder.builder
+    result = copy.copy(builder)
+    result._memo = {}
+    if isinstance(result.emitter, (DictEmitter, ListEmitter)):
+        result.emitter = result.emitter.__class__(result.emitter)
+    result.src_suffix = result.src_suffix[:]
+    result.src_builder = result.src_builder[:]
+    if cmdgen is not None:
+        if getattr(result.action, 'generator', None) is cmdgen:
+            result.action = copy.copy(result.action)
+            result.action.generator = new_cmdgen
+        result = CompositeBuilder(result, new_cmdgen)
+    return result
+
+def copy_builders(builders):
+    """Returns a copy of a dictionary of Builders holding copies of the
+    Builders, so that adding actions, emitters, source suffixes or
+    source Builders to the copies leaves the original Builders alone.
+    The copies use each other as source Builders where the originals
+    did.
+    """
+    copies = {}
+    result = {}
+    for name, builder in builders.items():
+        try:
+            result[name] = copies[id(builder)]
+        except KeyError:
+            result[name] = copies[id(builder)] = _copy_builder(builder)
+    for builder in copies.values():
+        if not isinstance(builder, (BuilderBase, CompositeBuilder)):
+            continue
+        src_builder = builder.src_builder
+        for i in range(len(src_builder)):
+            src_builder[i] = copies.get(id(src_builder[i]), src_builder[i])
+    return result
+
+def builder_state(builder, names={}):
+    """Returns a value that compares equal for Builders that are set up
+    the same way, such as a Builder and its copy from copy_builders().
+    Source Builders are compared by their names in the names dictionary
+    (keyed by id()), if they're there.
+    """
+    if not isinstance(builder, (BuilderBase, CompositeBuilder)):
+        return builder
+    state = []
+    cmdgen = None
+    if isinstance(builder, CompositeBuilder):
+        cmdgen = builder.cmdgen
+        state.append(('cmdgen', sorted(cmdgen.items()), cmdgen.source_ext_match))
+        builder = builder.builder
+    for key, value in sorted(builder.__dict__.items()):
+        if key == '_memo':
+            continue
+        if key == 'action' and cmdgen is not None and \
+           getattr(value, 'generator', None) is cmdgen:
+            continue
+        if key == 'emitter':
+            if isinstance(value, DictEmitter):
+                value = (DictEmitter, sorted(value.items()))
+            elif isinstance(value, ListEmitter):
+                value = (ListEmitter, list(value))
+        elif key == 'src_builder':
+            value = [names.get(id(b), b) for b in value]
+        state.append((key, value))
+    return state
+
 # Local Variables:
 # tab-width:4
 # indent-tabs-mode:nil
@@ -1476,6 +1476,36 @@ class CompositeBuilderTestCase(unittest.TestCase):
         assert isinstance(builder, SCons.Builder.CompositeBuilder)
         assert isinstance(builder.action, SCons.Action.CommandGeneratorAction)
 
+    def test_copy_builders(self):
+        """Test copying CompositeBuilders and their state"""
+        def func(env, target, source):
+            pass
+        other = SCons.Builder.Builder(action='foo', src_builder=self.builder)
+        builders = {'B' : self.builder, 'Alias' : self.builder,
+                    'Other' : other, 'Func' : func}
+        copies = SCons.Builder.copy_builders(builders)
+        b = copies['B']
+        assert b is not self.builder, b
+        assert copies['Alias'] is b, copies['Alias']
+        assert copies['Other'].src_builder == [b], copies['Other'].src_builder
+        assert copies['Func'] is func, copies['Func']
+
+        def state(builders):
+            names = {}
+            for name, builder in builders.items():
+                names[id(builder)] = name
+            return SCons.Builder.builder_state(builders['Other'], names), \
+                   SCons.Builder.builder_state(builders['B'], names)
+        assert state(copies) == state(builders)
+
+        b.add_action('.baz', self.func_action)
+        b.add_src_builder(other)
+        assert '.baz' in b.cmdgen, list(b.cmdgen.keys())
+        assert '.baz' not in self.builder.cmdgen, list(self.builder.cmdgen.keys())
+        assert b.action.generator is b.cmdgen
+        assert self.builder.src_builder == [], self.builder.src_builder
+        assert state(copies) != state(builders)
+
     def test_target_action(self):
         """Test CompositeBuilder setting of target builder actions"""
         env = Environment()
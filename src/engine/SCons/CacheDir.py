@@ -27,33 +27,339 @@ __doc__ = """
 CacheDir support
 """
 
+import errno
+import os
 import os.path
 import stat
 import sys
+import time
 
 import SCons.Action
+import SCons.Errors
+import SCons.Node
+import SCons.Util
+import SCons.Warnings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import threading
+except ImportError:
+    threading = None
+    _stats_lock = None
+else:
+    _stats_lock = threading.Lock()
 
 cache_enabled = True
 cache_debug = False
 cache_force = False
 cache_show = False
 
+# The ways files can be put into and taken out of the cache.
+link_modes = ('copy', 'hardlink', 'reflink')
+
+# The Linux ioctl that makes a file share another file's data blocks
+# copy-on-write, on file systems that can (Btrfs, XFS and the like).
+FICLONE = 0x40049409
+
+# The cache directories that CacheDir() has been called for, and the
+# other CacheDir() arguments, for --cache-prune.
+configured_caches = {}
+
+# The CacheDir objects with entries this build used that still have
+# to be written to the cache's index.
+_touched = {}
+
+# The CacheDir objects with Writer threads pushing files to them.
+_writers = {}
+
+# How many pushes may wait for each Writer thread.
+queued_pushes_per_job = 4
+
+# The names of the index of a size-bounded cache, and of the lock file
+# that keeps SCons processes sharing the cache from changing it at the
+# same time, in the top of the cache directory.
+index_name = '.scons_index'
+lock_name = '.scons_lock'
+
+# When a cache grows past its limits, the least recently used entries
+# are removed until it's down to this fraction of them, so the next
+# build doesn't have to prune it again right away.
+prune_ratio = 0.9
+
+# How long (in seconds) a lock file held by a process that didn't
+# remove it is honored, where there's no fcntl() locking.
+stale_lock_time = 60
+
+# The name of the file that marks a cache as possibly holding compressed
+# entries, so lookups in caches that don't only have to look for one file.
+compressed_marker = '.scons_compressed'
+
+# How much of a file is compressed or decompressed at a time.
+chunk_size = 65536
+
+class Codec(object):
+    """A way to compress cache entries, and the suffix the names of
+    the entries compressed that way get."""
+
+    def __init__(self, name, suffix, default_level, compressor, decompressor):
+        self.name = name
+        self.suffix = suffix
+        self.default_level = default_level
+        self.compressor = compressor
+        self.decompressor = decompressor
+
+    def compress_file(self, src, dst, level=None):
+        """Compress src into dst a chunk at a time.  Returns the
+        number of bytes read and written."""
+        if level is None:
+            level = self.default_level
+        c = self.compressor(level)
+        read = written = 0
+        s = open(src, 'rb')
+        try:
+            d = open(dst, 'wb')
+            try:
+                while 1:
+                    data = s.read(chunk_size)
+                    if not data:
+                        break
+                    read = read + len(data)
+                    data = c.compress(data)
+                    written = written + len(data)
+                    d.write(data)
+                data = c.flush()
+                written = written + len(data)
+                d.write(data)
+            finally:
+                d.close()
+        finally:
+            s.close()
+        return read, written
+
+    def decompress_file(self, src, dst):
+        """Decompress src into dst a chunk at a time.  Returns the
+        number of bytes written and read."""
+        c = self.decompressor()
+        read = written = 0
+        s = open(src, 'rb')
+        try:
+            d = open(dst, 'wb')
+            try:
+                while 1:
+                    data = s.read(chunk_size)
+                    if not data:
+                        break
+                    read = read + len(data)
+                    data = c.decompress(data)
+                    written = written + len(data)
+                    d.write(data)
+                if hasattr(c, 'flush'):
+                    data = c.flush()
+                    written = written + len(data)
+                    d.write(data)
+            finally:
+                d.close()
+        finally:
+            s.close()
+        return written, read
+
+codecs = {}
+
+try:
+    import zlib
+except ImportError:
+    pass
+else:
+    # The gzip format, so the entries can be read with gunzip.
+    codecs['gzip'] = Codec('gzip', '.gz', 6,
+        lambda level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS),
+        lambda: zlib.decompressobj(16 + zlib.MAX_WBITS))
+
+try:
+    import bz2
+except ImportError:
+    pass
+else:
+    codecs['bz2'] = Codec('bz2', '.bz2', 9,
+                          bz2.BZ2Compressor, bz2.BZ2Decompressor)
+
+class TransferStats(object):
+    """How much a build has put into or taken out of a cache."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.stored_bytes = 0
+        self.seconds = 0.0
+
+    def add(self, size, stored_size, seconds):
+        if _stats_lock:
+            _stats_lock.acquire()
+        try:
+            self.files = self.files + 1
+            self.bytes = self.bytes + size
+            self.stored_bytes = self.stored_bytes + stored_size
+            self.seconds = self.seconds + seconds
+        finally:
+            if _stats_lock:
+                _stats_lock.release()
+
+    def __str__(self):
+        return "%d files, %d bytes as %d bytes (%d saved) in %.3f seconds" % \
+               (self.files, self.bytes, self.stored_bytes,
+                self.bytes - self.stored_bytes, self.seconds)
+
+def parse_size(size):
+    """Return the number of bytes a CacheDir() max_size argument
+    stands for:  a number, or a string with a K, M, G or T suffix."""
+    if size is None or not SCons.Util.is_String(size):
+        return size
+    s = size.strip().upper()
+    if s.endswith('B'):
+        s = s[:-1]
+    multiplier = 1
+    for i, suffix in enumerate('KMGT'):
+        if s.endswith(suffix):
+            s = s[:-1]
+            multiplier = 1024 ** (i + 1)
+            break
+    try:
+        return int(float(s) * multiplier)
+    except ValueError:
+        raise SCons.Errors.UserError("Bad CacheDir max_size %s." % repr(size))
+
+class IndexLock(object):
+    """An exclusive lock on a cache's index, shared with the other
+    SCons processes using the cache."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0666)
+            try:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            except EnvironmentError:
+                os.close(self.fd)
+                self.fd = None
+                raise
+            return
+        while 1:
+            try:
+                self.fd = os.open(self.path,
+                                  os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0666)
+                return
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+            try:
+                if time.time() - os.stat(self.path)[stat.ST_MTIME] > stale_lock_time:
+                    os.unlink(self.path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.05)
+
+    def release(self):
+        if fcntl is None:
+            os.close(self.fd)
+            os.unlink(self.path)
+        else:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        self.fd = None
+
+def build_finished(skip_flush=False):
+    """Wait for the files being pushed to caches in the background
+    (or, with skip_flush, only the ones already being copied), add the
+    cache entries this build used to the index of each size-bounded
+    cache, prune the ones that have grown past their limits, and report
+    how much was transferred with --cache-debug."""
+    for cd in list(_writers.values()):
+        cd.flush_pushes(skip_flush)
+    touched = list(_touched.values())
+    _touched.clear()
+    for cd in touched:
+        if cd.is_bounded():
+            try:
+                cd.flush()
+                cd.prune()
+            except EnvironmentError, e:
+                msg = "Unable to update the index of cache %s: %s" % (cd.path, e)
+                SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning, msg)
+        cd.report_stats()
+
+def reflink(src, dst):
+    """Make dst a copy-on-write clone of src, with src's permissions.
+    Raises EnvironmentError if the platform or file system can't."""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+    s = open(src, 'rb')
+    try:
+        d = open(dst, 'wb')
+        try:
+            try:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            finally:
+                d.close()
+        except EnvironmentError:
+            os.unlink(dst)
+            raise
+    finally:
+        s.close()
+    os.chmod(dst, stat.S_IMODE(os.stat(src)[stat.ST_MODE]))
+
+def _read_only(mode):
+    return stat.S_IMODE(mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
 def CacheRetrieveFunc(target, source, env):
     t = target[0]
     fs = t.fs
     cd = env.get_CacheDir()
     cachedir, cachefile = cd.cachepath(t)
-    if not fs.exists(cachefile):
+    entry, codec = cd.find_entry(fs, cachefile)
+    if entry is None:
         cd.CacheDebug('CacheRetrieve(%s):  %s not in cache\n', t, cachefile)
         return 1
+    cachefile = entry
     cd.CacheDebug('CacheRetrieve(%s):  retrieving from %s\n', t, cachefile)
     if SCons.Action.execute_actions:
-        if fs.islink(cachefile):
-            fs.symlink(fs.readlink(cachefile), t.path)
-        else:
-            env.copy_from_cache(cachefile, t.path)
-        st = fs.stat(cachefile)
-        fs.chmod(t.path, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
+        start = time.time()
+        linked = None
+        try:
+            if fs.islink(cachefile):
+                fs.symlink(fs.readlink(cachefile), t.path)
+            elif codec:
+                size, stored_size = codec.decompress_file(cachefile, t.path)
+            elif cd.transfer(cachefile, t.path, env.copy_from_cache, t) == 'hardlink':
+                # The file is the cache entry, so it stays read-only,
+                # but it's brand new as far as timestamps go.
+                try:
+                    os.utime(t.path, None)
+                    linked = 1
+                except EnvironmentError:
+                    fs.unlink(t.path)
+                    env.copy_from_cache(cachefile, t.path)
+            st = fs.stat(cachefile)
+        except EnvironmentError:
+            if fs.exists(cachefile) or fs.islink(cachefile):
+                raise
+            # Another process pruning the cache removed the entry
+            # while we were retrieving it, so build the file instead.
+            cd.CacheDebug('CacheRetrieve(%s):  %s removed from cache\n', t, cachefile)
+            return 1
+        if not linked:
+            fs.chmod(t.path, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
+        if not codec:
+            size = stored_size = st[stat.ST_SIZE]
+        cd.retrieve_stats.add(size, stored_size, time.time() - start)
+        cd.record_access(cachefile, stored_size)
     return 0
 
 def CacheRetrieveString(target, source, env):
@@ -61,7 +367,7 @@ def CacheRetrieveString(target, source, env):
     fs = t.fs
     cd = env.get_CacheDir()
     cachedir, cachefile = cd.cachepath(t)
-    if t.fs.exists(cachefile):
+    if cd.find_entry(fs, cachefile)[0]:
         return "Retrieved `%s' from cache" % t.path
     return None
 
@@ -73,10 +379,19 @@ def CachePushFunc(target, source, env):
     t = target[0]
     if t.nocache:
         return
+    msg = push_file(t, env.get_CacheDir())
+    if msg:
+        SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning, msg)
+
+def push_file(t, cd):
+    """Push the target's file to the cache.  Returns why the file
+    couldn't be written, or None if it was.  The threads of a cache's
+    Writer call this, too, so it only looks at the target's path and
+    its cache signature, which has already been calculated."""
     fs = t.fs
-    cd = env.get_CacheDir()
     cachedir, cachefile = cd.cachepath(t)
-    if fs.exists(cachefile):
+    entry, codec = cd.find_entry(fs, cachefile)
+    if entry:
         # Don't bother copying it if it's already there.  Note that
         # usually this "shouldn't happen" because if the file already
         # existed in cache, we'd have retrieved the file from there,
@@ -84,9 +399,14 @@ def CachePushFunc(target, source, env):
         # other person running the same build pushes their copy to
         # the cache after we decide we need to build it but before our
         # build completes.
-        cd.CacheDebug('CachePush(%s):  %s already exists in cache\n', t, cachefile)
+        cd.CacheDebug('CachePush(%s):  %s already exists in cache\n', t, entry)
         return
 
+    codec = None
+    if cd.codec and not fs.islink(t.path):
+        codec = cd.codec
+        cachefile = cachefile + codec.suffix
+
     cd.CacheDebug('CachePush(%s):  pushing to %s\n', t, cachefile)
 
     tempfile = cachefile+'.tmp'+str(os.getpid())
@@ -99,31 +419,126 @@ def CachePushFunc(target, source, env):
             # We may have received an exception because another process
             # has beaten us creating the directory.
             if not fs.isdir(cachedir):
-                msg = errfmt % (str(target), cachefile)
+                msg = errfmt % (str(t), cachefile)
                 raise SCons.Errors.EnvironmentError(msg)
 
     try:
+        start = time.time()
         if fs.islink(t.path):
             fs.symlink(fs.readlink(t.path), tempfile)
+            how = 'symlink'
+        elif codec:
+            cd.mark_compressed()
+            size, stored_size = codec.compress_file(t.path, tempfile,
+                                                    cd.compress_level)
+            how = codec.name
         else:
-            fs.copy2(t.path, tempfile)
+            how = cd.transfer(t.path, tempfile, fs.copy2, t)
         fs.rename(tempfile, cachefile)
         st = fs.stat(t.path)
-        fs.chmod(cachefile, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
+        if not codec:
+            size = stored_size = st[stat.ST_SIZE]
+        cd.push_stats.add(size, stored_size, time.time() - start)
+        if how == 'hardlink':
+            # The target and the cache entry are the same file now.
+            # Keep anything from writing to it in place, since that
+            # would change the cache entry, too.
+            fs.chmod(cachefile, _read_only(st[stat.ST_MODE]))
+        else:
+            fs.chmod(cachefile, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
+        cd.record_access(cachefile)
     except EnvironmentError:
         # It's possible someone else tried writing the file at the
         # same time we did, or else that there was some problem like
         # the CacheDir being on a separate file system that's full.
         # In any case, inability to push a file to cache doesn't affect
         # the correctness of the build, so just print a warning.
-        msg = errfmt % (str(target), cachefile)
-        SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning, msg)
+        return errfmt % (str(t), cachefile)
+    return None
 
 CachePush = SCons.Action.Action(CachePushFunc, None)
 
+class Writer(object):
+    """A pool of threads pushing files to a cache, so the Taskmaster
+    can hand out the next task while a file is copied to a slow cache.
+    At most queue_size pushes wait for a thread; push() blocks when
+    that many are waiting."""
+
+    def __init__(self, cd, num_threads, queue_size):
+        self.cd = cd
+        self.queue_size = queue_size
+        self.queue = []
+        self.running = 0
+        self.errors = []
+        self.cond = threading.Condition()
+        for i in range(num_threads):
+            thread = threading.Thread(target=self.run)
+            thread.setDaemon(1)
+            thread.start()
+
+    def push(self, node):
+        self.cond.acquire()
+        try:
+            while len(self.queue) >= self.queue_size:
+                self.cond.wait()
+            self.queue.append(node)
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+
+    def run(self):
+        while 1:
+            self.cond.acquire()
+            try:
+                while not self.queue:
+                    self.cond.wait()
+                node = self.queue.pop(0)
+                self.running = self.running + 1
+                self.cond.notifyAll()
+            finally:
+                self.cond.release()
+            try:
+                msg = push_file(node, self.cd)
+            except Exception, e:
+                msg = str(e)
+            self.cond.acquire()
+            try:
+                if msg:
+                    self.errors.append(msg)
+                self.running = self.running - 1
+                self.cond.notifyAll()
+            finally:
+                self.cond.release()
+
+    def take_errors(self):
+        self.cond.acquire()
+        try:
+            errors = self.errors
+            self.errors = []
+        finally:
+            self.cond.release()
+        return errors
+
+    def flush(self, skip=False):
+        """Wait for the pushes to finish.  With skip, the pushes that
+        haven't started yet are dropped.  Returns how many were."""
+        self.cond.acquire()
+        try:
+            skipped = 0
+            if skip:
+                skipped = len(self.queue)
+                self.queue = []
+                self.cond.notifyAll()
+            while self.queue or self.running:
+                self.cond.wait()
+        finally:
+            self.cond.release()
+        return skipped
+
 class CacheDir(object):
 
-    def __init__(self, path):
+    def __init__(self, path, link_mode=None, max_size=None, max_entries=None,
+                 compress=None, compress_level=None, push_jobs=None):
         try:
             import hashlib
         except ImportError:
@@ -132,10 +547,41 @@ class CacheDir(object):
             self.path = None
         else:
             self.path = path
+        if link_mode is None:
+            link_mode = 'copy'
+        if link_mode not in link_modes:
+            msg = "Unknown CacheDir link_mode %s; expected one of %s."
+            raise SCons.Errors.UserError(msg % (repr(link_mode),
+                                                ', '.join(link_modes)))
+        self.link_mode = link_mode
+        self.max_size = parse_size(max_size)
+        self.max_entries = max_entries
+        if compress is None:
+            self.codec = None
+        else:
+            try:
+                self.codec = codecs[compress]
+            except KeyError:
+                msg = "Unsupported CacheDir compress codec %s; expected one of %s."
+                raise SCons.Errors.UserError(msg % (repr(compress),
+                                                    ', '.join(sorted(codecs.keys()))))
+        self.compress_level = compress_level
+        self.push_jobs = push_jobs
+        # The Writer threads are only started by the first push.
+        self.writer = None
+        # Whether the cache may have compressed entries; we only look
+        # for the marker file the first time we need to know.
+        self.compressed = None
+        self.accessed = {}
+        self.push_stats = TransferStats()
+        self.retrieve_stats = TransferStats()
         self.current_cache_debug = None
         self.debugFP = None
 
     def CacheDebug(self, fmt, target, cachefile):
+        self.debug_write(fmt % (target, os.path.split(cachefile)[1]))
+
+    def debug_write(self, msg):
         if cache_debug != self.current_cache_debug:
             if cache_debug == '-':
                 self.debugFP = sys.stdout
@@ -145,11 +591,223 @@ class CacheDir(object):
                 self.debugFP = None
             self.current_cache_debug = cache_debug
         if self.debugFP:
-            self.debugFP.write(fmt % (target, os.path.split(cachefile)[1]))
+            self.debugFP.write(msg)
+
+    def transfer(self, src, dst, copy_function, node):
+        """Put the file src at dst for the target node, the way our
+        link_mode says to, and return how it was done.  Files that
+        can't be linked (across file systems, say) get copied with
+        copy_function.
+
+        Precious targets never get hard-linked:  they aren't removed
+        before they're rebuilt, so their builders may write to them in
+        place, and that would change the cache entry, too."""
+        mode = self.link_mode
+        if mode == 'hardlink' and hasattr(os, 'link') and not node.precious:
+            try:
+                os.link(src, dst)
+                return mode
+            except EnvironmentError:
+                pass
+        elif mode == 'reflink':
+            try:
+                reflink(src, dst)
+                return mode
+            except EnvironmentError:
+                pass
+        copy_function(src, dst)
+        return 'copy'
 
     def is_enabled(self):
         return (cache_enabled and not self.path is None)
 
+    def find_entry(self, fs, cachefile):
+        """Return the name of the entry for cachefile in the cache and
+        the Codec it's compressed with (None if it isn't), or None and
+        None if it's not in the cache.  Caches that have never had
+        compressed entries only have to look for one file."""
+        if self.compressed is None:
+            self.compressed = self.codec is not None or \
+                fs.exists(os.path.join(self.path, compressed_marker))
+        if self.compressed and self.codec:
+            if fs.exists(cachefile + self.codec.suffix):
+                return cachefile + self.codec.suffix, self.codec
+        if fs.exists(cachefile):
+            return cachefile, None
+        if self.compressed:
+            for codec in codecs.values():
+                if codec is not self.codec and fs.exists(cachefile + codec.suffix):
+                    return cachefile + codec.suffix, codec
+        return None, None
+
+    def mark_compressed(self):
+        """Note in the cache that it has compressed entries, so other
+        builds using it look for them."""
+        marker = os.path.join(self.path, compressed_marker)
+        if not os.path.exists(marker):
+            open(marker, 'w').close()
+
+    def report_stats(self):
+        if self.push_stats.files:
+            self.debug_write('CacheStats(%s):  pushed %s\n'
+                             % (self.path, self.push_stats))
+        if self.retrieve_stats.files:
+            self.debug_write('CacheStats(%s):  retrieved %s\n'
+                             % (self.path, self.retrieve_stats))
+        self.push_stats = TransferStats()
+        self.retrieve_stats = TransferStats()
+
+    def is_bounded(self):
+        return bool(self.max_size or self.max_entries)
+
+    def record_access(self, cachefile, size=None):
+        """Note that this build used the cache entry, so the index of
+        a size-bounded cache has it as recently used.  The index is
+        only written at the end of the build, by build_finished()."""
+        _touched[id(self)] = self
+        if not self.is_bounded():
+            return
+        if size is None:
+            try:
+                size = os.lstat(cachefile)[stat.ST_SIZE]
+            except OSError:
+                return
+        name = cachefile[len(self.path)+1:]
+        self.accessed[name] = (int(time.time()), size)
+
+    def index_lock(self):
+        return IndexLock(os.path.join(self.path, lock_name))
+
+    def read_index(self):
+        """Return a dictionary mapping the names of the entries in the
+        cache's index to their last access time and size, and the number
+        of records read.  The latest record for an entry wins."""
+        entries = {}
+        records = 0
+        try:
+            f = open(os.path.join(self.path, index_name), 'r')
+        except IOError:
+            return entries, records
+        try:
+            for line in f.readlines():
+                try:
+                    atime, size, name = line.rstrip('\n').split(' ', 2)
+                    entries[name] = (int(atime), int(size))
+                except ValueError:
+                    # A record cut short by a crashed process.
+                    continue
+                records = records + 1
+        finally:
+            f.close()
+        return entries, records
+
+    def write_index(self, entries):
+        index = os.path.join(self.path, index_name)
+        tempfile = index + '.tmp' + str(os.getpid())
+        f = open(tempfile, 'w')
+        try:
+            for name, (atime, size) in entries.items():
+                f.write('%d %d %s\n' % (atime, size, name))
+        finally:
+            f.close()
+        os.rename(tempfile, index)
+
+    def flush(self):
+        """Append the accesses of this build to the cache's index."""
+        if not self.accessed:
+            return
+        accessed = self.accessed
+        self.accessed = {}
+        lines = ['%d %d %s\n' % (atime, size, name)
+                 for name, (atime, size) in accessed.items()]
+        lock = self.index_lock()
+        lock.acquire()
+        try:
+            f = open(os.path.join(self.path, index_name), 'a')
+            try:
+                f.write(''.join(lines))
+            finally:
+                f.close()
+        finally:
+            lock.release()
+
+    def scan(self, entries):
+        """Bring the index entries up to date with the files that are
+        actually in the cache, for entries put there by builds that
+        don't keep the index."""
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for f in filenames:
+                if f[0] == '.' or '.tmp' in f:
+                    continue
+                path = os.path.join(dirpath, f)
+                name = path[len(self.path)+1:]
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                atime = max(st[stat.ST_ATIME], st[stat.ST_MTIME])
+                if name in entries:
+                    atime = max(atime, entries[name][0])
+                found[name] = (atime, st[stat.ST_SIZE])
+        return found
+
+    def prune(self, max_size=None, max_entries=None, scan=False):
+        """Remove the least recently used entries from the cache until
+        it's within its limits.  With scan, the files in the cache are
+        indexed first.  Returns the number of entries and bytes removed,
+        and the number of entries and bytes left."""
+        if max_size is None:
+            max_size = self.max_size
+        if max_entries is None:
+            max_entries = self.max_entries
+        max_size = parse_size(max_size)
+        removed = removed_bytes = 0
+        if not os.path.isdir(self.path):
+            return removed, removed_bytes, 0, 0
+        lock = self.index_lock()
+        lock.acquire()
+        try:
+            entries, records = self.read_index()
+            rewrite = records > 2 * len(entries)
+            if scan:
+                entries = self.scan(entries)
+                rewrite = True
+            total = 0
+            for atime, size in entries.values():
+                total = total + size
+            if (max_size and total > max_size) or \
+               (max_entries and len(entries) > max_entries):
+                size_goal = entries_goal = None
+                if max_size:
+                    size_goal = int(max_size * prune_ratio)
+                if max_entries:
+                    entries_goal = int(max_entries * prune_ratio)
+                lru = sorted([(atime, name) for name, (atime, size) in entries.items()])
+                for atime, name in lru:
+                    if (size_goal is None or total <= size_goal) and \
+                       (entries_goal is None or len(entries) <= entries_goal):
+                        break
+                    try:
+                        os.unlink(os.path.join(self.path, name))
+                    except OSError, e:
+                        if e.errno != errno.ENOENT:
+                            continue
+                    else:
+                        removed = removed + 1
+                        removed_bytes = removed_bytes + entries[name][1]
+                    total = total - entries[name][1]
+                    del entries[name]
+                    rewrite = True
+            if rewrite:
+                self.write_index(entries)
+        finally:
+            lock.release()
+        if removed:
+            self.debug_write('CachePrune(%s):  removed %d entries\n'
+                             % (self.path, removed))
+        return removed, removed_bytes, len(entries), total
+
     def cachepath(self, node):
         """
         """
@@ -158,7 +816,14 @@ class CacheDir(object):
 
         sig = node.get_cachedir_bsig()
         subdir = sig[0].upper()
-        dir = os.path.join(self.path, subdir)
+        format = SCons.Util.get_hash_format()
+        if format in ('md5', None):
+            dir = os.path.join(self.path, subdir)
+        else:
+            # Keep signatures from other hash formats in their own
+            # part of the cache, so builds using different formats
+            # can share a cache directory without colliding.
+            dir = os.path.join(self.path, format, subdir)
         return dir, os.path.join(dir, sig)
 
     def retrieve(self, node):
@@ -203,12 +868,240 @@ class CacheDir(object):
     def push(self, node):
         if not self.is_enabled():
             return
-        return CachePush(node, [], node.get_build_env())
+        if not self.push_jobs or threading is None:
+            return CachePush(node, [], node.get_build_env())
+        if node.nocache or not SCons.Action.execute_actions:
+            return
+        # The signature is calculated here, so the Writer's threads
+        # only have to copy the file.
+        node.get_cachedir_bsig()
+        if self.writer is None:
+            self.writer = Writer(self, self.push_jobs,
+                                 self.push_jobs * queued_pushes_per_job)
+            _writers[id(self)] = self
+        self.writer.push(node)
+        self.warn_push_errors()
+
+    def warn_push_errors(self):
+        for msg in self.writer.take_errors():
+            SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning, msg)
+
+    def flush_pushes(self, skip=False):
+        """Wait for the pushes the Writer threads are doing."""
+        skipped = self.writer.flush(skip)
+        if skipped:
+            self.debug_write('CacheFlush(%s):  skipped pushing %d files\n'
+                             % (self.path, skipped))
+        self.warn_push_errors()
 
     def push_if_forced(self, node):
         if cache_force:
             return self.push(node)
 
+def _prefetch_candidate(node):
+    """Return whether prefetch() may retrieve the target node:  a
+    derived file that doesn't exist yet, that the Taskmaster hasn't
+    looked at and that doesn't need anything done besides building it."""
+    return (node.get_state() == SCons.Node.no_state and
+            node.is_derived() and
+            not node.side_effect and
+            not node.side_effects and
+            not node.nocache and
+            not node.always_build and
+            not node.exists())
+
+def _prefetch_ready(children, pending, retrieved):
+    """Return 'ready' if all of the children are there for the targets
+    that depend on them to be retrieved, 'wait' if some of them are
+    still being looked up, or None if the targets have to be left to
+    the Taskmaster."""
+    import SCons.Node.FS
+    import SCons.Node.Python
+    result = 'ready'
+    for c in children:
+        if c in retrieved:
+            continue
+        if isinstance(c, SCons.Node.FS.Entry):
+            c = c.disambiguate()
+        if c.is_derived():
+            if c not in pending:
+                return None
+            result = 'wait'
+        elif isinstance(c, SCons.Node.FS.File):
+            if not c.rexists():
+                return None
+        elif not isinstance(c, SCons.Node.Python.Value):
+            return None
+    return result
+
+def prefetch(nodes, num_threads):
+    """
+    Retrieves the targets that the specified Nodes depend on from
+    their caches in num_threads parallel threads, before the
+    Taskmaster starts walking the dependency graph.  Otherwise each
+    target only gets looked up in its cache when the Taskmaster gets
+    to it, so in a fresh checkout every hit costs a job slot and a
+    round trip through the Taskmaster.
+
+    Only targets that don't exist yet are looked at.  A target can be
+    looked up once the files it depends on are all source files or
+    targets that have already been retrieved, so the targets get
+    looked up in rounds, each one taking the ones whose dependencies
+    the previous rounds retrieved.  The targets built by an action
+    are retrieved together or not at all; the ones that can't be are
+    left for the Taskmaster to build (or retrieve) as usual.
+
+    Everything that touches shared state (signatures, Node lookups,
+    the .sconsign files) is done here in the calling thread; the
+    worker threads only copy the files out of the caches.
+    """
+    if threading is None or not cache_enabled:
+        return
+    import SCons.Node.FS
+
+    # Find the targets that could be retrieved, grouped by the
+    # Executor that builds them.
+    groups = []
+    seen = {}
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen[node] = 1
+        if isinstance(node, SCons.Node.FS.Entry):
+            node = node.disambiguate()
+        if isinstance(node, SCons.Node.FS.Dir):
+            stack.extend(node.children())
+            continue
+        if not node.has_builder():
+            continue
+        stack.extend(node.children(scan=0))
+        if not isinstance(node, SCons.Node.FS.File):
+            continue
+        executor = node.get_executor()
+        if executor in seen:
+            continue
+        seen[executor] = 1
+        targets = []
+        for t in executor.get_all_targets():
+            if isinstance(t, SCons.Node.FS.Entry):
+                t = t.disambiguate()
+            targets.append(t)
+        for t in targets:
+            if not isinstance(t, SCons.Node.FS.File) or \
+               not _prefetch_candidate(t):
+                break
+        else:
+            groups.append(targets)
+    if not groups:
+        return
+
+    pending = {}
+    for targets in groups:
+        for t in targets:
+            pending[t] = 1
+    retrieved = {}
+    checked = {}
+    found = {}
+    rounds = 0
+    start = time.time()
+
+    while groups:
+        ready = []
+        waiting = []
+        for targets in groups:
+            status = 'ready'
+            for t in targets:
+                try:
+                    s = _prefetch_ready(t.children(scan=0), pending, retrieved)
+                    if s == 'ready':
+                        # Only scan for the implicit dependencies once
+                        # everything the scanners read is there.
+                        s = _prefetch_ready(t.children(), pending, retrieved)
+                except Exception:
+                    # Leave it for the Taskmaster to report.
+                    s = None
+                if s != 'ready':
+                    status = s
+                    break
+            if status == 'ready':
+                ready.append(targets)
+            elif status == 'wait':
+                waiting.append(targets)
+            else:
+                for t in targets:
+                    del pending[t]
+        if not ready:
+            break
+        rounds = rounds + 1
+
+        work = []
+        for targets in ready:
+            for t in targets:
+                del pending[t]
+                env = t.get_build_env()
+                cd = env.get_CacheDir()
+                if not cd.is_enabled():
+                    continue
+                # Calculate the signature here, so the worker
+                # threads only have to copy the file.
+                cd.cachepath(t)
+                checked[cd] = checked.get(cd, 0) + 1
+                work.append((t, env, cd))
+
+        lock = threading.Lock()
+        hits = {}
+        def worker(work=list(work), hits=hits, lock=lock):
+            while True:
+                lock.acquire()
+                try:
+                    if not work:
+                        return
+                    t, env, cd = work.pop()
+                finally:
+                    lock.release()
+                try:
+                    if CacheRetrieveFunc([t], [], env) == 0:
+                        hits[t] = cd
+                except Exception:
+                    # Leave it for the Taskmaster to report.
+                    pass
+
+        threads = []
+        for i in range(min(num_threads, len(work))):
+            thread = threading.Thread(target=worker)
+            thread.setDaemon(1)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        for targets in ready:
+            for t in targets:
+                if t not in hits:
+                    break
+            else:
+                for t in targets:
+                    if cache_show:
+                        t.build(presub=0, execute=0)
+                    else:
+                        CacheRetrieve(t, [], t.get_build_env(), execute=0)
+                    t.set_state(SCons.Node.executed)
+                    t.built()
+                    t.visited()
+                    retrieved[t] = 1
+                    found[hits[t]] = found.get(hits[t], 0) + 1
+                for t in targets:
+                    t.postprocess()
+        groups = waiting
+
+    seconds = time.time() - start
+    for cd, count in checked.items():
+        cd.debug_write('CachePrefetch(%s):  retrieved %d of %d targets '
+                       'in %d rounds in %.3f seconds\n'
+                       % (cd.path, found.get(cd, 0), count, rounds, seconds))
+
 # Local Variables:
 # tab-width:4
 # indent-tabs-mode:nil
@@ -23,14 +23,19 @@
 
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
+import errno
+import os
 import os.path
 import shutil
+import stat
 import sys
+import time
 import unittest
 
 from TestCmd import TestCmd
 
 import SCons.CacheDir
+import SCons.Errors
 
 built_it = None
 
@@ -60,6 +65,8 @@ class Environment(object):
         return self
     def get_CacheDir(self):
         return self.cachedir
+    def copy_from_cache(self, src, dst):
+        shutil.copy2(src, dst)
 
 class BaseTestCase(unittest.TestCase):
     """
@@ -102,9 +109,494 @@ class CacheDirTestCase(BaseTestCase):
             dirname = os.path.join('cache', 'A')
             filename = os.path.join(dirname, 'a_fake_bsig')
             assert result == (dirname, filename), result
+
+            SCons.Util.set_hash_format('sha1')
+            try:
+                result = self._CacheDir.cachepath(f5)
+            finally:
+                SCons.Util.set_hash_format('md5')
+            dirname = os.path.join('cache', 'sha1', 'A')
+            filename = os.path.join(dirname, 'a_fake_bsig')
+            assert result == (dirname, filename), result
         finally:
             SCons.Util.MD5collect = save_collect
 
+class TransferTestCase(BaseTestCase):
+    """
+    Fixtures for pushing files to and retrieving them from the cache.
+    """
+    def push(self, name, contents, link_mode=None, precious=None, **kw):
+        self.test.write(name, contents)
+        self._CacheDir = SCons.CacheDir.CacheDir(self.test.workpath('cache'),
+                                                 link_mode, **kw)
+        f = self.File(self.test.workpath(name), 'bsig_' + name)
+        f.precious = precious
+        SCons.CacheDir.CachePushFunc([f], [], f.builder.env)
+        return f, self._CacheDir.cachepath(f)[1]
+
+    def retrieve(self, f, name):
+        r = self.File(self.test.workpath(name), f.cachesig)
+        r.precious = None
+        result = SCons.CacheDir.CacheRetrieveFunc([r], [], f.builder.env)
+        assert result == 0, result
+        return r
+
+    def writable(self, path):
+        return os.stat(path)[stat.ST_MODE] & stat.S_IWUSR
+
+class LinkModeTestCase(TransferTestCase):
+    """
+    Test the ways files get into and out of the cache.
+    """
+    def test_link_mode(self):
+        """Test checking the link_mode"""
+        assert self._CacheDir.link_mode == 'copy', self._CacheDir.link_mode
+        for mode in SCons.CacheDir.link_modes:
+            cd = SCons.CacheDir.CacheDir('cache', mode)
+            assert cd.link_mode == mode, cd.link_mode
+        try:
+            SCons.CacheDir.CacheDir('cache', 'symlink')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch expected UserError")
+
+    def test_copy(self):
+        """Test copying files into and out of the cache"""
+        f, cachefile = self.push('copy.in', "copy.in\n", 'copy')
+        assert not os.path.samefile(f.path, cachefile)
+        assert self.writable(cachefile)
+        r = self.retrieve(f, 'copy.out')
+        assert self.test.read(r.path) == "copy.in\n"
+        assert not os.path.samefile(r.path, cachefile)
+        assert self.writable(r.path)
+
+    def test_hardlink(self):
+        """Test hard-linking files into and out of the cache"""
+        if not hasattr(os, 'link'):
+            return
+        f, cachefile = self.push('hardlink.in', "hardlink.in\n", 'hardlink')
+        assert os.path.samefile(f.path, cachefile)
+        # The shared file can't be changed in place.
+        assert not self.writable(cachefile)
+        r = self.retrieve(f, 'hardlink.out')
+        assert self.test.read(r.path) == "hardlink.in\n"
+        assert os.path.samefile(r.path, cachefile)
+
+    def test_hardlink_precious(self):
+        """Test that precious targets are copied, not hard-linked"""
+        f, cachefile = self.push('precious.in', "precious.in\n",
+                                 'hardlink', precious=1)
+        assert not os.path.samefile(f.path, cachefile)
+        assert self.writable(f.path)
+
+    def test_hardlink_fallback(self):
+        """Test copying files that can't be hard-linked"""
+        if not hasattr(os, 'link'):
+            return
+        def cross_device(src, dst):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        save_link = os.link
+        os.link = cross_device
+        try:
+            f, cachefile = self.push('exdev.in', "exdev.in\n", 'hardlink')
+            r = self.retrieve(f, 'exdev.out')
+        finally:
+            os.link = save_link
+        assert not os.path.samefile(f.path, cachefile)
+        assert self.test.read(r.path) == "exdev.in\n"
+        assert self.writable(r.path)
+
+    def test_reflink(self):
+        """Test cloning files into and out of the cache"""
+        # Whether the clone works or it falls back to copying depends
+        # on the file system, but the result has to be the same.
+        f, cachefile = self.push('reflink.in', "reflink.in\n", 'reflink')
+        assert not os.path.samefile(f.path, cachefile)
+        assert self.test.read(cachefile) == "reflink.in\n"
+        r = self.retrieve(f, 'reflink.out')
+        assert self.test.read(r.path) == "reflink.in\n"
+        assert self.writable(r.path)
+
+    def test_reflink_failure(self):
+        """Test that a failed clone leaves nothing behind"""
+        self.test.write('clone.in', "clone.in\n")
+        src = self.test.workpath('clone.in')
+        dst = self.test.workpath('clone.out')
+        try:
+            SCons.CacheDir.reflink(src, dst)
+        except EnvironmentError:
+            assert not os.path.exists(dst)
+        else:
+            assert self.test.read(dst) == "clone.in\n"
+
+class CompressTestCase(TransferTestCase):
+    """
+    Test compressed cache entries.
+    """
+    def setUp(self):
+        TransferTestCase.setUp(self)
+        self.contents = ''.join(['line %d\n' % i for i in range(20000)])
+
+    def test_codecs(self):
+        """Test compressing and decompressing files a chunk at a time"""
+        self.test.write('file.in', self.contents)
+        src = self.test.workpath('file.in')
+        for codec in SCons.CacheDir.codecs.values():
+            compressed = self.test.workpath('file' + codec.suffix)
+            out = self.test.workpath('file.out')
+            read, written = codec.compress_file(src, compressed, 1)
+            assert read == len(self.contents), (codec.name, read)
+            assert written == os.path.getsize(compressed), (codec.name, written)
+            assert written < read / 3, (codec.name, written)
+            size, stored_size = codec.decompress_file(compressed, out)
+            assert size == read, (codec.name, size)
+            assert stored_size == written, (codec.name, stored_size)
+            assert self.test.read(out) == self.contents, codec.name
+
+    def test_bad_codec(self):
+        """Test asking for a codec that doesn't exist"""
+        try:
+            SCons.CacheDir.CacheDir('cache', compress = 'zip')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch expected UserError")
+
+    def test_compressed(self):
+        """Test pushing and retrieving compressed entries"""
+        if 'gzip' not in SCons.CacheDir.codecs:
+            return
+        f, cachefile = self.push('gzip.in', self.contents, compress = 'gzip')
+        assert not os.path.exists(cachefile)
+        assert os.path.exists(cachefile + '.gz')
+        import gzip
+        assert gzip.open(cachefile + '.gz').read() == self.contents
+        r = self.retrieve(f, 'gzip.out')
+        assert self.test.read(r.path) == self.contents
+        assert self.writable(r.path)
+
+        cd = self._CacheDir
+        assert cd.push_stats.files == 1, cd.push_stats.files
+        assert cd.push_stats.bytes == len(self.contents), cd.push_stats.bytes
+        stored = os.path.getsize(cachefile + '.gz')
+        assert cd.push_stats.stored_bytes == stored, cd.push_stats.stored_bytes
+        assert cd.retrieve_stats.bytes == len(self.contents), cd.retrieve_stats.bytes
+        assert cd.retrieve_stats.stored_bytes == stored, cd.retrieve_stats.stored_bytes
+
+        debug = self.test.workpath('cache-debug')
+        save_cache_debug = SCons.CacheDir.cache_debug
+        SCons.CacheDir.cache_debug = debug
+        try:
+            SCons.CacheDir.build_finished()
+        finally:
+            SCons.CacheDir.cache_debug = save_cache_debug
+            cd.debugFP.close()
+        expect = "%d bytes as %d bytes (%d saved)" % \
+                 (len(self.contents), stored, len(self.contents) - stored)
+        output = self.test.read(debug)
+        assert output.count(expect) == 2, output
+        assert cd.push_stats.files == 0, cd.push_stats.files
+
+    def test_mixed(self):
+        """Test caches with compressed and uncompressed entries"""
+        if 'gzip' not in SCons.CacheDir.codecs:
+            return
+        f1, cachefile1 = self.push('plain.in', "plain.in\n")
+        f2, cachefile2 = self.push('gzip.in', "gzip.in\n", compress = 'gzip')
+        assert os.path.exists(cachefile1)
+        assert os.path.exists(cachefile2 + '.gz')
+
+        # A cache that doesn't compress finds the compressed entries
+        # once they've been put there.
+        self._CacheDir = SCons.CacheDir.CacheDir(self.test.workpath('cache'))
+        r = self.retrieve(f2, 'gzip.out')
+        assert self.test.read(r.path) == "gzip.in\n"
+        r = self.retrieve(f1, 'plain.out')
+        assert self.test.read(r.path) == "plain.in\n"
+
+        # A compressed push doesn't replace an uncompressed entry.
+        f3, cachefile3 = self.push('plain.in', "plain.in\n", compress = 'gzip')
+        assert cachefile3 == cachefile1
+        assert not os.path.exists(cachefile1 + '.gz')
+
+    def test_uncompressed_lookup(self):
+        """Test that caches without compressed entries look for one file"""
+        cd = SCons.CacheDir.CacheDir(self.test.workpath('cache'))
+        class FS(object):
+            def __init__(self):
+                self.checked = []
+            def exists(self, path):
+                self.checked.append(path)
+                return False
+        fs = FS()
+        result = cd.find_entry(fs, 'cache/A/abc')
+        assert result == (None, None), result
+        marker = os.path.join(self.test.workpath('cache'),
+                              SCons.CacheDir.compressed_marker)
+        assert fs.checked == [marker, 'cache/A/abc'], fs.checked
+        fs.checked = []
+        cd.find_entry(fs, 'cache/A/abc')
+        assert fs.checked == ['cache/A/abc'], fs.checked
+
+class WriterTestCase(TransferTestCase):
+    """
+    Test pushing files to the cache in the background.
+    """
+    def setUp(self):
+        TransferTestCase.setUp(self)
+        self._CacheDir = SCons.CacheDir.CacheDir(self.test.workpath('cache'),
+                                                 push_jobs = 2)
+        self.save_push_file = SCons.CacheDir.push_file
+
+    def tearDown(self):
+        SCons.CacheDir.push_file = self.save_push_file
+        SCons.CacheDir._writers.clear()
+        SCons.CacheDir._touched.clear()
+
+    def files(self, count):
+        result = []
+        for i in range(count):
+            name = 'f%d.in' % i
+            self.test.write(name, name + "\n")
+            result.append(self.File(self.test.workpath(name), 'bsig%d' % i))
+        return result
+
+    def test_push(self):
+        """Test pushing files through the Writer threads"""
+        files = self.files(20)
+        for f in files:
+            self._CacheDir.push(f)
+        assert self._CacheDir.writer is not None
+        SCons.CacheDir.build_finished()
+        for f in files:
+            cachefile = self._CacheDir.cachepath(f)[1]
+            assert self.test.read(cachefile) == self.test.read(f.path), cachefile
+        assert self._CacheDir.writer.queue == [], self._CacheDir.writer.queue
+        assert self._CacheDir.writer.running == 0, self._CacheDir.writer.running
+
+    def test_bounded_queue(self):
+        """Test that pushes wait for room in the queue"""
+        import threading
+        release = threading.Event()
+        def push_file(t, cd, release=release):
+            release.wait()
+        SCons.CacheDir.push_file = push_file
+        cd = SCons.CacheDir.CacheDir(self.test.workpath('cache'), push_jobs = 1)
+        files = self.files(SCons.CacheDir.queued_pushes_per_job + 2)
+        def push_all(cd=cd, files=files):
+            for f in files:
+                cd.push(f)
+        pusher = threading.Thread(target=push_all)
+        pusher.start()
+        pusher.join(0.5)
+        assert pusher.isAlive()
+        assert len(cd.writer.queue) == SCons.CacheDir.queued_pushes_per_job, \
+               cd.writer.queue
+        release.set()
+        pusher.join()
+        cd.flush_pushes()
+        assert cd.writer.queue == [], cd.writer.queue
+
+    def test_skip_flush(self):
+        """Test dropping the pushes that haven't started"""
+        import threading
+        release = threading.Event()
+        pushed = []
+        def push_file(t, cd, release=release, pushed=pushed):
+            release.wait()
+            pushed.append(t)
+        SCons.CacheDir.push_file = push_file
+        cd = SCons.CacheDir.CacheDir(self.test.workpath('cache'), push_jobs = 1)
+        files = self.files(3)
+        for f in files:
+            cd.push(f)
+        while not cd.writer.running:
+            time.sleep(0.01)
+        threading.Timer(0.1, release.set).start()
+        assert cd.writer.flush(skip=True) == 2
+        assert pushed == files[:1], pushed
+
+    def test_errors(self):
+        """Test that failed pushes are CacheWriteErrorWarnings"""
+        self.test.write('cache', "not a directory\n")
+        files = self.files(2)
+        old_warn_exceptions = SCons.Warnings.warningAsException(1)
+        SCons.Warnings.enableWarningClass(SCons.Warnings.CacheWriteErrorWarning)
+        try:
+            # The warning comes from a later push, or the end of the build.
+            try:
+                for f in files:
+                    self._CacheDir.push(f)
+                SCons.CacheDir.build_finished()
+            except SCons.Warnings.CacheWriteErrorWarning, e:
+                assert str(e).find('Unable to copy') != -1, str(e)
+            else:
+                self.fail("did not catch expected CacheWriteErrorWarning")
+        finally:
+            SCons.Warnings.warningAsException(old_warn_exceptions)
+            SCons.Warnings.suppressWarningClass(SCons.Warnings.CacheWriteErrorWarning)
+
+class PruneTestCase(unittest.TestCase):
+    """
+    Test size-bounded caches.
+    """
+    def setUp(self):
+        self.test = TestCmd(workdir='')
+        self.test.subdir('cache', ['cache', 'A'], ['cache', 'B'])
+        self.cache = self.test.workpath('cache')
+        SCons.CacheDir._touched.clear()
+
+    def entry(self, name, size, atime):
+        path = os.path.join(self.cache, name)
+        self.test.write(path, 'x' * size)
+        os.utime(path, (atime, atime))
+        return path
+
+    def test_parse_size(self):
+        """Test parsing max_size values"""
+        parse_size = SCons.CacheDir.parse_size
+        assert parse_size(None) is None
+        assert parse_size(1000) == 1000
+        assert parse_size('1000') == 1000
+        assert parse_size('2k') == 2048, parse_size('2k')
+        assert parse_size('1.5M') == 1536 * 1024, parse_size('1.5M')
+        assert parse_size('3GB') == 3 * 1024**3, parse_size('3GB')
+        try:
+            parse_size('lots')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch expected UserError")
+
+    def test_record_access(self):
+        """Test that only bounded caches record accesses"""
+        path = self.entry(os.path.join('A', 'a1'), 10, 1000)
+        cd = SCons.CacheDir.CacheDir(self.cache)
+        cd.record_access(path)
+        assert cd.accessed == {}, cd.accessed
+        SCons.CacheDir.build_finished()
+        assert SCons.CacheDir._touched == {}, SCons.CacheDir._touched
+        assert not os.path.exists(os.path.join(self.cache,
+                                               SCons.CacheDir.index_name))
+
+        cd = SCons.CacheDir.CacheDir(self.cache, max_entries = 10)
+        cd.record_access(path)
+        name = os.path.join('A', 'a1')
+        assert list(cd.accessed.keys()) == [name], cd.accessed
+        assert cd.accessed[name][1] == 10, cd.accessed
+        assert list(SCons.CacheDir._touched.values()) == [cd]
+
+        SCons.CacheDir.build_finished()
+        assert SCons.CacheDir._touched == {}, SCons.CacheDir._touched
+        assert cd.accessed == {}, cd.accessed
+        entries, records = cd.read_index()
+        assert list(entries.keys()) == [name], entries
+        assert records == 1, records
+
+    def test_read_index(self):
+        """Test that the latest index record wins"""
+        self.test.write(['cache', SCons.CacheDir.index_name], """\
+100 10 A/a1
+200 20 B/b1
+300 10 A/a1
+4000 1
+""")
+        cd = SCons.CacheDir.CacheDir(self.cache)
+        entries, records = cd.read_index()
+        expect = {'A/a1' : (300, 10), 'B/b1' : (200, 20)}
+        assert entries == expect, entries
+        assert records == 3, records
+
+    def test_prune(self):
+        """Test removing the least recently used entries"""
+        names = []
+        for i in range(10):
+            name = os.path.join('AB'[i % 2], 'e%d' % i)
+            self.entry(name, 100, 1000 + i)
+            names.append(name)
+        cd = SCons.CacheDir.CacheDir(self.cache, max_size = 500)
+
+        # Nothing's indexed yet, so there's nothing to prune...
+        result = cd.prune()
+        assert result == (0, 0, 0, 0), result
+        for name in names:
+            assert os.path.exists(os.path.join(self.cache, name)), name
+
+        # ...until the files in the cache are indexed.
+        result = cd.prune(scan=True)
+        assert result == (6, 600, 4, 400), result
+        for name in names[:6]:
+            assert not os.path.exists(os.path.join(self.cache, name)), name
+        for name in names[6:]:
+            assert os.path.exists(os.path.join(self.cache, name)), name
+
+        # Using an entry makes it the most recently used.
+        cd.record_access(os.path.join(self.cache, names[6]))
+        cd.flush()
+        result = cd.prune(max_entries = 2)
+        assert result == (3, 300, 1, 100), result
+        assert os.path.exists(os.path.join(self.cache, names[6]))
+        entries, records = cd.read_index()
+        assert records == len(entries), (records, entries)
+
+    def test_prune_removed(self):
+        """Test pruning entries that other processes removed"""
+        a1 = self.entry(os.path.join('A', 'a1'), 100, 1000)
+        a2 = self.entry(os.path.join('A', 'a2'), 100, 2000)
+        b1 = self.entry(os.path.join('B', 'b1'), 100, 3000)
+        cd = SCons.CacheDir.CacheDir(self.cache, max_entries = 2)
+        cd.prune(scan=True)
+        assert not os.path.exists(a1)
+        assert not os.path.exists(a2)
+        assert os.path.exists(b1)
+        os.unlink(b1)
+        result = cd.prune(scan=True)
+        assert result == (0, 0, 0, 0), result
+
+class PrefetchTestCase(BaseTestCase):
+    """
+    Test deciding which targets prefetch() can look up.
+    """
+    def test_prefetch_ready(self):
+        """Test deciding whether a target's children are ready"""
+        import SCons.Node.Python
+        ready = SCons.CacheDir._prefetch_ready
+        self.test.write('src.in', "src.in\n")
+        src = self.fs.File(self.test.workpath('src.in'))
+        missing = self.fs.File(self.test.workpath('missing.in'))
+        value = SCons.Node.Python.Value('value')
+        d = self.fs.Dir(self.test.workpath('dir'))
+        mid = self.File(self.test.workpath('mid.out'))
+        other = self.File(self.test.workpath('other.out'))
+
+        assert ready([], {}, {}) == 'ready'
+        assert ready([src, value], {}, {}) == 'ready'
+        assert ready([src, missing], {}, {}) is None
+        assert ready([src, d], {}, {}) is None
+        assert ready([src, mid], {mid : 1}, {}) == 'wait'
+        assert ready([src, mid], {}, {mid : 1}) == 'ready'
+        assert ready([mid], {}, {}) is None
+        assert ready([mid, other], {mid : 1}, {}) is None
+
+    def test_prefetch_candidate(self):
+        """Test deciding whether a target can be prefetched"""
+        import SCons.Node
+        candidate = SCons.CacheDir._prefetch_candidate
+        self.test.write('exists.out', "exists.out\n")
+        assert not candidate(self.File(self.test.workpath('exists.out')))
+        assert not candidate(self.fs.File(self.test.workpath('src.in')))
+        f = self.File(self.test.workpath('f.out'))
+        assert candidate(f)
+        f.set_nocache()
+        assert not candidate(f)
+        f = self.File(self.test.workpath('g.out'))
+        f.set_always_build()
+        assert not candidate(f)
+        f = self.File(self.test.workpath('h.out'))
+        f.set_state(SCons.Node.pending)
+        assert not candidate(f)
+
 class FileTestCase(BaseTestCase):
     """
     Test calling CacheDir code through Node.FS.File interfaces.
@@ -282,6 +774,11 @@ if __name__ == "__main__":
     suite = unittest.TestSuite()
     tclasses = [
         CacheDirTestCase,
+        LinkModeTestCase,
+        CompressTestCase,
+        WriterTestCase,
+        PruneTestCase,
+        PrefetchTestCase,
         FileTestCase,
     ]
     for tclass in tclasses:
@@ -73,10 +73,24 @@ def dumpLoggedInstances(classes, file=sys.stdout):
             obj = ref()
             if obj is not None:
                 file.write('    %s:\n' % obj)
-                for key, value in obj.__dict__.items():
+                try:
+                    state = obj.__getstate__()
+                except AttributeError:
+                    state = obj.__dict__
+                for key, value in state.items():
                     file.write('        %20s : %s\n' % (key, value))
 
 
+# Counts of interesting events (cache hits and misses and the like),
+# reported along with the object counts by --debug=count.
+event_counts = {}
+
+def countEvent(name, n=1):
+    event_counts[name] = event_counts.get(name, 0) + n
+
+def fetchEventCounts():
+    return sorted(event_counts.items())
+
 
 if sys.platform[:5] == "linux":
     # Linux doesn't actually support memory usage stats from getrusage().
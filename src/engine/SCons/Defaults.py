@@ -93,6 +93,7 @@ def DefaultEnvironment(*args, **kw):
         global DefaultEnvironment
         DefaultEnvironment = _fetch_DefaultEnvironment
         _default_env._CacheDir_path = None
+        _default_env._CacheDir_options = {}
     return _default_env
 
 # Emitters for setting the shared attribute on object files,
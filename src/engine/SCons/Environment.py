@@ -72,6 +72,7 @@ CleanTargets = {}
 CalculatorArgs = {}
 
 semi_deepcopy = SCons.Util.semi_deepcopy
+is_String = SCons.Util.is_String
 
 # Pull UserError into the global name space for the benefit of
 # Environment().SourceSignatures(), which has some import statements
@@ -372,6 +373,8 @@ class SubstitutionEnvironment(object):
         self.ans = SCons.Node.Alias.default_ans
         self.lookup_list = SCons.Node.arg2nodes_lookups
         self._dict = kw.copy()
+        self._shared = {}
+        self._escaped = set()
         self._init_special()
         self.added_methods = []
         #self._memo = {}
@@ -406,7 +409,9 @@ class SubstitutionEnvironment(object):
             del self._dict[key]
 
     def __getitem__(self, key):
-        return self._dict[key]
+        if key in self._escaped:
+            return self._dict[key]
+        return self._escape(key)
 
     def __setitem__(self, key, value):
         # This is heavily used.  This implementation is the best we have
@@ -432,10 +437,18 @@ class SubstitutionEnvironment(object):
                and not _is_valid_var.match(key):
                     raise SCons.Errors.UserError("Illegal construction variable `%s'" % key)
             self._dict[key] = value
+        # The caller still has the value, and may change it in place
+        # (which strings, the bulk of the values, can't be).
+        if not is_String(value):
+            self._escaped.add(key)
 
     def get(self, key, default=None):
         """Emulates the get() method of dictionaries."""
-        return self._dict.get(key, default)
+        if key in self._escaped:
+            return self._dict.get(key, default)
+        if key not in self._dict:
+            return default
+        return self._escape(key)
 
     def has_key(self, key):
         return key in self._dict
@@ -444,8 +457,42 @@ class SubstitutionEnvironment(object):
         return self._dict.__contains__(key)
 
     def items(self):
+        self._escape_all()
         return list(self._dict.items())
 
+    def _own(self, key):
+        """Returns the value of a construction variable, after first
+        giving this environment its own copy if the value is still
+        shared with a clone (see Clone()).  Used before a value is
+        changed in place.
+        """
+        value = self._dict[key]
+        if self._shared.get(key) is value:
+            value = semi_deepcopy(value)
+            self._dict[key] = value
+        return value
+
+    def _escape(self, key):
+        """Returns the value of a construction variable that's being
+        handed out to a caller, who may change it in place.  Remembers
+        that the caller has it, so that Clone() copies it right away.
+        """
+        value = self._own(key)
+        self._escaped.add(key)
+        return value
+
+    def _escape_all(self):
+        for key in list(self._dict.keys()):
+            if key not in self._escaped:
+                self._escape(key)
+
+    def _escape_stored(self, kw):
+        """Remembers which of the values in kw were stored as they
+        are, since the caller still has them, too."""
+        for key, val in kw.items():
+            if self._dict.get(key) is val and not is_String(val):
+                self._escaped.add(key)
+
     def arg2nodes(self, args, node_factory=_null, lookup_list=_null, **kw):
         if node_factory is _null:
             node_factory = self.fs.File
@@ -934,6 +981,8 @@ class Base(SubstitutionEnvironment):
         self.ans = SCons.Node.Alias.default_ans
         self.lookup_list = SCons.Node.arg2nodes_lookups
         self._dict = semi_deepcopy(SCons.Defaults.ConstructionEnvironment)
+        self._shared = {}
+        self._escaped = set()
         self._init_special()
         self.added_methods = []
 
@@ -1023,15 +1072,20 @@ class Base(SubstitutionEnvironment):
     def get_CacheDir(self):
         try:
             path = self._CacheDir_path
+            options = self._CacheDir_options
         except AttributeError:
-            path = SCons.Defaults.DefaultEnvironment()._CacheDir_path
+            default_env = SCons.Defaults.DefaultEnvironment()
+            path = default_env._CacheDir_path
+            options = default_env._CacheDir_options
         try:
-            if path == self._last_CacheDir_path:
+            if path == self._last_CacheDir_path and \
+               options == self._last_CacheDir_options:
                 return self._last_CacheDir
         except AttributeError:
             pass
-        cd = SCons.CacheDir.CacheDir(path)
+        cd = SCons.CacheDir.CacheDir(path, **options)
         self._last_CacheDir_path = path
+        self._last_CacheDir_options = options
         self._last_CacheDir = cd
         return cd
 
@@ -1182,7 +1236,7 @@ class Base(SubstitutionEnvironment):
                     except (KeyError, TypeError):
                         try:
                             # Check if the original is a list.
-                            add_to_orig = orig.append
+                            add_to_orig = self._own(key).append
                         except AttributeError:
                             # The original isn't a list, but the new
                             # value is (by process of elimination),
@@ -1200,6 +1254,8 @@ class Base(SubstitutionEnvironment):
                 else:
                     # The original looks like a dictionary, so update it
                     # based on what we think the value looks like.
+                    orig = self._own(key)
+                    update_dict = orig.update
                     if SCons.Util.is_List(val):
                         if key == 'CPPDEFINES':
                             orig = orig.items()
@@ -1217,6 +1273,7 @@ class Base(SubstitutionEnvironment):
                                     orig[k] = v
                             else:
                                 orig[val] = None
+        self._escape_stored(kw)
         self.scanner_map_delete(kw)
 
     # allow Dirs and strings beginning with # for top-relative
@@ -1250,7 +1307,7 @@ class Base(SubstitutionEnvironment):
         if envname not in self._dict:
             self._dict[envname] = {}
 
-        self._dict[envname][name] = nv
+        self._own(envname)[name] = nv
 
     def AppendUnique(self, delete_existing=0, **kw):
         """Append values to existing construction variables
@@ -1266,7 +1323,7 @@ class Base(SubstitutionEnvironment):
                 self._dict[key] = val
             elif SCons.Util.is_Dict(self._dict[key]) and \
                  SCons.Util.is_Dict(val):
-                self._dict[key].update(val)
+                self._own(key).update(val)
             elif SCons.Util.is_List(val):
                 dk = self._dict[key]
                 if key == 'CPPDEFINES':
@@ -1364,6 +1421,7 @@ class Base(SubstitutionEnvironment):
                     if delete_existing:
                         dk = [x for x in dk if x not in val]
                     self._dict[key] = dk + val
+        self._escape_stored(kw)
         self.scanner_map_delete(kw)
 
     def Clone(self, tools=[], toolpath=None, parse_flags = None, **kw):
@@ -1373,17 +1431,38 @@ class Base(SubstitutionEnvironment):
         a reference is copied when an object is not deep-copyable
         (like a function).  There are no references to any mutable
         objects in the original Environment.
+
+        The copying is done lazily:  the two environments share the
+        values nobody outside them holds until one of the environments
+        hands a value out or changes it in place, at which point that
+        environment makes its own copy (see _own()).  Values that have
+        already been handed out are copied right away, since the caller
+        may still change them.
         """
         clone = copy.copy(self)
-        clone._dict = semi_deepcopy(self._dict)
+        clone._dict = self._dict.copy()
+        shared = self._dict.copy()
+        for key in self._escaped:
+            try:
+                value = shared.pop(key)
+            except KeyError:
+                continue
+            if key != 'BUILDERS':
+                clone._dict[key] = semi_deepcopy(value)
+        clone._escaped = set()
 
         try:
-            cbd = clone._dict['BUILDERS']
+            cbd = self._dict['BUILDERS']
         except KeyError:
             pass
         else:
+            # Each environment has its own BuilderDict, since it
+            # wraps the builders as methods of its environment.
+            shared.pop('BUILDERS', None)
             clone._dict['BUILDERS'] = BuilderDict(cbd, clone)
 
+        self._shared = clone._shared = shared
+
         # Check the methods added via AddMethod() and re-bind them to
         # the cloned environment.  Only do this if the attribute hasn't
         # been overwritten by the user explicitly and still points to
@@ -1430,6 +1509,18 @@ class Base(SubstitutionEnvironment):
     def _changed_content(self, dependency, target, prev_ni):
         return dependency.changed_content(target, prev_ni)
 
+    def _decides_on_content(self):
+        """Returns whether this environment's Decider() compares content
+        signatures (following the default decider to the default
+        construction environment's)."""
+        decide = self.decide_source
+        if decide is default_decide_source:
+            default_env = SCons.Defaults.DefaultEnvironment()
+            if default_env is self:
+                return False
+            return default_env._decides_on_content()
+        return decide == self._changed_content
+
     def _changed_source(self, dependency, target, prev_ni):
         target_env = dependency.get_build_env()
         type = target_env.get_tgt_sig_type()
@@ -1489,8 +1580,9 @@ class Base(SubstitutionEnvironment):
 
     def Dictionary(self, *args):
         if not args:
+            self._escape_all()
             return self._dict
-        dlist = [self._dict[x] for x in args]
+        dlist = [self[x] for x in args]
         if len(dlist) == 1:
             dlist = dlist[0]
         return dlist
@@ -1634,7 +1726,7 @@ class Base(SubstitutionEnvironment):
                             # so insert the the new value in the original
                             # (if there's one to insert).
                             if val:
-                                orig.insert(0, val)
+                                self._own(key).insert(0, val)
                         else:
                             # The added value is a list, so append
                             # the original to it (if there's a value
@@ -1645,6 +1737,8 @@ class Base(SubstitutionEnvironment):
                 else:
                     # The original looks like a dictionary, so update it
                     # based on what we think the value looks like.
+                    orig = self._own(key)
+                    update_dict = orig.update
                     if SCons.Util.is_List(val):
                         for v in val:
                             orig[v] = None
@@ -1657,6 +1751,7 @@ class Base(SubstitutionEnvironment):
                                     orig[k] = v
                             else:
                                 orig[val] = None
+        self._escape_stored(kw)
         self.scanner_map_delete(kw)
 
     def PrependENVPath(self, name, newpath, envname = 'ENV', sep = os.pathsep,
@@ -1681,7 +1776,7 @@ class Base(SubstitutionEnvironment):
         if envname not in self._dict:
             self._dict[envname] = {}
 
-        self._dict[envname][name] = nv
+        self._own(envname)[name] = nv
 
     def PrependUnique(self, delete_existing=0, **kw):
         """Prepend values to existing construction variables
@@ -1697,7 +1792,7 @@ class Base(SubstitutionEnvironment):
                 self._dict[key] = val
             elif SCons.Util.is_Dict(self._dict[key]) and \
                  SCons.Util.is_Dict(val):
-                self._dict[key].update(val)
+                self._own(key).update(val)
             elif SCons.Util.is_List(val):
                 dk = self._dict[key]
                 if not SCons.Util.is_List(dk):
@@ -1722,6 +1817,7 @@ class Base(SubstitutionEnvironment):
                     if delete_existing:
                         dk = [x for x in dk if x not in val]
                     self._dict[key] = val + dk
+        self._escape_stored(kw)
         self.scanner_map_delete(kw)
 
     def Replace(self, **kw):
@@ -1914,11 +2010,20 @@ class Base(SubstitutionEnvironment):
         nkw = self.subst_kw(kw)
         return SCons.Builder.Builder(**nkw)
 
-    def CacheDir(self, path):
+    def CacheDir(self, path, **kw):
         import SCons.CacheDir
         if path is not None:
             path = self.subst(path)
+        options = {}
+        for name, value in kw.items():
+            if value is not None:
+                options[name] = value
+        # Catch bad options here, where the SConscript file sets them.
+        SCons.CacheDir.CacheDir(None, **options)
         self._CacheDir_path = path
+        self._CacheDir_options = options
+        if path is not None:
+            SCons.CacheDir.configured_caches[path] = options
 
     def Clean(self, targets, files):
         global CleanTargets
@@ -2131,6 +2236,8 @@ class Base(SubstitutionEnvironment):
             side_effect.side_effect = 1
             self.Precious(side_effect)
             for target in targets:
+                if target.side_effects is SCons.Node._empty_list:
+                    target.side_effects = []
                 target.side_effects.append(side_effect)
         return side_effects
 
@@ -2376,6 +2483,10 @@ def NoSubstitutionProxy(subject):
             return getattr(self.__dict__['__subject'], name)
         def __setattr__(self, name, value):
             return setattr(self.__dict__['__subject'], name, value)
+        def __reduce__(self):
+            # The class itself can't be pickled, so pickle the
+            # function that creates it.
+            return (NoSubstitutionProxy, (self.__dict__['__subject'],))
         def executor_to_lvars(self, kwdict):
             if kwdict.has_key('executor'):
                 kwdict['lvars'] = kwdict['executor'].get_lvars()
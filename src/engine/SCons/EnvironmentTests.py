@@ -1869,6 +1869,59 @@ def generate(env):
         env = env.Clone(KEY_THAT_I_WANT=6, tools=[my_tool])
         assert env['KEY_THAT_I_WANT'] == real_value[0], env['KEY_THAT_I_WANT']
 
+    def test_Clone_shared(self):
+        """Test that cloned environments share values until changed"""
+        env1 = self.TestEnvironment(LIST = ['a'], DICT = {'a' : 1},
+                                    ENV = {'PATH' : '/bin'})
+        env2 = env1.Clone()
+        assert env2._dict['LIST'] is env1._dict['LIST']
+
+        # Values handed out by either environment are its own.
+        env2['LIST'].append('b')
+        env1['DICT']['b'] = 2
+        assert env1['LIST'] == ['a'], env1['LIST']
+        assert env2['LIST'] == ['a', 'b'], env2['LIST']
+        assert env1['DICT'] == {'a' : 1, 'b' : 2}, env1['DICT']
+        assert env2['DICT'] == {'a' : 1}, env2['DICT']
+        l = env1['LIST']
+        assert env1['LIST'] is l
+        assert env1.get('LIST') is l
+
+        # Values changed in place are copied first.
+        env3 = env1.Clone()
+        env3.AppendENVPath('PATH', '/usr/bin')
+        env3.Append(DICT = {'c' : 3})
+        assert env1['ENV']['PATH'] == '/bin', env1['ENV']
+        assert env3['ENV']['PATH'] == os.pathsep.join(['/bin', '/usr/bin']), env3['ENV']
+        assert 'c' not in env1['DICT'], env1['DICT']
+        assert env3['DICT']['c'] == 3, env3['DICT']
+
+        # Values handed out before cloning stay with the original.
+        l.append('c')
+        assert env1['LIST'] == ['a', 'c'], env1['LIST']
+        assert env3['LIST'] == ['a'], env3['LIST']
+
+        env4 = env1.Clone()
+        d = env4.Dictionary()
+        d['ENV']['FOO'] = 'foo'
+        assert 'FOO' not in env1['ENV'], env1['ENV']
+
+        # So do values that were stored as they were passed in.
+        libs = ['m']
+        env5 = self.TestEnvironment()
+        env5['LIBS'] = libs
+        defines = {'A' : 1}
+        env5.Append(CPPDEFINES = defines)
+        paths = ['include']
+        env5.Prepend(CPPPATH = paths)
+        env6 = env5.Clone()
+        libs.append('pthread')
+        defines['B'] = 2
+        paths.append('src')
+        assert env6['LIBS'] == ['m'], env6['LIBS']
+        assert env6['CPPDEFINES'] == {'A' : 1}, env6['CPPDEFINES']
+        assert env6['CPPPATH'] == ['include'], env6['CPPPATH']
+        assert env5['LIBS'] is libs
 
     def test_Copy(self):
         """Test copying using the old env.Copy() method"""
@@ -2742,6 +2795,28 @@ def generate(env):
 
         env.CacheDir('$CD')
         assert env._CacheDir_path == 'CacheDir', env._CacheDir_path
+        assert env.get_CacheDir().link_mode == 'copy'
+
+        env.CacheDir('foo', link_mode = 'hardlink')
+        assert env._CacheDir_options == {'link_mode' : 'hardlink'}, env._CacheDir_options
+        cd = env.get_CacheDir()
+        assert cd.path == 'foo', cd.path
+        assert cd.link_mode == 'hardlink', cd.link_mode
+        assert env.get_CacheDir() is cd
+
+        env.CacheDir('foo', link_mode = None, compress = 'gzip')
+        assert env._CacheDir_options == {'compress' : 'gzip'}, env._CacheDir_options
+        assert env.get_CacheDir() is not cd
+        assert env.get_CacheDir().link_mode == 'copy'
+        env.CacheDir('foo', link_mode = 'hardlink')
+
+        try:
+            env.CacheDir('foo', link_mode = 'softlink')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch expected UserError")
+        assert env._CacheDir_options == {'link_mode' : 'hardlink'}, env._CacheDir_options
 
     def test_Clean(self):
         """Test the Clean() method"""
@@ -108,6 +108,10 @@ def rfile(node):
         return rfile()
 
 
+# How many Executors have been created.  The Tool module looks at it to
+# tell whether applying a tool called any Builders.
+executors_created = 0
+
 class Executor(object):
     """A class for controlling instances of executing an action.
 
@@ -124,6 +128,8 @@ class Executor(object):
     def __init__(self, action, env=None, overridelist=[{}],
                  targets=[], sources=[], builder_kw={}):
         if __debug__: logInstanceCreation(self, 'Executor.Executor')
+        global executors_created
+        executors_created = executors_created + 1
         self.set_action_list(action)
         self.pre_actions = []
         self.post_actions = []
@@ -558,6 +564,7 @@ def get_NullEnvironment():
     class NullEnvironment(SCons.Util.Null):
         import SCons.CacheDir
         _CacheDir_path = None
+        _CacheDir_options = {}
         _CacheDir = SCons.CacheDir.CacheDir(None)
         def get_CacheDir(self):
             return self._CacheDir
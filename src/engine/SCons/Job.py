@@ -34,8 +34,12 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.compat
 
 import os
+# compat layer imports "cPickle" for us if it's available.
+import pickle
 import signal
+import sys
 
+import SCons.Action
 import SCons.Errors
 
 # The default stack size (in kilobytes) of the threads used to execute
@@ -49,6 +53,12 @@ import SCons.Errors
 explicit_stack_size = None
 default_stack_size = 256
 
+# The number of worker processes in which Python function actions that
+# support it are run during a parallel build (set by --process-jobs).
+# Zero means that all actions run in the worker threads.
+
+process_jobs = 0
+
 interrupt_msg = 'Build interrupted.'
 
 
@@ -264,6 +274,72 @@ else:
 
                 self.resultsQueue.put((task, ok))
 
+    def _ignore_sigint():
+        # The SCons process handles interrupts by stopping the
+        # Taskmaster; let the calls already running in the worker
+        # processes finish instead of dying with KeyboardInterrupt.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def _call_pickled(data):
+        """
+        Runs a pickled (function, args) call in a worker process.
+        Returns a (failed, value) tuple so exceptions that can't be
+        unpickled in the SCons process still get reported.
+        """
+        function, args = pickle.loads(data)
+        try:
+            return False, function(*args)
+        except Exception, e:
+            try:
+                pickle.loads(pickle.dumps(e, 1))
+            except Exception:
+                e = Exception('%s: %s' % (e.__class__.__name__, e))
+            return True, e
+
+    class ProcessPool(object):
+        """This class runs the calls that function actions hand to it
+        in a pool of worker processes, so Python code in actions doesn't
+        hold the interpreter lock that the worker threads share."""
+
+        def __init__(self, num):
+            """Create a pool of 'num' worker processes.
+
+            Raises ImportError if the multiprocessing module isn't
+            available.
+            """
+            # SCons.compat installs cPickle as the "pickle" module, but
+            # multiprocessing subclasses the pure-Python Pickler class,
+            # so let it see the real module while it's imported.
+            fast_pickle = sys.modules.pop('pickle', None)
+            try:
+                import multiprocessing
+                import multiprocessing.forking
+                import multiprocessing.pool
+            finally:
+                if fast_pickle is not None:
+                    sys.modules['pickle'] = fast_pickle
+            self.pool = multiprocessing.Pool(num, _ignore_sigint)
+
+        def call(self, function, args):
+            """Call function(*args) in a worker process and return the
+            result, or re-raise the exception it raised.  This is called
+            from the worker threads, which block until the call is done.
+            Calls that can't be pickled run in the calling thread.
+            """
+            try:
+                data = pickle.dumps((function, args), 1)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return function(*args)
+            failed, value = self.pool.apply(_call_pickled, (data,))
+            if failed:
+                raise value
+            return value
+
+        def cleanup(self):
+            """Shuts down the worker processes."""
+            self.pool.close()
+            self.pool.join()
+
     class ThreadPool(object):
         """This class is responsible for spawning and managing worker threads."""
 
@@ -362,6 +438,14 @@ else:
 
             self.taskmaster = taskmaster
             self.interrupted = InterruptState()
+            # Start any worker processes before the worker threads,
+            # so they aren't forked while the threads are running.
+            self.pp = None
+            if process_jobs > 0:
+                try:
+                    self.pp = ProcessPool(process_jobs)
+                except ImportError:
+                    pass
             self.tp = ThreadPool(num, stack_size, self.interrupted)
 
             self.maxjobs = num
@@ -373,6 +457,8 @@ else:
             an exception), then the job will stop."""
 
             jobs = 0
+
+            SCons.Action.process_pool = self.pp
             
             while True:
                 # Start up as many available tasks as we're
@@ -426,6 +512,9 @@ else:
                         break
 
             self.tp.cleanup()
+            if self.pp:
+                self.pp.cleanup()
+                SCons.Action.process_pool = None
             self.taskmaster.cleanup()
 
 # Local Variables:
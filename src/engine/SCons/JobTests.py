@@ -25,6 +25,8 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import unittest
 import random
 import math
+import os
+import SCons.Action
 import SCons.Job
 import sys
 import time
@@ -279,6 +281,56 @@ class ParallelTestCase(unittest.TestCase):
         finally:
             SCons.Job.ThreadPool = SaveThreadPool
 
+class ProcessPoolTestCase(unittest.TestCase):
+    def runTest(self):
+        "test running calls in a pool of worker processes"
+
+        try:
+            import multiprocessing
+        except ImportError:
+            return
+
+        pp = SCons.Job.ProcessPool(2)
+        try:
+            pid = pp.call(os.getpid, ())
+            assert pid != os.getpid(), pid
+
+            # Calls that can't be pickled run in this process.
+            pid = pp.call(lambda: os.getpid(), ())
+            assert pid == os.getpid(), pid
+
+            try:
+                pp.call(int, ('not a number',))
+            except ValueError:
+                pass
+            else:
+                self.fail("ValueError expected")
+        finally:
+            pp.cleanup()
+
+        # Parallel jobs make the pool available to actions while
+        # they're running.
+        pools = []
+        class PoolTask(Task):
+            def _do_something(self):
+                pools.append(SCons.Action.process_pool)
+
+        save_process_jobs = SCons.Job.process_jobs
+        SCons.Job.process_jobs = 2
+        try:
+            taskmaster = Taskmaster(3, self, PoolTask)
+            jobs = SCons.Job.Jobs(2, taskmaster)
+            jobs.run()
+        finally:
+            SCons.Job.process_jobs = save_process_jobs
+
+        self.failUnless(taskmaster.all_tasks_are_executed(),
+                        "all the tests were not executed")
+        assert len(pools) == 3, pools
+        for pool in pools:
+            assert isinstance(pool, SCons.Job.ProcessPool), pool
+        assert SCons.Action.process_pool is None, SCons.Action.process_pool
+
 class SerialTestCase(unittest.TestCase):
     def runTest(self):
         "test a serial job"
@@ -512,6 +564,7 @@ class ParallelTaskTest(_SConsTaskTest):
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(ParallelTestCase())
+    suite.addTest(ProcessPoolTestCase())
     suite.addTest(SerialTestCase())
     suite.addTest(NoParallelTestCase())
     suite.addTest(SerialExceptionTestCase())
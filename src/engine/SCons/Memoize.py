@@ -206,6 +206,18 @@ class CountDict(Counter):
                 self.miss = self.miss + 1
         return self.underlying_method(*args, **kw)
 
+class CountEvents(Counter):
+    """
+    A counter class for caches that don't fit the memoized-method
+    pattern, whose hits and misses are counted by the code using them.
+
+    The name is given up front, since there's no method for the
+    metaclass initialization to fill it in from.
+    """
+    def __init__(self, name):
+        Counter.__init__(self, name.split('.')[-1])
+        self.name = name
+
 class Memoizer(object):
     """Object which performs caching of method calls for its 'primary'
     instance."""
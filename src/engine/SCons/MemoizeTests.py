@@ -171,11 +171,34 @@ class CountValueTestCase(unittest.TestCase):
         assert c.miss == 1, c.miss
 
 
+class CountEventsTestCase(unittest.TestCase):
+
+    def test_display(self):
+        """Displaying hits and misses counted by the caller
+        """
+        c = SCons.Memoize.CountEvents('Finder.index_lookup')
+        assert c in SCons.Memoize.CounterList
+        c.hit = c.hit + 2
+        c.miss = c.miss + 1
+
+        import io
+        save_stdout = sys.stdout
+        sys.stdout = io.BytesIO()
+        try:
+            c.display()
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = save_stdout
+        expect = "          2 hits       1 misses    Finder.index_lookup()\n"
+        assert output == expect, repr(output)
+
+
 if __name__ == "__main__":
     suite = unittest.TestSuite()
     tclasses = [
         CountDictTestCase,
         CountValueTestCase,
+        CountEventsTestCase,
     ]
     for tclass in tclasses:
         names = unittest.getTestCaseNames(tclass, 'test_')
@@ -42,8 +42,10 @@ import stat
 import sys
 import time
 import codecs
+import errno
 
 import SCons.Action
+import SCons.Debug
 from SCons.Debug import logInstanceCreation
 import SCons.Errors
 import SCons.Memoize
@@ -79,6 +81,13 @@ class EntryProxyAttributeError(AttributeError):
 # any file that's been untouched for more than two days.
 default_max_drift = 2*24*60*60
 
+# The racy window:  a content signature is only remembered along with
+# the file's (device, inode, size, mtime) stat signature if the file
+# was last modified at least this many seconds before we read it.
+# Otherwise a later modification could land within the same timestamp
+# granularity and leave the stat signature unchanged.
+csig_cache_racy_window = 2
+
 #
 # We stringify these file system Nodes a lot.  Turning a file system Node
 # into a string is non-trivial, because the final string representation
@@ -102,6 +111,39 @@ Save_Strings = None
 def save_strings(val):
     global Save_Strings
     Save_Strings = val
+    # The SConscript files may have changed things on disk behind our
+    # back, so don't trust the directory snapshots taken so far.
+    invalidate_dir_snapshots()
+
+#
+# Directory snapshots (see Dir.disk_snapshot()) taken before the last
+# call to invalidate_dir_snapshots() are out of date and get read
+# again the next time they're needed.  Interactive mode calls this
+# between builds, since anything might have changed on disk.
+#
+_snapshot_generation = 0
+
+#
+# The directories that FileFinder path indexes (see PathIndex below)
+# were built from, mapped to the (index, position) pairs that depend
+# on each of them.  Declaring or building something in one of these
+# directories tells the indexes not to trust what they recorded.
+#
+_indexed_dirs = {}
+
+def invalidate_dir_snapshots():
+    global _snapshot_generation
+    _snapshot_generation = _snapshot_generation + 1
+    # The path indexes built from the old snapshots are out of date, too.
+    _indexed_dirs.clear()
+
+def _indexed_dir_changed(dir):
+    try:
+        dependents = _indexed_dirs.pop(dir)
+    except KeyError:
+        return
+    for index, position in dependents:
+        index.distrust(position)
 
 #
 # Avoid unnecessary function calls by recording a Boolean value that
@@ -572,6 +614,16 @@ class Base(SCons.Node.Node):
     object identity comparisons.
     """
 
+    # Entry, Dir and File objects turn into each other by changing
+    # their __class__, so the slots for all of their attributes are
+    # here, and the subclasses don't add any.
+    __slots__ = ['name', 'suffix', 'fs', 'abspath', 'labspath', 'path',
+                 'tpath', 'path_elements', 'dir', 'cwd', 'duplicate',
+                 '_local', 'sbuilder', '_proxy', 'entries',
+                 'on_disk_entries', 'repositories', 'srcdir', 'searched',
+                 '_sconsign', 'variant_dirs', 'root', 'dirname',
+                 'cachedir_csig', 'cachesig', 'include_names']
+
     memoizer_counters = []
 
     def __init__(self, name, directory, fs):
@@ -681,11 +733,60 @@ class Base(SCons.Node.Node):
     def stat(self):
         try: return self._memo['stat']
         except KeyError: pass
-        try: result = self.fs.stat(self.abspath)
-        except os.error: result = None
+        entry = self.disk_entry()
+        if entry is None:
+            if __debug__: SCons.Debug.countEvent('file system calls avoided: stat')
+            result = None
+        elif entry.stat is not None:
+            if __debug__: SCons.Debug.countEvent('file system calls avoided: stat')
+            result = entry.stat
+            # Only use it once:  if our memoized value gets cleared,
+            # it's because something may have changed on disk.
+            entry.stat = None
+        else:
+            try: result = self.fs.stat(self.abspath)
+            except os.error: result = None
         self._memo['stat'] = result
         return result
 
+    def disk_entry(self):
+        """Return what our directory's snapshot says about this entry:
+        its DiskEntry, or None if it isn't on disk.
+
+        We only trust snapshots once the SConscript files have been
+        read (see save_strings()).  Until then, or when the snapshot
+        can't tell, this returns an empty DiskEntry so the caller asks
+        the file system."""
+        if not Save_Strings:
+            return _unknown_entry
+        snapshot = self.dir.disk_snapshot()
+        try:
+            return snapshot[_my_normcase(self.name)]
+        except KeyError:
+            if snapshot.complete and sys.platform != 'win32':
+                return None
+            # Windows can find 8.3 file names that don't show up in
+            # directory listings.
+            return _unknown_entry
+
+    def clear_memoized_values(self):
+        self._memo = {}
+        # We may just have been built, removed or fetched from a
+        # CacheDir, so our directory's snapshot can't answer for us
+        # any more.  (Our dir attribute isn't set yet when this is
+        # called from SCons.Node.Node.__init__().)
+        try:
+            snapshot = self.dir.on_disk_entries
+        except AttributeError:
+            pass
+        else:
+            snapshot.forget(self.name)
+
+    def builder_set(self, builder):
+        SCons.Node.Node.builder_set(self, builder)
+        if self.dir in _indexed_dirs:
+            _indexed_dir_changed(self.dir)
+
     def exists(self):
         return self.stat() is not None
 
@@ -703,15 +804,41 @@ class Base(SCons.Node.Node):
         else: return None
 
     def isdir(self):
+        if 'stat' not in self._memo:
+            kind = self.disk_entry_kind()
+            if kind is not None:
+                return kind == 'dir'
         st = self.stat()
         return st is not None and stat.S_ISDIR(st[stat.ST_MODE])
 
     def isfile(self):
+        if 'stat' not in self._memo:
+            kind = self.disk_entry_kind()
+            if kind is not None:
+                return kind == 'file'
         st = self.stat()
         return st is not None and stat.S_ISREG(st[stat.ST_MODE])
 
+    def disk_entry_kind(self):
+        """Return 'dir', 'file' or 'other' if our directory's snapshot
+        says what kind of thing we are without having to follow a
+        symlink, or None if stat() has to find out."""
+        entry = self.disk_entry()
+        if entry is None or entry.kind == 'link':
+            return None
+        if entry.kind is not None:
+            if __debug__: SCons.Debug.countEvent('file system calls avoided: stat')
+        return entry.kind
+
     if hasattr(os, 'symlink'):
         def islink(self):
+            entry = self.disk_entry()
+            if entry is None:
+                if __debug__: SCons.Debug.countEvent('file system calls avoided: lstat')
+                return 0
+            if entry.kind is not None:
+                if __debug__: SCons.Debug.countEvent('file system calls avoided: lstat')
+                return entry.kind == 'link'
             try: st = self.fs.lstat(self.abspath)
             except os.error: return 0
             return stat.S_ISLNK(st[stat.ST_MODE])
@@ -1012,6 +1139,59 @@ class Entry(Base):
 _classEntry = Entry
 
 
+# Use os.scandir() (or the scandir module it came from, if it's
+# installed) to read directories, because it tells us what kind of
+# thing each entry is (and on Windows, its stat() information) without
+# a separate system call per entry.
+try:
+    _scandir = os.scandir
+except AttributeError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
+
+class DiskEntry(object):
+    """What a directory listing told us about one of its entries.
+
+    The kind is 'dir', 'file', 'link' or 'other', or None if the
+    listing didn't say.  The stat attribute holds the entry's stat()
+    result if that came free with the listing (on Windows), or None.
+    """
+    def __init__(self, name, kind=None, stat=None):
+        self.name = name
+        self.kind = kind
+        self.stat = stat
+
+# Returned by Base.disk_entry() when there's no snapshot that can
+# answer for an entry, so it has to ask the file system itself.
+_unknown_entry = DiskEntry(None)
+
+class DirSnapshot(dict):
+    """A one-shot listing of a directory, mapping the normalized
+    names of its entries to DiskEntry objects (or to None, for names
+    we've since found out aren't on disk).
+
+    A name that isn't in a complete snapshot wasn't on disk when the
+    snapshot was taken.  A snapshot is incomplete if the directory
+    exists but couldn't be read.
+    """
+    def __init__(self, complete=1):
+        dict.__init__(self)
+        self.complete = complete
+        self.generation = _snapshot_generation
+
+    def forget(self, name):
+        """Stop answering for an entry that may have changed on disk
+        since the snapshot was taken (because we just built it, say).
+
+        Building one entry often writes others that nobody told us
+        about (.pdb files, dependency files and the like), so don't
+        say anything else in the directory isn't there, either."""
+        self[_my_normcase(name)] = DiskEntry(name)
+        self.complete = 0
+
+
 class LocalFS(object):
 
     if SCons.Memoize.use_memoizer:
@@ -1039,21 +1219,30 @@ class LocalFS(object):
         return shutil.copy(src, dst)
     def copy2(self, src, dst):
         return shutil.copy2(src, dst)
+    # The methods that query the file system count their calls, which
+    # --debug=count reports at the end of the run.
     def exists(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: exists')
         return os.path.exists(path)
     def getmtime(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: getmtime')
         return os.path.getmtime(path)
     def getsize(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: getsize')
         return os.path.getsize(path)
     def isdir(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: isdir')
         return os.path.isdir(path)
     def isfile(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: isfile')
         return os.path.isfile(path)
     def link(self, src, dst):
         return os.link(src, dst)
     def lstat(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: lstat')
         return os.lstat(path)
     def listdir(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: listdir')
         return os.listdir(path)
     def makedirs(self, path):
         return os.makedirs(path)
@@ -1062,7 +1251,35 @@ class LocalFS(object):
     def rename(self, old, new):
         return os.rename(old, new)
     def stat(self, path):
+        if __debug__: SCons.Debug.countEvent('file system calls: stat')
         return os.stat(path)
+    def scandir(self, path):
+        """Return a list of DiskEntry objects for the entries in the
+        path directory, with whatever we can find out about them
+        without more system calls."""
+        if _scandir is None:
+            return list(map(DiskEntry, self.listdir(path)))
+        if __debug__: SCons.Debug.countEvent('file system calls: scandir')
+        result = []
+        for e in _scandir(path):
+            st = None
+            try:
+                if e.is_symlink():
+                    kind = 'link'
+                elif e.is_dir():
+                    kind = 'dir'
+                elif e.is_file():
+                    kind = 'file'
+                else:
+                    kind = 'other'
+                if sys.platform == 'win32' and kind != 'link':
+                    # Windows fills in the stat() information of
+                    # everything but symlinks from the listing.
+                    st = e.stat()
+            except OSError:
+                kind = None
+            result.append(DiskEntry(e.name, kind, st))
+        return result
     def symlink(self, src, dst):
         return os.symlink(src, dst)
     def open(self, path):
@@ -1072,6 +1289,7 @@ class LocalFS(object):
 
     if hasattr(os, 'symlink'):
         def islink(self, path):
+            if __debug__: SCons.Debug.countEvent('file system calls: islink')
             return os.path.islink(path)
     else:
         def islink(self, path):
@@ -1406,6 +1624,46 @@ class FS(LocalFS):
             cwd = self.getcwd()
         return cwd.glob(pathname, ondisk, source, strings)
 
+    def _stored_path_node_key(self, s):
+        return s
+
+    memoizer_counters.append(SCons.Memoize.CountDict('stored_path_node', _stored_path_node_key))
+
+    def stored_path_node(self, s):
+        """
+        Return the Node for a dependency path as stored in a .sconsign
+        file:  relative to the top-level SConstruct directory, or an
+        absolute path if it's outside.
+
+        The same paths come up for lots of targets (a header that most
+        of the objects include), so each one is only looked up once.
+        """
+        try:
+            memo_dict = self._memo['stored_path_node']
+        except KeyError:
+            memo_dict = {}
+            self._memo['stored_path_node'] = memo_dict
+        else:
+            try:
+                return memo_dict[s]
+            except KeyError:
+                pass
+
+        top = self.Top
+        root = top.root
+        p = s
+        if do_splitdrive:
+            drive, p = _my_splitdrive(p)
+            if drive:
+                root = self.get_root(drive)
+        if not os.path.isabs(p):
+            p = top.labspath + '/' + p
+        result = root._lookup_abs(p, Entry)
+
+        memo_dict[s] = result
+
+        return result
+
 class DirNodeInfo(SCons.Node.NodeInfoBase):
     # This should get reset by the FS initialization.
     current_version_id = 1
@@ -1413,15 +1671,7 @@ class DirNodeInfo(SCons.Node.NodeInfoBase):
     fs = None
 
     def str_to_node(self, s):
-        top = self.fs.Top
-        root = top.root
-        if do_splitdrive:
-            drive, s = _my_splitdrive(s)
-            if drive:
-                root = self.fs.get_root(drive)
-        if not os.path.isabs(s):
-            s = top.labspath + '/' + s
-        return root._lookup_abs(s, Entry)
+        return self.fs.stored_path_node(s)
 
 class DirBuildInfo(SCons.Node.BuildInfoBase):
     current_version_id = 1
@@ -1824,28 +2074,59 @@ class Dir(Base):
     def entry_tpath(self, name):
         return self.tpath + OS_SEP + name
 
-    def entry_exists_on_disk(self, name):
+    def disk_snapshot(self):
+        """Return a DirSnapshot of what's in this directory on disk,
+        reading the directory if we haven't yet (or since the last
+        invalidate_dir_snapshots() call).
+
+        The snapshot lets us answer lookups and stat() calls for all
+        of our entries with one system call, instead of one per entry.
+        """
         try:
-            d = self.on_disk_entries
+            snapshot = self.on_disk_entries
         except AttributeError:
-            d = {}
-            try:
-                entries = os.listdir(self.abspath)
-            except OSError:
-                pass
-            else:
-                for entry in map(_my_normcase, entries):
-                    d[entry] = True
-            self.on_disk_entries = d
+            pass
+        else:
+            if snapshot.generation == _snapshot_generation:
+                return snapshot
+        try:
+            entries = self.fs.scandir(self.abspath)
+        except OSError, e:
+            # A directory that doesn't exist has no entries, but one
+            # we can't read might have any of them.
+            snapshot = DirSnapshot(e.errno in (errno.ENOENT, errno.ENOTDIR))
+        else:
+            snapshot = DirSnapshot()
+            for entry in entries:
+                snapshot[_my_normcase(entry.name)] = entry
+        self.on_disk_entries = snapshot
+        return snapshot
+
+    def clear_memoized_values(self):
+        Base.clear_memoized_values(self)
+        # We may just have been created, so read our entries again.
+        try:
+            del self.on_disk_entries
+        except AttributeError:
+            pass
+        if self in _indexed_dirs:
+            _indexed_dir_changed(self)
+
+    def entry_exists_on_disk(self, name):
+        d = self.disk_snapshot()
         if sys.platform == 'win32':
             name = _my_normcase(name)
-            result = d.get(name)
-            if result is None:
+            try:
+                result = d[name]
+            except KeyError:
                 # Belt-and-suspenders for Windows:  check directly for
                 # 8.3 file names that don't show up in os.listdir().
-                result = os.path.exists(self.abspath + OS_SEP + name)
+                if self.fs.exists(self.abspath + OS_SEP + name):
+                    result = DiskEntry(name)
+                else:
+                    result = None
                 d[name] = result
-            return result
+            return result is not None
         else:
             return name in d
 
@@ -2059,10 +2340,18 @@ class Dir(Base):
                 # entries for all Nodes in repositories or variant dirs.
                 for name in node_names: selfEntry(name)
             if ondisk:
+                # Read the directory again, in case the SConscript
+                # files have just written something in it, and keep
+                # the listing so the Entry nodes we create below can
+                # tell whether they're files or directories from it.
                 try:
-                    disk_names = os.listdir(dir.abspath)
-                except os.error:
+                    del dir.on_disk_entries
+                except AttributeError:
+                    pass
+                snapshot = dir.disk_snapshot()
+                if not snapshot.complete:
                     continue
+                disk_names = [e.name for e in snapshot.values()]
                 names.extend(disk_names)
                 if not strings:
                     # We're going to return corresponding Nodes in
@@ -2240,6 +2529,19 @@ class RootDir(Dir):
         else:
             return 0
 
+    def disk_entry(self):
+        # We're our own parent directory, not one of its entries.
+        return _unknown_entry
+
+    def clear_memoized_values(self):
+        self._memo = {}
+        try:
+            del self.on_disk_entries
+        except AttributeError:
+            pass
+        if self in _indexed_dirs:
+            _indexed_dir_changed(self)
+
     def up(self):
         return None
 
@@ -2250,6 +2552,7 @@ class RootDir(Dir):
         return _null
 
 class FileNodeInfo(SCons.Node.NodeInfoBase):
+    __slots__ = ('csig', 'timestamp', 'size', 'statsig')
     current_version_id = 1
 
     field_list = ['csig', 'timestamp', 'size']
@@ -2258,26 +2561,21 @@ class FileNodeInfo(SCons.Node.NodeInfoBase):
     fs = None
 
     def str_to_node(self, s):
-        top = self.fs.Top
-        root = top.root
-        if do_splitdrive:
-            drive, s = _my_splitdrive(s)
-            if drive:
-                root = self.fs.get_root(drive)
-        if not os.path.isabs(s):
-            s = top.labspath + '/' + s
-        return root._lookup_abs(s, Entry)
+        return self.fs.stored_path_node(s)
 
 class FileBuildInfo(SCons.Node.BuildInfoBase):
+    __slots__ = ()
     current_version_id = 1
 
-    def convert_to_sconsign(self):
+    def convert_to_sconsign(self, paths=None):
         """
         Converts this FileBuildInfo object for writing to a .sconsign file
 
         This replaces each Node in our various dependency lists with its
         usual string representation: relative to the top-level SConstruct
-        directory, or an absolute path if it's outside.
+        directory, or an absolute path if it's outside.  If the .sconsign
+        file has a path table, the strings are replaced in turn by their
+        indexes in it.
         """
         if os_sep_is_slash:
             node_to_str = str
@@ -2296,15 +2594,29 @@ class FileBuildInfo(SCons.Node.BuildInfoBase):
             except AttributeError:
                 pass
             else:
-                setattr(self, attr, list(map(node_to_str, val)))
-    def convert_from_sconsign(self, dir, name):
+                val = list(map(node_to_str, val))
+                if paths is not None:
+                    val = list(map(paths.add, val))
+                setattr(self, attr, val)
+    def convert_from_sconsign(self, dir, name, paths=None):
         """
         Converts a newly-read FileBuildInfo object for in-SCons use
 
-        For normal up-to-date checking, we don't have any conversion to
-        perform--but we're leaving this method here to make that clear.
+        This puts the paths from the .sconsign file's path table back in
+        place of their indexes.  The paths stay strings until something
+        needs the Nodes (see prepare_dependencies(), below).  Entries
+        from .sconsign files without a path table hold the strings
+        themselves.
         """
-        pass
+        if paths is None:
+            return
+        for attr in ['bsources', 'bdepends', 'bimplicit']:
+            try:
+                val = getattr(self, attr)
+            except AttributeError:
+                continue
+            if val and isinstance(val[0], int):
+                setattr(self, attr, [paths[i] for i in val])
     def prepare_dependencies(self):
         """
         Prepares a FileBuildInfo object for explaining what changed
@@ -2390,7 +2702,6 @@ class File(Base):
 
     def _morph(self):
         """Turn a file system node into a File object."""
-        self.scanner_paths = {}
         if not hasattr(self, '_local'):
             self._local = 0
 
@@ -2637,6 +2948,12 @@ class File(Base):
             except AttributeError:
                 pass
 
+        # Carry over include names found since the entry was read.
+        try:
+            sconsign_entry.include_names = self.include_names
+        except AttributeError:
+            pass
+
         self._memo['get_stored_info'] = sconsign_entry
 
         return sconsign_entry
@@ -2647,6 +2964,35 @@ class File(Base):
         try: return binfo.bimplicit
         except AttributeError: return None
 
+    def get_stored_include_names(self, key):
+        """
+        Returns the include names that the scanner identified by key
+        found the last time it scanned this file, as stored in the
+        .sconsign file, if the file's contents haven't changed since.
+        Returns None otherwise.
+        """
+        try:
+            stored_key, csig, names = self.get_stored_info().include_names
+        except AttributeError:
+            return None
+        if stored_key != key or csig != self.get_csig():
+            return None
+        return names
+
+    def store_include_names(self, key, names):
+        """
+        Records the include names that the scanner identified by key
+        found in this file, along with the file's content signature,
+        so later builds can reuse them until the file changes.
+
+        They're kept in the file's own .sconsign entry, not in its
+        NodeInfo, which gets copied into the build information of
+        every target that depends on the file.  We hang on to them
+        ourselves, too, since scanning clears the memoized entry.
+        """
+        self.include_names = (key, self.get_csig(), names)
+        self.get_stored_info().include_names = self.include_names
+
     def rel_path(self, other):
         return self.dir.rel_path(other)
 
@@ -2738,7 +3084,7 @@ class File(Base):
             # any build information that's stored in the .sconsign file
             # into our binfo object so it doesn't get lost.
             old = self.get_stored_info()
-            self.get_binfo().__dict__.update(old.binfo.__dict__)
+            self.get_binfo().merge(old.binfo)
 
         self.store_info()
 
@@ -2881,6 +3227,36 @@ class File(Base):
     # SIGNATURE SUBSYSTEM
     #
 
+    def get_statsig(self):
+        """
+        Returns the (device, inode, size, mtime) tuple identifying the
+        current contents of this file for the content signature cache,
+        or None if the file doesn't exist.
+        """
+        st = self.rfile().stat()
+        if st is None:
+            return None
+        mtime = getattr(st, 'st_mtime_ns', None)
+        if mtime is None:
+            mtime = int(getattr(st, 'st_mtime', st[stat.ST_MTIME]) * 1000000000)
+        return (st[stat.ST_DEV], st[stat.ST_INO], st[stat.ST_SIZE], mtime)
+
+    def get_statsig_csig(self, statsig):
+        """
+        Returns the content signature currently stored for this node
+        if the stat signature stored with it matches the specified one.
+        Returns None otherwise.
+        """
+        if statsig is None:
+            return None
+        try:
+            n = self.get_stored_info().ninfo
+            if n.statsig == statsig and n.csig:
+                return n.csig
+        except AttributeError:
+            pass
+        return None
+
     def get_max_drift_csig(self):
         """
         Returns the content signature currently stored for this node
@@ -2907,6 +3283,66 @@ class File(Base):
 
         return None
 
+    def get_cached_csig(self):
+        """
+        Looks for a content signature for this node that doesn't require
+        reading the file:  one stored with a matching stat signature, or
+        one old enough to satisfy the max_drift value.
+
+        Returns a (csig, statsig) tuple, where csig is None if the file
+        will have to be read.
+        """
+        if self.fs.max_drift >= 0:
+            statsig = self.get_statsig()
+        else:
+            # A negative max_drift means never trust a stored signature.
+            statsig = None
+
+        csig = self.get_statsig_csig(statsig)
+        if csig is not None:
+            if __debug__: SCons.Debug.countEvent('csig cache hits')
+            return csig, statsig
+
+        csig = self.get_max_drift_csig()
+        if csig is None:
+            if __debug__:
+                if statsig is not None:
+                    SCons.Debug.countEvent('csig cache misses')
+        return csig, statsig
+
+    def compute_csig(self):
+        """
+        Reads the file and returns the digested signature of its
+        content.
+        """
+        try:
+            if self.get_size() < SCons.Node.FS.File.md5_chunksize:
+                contents = self.get_contents()
+            else:
+                return self.get_content_hash()
+        except IOError:
+            # This can happen if there's actually a directory on-disk,
+            # which can be the case if they've disabled disk checks,
+            # or if an action with a File target actually happens to
+            # create a same-named directory by mistake.
+            return ''
+        return SCons.Util.MD5signature(contents)
+
+    def set_csig(self, csig, statsig, started):
+        """
+        Records the content signature for this node, along with the
+        stat signature of the file it was computed from, if the file
+        was last modified safely before we started reading it at time
+        started.
+        """
+        if statsig is not None:
+            mtime = statsig[3] / 1000000000.0
+            if mtime > started - csig_cache_racy_window:
+                statsig = None
+        ninfo = self.get_ninfo()
+        ninfo.csig = csig
+        ninfo.statsig = statsig
+
     def get_csig(self):
         """
         Generate a node's content signature, the digested signature
@@ -2922,25 +3358,12 @@ class File(Base):
         except AttributeError:
             pass
 
-        csig = self.get_max_drift_csig()
+        started = time.time()
+        csig, statsig = self.get_cached_csig()
         if csig is None:
+            csig = self.compute_csig()
 
-            try:
-                if self.get_size() < SCons.Node.FS.File.md5_chunksize:
-                    contents = self.get_contents()
-                else:
-                    csig = self.get_content_hash()
-            except IOError:
-                # This can happen if there's actually a directory on-disk,
-                # which can be the case if they've disabled disk checks,
-                # or if an action with a File target actually happens to
-                # create a same-named directory by mistake.
-                csig = ''
-            else:
-                if not csig:
-                    csig = SCons.Util.MD5signature(contents)
-
-        ninfo.csig = csig
+        self.set_csig(csig, statsig, started)
 
         return csig
 
@@ -2949,7 +3372,7 @@ class File(Base):
     #
 
     def builder_set(self, builder):
-        SCons.Node.Node.builder_set(self, builder)
+        Base.builder_set(self, builder)
         self.changed_since_last_build = self.decide_target
 
     def changed_content(self, target, prev_ni):
@@ -3112,6 +3535,98 @@ def get_default_fs():
         default_fs = FS()
     return default_fs
 
+class PathIndex(object):
+    """
+    An index of the names that can be found along a list of directories
+    (a CPPPATH, say), mapping each normalized name to the position of
+    the first directory in the list with an entry by that name, either
+    on disk (in its directory snapshot) or in the Node tree.  The
+    Repository() and VariantDir() source directories of each directory
+    count as part of it.
+
+    The index only narrows down where find_file() has to look:
+    srcdir_find_file() still confirms each candidate directory, since
+    an entry may be a subdirectory or a Node that is neither on disk
+    nor built.  Directories the index can't rule out by name are
+    "unsure" and always get looked in:  on Windows (where we check the
+    disk for 8.3 names that aren't in the snapshots), with RCS or SCCS
+    checkouts, and when a target has been declared in them (or their
+    entries read again) since the index was made.  Targets that get
+    built were declared first, so building them doesn't add names.
+    """
+    def __init__(self, dirs):
+        self.dirs = dirs
+        self.first = {}
+        self.names = []
+        self.unsure = {}
+        self.registered = []
+        check_rcs = diskcheck_rcs.func is do_diskcheck_rcs
+        check_sccs = diskcheck_sccs.func is do_diskcheck_sccs
+        for position in range(len(dirs)):
+            names = []
+            sure = sys.platform != 'win32'
+            for d in self.lookup_dirs(dirs[position]):
+                snapshot = d.disk_snapshot()
+                if (check_rcs and _my_normcase('RCS') in snapshot) or \
+                   (check_sccs and _my_normcase('SCCS') in snapshot):
+                    sure = 0
+                names.append(snapshot)
+                names.append(d.entries)
+                _indexed_dirs.setdefault(d, []).append((self, position))
+                self.registered.append(d)
+            if not sure:
+                self.unsure[position] = 1
+            self.names.append(names)
+            for n in names:
+                for name in n.keys():
+                    self.first.setdefault(name, position)
+
+    def lookup_dirs(self, dir):
+        """Return the directories whose entries srcdir_find_file()
+        looks at when looking for a file in the specified directory."""
+        result = []
+        seen = {}
+        for d in [dir] + dir.srcdir_list():
+            for rdir in d.get_all_rdirs():
+                for x in [rdir] + rdir.srcdir_list():
+                    if x not in seen:
+                        seen[x] = 1
+                        result.append(x)
+        return result
+
+    def distrust(self, position):
+        self.unsure[position] = 1
+
+    def release(self):
+        """Stop being told about changes to the directories, when the
+        index is thrown away."""
+        for d in self.registered:
+            try:
+                dependents = _indexed_dirs[d]
+            except KeyError:
+                continue
+            dependents[:] = [x for x in dependents if x[0] is not self]
+            if not dependents:
+                del _indexed_dirs[d]
+        self.registered = []
+
+    def positions(self, name):
+        """Generate, in order, the positions of the directories that
+        may have the (normalized) name."""
+        first = self.first.get(name, len(self.dirs))
+        for position in sorted(self.unsure.keys()):
+            if position >= first:
+                break
+            yield position
+        for position in range(first, len(self.dirs)):
+            if position in self.unsure:
+                yield position
+            else:
+                for n in self.names[position]:
+                    if name in n:
+                        yield position
+                        break
+
 class FileFinder(object):
     """
     """
@@ -3120,6 +3635,19 @@ class FileFinder(object):
 
     memoizer_counters = []
 
+    # Look files up along lists of more than this many directories
+    # through a PathIndex, instead of asking each directory in turn.
+    # The first directory is always asked directly, since that's where
+    # callers that don't use find_include_file() put the directory of
+    # the file doing the including, in front of the same search path
+    # for every file.
+    index_threshold = 4
+
+    # How many PathIndexes to keep.
+    max_path_indexes = 16
+
+    index_lookups = SCons.Memoize.CountEvents('FileFinder.index_lookup')
+
     def __init__(self):
         self._memo = {}
 
@@ -3158,6 +3686,43 @@ class FileFinder(object):
             return node
         return None
 
+    def _path_index_key(self, paths):
+        return (paths, _snapshot_generation)
+
+    memoizer_counters.append(SCons.Memoize.CountDict('path_index', _path_index_key))
+
+    def path_index(self, paths):
+        """Return the PathIndex for a tuple of directories, building
+        it the first time it's needed since the directory snapshots
+        were last invalidated.  Only the max_path_indexes most recently
+        built indexes are kept."""
+        memo_key = self._path_index_key(paths)
+        try:
+            memo_dict = self._memo['path_index']
+        except KeyError:
+            memo_dict = {}
+            self._memo['path_index'] = memo_dict
+            self._path_index_order = []
+        else:
+            try:
+                return memo_dict[memo_key]
+            except KeyError:
+                pass
+            # Throw away the indexes built from out-of-date snapshots,
+            # and the oldest ones if there are too many.
+            order = self._path_index_order
+            for key in order[:]:
+                if key[1] != _snapshot_generation:
+                    memo_dict.pop(key).release()
+                    order.remove(key)
+            while len(order) >= self.max_path_indexes:
+                memo_dict.pop(order.pop(0)).release()
+
+        result = PathIndex(paths)
+        memo_dict[memo_key] = result
+        self._path_index_order.append(memo_key)
+        return result
+
     def _find_file_key(self, filename, paths, verbose=None):
         return (filename, paths)
         
@@ -3234,21 +3799,62 @@ class FileFinder(object):
             paths = [_f for _f in map(self.filedir_lookup, paths) if _f]
 
         result = None
-        for dir in paths:
-            if verbose:
-                verbose("looking for '%s' in '%s' ...\n" % (filename, dir))
-            node, d = dir.srcdir_find_file(filename)
-            if node:
+        if verbose or len(paths) <= self.index_threshold:
+            for dir in paths:
                 if verbose:
-                    verbose("... FOUND '%s' in '%s'\n" % (filename, d))
-                result = node
-                break
+                    verbose("looking for '%s' in '%s' ...\n" % (filename, dir))
+                node, d = dir.srcdir_find_file(filename)
+                if node:
+                    if verbose:
+                        verbose("... FOUND '%s' in '%s'\n" % (filename, d))
+                    result = node
+                    break
+        else:
+            result, d = paths[0].srcdir_find_file(filename)
+            if not result:
+                paths = tuple(paths[1:])
+                index = self.path_index(paths)
+                tries = 0
+                for position in index.positions(_my_normcase(filename)):
+                    tries = tries + 1
+                    node, d = paths[position].srcdir_find_file(filename)
+                    if node:
+                        result = node
+                        break
+                # A hit means the index sent us straight to the file,
+                # or told us it isn't there without looking anywhere.
+                if tries == 0 or (tries == 1 and result):
+                    self.index_lookups.hit = self.index_lookups.hit + 1
+                else:
+                    self.index_lookups.miss = self.index_lookups.miss + 1
 
         memo_dict[memo_key] = result
 
         return result
 
-find_file = FileFinder().find_file
+    def find_include_file(self, filename, source_dir, paths, source_dir_last=0):
+        """
+        find_include_file(str, Dir(), [Dir()], bool) -> node
+
+        Find a file included by a file in source_dir:  in source_dir
+        and then along paths, or along paths and then in source_dir if
+        source_dir_last is true (as for C "<...>" includes).  The
+        search along paths doesn't depend on source_dir, so it's done
+        (and indexed) once for every file that uses the same paths.
+        """
+        if source_dir_last:
+            result = self.find_file(filename, paths)
+            if result is None:
+                result = self.find_file(filename, (source_dir,))
+        else:
+            result = self.find_file(filename, (source_dir,))
+            if result is None:
+                result = self.find_file(filename, paths)
+        return result
+
+_file_finder = FileFinder()
+find_file = _file_finder.find_file
+find_include_file = _file_finder.find_include_file
 
 
 def invalidate_node_memos(targets):
@@ -3291,6 +3897,100 @@ def invalidate_node_memos(targets):
             if node:
                 node.clear_memoized_values()                        
 
+def prefetch_csigs(nodes, num_threads):
+    """
+    Computes the content signatures of the source files that the
+    specified target Nodes depend on, reading and digesting the files
+    in num_threads parallel threads, before the Taskmaster starts
+    walking the dependency graph.  (The digest functions release the
+    global interpreter lock, so the threads really do run in parallel.)
+    Otherwise the signatures get calculated one at a time in the main
+    thread as the Taskmaster evaluates each target, stalling the
+    worker threads of a parallel build while it does.
+
+    Only the explicit sources and dependencies (and any implicit
+    dependencies already read from an --implicit-cache) of targets
+    whose construction environment decides on content are followed.
+    Source files that turn up later through scanning get signed as
+    usual when the Taskmaster gets to them.
+
+    Everything that touches shared state (the .sconsign files, Node
+    lookups, memoized values) is done here in the calling thread;
+    the worker threads only read and digest file contents.
+    """
+    try:
+        import threading
+    except ImportError:
+        return
+
+    leaves = []
+    seen = {}
+    stack = [(n, False) for n in nodes]
+    while stack:
+        node, content = stack.pop()
+        # Revisit a Node only if we now know its signature is wanted.
+        if seen.get(node, -1) >= content:
+            continue
+        seen[node] = content
+        if isinstance(node, Entry):
+            node = node.disambiguate()
+        if isinstance(node, Dir):
+            stack.extend([(c, False) for c in node.children()])
+        elif node.has_builder():
+            try:
+                content = node.get_build_env()._decides_on_content()
+            except AttributeError:
+                content = False
+            stack.extend([(c, content) for c in node.children(scan=0)])
+        elif content and isinstance(node, File):
+            leaves.append(node)
+
+    work = []
+    for node in leaves:
+        if hasattr(node.get_ninfo(), 'csig'):
+            continue
+        started = time.time()
+        csig, statsig = node.get_cached_csig()
+        if csig is not None:
+            node.set_csig(csig, statsig, started)
+        elif node.rexists():
+            # Prime the memoized values the worker threads will use.
+            node.get_size()
+            work.append((node, statsig))
+    if not work:
+        return
+
+    lock = threading.Lock()
+    results = []
+    def worker(work=work, results=results, lock=lock):
+        while True:
+            lock.acquire()
+            try:
+                if not work:
+                    return
+                node, statsig = work.pop()
+            finally:
+                lock.release()
+            started = time.time()
+            try:
+                csig = node.compute_csig()
+            except EnvironmentError:
+                # Leave it for get_csig() to report during the build.
+                continue
+            results.append((node, csig, statsig, started))
+
+    threads = []
+    for i in range(min(num_threads, len(work))):
+        t = threading.Thread(target=worker)
+        t.setDaemon(1)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+    for node, csig, statsig, started in results:
+        node.set_csig(csig, statsig, started)
+
 # Local Variables:
 # tab-width:4
 # indent-tabs-mode:nil
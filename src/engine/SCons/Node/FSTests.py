@@ -28,6 +28,7 @@ import SCons.compat
 
 import os
 import os.path
+import pickle
 import sys
 import time
 import unittest
@@ -759,6 +760,24 @@ class FileNodeInfoTestCase(_tempdirTestCase):
         #size = st[stat.ST_SIZE]
         #assert ni.size == size, (ni.size, size)
 
+    def test_pickle(self):
+        """Test pickling a FileNodeInfo"""
+        fff = self.fs.File('fff')
+        ni = SCons.Node.FS.FileNodeInfo(fff)
+        ni.csig = 'csig'
+        ni.timestamp = 1
+        s = pickle.dumps(ni, 1)
+        ni = pickle.loads(s)
+        assert ni.__getstate__() == {'_version_id' : 1,
+                                     'csig' : 'csig',
+                                     'timestamp' : 1}, ni.__getstate__()
+        assert not hasattr(ni, 'size'), ni.size
+
+        # The state of a FileNodeInfo from before it had slots.
+        ni.__setstate__({'_version_id' : 1, 'csig' : 'old', 'size' : 2})
+        assert ni.csig == 'old', ni.csig
+        assert ni.size == 2, ni.size
+
 class FileBuildInfoTestCase(_tempdirTestCase):
     def test___init__(self):
         """Test File.BuildInfo initialization"""
@@ -772,12 +791,45 @@ class FileBuildInfoTestCase(_tempdirTestCase):
         bi = SCons.Node.FS.FileBuildInfo(fff)
         assert hasattr(bi, 'convert_to_sconsign')
 
+    def test_convert_to_sconsign_paths(self):
+        """Test converting dependencies to path table indexes"""
+        import SCons.SConsign
+        fff = self.fs.File('fff')
+        bi = SCons.Node.FS.FileBuildInfo(fff)
+        bi.bsources = [self.fs.File('s1')]
+        bi.bdepends = []
+        bi.bimplicit = [self.fs.File('h'), self.fs.File('s1')]
+        paths = SCons.SConsign.PathTable()
+        bi.convert_to_sconsign(paths)
+        assert bi.bsources == [0], bi.bsources
+        assert bi.bdepends == [], bi.bdepends
+        assert bi.bimplicit == [1, 0], bi.bimplicit
+        assert paths.paths == ['s1', 'h'], paths.paths
+
     def test_convert_from_sconsign(self):
         """Test converting from .sconsign file format"""
         fff = self.fs.File('fff')
         bi = SCons.Node.FS.FileBuildInfo(fff)
         assert hasattr(bi, 'convert_from_sconsign')
 
+    def test_convert_from_sconsign_paths(self):
+        """Test converting path table indexes back to paths"""
+        import SCons.SConsign
+        fff = self.fs.File('fff')
+        paths = SCons.SConsign.PathTable(['s1', 'h'])
+        bi = SCons.Node.FS.FileBuildInfo(fff)
+        bi.bsources = [0]
+        bi.bimplicit = [1, 0]
+        bi.convert_from_sconsign(self.fs.Dir('.'), 'fff', paths)
+        assert bi.bsources == ['s1'], bi.bsources
+        assert bi.bimplicit == ['h', 's1'], bi.bimplicit
+        assert bi.bimplicit[1] is bi.bsources[0]
+
+        # Entries written before there were path tables hold the paths.
+        bi.bsources = ['old']
+        bi.convert_from_sconsign(self.fs.Dir('.'), 'fff', paths)
+        assert bi.bsources == ['old'], bi.bsources
+
     def test_prepare_dependencies(self):
         """Test that we have a prepare_dependencies() method"""
         fff = self.fs.File('fff')
@@ -2050,6 +2102,78 @@ class DirTestCase(_tempdirTestCase):
         if os.path.normcase("TeSt") != os.path.normpath("TeSt") or sys.platform == "cygwin":
             assert d.entry_exists_on_disk('case-insensitive')
 
+    def test_disk_snapshot(self):
+        """Test the Dir.disk_snapshot() method"""
+        test = self.test
+
+        test.subdir('d', ['d', 'sub'])
+        test.write(['d', 'f'], "d/f\n")
+
+        d = self.fs.Dir('d')
+        snapshot = d.disk_snapshot()
+        assert snapshot.complete, snapshot.complete
+        names = sorted([e.name for e in snapshot.values()])
+        assert names == ['f', 'sub'], names
+        if SCons.Node.FS._scandir is not None:
+            kinds = sorted([e.kind for e in snapshot.values()])
+            assert kinds == ['dir', 'file'], kinds
+        assert d.disk_snapshot() is snapshot
+
+        test.write(['d', 'g'], "d/g\n")
+        assert not d.entry_exists_on_disk('g')
+        SCons.Node.FS.invalidate_dir_snapshots()
+        assert d.disk_snapshot() is not snapshot
+        assert d.entry_exists_on_disk('g')
+
+        missing = self.fs.Dir('missing').disk_snapshot()
+        assert missing.complete, missing.complete
+        assert len(missing) == 0, missing
+
+    def test_snapshot_stat(self):
+        """Test answering stat() calls from directory snapshots"""
+        test = self.test
+
+        test.subdir('d')
+        test.write(['d', 'f'], "d/f\n")
+
+        d = self.fs.Dir('d')
+        f = self.fs.File('d/f')
+        g = self.fs.File('d/g')
+
+        calls = []
+        def stat(path, calls=calls, real_stat=self.fs.stat):
+            calls.append(os.path.basename(path))
+            return real_stat(path)
+        self.fs.stat = stat
+
+        SCons.Node.FS.save_strings(1)
+        try:
+            # Forget what looking the Nodes up found out.
+            f.clear_memoized_values()
+            g.clear_memoized_values()
+
+            assert f.exists()
+            assert not g.exists()
+            assert f.isfile()
+            assert calls == ['f'], calls
+
+            # An entry that's been built gets stat()ed again, and the
+            # snapshot no longer says anything else isn't there.
+            test.write(['d', 'g'], "d/g\n")
+            test.write(['d', 'h'], "d/h\n")
+            g.clear_memoized_values()
+            assert g.exists()
+            assert self.fs.File('d/h').exists()
+            assert calls == ['f', 'g', 'h'], calls
+
+            # Until the SConscript files have been read, we always ask.
+            SCons.Node.FS.save_strings(None)
+            i = self.fs.File('d/i')
+            assert not i.exists()
+            assert calls[3:] and calls[-1] == 'i', calls
+        finally:
+            SCons.Node.FS.save_strings(None)
+
     def test_srcdir_list(self):
         """Test the Dir.srcdir_list() method
         """
@@ -2415,6 +2539,110 @@ class FileTestCase(_tempdirTestCase):
         assert not build_f1.exists(), "%s did not realize that %s disappeared" % (build_f1, src_f1)
         assert not os.path.exists(build_f1.abspath), "%s did not get removed after %s was removed" % (build_f1, src_f1)
 
+    def test_stored_include_names(self):
+        """Test storing the include names found in a File"""
+        test = self.test
+        test.write('f1', "f1\n")
+        f1 = self.fs.File('f1')
+
+        assert f1.get_stored_include_names('key') is None
+
+        f1.store_include_names('key', ['a.h', 'b.h'])
+        stored = f1.get_stored_info().include_names
+        expect = ('key', SCons.Util.MD5signature("f1\n"), ['a.h', 'b.h'])
+        assert stored == expect, stored
+
+        names = f1.get_stored_include_names('key')
+        assert names == ['a.h', 'b.h'], names
+        assert f1.get_stored_include_names('other') is None
+
+        # Names stored for different contents aren't used.
+        f1.get_ninfo().csig = 'changed'
+        assert f1.get_stored_include_names('key') is None
+
+    def test_statsig_csig(self):
+        """Test reusing content signatures through stat signatures"""
+        test = self.test
+        test.write('f1', "f1\n")
+        old = time.time() - 60
+        os.utime(test.workpath('f1'), (old, old))
+
+        f1 = self.fs.File('f1')
+        statsig = f1.get_statsig()
+        st = os.stat(test.workpath('f1'))
+        assert statsig[:3] == (st.st_dev, st.st_ino, st.st_size), statsig
+
+        csig = f1.get_csig()
+        assert csig == SCons.Util.MD5signature("f1\n"), csig
+        assert f1.get_ninfo().statsig == statsig, f1.get_ninfo().statsig
+
+        class Entry(object):
+            pass
+        stored = Entry()
+        stored.ninfo = f1.new_ninfo()
+        stored.ninfo.csig = 'cached'
+        stored.ninfo.statsig = statsig
+        f1.get_stored_info = lambda stored=stored: stored
+
+        del f1.get_ninfo().csig
+        assert f1.get_csig() == 'cached', f1.get_csig()
+
+        stored.ninfo.statsig = statsig[:3] + (statsig[3] + 1,)
+        del f1.get_ninfo().csig
+        assert f1.get_csig() == csig, f1.get_csig()
+
+        save_max_drift = self.fs.max_drift
+        try:
+            self.fs.set_max_drift(-1)
+            stored.ninfo.statsig = statsig
+            del f1.get_ninfo().csig
+            assert f1.get_csig() == csig, f1.get_csig()
+            assert f1.get_ninfo().statsig is None, f1.get_ninfo().statsig
+        finally:
+            self.fs.set_max_drift(save_max_drift)
+
+        # A file modified within the racy window doesn't get its
+        # stat signature remembered.
+        test.write('f2', "f2\n")
+        f2 = self.fs.File('f2')
+        csig = f2.get_csig()
+        assert csig == SCons.Util.MD5signature("f2\n"), csig
+        assert f2.get_ninfo().statsig is None, f2.get_ninfo().statsig
+
+    def test_prefetch_csigs(self):
+        """Test computing source content signatures in parallel"""
+        test = self.test
+        fs = self.fs
+        for name in ['s1', 's2', 's3', 's4']:
+            test.write(name, name + "\n")
+
+        class Env(object):
+            def __init__(self, content):
+                self.content = content
+            def _decides_on_content(self):
+                return self.content
+
+        t1 = fs.File('t1')
+        t1.builder_set(Builder(fs.File))
+        t1.get_build_env = lambda: Env(True)
+        t1.add_source([fs.File('s1'), fs.File('s2')])
+        t1.add_dependency([fs.File('s3')])
+
+        t2 = fs.File('t2')
+        t2.builder_set(Builder(fs.File))
+        t2.get_build_env = lambda: Env(False)
+        t2.add_source([fs.File('s4'), fs.File('nonexistent')])
+
+        SCons.Node.FS.prefetch_csigs([t1, t2], 3)
+
+        for name in ['s1', 's2', 's3']:
+            ninfo = fs.File(name).get_ninfo()
+            expect = SCons.Util.MD5signature(name + "\n")
+            assert ninfo.csig == expect, (name, ninfo.csig)
+        assert not hasattr(fs.File('s4').get_ninfo(), 'csig')
+        assert not hasattr(fs.File('nonexistent').get_ninfo(), 'csig')
+        assert not hasattr(t1.get_ninfo(), 'csig')
+
 
 
 class GlobTestCase(_tempdirTestCase):
@@ -3182,6 +3410,106 @@ class find_fileTestCase(unittest.TestCase):
         finally:
             sys.stdout = save_sys_stdout
 
+class find_file_indexTestCase(unittest.TestCase):
+    def runTest(self):
+        """Testing find_file through a path index"""
+        test = TestCmd(workdir = '')
+        test.subdir('d0', 'd1', 'd2', 'd3', 'src', ['src', 'd4'],
+                    'rep', ['rep', 'd1'], ['d1', 'sub'])
+        test.write(['d2', 'a.h'], 'd2/a.h\n')
+        test.write(['d3', 'a.h'], 'd3/a.h\n')
+        test.write(['d3', 'b.h'], 'd3/b.h\n')
+        test.write(['rep', 'd1', 'b.h'], 'rep/d1/b.h\n')
+        test.write(['src', 'd4', 'c.h'], 'src/d4/c.h\n')
+        test.write(['src', 'a.h'], 'src/a.h\n')
+
+        fs = SCons.Node.FS.FS(test.workpath(""))
+        os.chdir(test.workpath(""))
+        fs.Repository(test.workpath('rep'))
+        fs.VariantDir('d4', 'src/d4', duplicate=0)
+        fs.Dir('d1/sub')
+
+        finder = SCons.Node.FS.FileFinder()
+        paths = tuple(map(fs.Dir, ['d0', 'd1', 'd2', 'd3', 'd4']))
+
+        def lookup(name, expect):
+            node = finder.find_file(name, paths)
+            if expect is None:
+                assert node is None, node
+            else:
+                assert os.path.normpath(str(node)) == \
+                       os.path.normpath(expect), str(node)
+
+        lookups = SCons.Node.FS.FileFinder.index_lookups
+        hit, miss = lookups.hit, lookups.miss
+        lookup('a.h', 'd2/a.h')
+        lookup('b.h', 'rep/d1/b.h')
+        lookup('c.h', 'src/d4/c.h')
+        lookup('nonexistent.h', None)
+        assert lookups.hit == hit + 4, lookups.hit
+        # The Dir d1/sub is in the index, but isn't a file.
+        lookup('sub', None)
+        assert lookups.miss == miss + 1, lookups.miss
+
+        # The first directory isn't part of the index.
+        index = finder.path_index(paths[1:])
+        assert list(index.positions(SCons.Node.FS._my_normcase('a.h'))) == [1, 2]
+        assert list(index.positions(SCons.Node.FS._my_normcase('x.h'))) == []
+
+        # Declaring a target in an indexed directory makes it unsure.
+        fs.File('d1/new.h').builder_set(1)
+        assert index.unsure == {0 : 1}, index.unsure
+        lookup('new.h', 'd1/new.h')
+        assert list(index.positions(SCons.Node.FS._my_normcase('a.h'))) == [0, 1, 2]
+
+        # So does reading the entries of one again.
+        test.write(['d3', 'a2.h'], 'd3/a2.h\n')
+        fs.Dir('d3').clear_memoized_values()
+        assert index.unsure == {0 : 1, 2 : 1}, index.unsure
+        lookup('a2.h', 'd3/a2.h')
+
+        # Invalidating the directory snapshots throws the index away.
+        SCons.Node.FS.invalidate_dir_snapshots()
+        assert finder.path_index(paths[1:]) is not index
+        assert finder.path_index(paths[1:]).unsure == {}
+
+        # Files included from different directories share the index
+        # of the search path, whether their own directory is looked
+        # in first or last.
+        finder = SCons.Node.FS.FileFinder()
+        src = fs.Dir('src')
+        node = finder.find_include_file('a.h', src, paths)
+        assert os.path.normpath(str(node)) == os.path.normpath('src/a.h'), node
+        node = finder.find_include_file('a.h', src, paths, 1)
+        assert os.path.normpath(str(node)) == os.path.normpath('d2/a.h'), node
+        node = finder.find_include_file('c.h', fs.Dir('d0'), paths, 1)
+        assert os.path.normpath(str(node)) == os.path.normpath('src/d4/c.h'), node
+        node = finder.find_include_file('a.h', fs.Dir('d1'), paths, 1)
+        assert os.path.normpath(str(node)) == os.path.normpath('d2/a.h'), node
+        keys = [k[0] for k in finder._memo['path_index'].keys()]
+        assert keys == [paths[1:]], keys
+
+        # Only the most recently built indexes are kept, and the ones
+        # thrown away aren't told about changes any more.
+        finder.max_path_indexes = 2
+        i1 = finder.path_index(paths[1:])
+        i2 = finder.path_index(paths[:4])
+        i3 = finder.path_index(paths[2:])
+        assert len(finder._memo['path_index']) == 2
+        assert i1.registered == [], i1.registered
+        for dependents in SCons.Node.FS._indexed_dirs.values():
+            for index, position in dependents:
+                assert index is not i1
+        assert finder.path_index(paths[2:]) is i3
+        assert finder.path_index(paths[1:]) is not i1
+
+        # Too few directories to index are looked in one at a time.
+        finder = SCons.Node.FS.FileFinder()
+        paths = paths[:4]
+        lookup('a.h', 'd2/a.h')
+        assert 'path_index' not in finder._memo, finder._memo.keys()
+        assert 'find_file' in finder._memo, finder._memo.keys()
+
 class StringDirTestCase(unittest.TestCase):
     def runTest(self):
         """Test using a string as the second argument of
@@ -3704,6 +4032,9 @@ class SaveStringsTestCase(unittest.TestCase):
         expect = list(map(os.path.normpath, ['src/f', 'd1/f', 'd0/b', 'd1/b']))
         assert s == expect, 'node str() not cached: %s'%s
 
+        # Don't leave the later tests trusting directory snapshots.
+        SCons.Node.FS.save_strings(None)
+
 
 class AbsolutePathTestCase(unittest.TestCase):
     def test_root_lookup_equivalence(self):
@@ -3727,6 +4058,7 @@ if __name__ == "__main__":
     suite = unittest.TestSuite()
     suite.addTest(VariantDirTestCase())
     suite.addTest(find_fileTestCase())
+    suite.addTest(find_file_indexTestCase())
     suite.addTest(StringDirTestCase())
     suite.addTest(stored_infoTestCase())
     suite.addTest(has_src_builderTestCase())
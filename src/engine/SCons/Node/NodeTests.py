@@ -26,6 +26,7 @@ import SCons.compat
 
 import collections
 import os
+import pickle
 import re
 import sys
 import unittest
@@ -236,7 +237,18 @@ class NodeInfoBaseTestCase(unittest.TestCase):
 
         ni1.merge(ni2)
         expect = {'a1':1, 'a2':222, 'a3':333, '_version_id':1}
-        assert ni1.__dict__ == expect, ni1.__dict__
+        state = ni1.__getstate__()
+        assert state == expect, state
+
+    def test___getstate__(self):
+        """Test pickling NodeInfoBase slots and other attributes"""
+        ni = SCons.Node.NodeInfoBase(SCons.Node.Node())
+        state = ni.__getstate__()
+        assert state == {'_version_id':1}, state
+        ni.xxx = 'x'
+        ni = pickle.loads(pickle.dumps(ni, 1))
+        assert ni._version_id == 1, ni._version_id
+        assert ni.xxx == 'x', ni.xxx
 
     def test_update(self):
         """Test the update() method"""
@@ -662,6 +674,21 @@ class NodeTestCase(unittest.TestCase):
         result = node.get_stored_info()
         assert result is None, result
 
+    def test_get_stored_duration(self):
+        """Test fetching the duration of a Node's previous build
+        """
+        node = SCons.Node.Node()
+        assert node.get_stored_duration() == 0
+
+        class Entry(object):
+            pass
+        entry = Entry()
+        entry.binfo = SCons.Node.BuildInfoBase()
+        node.get_stored_info = lambda entry=entry: entry
+        assert node.get_stored_duration() == 0
+        entry.binfo.duration = 2.5
+        assert node.get_stored_duration() == 2.5
+
     def test_set_always_build(self):
         """Test setting a Node's always_build value
         """
@@ -792,6 +819,33 @@ class NodeTestCase(unittest.TestCase):
         assert node.depends == [zero, one, two, three, four]
 
 
+    def test_empty_lists(self):
+        """Test that new Nodes share empty lists until something is added
+        """
+        node = SCons.Node.Node()
+        other = SCons.Node.Node()
+        for name in ['sources', 'depends', 'ignore', 'side_effects']:
+            assert getattr(node, name) is getattr(other, name), name
+        assert node.sources + node.depends == []
+        try:
+            node.sources.append(other)
+        except TypeError:
+            pass
+        else:
+            raise Exception("did not catch expected exception")
+        assert other.sources == []
+        assert pickle.loads(pickle.dumps(node.ignore)) is node.ignore
+
+        node.add_source([other])
+        node.add_dependency([other])
+        node.add_ignore([other])
+        assert node.sources == [other], node.sources
+        assert node.depends == [other], node.depends
+        assert node.ignore == [other], node.ignore
+        assert other.sources == [], other.sources
+        assert other.depends == [], other.depends
+        assert other.ignore == [], other.ignore
+
     def test_add_source(self):
         """Test adding sources to a Node's list.
         """
@@ -1267,6 +1321,42 @@ class NodeTestCase(unittest.TestCase):
         r = n1.add_to_waiting_parents(n2)
         assert r == 0, r
 
+    def test_empty_collections(self):
+        """Test that Nodes share empty child sets until they add to them"""
+        n1 = SCons.Node.Node()
+        n2 = SCons.Node.Node()
+        n3 = SCons.Node.Node()
+        assert n1.sources_set is n2.sources_set
+        assert n1.depends_set is n2.depends_set
+        assert n1.ignore_set is n2.ignore_set
+        assert n1.waiting_s_e is n2.waiting_s_e
+        n1.add_source([n3])
+        n1.add_dependency([n3])
+        n1.add_ignore([n3])
+        n1.add_to_waiting_s_e(n3)
+        assert n1.sources_set == set([n3]), n1.sources_set
+        assert n1.depends_set == set([n3]), n1.depends_set
+        assert n1.ignore_set == set([n3]), n1.ignore_set
+        assert n1.waiting_s_e == set([n3]), n1.waiting_s_e
+        assert n2.sources_set == set(), n2.sources_set
+        assert n2.depends_set == set(), n2.depends_set
+        assert n2.ignore_set == set(), n2.ignore_set
+        assert n2.waiting_s_e == set(), n2.waiting_s_e
+        assert list(n2.prerequisites) == [], n2.prerequisites
+
+    def test___getstate__(self):
+        """Test pickling a Node's slots and other attributes"""
+        n = SCons.Node.Node()
+        n.add_source([SCons.Node.Node()])
+        n.xyzzy = 1
+        n.attributes.shared = 1
+        n = pickle.loads(pickle.dumps(n, 2))
+        assert len(n.sources) == 1, n.sources
+        assert n.sources_set == set(n.sources), n.sources_set
+        assert n.state == SCons.Node.no_state, n.state
+        assert n.xyzzy == 1, n.xyzzy
+        assert n.attributes.shared == 1, n.attributes.__dict__
+
 
 class NodeListTestCase(unittest.TestCase):
     def test___str__(self):
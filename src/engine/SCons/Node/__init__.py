@@ -95,6 +95,69 @@ def do_nothing(node): pass
 
 Annotate = do_nothing
 
+# Shared by all the Nodes that have no sources, dependencies, ignored
+# dependencies, side effects or waiting parents, until something gets
+# added.
+_empty_set = frozenset()
+
+class _EmptyList(list):
+    """An empty list that can't be changed, so all the Nodes can share
+    it.  It compares and adds like any other empty list."""
+    def _immutable(self, *args, **kw):
+        raise TypeError("the shared empty list of a Node can't be changed")
+    append = extend = insert = remove = pop = sort = reverse = _immutable
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _immutable
+    __iadd__ = __imul__ = _immutable
+    def __reduce__(self):
+        # Loads back as the shared one, not a copy.
+        return '_empty_list'
+
+_empty_list = _EmptyList()
+
+# The Node and signature info classes keep their attributes in
+# __slots__ instead of an instance dictionary, which makes the
+# (many) instances much smaller.  They still have a __dict__ slot for
+# any other attributes, which is only allocated when one is set, and
+# they pickle (for the .sconsign file and the SConscript cache) as
+# a single dictionary, the same as they did before they had slots.
+
+_slot_names_cache = {}
+
+def _slot_names(klass):
+    """Returns the names of the __slots__ of a class and its bases."""
+    try:
+        return _slot_names_cache[klass]
+    except KeyError:
+        pass
+    result = []
+    for k in klass.__mro__:
+        for name in k.__dict__.get('__slots__', ()):
+            if name not in ('__dict__', '__weakref__') and name not in result:
+                result.append(name)
+    _slot_names_cache[klass] = result
+    return result
+
+def _getstate(obj):
+    """Returns the attributes of an object with __slots__ as a
+    dictionary, for pickling."""
+    state = obj.__dict__
+    if state:
+        state = state.copy()
+    else:
+        # Fetching the __dict__ created it; don't keep it around.
+        del obj.__dict__
+        state = {}
+    for name in _slot_names(obj.__class__):
+        try:
+            state[name] = getattr(obj, name)
+        except AttributeError:
+            pass
+    return state
+
+def _setstate(obj, state):
+    for key, value in state.items():
+        setattr(obj, key, value)
+
 # Classes for signature info for Nodes.
 
 class NodeInfoBase(object):
@@ -104,6 +167,7 @@ class NodeInfoBase(object):
     Node subclasses should subclass NodeInfoBase to provide their own
     logic for dealing with their own Node-specific signature information.
     """
+    __slots__ = ('_version_id', '__dict__')
     current_version_id = 1
     def __init__(self, node=None):
         # Create an object attribute from the class attribute so it ends up
@@ -128,13 +192,17 @@ class NodeInfoBase(object):
     def convert(self, node, val):
         pass
     def merge(self, other):
-        self.__dict__.update(other.__dict__)
+        _setstate(self, _getstate(other))
+    def __getstate__(self):
+        return _getstate(self)
+    def __setstate__(self, state):
+        _setstate(self, state)
     def format(self, field_list=None, names=0):
         if field_list is None:
             try:
                 field_list = self.field_list
             except AttributeError:
-                field_list = sorted(self.__dict__.keys())
+                field_list = sorted(_getstate(self).keys())
         fields = []
         for field in field_list:
             try:
@@ -157,6 +225,9 @@ class BuildInfoBase(object):
     generic build stuff we have to track:  sources, explicit dependencies,
     implicit dependencies, and action information.
     """
+    __slots__ = ('_version_id', 'bsources', 'bdepends', 'bimplicit',
+                 'bsourcesigs', 'bdependsigs', 'bimplicitsigs',
+                 'bact', 'bactsig', 'duration', '__dict__')
     current_version_id = 1
     def __init__(self, node=None):
         # Create an object attribute from the class attribute so it ends up
@@ -167,7 +238,14 @@ class BuildInfoBase(object):
         self.bimplicitsigs = []
         self.bactsig = None
     def merge(self, other):
-        self.__dict__.update(other.__dict__)
+        _setstate(self, _getstate(other))
+    def __getstate__(self):
+        return _getstate(self)
+    def __setstate__(self, state):
+        _setstate(self, state)
+
+class Attrs(object):
+    """A generic place to stick information about a Node."""
 
 class Node(object):
     """The base Node class, for entities that we know how to
@@ -177,10 +255,20 @@ class Node(object):
     if SCons.Memoize.use_memoizer:
         __metaclass__ = SCons.Memoize.Memoized_Metaclass
 
+    __slots__ = ['sources', 'sources_set', '_specific_sources',
+                 'depends', 'depends_set', 'ignore', 'ignore_set',
+                 'prerequisites', 'implicit', 'implicit_set',
+                 'waiting_parents', 'waiting_s_e', 'ref_count',
+                 'priority', 'wkids', 'env', 'state', 'precious',
+                 'noclean', 'nocache', 'always_build', 'includes',
+                 '_attributes', 'side_effect', 'side_effects', 'linked',
+                 '_memo', 'builder', 'executor', 'binfo', 'ninfo',
+                 'is_explicit', 'duration',
+                 '__dict__', '__weakref__']
+
     memoizer_counters = []
 
-    class Attrs(object):
-        pass
+    Attrs = Attrs
 
     def __init__(self):
         if __debug__: logInstanceCreation(self, 'Node.Node')
@@ -197,18 +285,24 @@ class Node(object):
         # this way, instead of wrapping up each list+dictionary pair in
         # a class.  (Of course, we could always still do that in the
         # future if we had a good reason to...).
-        self.sources = []       # source files used to build node
-        self.sources_set = set()
+        #
+        # The lists and sets (and the prerequisites) start out shared
+        # and empty; the add_*() methods give a Node its own when it
+        # first needs one, since most Nodes never get anything added to
+        # most of them.
+        self.sources = _empty_list  # source files used to build node
+        self.sources_set = _empty_set
         self._specific_sources = False
-        self.depends = []       # explicit dependencies (from Depends)
-        self.depends_set = set()
-        self.ignore = []        # dependencies to ignore
-        self.ignore_set = set()
-        self.prerequisites = SCons.Util.UniqueList()
+        self.depends = _empty_list  # explicit dependencies (from Depends)
+        self.depends_set = _empty_set
+        self.ignore = _empty_list   # dependencies to ignore
+        self.ignore_set = _empty_set
+        self.prerequisites = ()
         self.implicit = None    # implicit (scanned) dependencies (None means not scanned yet)
-        self.waiting_parents = set()
-        self.waiting_s_e = set()
+        self.waiting_parents = _empty_set
+        self.waiting_s_e = _empty_set
         self.ref_count = 0
+        self.priority = 0       # critical-path estimate for scheduling
         self.wkids = None       # Kids yet to walk, when it's an array
 
         self.env = None
@@ -218,9 +312,9 @@ class Node(object):
         self.nocache = 0
         self.always_build = None
         self.includes = None
-        self.attributes = self.Attrs() # Generic place to stick information about the Node.
+        self._attributes = None # see the attributes property below
         self.side_effect = 0 # true iff this node is a side effect
-        self.side_effects = [] # the side effects of building this target
+        self.side_effects = _empty_list # the side effects of building this target
         self.linked = 0 # is this node linked to the variant directory?
 
         self.clear_memoized_values()
@@ -230,6 +324,24 @@ class Node(object):
         # what line in what file created the node, for example).
         Annotate(self)
 
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
+    def _get_attributes(self):
+        """Returns the generic place to stick information about the
+        Node, creating it the first time it's asked for."""
+        if self._attributes is None:
+            self._attributes = self.Attrs()
+        return self._attributes
+
+    def _set_attributes(self, attributes):
+        self._attributes = attributes
+
+    attributes = property(_get_attributes, _set_attributes)
+
     def disambiguate(self, must_exist=None):
         return self
 
@@ -404,6 +516,8 @@ class Node(object):
     #
 
     def add_to_waiting_s_e(self, node):
+        if self.waiting_s_e is _empty_set:
+            self.waiting_s_e = set()
         self.waiting_s_e.add(node)
 
     def add_to_waiting_parents(self, node):
@@ -417,6 +531,8 @@ class Node(object):
         wp = self.waiting_parents
         if node in wp:
             return 0
+        if wp is _empty_set:
+            wp = self.waiting_parents = set()
         wp.add(node)
         return 1
 
@@ -424,7 +540,7 @@ class Node(object):
         """Clean up anything we don't need to hang onto after we've
         been built."""
         self.executor_cleanup()
-        self.waiting_parents = set()
+        self.waiting_parents = _empty_set
 
     def clear(self):
         """Completely clear a Node of all its cached state (so that it
@@ -709,6 +825,10 @@ class Node(object):
         if self.has_builder():
             binfo.bact = str(executor)
             binfo.bactsig = SCons.Util.MD5signature(executor.get_contents())
+            try:
+                binfo.duration = self.duration
+            except AttributeError:
+                pass
 
         if self._specific_sources:
             sources = []
@@ -775,6 +895,16 @@ class Node(object):
     def get_stored_info(self):
         return None
 
+    def get_stored_duration(self):
+        """
+        Returns how many seconds the last build of this Node took, as
+        recorded in its stored build information, or 0 if not known.
+        """
+        try:
+            return self.get_stored_info().binfo.duration
+        except AttributeError:
+            return 0
+
     def get_stored_implicit(self):
         """Fetch the stored implicit dependencies"""
         return None
@@ -824,6 +954,9 @@ class Node(object):
 
     def add_dependency(self, depend):
         """Adds dependencies."""
+        if self.depends_set is _empty_set:
+            self.depends = []
+            self.depends_set = set()
         try:
             self._add_child(self.depends, self.depends_set, depend)
         except TypeError, e:
@@ -836,11 +969,16 @@ class Node(object):
 
     def add_prerequisite(self, prerequisite):
         """Adds prerequisites"""
+        if not self.prerequisites:
+            self.prerequisites = SCons.Util.UniqueList()
         self.prerequisites.extend(prerequisite)
         self._children_reset()
 
     def add_ignore(self, depend):
         """Adds dependencies to ignore."""
+        if self.ignore_set is _empty_set:
+            self.ignore = []
+            self.ignore_set = set()
         try:
             self._add_child(self.ignore, self.ignore_set, depend)
         except TypeError, e:
@@ -855,6 +993,9 @@ class Node(object):
         """Adds sources."""
         if self._specific_sources:
             return
+        if self.sources_set is _empty_set:
+            self.sources = []
+            self.sources_set = set()
         try:
             self._add_child(self.sources, self.sources_set, source)
         except TypeError, e:
@@ -35,13 +35,29 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import errno
 import os
 import os.path
+import re
 import subprocess
 import sys
 import select
+import tempfile
 
 import SCons.Util
 from SCons.Platform import TempFileMunge
 
+try:
+    import fcntl
+except ImportError:
+    # We're being set up as the platform of some other operating
+    # system (by the unit tests, say), and won't run commands.
+    fcntl = None
+
+try:
+    import threading
+except ImportError:
+    _output_lock = None
+else:
+    _output_lock = threading.Lock()
+
 exitvalmap = {
     2 : 127,
     13 : 126,
@@ -106,28 +122,129 @@ def spawnvpe_spawn(sh, escape, cmd, args, env):
 def fork_spawn(sh, escape, cmd, args, env):
     return exec_fork([sh, '-c', ' '.join(args)], env)
 
-def process_cmd_output(cmd_stdout, cmd_stderr, stdout, stderr):
-    stdout_eof = stderr_eof = 0
-    while not (stdout_eof and stderr_eof):
+#
+# Starting commands with posix_spawn() instead of fork() + exec().
+#
+# A C library that implements posix_spawn() with vfork() (or Linux's
+# clone(CLONE_VM|CLONE_VFORK)) starts the command without copying our
+# page tables, which takes a good part of a millisecond per command
+# once a big build has made us big.  Python versions without
+# os.posix_spawn() call the C library's through ctypes.
+#
+
+def _find_posix_spawn():
+    """Return a function that calls posix_spawn(path, argv, env) and
+    returns the new process's ID, or None if we don't have one."""
+    if hasattr(os, 'posix_spawn'):
+        return os.posix_spawn
+    try:
+        import ctypes
+    except ImportError:
+        return None
+    try:
+        libc = ctypes.CDLL(None)
+        c_posix_spawn = libc.posix_spawn
+    except (OSError, AttributeError):
+        return None
+    c_posix_spawn.restype = ctypes.c_int
+    def posix_spawn(path, argv, env):
+        c_argv = (ctypes.c_char_p * (len(argv) + 1))(*argv)
+        envp = ['%s=%s' % (k, v) for k, v in env.items()]
+        c_envp = (ctypes.c_char_p * (len(envp) + 1))(*envp)
+        pid = ctypes.c_int()
+        result = c_posix_spawn(ctypes.byref(pid), path, None, None,
+                               c_argv, c_envp)
+        if result:
+            raise OSError(result, os.strerror(result))
+        return pid.value
+    return posix_spawn
+
+_posix_spawn = []
+
+def get_posix_spawn():
+    if not _posix_spawn:
+        _posix_spawn.append(_find_posix_spawn())
+    return _posix_spawn[0]
+
+# Words made only of these characters mean the same thing to the shell
+# as they do in an argument list.
+_plain_word = re.compile(r'^[\w@%+=:,./-]+$')
+
+# Things the shell knows how to do that aren't programs on the PATH.
+_shell_words = {}
+for w in ['!', '.', ':', '[', '[[', '{', 'alias', 'break', 'case', 'cd',
+          'command', 'continue', 'do', 'eval', 'exec', 'exit', 'export',
+          'for', 'function', 'getopts', 'hash', 'if', 'local', 'read',
+          'readonly', 'return', 'select', 'set', 'shift', 'source',
+          'time', 'times', 'trap', 'type', 'ulimit', 'umask', 'unalias',
+          'unset', 'until', 'wait', 'while']:
+    _shell_words[w] = 1
+
+def needs_shell(args):
+    """Return whether a command line (as the list of escaped arguments
+    that CommandAction passes to SPAWN) uses anything only the shell
+    can do:  quoting, redirection, pipes, variables, wildcards, lists
+    of commands, variable assignments or shell built-ins."""
+    if not args or args[0] in _shell_words or '=' in args[0]:
+        return 1
+    for a in args:
+        if not _plain_word.match(a):
+            return 1
+    return 0
+
+def find_executable(name, env):
+    """Look a command up along the PATH in env, the way execvpe()
+    does, and return its path (or None)."""
+    if '/' in name:
+        if os.path.isfile(name) and os.access(name, os.X_OK):
+            return name
+        return None
+    # WhereIs() keeps an index of the PATH directories, which notices
+    # when they change.
+    return SCons.Util.WhereIs(name, env.get('PATH', os.defpath))
+
+def exec_posix_spawn(path, l, env):
+    return wait_posix_spawn(get_posix_spawn()(path, l, env))
+
+def wait_posix_spawn(pid):
+    while 1:
         try:
-            (i,o,e) = select.select([cmd_stdout, cmd_stderr], [], [])
-            if cmd_stdout in i:
-                str = cmd_stdout.read()
-                if len(str) == 0:
-                    stdout_eof = 1
-                elif stdout is not None:
-                    stdout.write(str)
-            if cmd_stderr in i:
-                str = cmd_stderr.read()
-                if len(str) == 0:
-                    #sys.__stderr__.write( "stderr_eof=1\n" )
-                    stderr_eof = 1
-                else:
-                    #sys.__stderr__.write( "str(stderr) = %s\n" % str )
-                    stderr.write(str)
-        except select.error, (_errno, _strerror):
-            if _errno != errno.EINTR:
+            pid, stat = os.waitpid(pid, 0)
+            break
+        except OSError, e:
+            if e.errno != errno.EINTR:
                 raise
+    if stat & 0xff:
+        return stat | 0x80
+    return stat >> 8
+
+def posix_spawn_spawn(sh, escape, cmd, args, env):
+    # Run the command directly when the shell wouldn't do anything
+    # with the command line, and start it (or the shell) without
+    # forking.
+    if get_posix_spawn() is None:
+        return fork_spawn(sh, escape, cmd, args, env)
+    for a in args:
+        if not isinstance(a, str):
+            # Leave encoding Unicode arguments to os.execvpe().
+            return fork_spawn(sh, escape, cmd, args, env)
+    if not needs_shell(args):
+        path = find_executable(args[0], env)
+        if path is not None:
+            try:
+                pid = get_posix_spawn()(path, args, env)
+            except OSError:
+                # Let the shell try, and report the error.  (Only if
+                # the command couldn't be started:  once it has been,
+                # running it again could do whatever it does twice.)
+                pass
+            else:
+                return wait_posix_spawn(pid)
+    l = [sh, '-c', ' '.join(args)]
+    path = find_executable(sh, env)
+    if path is None:
+        return exec_fork(l, env)
+    return exec_posix_spawn(path, l, env)
 
 def exec_popen3(l, env, stdout, stderr):
     proc = subprocess.Popen(' '.join(l),
@@ -139,28 +256,220 @@ def exec_popen3(l, env, stdout, stderr):
         return stat | 0x80
     return stat >> 8
 
+class PipedOutput(object):
+    """
+    The output a piped command writes to one of its pipes.  It's kept
+    in memory up to max_memory bytes, and in a temporary file after
+    that, until the command is done and write() sends all of it to
+    the stream it's meant for in one piece.
+    """
+    max_memory = 1024 * 1024
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.chunks = []
+        self.size = 0
+        self.spill = None
+
+    def append(self, data):
+        if self.stream is None:
+            return
+        if self.spill is None and self.size + len(data) > self.max_memory:
+            self.spill = tempfile.TemporaryFile()
+            self.spill.write(''.join(self.chunks))
+            self.chunks = []
+        if self.spill is None:
+            self.chunks.append(data)
+        else:
+            self.spill.write(data)
+        self.size = self.size + len(data)
+
+    def write(self):
+        if self.stream is None:
+            return
+        if self.spill is None:
+            self.stream.write(''.join(self.chunks))
+        else:
+            self.spill.seek(0)
+            while 1:
+                data = self.spill.read(65536)
+                if not data:
+                    break
+                self.stream.write(data)
+            self.spill.close()
+        self.chunks = []
+        self.spill = None
+
+class PipedJob(object):
+    """The pipes of one running piped command, as a list of (read file
+    descriptor, PipedOutput) pairs."""
+    def __init__(self, pipes):
+        self.pipes = pipes
+        self.outputs = dict(pipes)
+        self.open_pipes = len(pipes)
+        if _output_lock is not None:
+            self.finished = threading.Event()
+
+    def pipe_closed(self):
+        self.open_pipes = self.open_pipes - 1
+        if self.open_pipes == 0 and _output_lock is not None:
+            self.finished.set()
+
+    def write_output(self):
+        """Write everything the command wrote, one stream after the
+        other, without the output of other commands in between."""
+        if _output_lock is not None:
+            _output_lock.acquire()
+        try:
+            for fd, output in self.pipes:
+                output.write()
+        finally:
+            if _output_lock is not None:
+                _output_lock.release()
+
+class OutputPoller(object):
+    """
+    Reads the pipes of all the running piped commands as data shows
+    up in them, so no command blocks on a full pipe while we're
+    waiting for another one (or for itself) to finish.
+
+    With threads, one daemon thread polls the pipes of all the jobs.
+    Without them, wait() polls in the calling thread.
+    """
+    def __init__(self):
+        self.jobs = {}
+        self.pending = []
+        self.thread = None
+        if hasattr(select, 'poll'):
+            self.poller = select.poll()
+        else:
+            self.poller = None
+        self.wakeup_r, self.wakeup_w = _pipe()
+        self.watch(self.wakeup_r)
+
+    def watch(self, fd):
+        if self.poller is not None:
+            self.poller.register(fd, select.POLLIN | select.POLLPRI)
+
+    def unwatch(self, fd):
+        if self.poller is not None:
+            self.poller.unregister(fd)
+
+    def start(self, pipes):
+        """Start reading a command's pipes, given as a list of (read
+        file descriptor, PipedOutput) pairs.  Returns the PipedJob
+        to wait() for."""
+        job = PipedJob(pipes)
+        if _output_lock is None:
+            self.add(job)
+            return job
+        _output_lock.acquire()
+        try:
+            self.pending.append(job)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run)
+                self.thread.setDaemon(1)
+                self.thread.start()
+        finally:
+            _output_lock.release()
+        os.write(self.wakeup_w, 'x')
+        return job
+
+    def add(self, job):
+        for fd in job.outputs.keys():
+            self.jobs[fd] = job
+            self.watch(fd)
+
+    def wait(self, job):
+        if _output_lock is None:
+            while job.open_pipes:
+                self.poll()
+        else:
+            job.finished.wait()
+
+    def run(self):
+        while 1:
+            self.poll()
+
+    def ready(self):
+        fds = list(self.jobs.keys()) + [self.wakeup_r]
+        while 1:
+            try:
+                if self.poller is not None:
+                    return [e[0] for e in self.poller.poll()]
+                return select.select(fds, [], [])[0]
+            except (select.error, OSError, IOError), e:
+                if e.args[0] != errno.EINTR:
+                    raise
+
+    def poll(self):
+        for fd in self.ready():
+            if fd == self.wakeup_r:
+                _read(fd)
+                _output_lock.acquire()
+                try:
+                    pending = self.pending
+                    self.pending = []
+                finally:
+                    _output_lock.release()
+                for job in pending:
+                    self.add(job)
+                continue
+            job = self.jobs[fd]
+            data = _read(fd)
+            if data:
+                job.outputs[fd].append(data)
+            elif data is not None:
+                self.unwatch(fd)
+                del self.jobs[fd]
+                os.close(fd)
+                job.pipe_closed()
+
+def _pipe():
+    """Return a pipe whose ends don't get inherited by the commands
+    started (from other threads) while it's open, so only the command
+    that it's meant for can keep it open.  The read end doesn't block."""
+    r, w = os.pipe()
+    if fcntl is None:
+        return r, w
+    for fd in (r, w):
+        fcntl.fcntl(fd, fcntl.F_SETFD,
+                    fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+    fcntl.fcntl(r, fcntl.F_SETFL, fcntl.fcntl(r, fcntl.F_GETFL) | os.O_NONBLOCK)
+    return r, w
+
+def _read(fd):
+    """Read what's in a pipe, or return None if there's nothing
+    to read right now."""
+    while 1:
+        try:
+            return os.read(fd, 65536)
+        except OSError, e:
+            if e.errno == errno.EAGAIN:
+                return None
+            if e.errno != errno.EINTR:
+                raise
+
+_output_poller = None
+
 def exec_piped_fork(l, env, stdout, stderr):
     # spawn using fork / exec and providing a pipe for the command's
-    # stdout / stderr stream
+    # stdout / stderr stream, which get read while the command runs
+    global _output_poller
+    if _output_poller is None:
+        _output_poller = OutputPoller()
+    (rFdOut, wFdOut) = _pipe()
     if stdout != stderr:
-        (rFdOut, wFdOut) = os.pipe()
-        (rFdErr, wFdErr) = os.pipe()
+        (rFdErr, wFdErr) = _pipe()
     else:
-        (rFdOut, wFdOut) = os.pipe()
         rFdErr = rFdOut
         wFdErr = wFdOut
     # do the fork
     pid = os.fork()
     if not pid:
-        # Child process
-        os.close( rFdOut )
-        if rFdOut != rFdErr:
-            os.close( rFdErr )
+        # Child process.  The pipes are closed on exec.
         os.dup2( wFdOut, 1 ) # is there some symbolic way to do that ?
         os.dup2( wFdErr, 2 )
-        os.close( wFdOut )
-        if stdout != stderr:
-            os.close( wFdErr )
         exitval = 127
         try:
             os.execvpe(l[0], l, env)
@@ -170,19 +479,21 @@ def exec_piped_fork(l, env, stdout, stderr):
         os._exit(exitval)
     else:
         # Parent process
-        pid, stat = os.waitpid(pid, 0)
         os.close( wFdOut )
+        pipes = [(rFdOut, PipedOutput(stdout))]
         if stdout != stderr:
             os.close( wFdErr )
-        childOut = os.fdopen( rFdOut )
-        if stdout != stderr:
-            childErr = os.fdopen( rFdErr )
-        else:
-            childErr = childOut
-        process_cmd_output(childOut, childErr, stdout, stderr)
-        os.close( rFdOut )
-        if stdout != stderr:
-            os.close( rFdErr )
+            pipes.append((rFdErr, PipedOutput(stderr)))
+        job = _output_poller.start(pipes)
+        _output_poller.wait(job)
+        while 1:
+            try:
+                pid, stat = os.waitpid(pid, 0)
+                break
+            except OSError, e:
+                if e.errno != errno.EINTR:
+                    raise
+        job.write_output()
         if stat & 0xff:
             return stat | 0x80
         return stat >> 8
@@ -245,6 +556,7 @@ def generate(env):
     env['LIBSUFFIXES']    = [ '$LIBSUFFIX', '$SHLIBSUFFIX' ]
     env['PSPAWN']         = pspawn
     env['SPAWN']          = spawn
+    env['POSIXSPAWN']     = posix_spawn_spawn
     env['SHELL']          = 'sh'
     env['ESCAPE']         = escape
     env['TEMPFILE']       = TempFileMunge
@@ -0,0 +1,239 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import SCons.compat
+
+import errno
+import io
+import os
+import sys
+import threading
+import unittest
+
+import TestCmd
+
+import SCons.Platform.posix
+
+# Writes more than fits in a pipe to stdout and stderr.
+big_output = """\
+import sys
+for i in range(2000):
+    sys.stdout.write('%s out %04d %s\\n' % (sys.argv[1], i, 'x' * 40))
+    sys.stderr.write('%s err %04d\\n' % (sys.argv[1], i))
+sys.exit(int(sys.argv[2]))
+"""
+
+def piped_spawn(name, status, stdout, stderr):
+    args = [sys.executable, '-c', big_output, name, str(status)]
+    return SCons.Platform.posix.exec_piped_fork(args, os.environ,
+                                                stdout, stderr)
+
+class Stream(object):
+    """A stream that records each write() call."""
+    def __init__(self):
+        self.writes = []
+    def write(self, data):
+        self.writes.append(data)
+    def getvalue(self):
+        return ''.join(self.writes)
+
+class exec_piped_forkTestCase(unittest.TestCase):
+
+    def test_big_output(self):
+        """Test piping more output than fits in a pipe"""
+        stdout = io.BytesIO()
+        stderr = io.BytesIO()
+        status = piped_spawn('a', 3, stdout, stderr)
+        assert status == 3, status
+        out = stdout.getvalue().split('\n')
+        assert len(out) == 2001, len(out)
+        assert out[1999] == 'a out 1999 ' + 'x' * 40, out[1999]
+        err = stderr.getvalue().split('\n')
+        assert len(err) == 2001, len(err)
+        assert err[0] == 'a err 0000', err[0]
+
+    def test_same_stream(self):
+        """Test piping stdout and stderr to the same stream"""
+        stream = io.BytesIO()
+        status = piped_spawn('a', 0, stream, stream)
+        assert status == 0, status
+        lines = stream.getvalue().split('\n')
+        assert len(lines) == 4001, len(lines)
+
+    def test_spill(self):
+        """Test keeping output beyond max_memory in a temporary file"""
+        save_max_memory = SCons.Platform.posix.PipedOutput.max_memory
+        SCons.Platform.posix.PipedOutput.max_memory = 1000
+        try:
+            stdout = io.BytesIO()
+            piped_spawn('a', 0, stdout, None)
+        finally:
+            SCons.Platform.posix.PipedOutput.max_memory = save_max_memory
+        out = stdout.getvalue().split('\n')
+        assert len(out) == 2001, len(out)
+        assert out[1000] == 'a out 1000 ' + 'x' * 40, out[1000]
+
+    def test_parallel(self):
+        """Test that the output of parallel commands isn't interleaved"""
+        stream = Stream()
+        statuses = {}
+        def run(name):
+            statuses[name] = piped_spawn(name, 0, stream, None)
+        threads = []
+        for name in ['a', 'b', 'c', 'd']:
+            t = threading.Thread(target=run, args=(name,))
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        assert list(statuses.values()) == [0, 0, 0, 0], statuses
+        # Each command's output came in one piece.
+        assert len(stream.writes) == 4, len(stream.writes)
+        for data in stream.writes:
+            lines = data.split('\n')
+            assert len(lines) == 2001, len(lines)
+            name = lines[0][0]
+            for line in lines[:-1]:
+                assert line[0] == name, (name, line)
+
+    def test_not_found(self):
+        """Test piping the output of a command that can't be run"""
+        stderr = io.BytesIO()
+        status = SCons.Platform.posix.exec_piped_fork(['no_such_command_xyz'],
+                                                      os.environ,
+                                                      io.BytesIO(), stderr)
+        assert status == 127, status
+
+class posix_spawn_spawnTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.test = TestCmd.TestCmd(workdir='')
+        self.env = os.environ.copy()
+
+    def spawn(self, args):
+        return SCons.Platform.posix.posix_spawn_spawn('sh',
+                                                      SCons.Platform.posix.escape,
+                                                      args[0], args, self.env)
+
+    def test_needs_shell(self):
+        """Test recognizing command lines that need the shell"""
+        needs_shell = SCons.Platform.posix.needs_shell
+        assert not needs_shell(['gcc', '-o', 'f.o', '-c', '-DX=1', 'f.c'])
+        assert not needs_shell(['/usr/bin/ar', 'rc', 'lib/libx.a', 'a,b@c%d+e'])
+        assert needs_shell(['echo', 'x', '>', 'f'])
+        assert needs_shell(['a', '&&', 'b'])
+        assert needs_shell(['echo', '"a b"'])
+        assert needs_shell(['echo', '$HOME'])
+        assert needs_shell(['ls', '*.c'])
+        assert needs_shell(['ls', '~'])
+        assert needs_shell(['cd', 'dir'])
+        assert needs_shell(['exit', '1'])
+        assert needs_shell(['CC=gcc', 'make'])
+        assert needs_shell([])
+
+    def test_spawn(self):
+        """Test running commands with and without the shell"""
+        out = self.test.workpath('out')
+        assert self.spawn(['touch', out]) == 0
+        assert os.path.exists(out)
+        assert self.spawn(['false']) == 1
+        assert self.spawn(['exit', '3']) == 3
+        assert self.spawn(['echo', 'hello', '>', out]) == 0
+        assert self.test.read(out) == 'hello\n', self.test.read(out)
+
+    def test_wait_error(self):
+        """Test that a command isn't run again if waiting for it fails"""
+        out = self.test.workpath('out')
+        self.test.write('append', "#!/bin/sh\necho x >> %s\n" % out)
+        append = self.test.workpath('append')
+        os.chmod(append, 0755)
+        save_waitpid = os.waitpid
+        def waitpid(pid, options):
+            save_waitpid(pid, options)
+            raise OSError(errno.ECHILD, os.strerror(errno.ECHILD))
+        os.waitpid = waitpid
+        try:
+            try:
+                self.spawn([append])
+            except OSError, e:
+                assert e.errno == errno.ECHILD, e
+            else:
+                raise Exception("did not catch expected exception")
+        finally:
+            os.waitpid = save_waitpid
+        assert self.test.read(out) == 'x\n', self.test.read(out)
+
+    def test_not_found(self):
+        """Test running a command that isn't on the PATH"""
+        self.env['PATH'] = self.test.workpath('')
+        save_stderr = sys.stderr
+        sys.stderr = io.BytesIO()
+        try:
+            assert self.spawn([sys.executable, '-c', '1']) == 0
+            # The shell itself isn't on the PATH either.
+            assert self.spawn(['no_such_command_xyz']) == 127
+        finally:
+            sys.stderr = save_stderr
+
+    def test_find_executable(self):
+        """Test looking up commands along the PATH"""
+        find_executable = SCons.Platform.posix.find_executable
+        self.test.write('prog', "#!/bin/sh\n")
+        prog = self.test.workpath('prog')
+        os.chmod(prog, 0755)
+        env = {'PATH' : self.test.workpath('')}
+        assert find_executable('prog', env) == prog
+        assert find_executable(prog, env) == prog
+        assert find_executable('no_such_prog', env) is None
+        # Commands that go away or show up during the build are noticed.
+        os.unlink(prog)
+        assert find_executable('prog', env) is None
+        self.test.write('prog2', "#!/bin/sh\n")
+        os.chmod(self.test.workpath('prog2'), 0755)
+        assert find_executable('prog2', env) == self.test.workpath('prog2')
+
+
+if __name__ == "__main__":
+    if os.name != 'posix':
+        sys.stdout.write("NO RESULT for posixTests.py:  '%s' is not posix\n" % os.name)
+        sys.exit(0)
+    suite = unittest.TestSuite()
+    tclasses = [ exec_piped_forkTestCase,
+                 posix_spawn_spawnTestCase,
+               ]
+    for tclass in tclasses:
+        names = unittest.getTestCaseNames(tclass, 'test_')
+        suite.addTests(list(map(tclass, names)))
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
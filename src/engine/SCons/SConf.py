@@ -161,6 +161,10 @@ class SConfBuildInfo(SCons.Node.FS.FileBuildInfo):
     are result (did the builder succeed last time?) and string, which
     contains messages of the original build phase.
     """
+    # No slots of its own, so that a FileBuildInfo can be turned into
+    # one by changing its __class__.
+    __slots__ = ()
+
     result = None # -> 0/None -> no error, != 0 error
     string = None # the stdout / stderr output when building the target
 
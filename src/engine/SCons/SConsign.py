@@ -36,6 +36,8 @@ import os
 import pickle
 
 import SCons.dblite
+import SCons.dblog
+import SCons.Util
 import SCons.Warnings
 
 def corrupt_dblite_warning(filename):
@@ -44,6 +46,8 @@ def corrupt_dblite_warning(filename):
 
 SCons.dblite.ignore_corrupt_dbfiles = 1
 SCons.dblite.corruption_warning = corrupt_dblite_warning
+SCons.dblog.ignore_corrupt_dbfiles = 1
+SCons.dblog.corruption_warning = corrupt_dblite_warning
 
 #XXX Get rid of the global array so this becomes re-entrant.
 sig_files = []
@@ -59,6 +63,11 @@ DB_Module = SCons.dblite
 DB_Name = ".sconsign"
 DB_sync_list = []
 
+# "PathTables" maps the id()s of open database handles (some of them
+# can't be hashed) to the PathTable (see below) shared by all of the
+# directories stored in that database.
+PathTables = {}
+
 def Get_DataBase(dir):
     global DataBase, DB_Module, DB_Name
     top = dir.fs.Top
@@ -89,17 +98,167 @@ def Get_DataBase(dir):
 
 def Reset():
     """Reset global state.  Used by unit tests that end up using
-    SConsign multiple times to get a clean slate for each test."""
-    global sig_files, DB_sync_list
+    SConsign multiple times to get a clean slate for each test,
+    and between the builds of --interactive and --daemon mode."""
+    global sig_files, DataBase, DB_sync_list, PathTables
     sig_files = []
+    DataBase = {}
     DB_sync_list = []
+    PathTables = {}
 
 normcase = os.path.normcase
 
+# The name of the pseudo-entry that records the hash format used for
+# the signatures in a directory's entries.  The NUL byte keeps it from
+# colliding with the name of any real file.  It's only written when
+# the format isn't the default (md5), so existing files stay the same.
+HashFormatKey = '\0hash_format'
+
+# The name of the pseudo-entry in a per-directory .sconsign file, or of
+# the key in a .sconsign database, that holds its PathTable.
+PathTableKey = '\0paths'
+
+# The path table of a database is compacted, the next time the whole
+# database gets rewritten anyway, once it holds more than path_ratio
+# times as many paths as it did after it was last compacted (plus a
+# little slack, so that small databases aren't compacted on every
+# build).  Compacting reads and writes the entries of every directory,
+# so this keeps the cost of it in proportion to the paths added.
+path_ratio = 2
+path_slack = 100
+
+class PathTable(object):
+    """
+    The table of the dependency paths in a .sconsign file or database.
+
+    The build information stored for a target refers to each of its
+    sources and dependencies by the index of its path in the table, so
+    a header that lots of targets depend on is stored (and, when it's
+    read, looked up) once instead of once for every target.  During a
+    build, paths are only ever added, so the entries of directories that
+    weren't written again keep referring to the right ones.  The table
+    of a database is compacted from time to time, when the whole
+    database gets rewritten anyway (see compact_path_table(), below).
+    """
+    def __init__(self, paths=None, compacted=None):
+        if paths is None:
+            paths = []
+        self.paths = paths
+        self.index = dict(zip(paths, range(len(paths))))
+        self.dirty = False
+        # How many paths the table had after it was last compacted, or
+        # None if it's a new one.
+        self.compacted = compacted
+        # Whether entries have been written since the table was read,
+        # so it may hold paths that nothing refers to any more.
+        self.stale = False
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, i):
+        return self.paths[i]
+
+    def add(self, path):
+        """Return the index of a path, adding it to the table if it
+        isn't there yet."""
+        try:
+            return self.index[path]
+        except KeyError:
+            i = self.index[path] = len(self.paths)
+            self.paths.append(path)
+            self.dirty = True
+            return i
+
+def Get_PathTable(db):
+    """Return the PathTable for the database db, reading it from the
+    database the first time it's asked for."""
+    try:
+        return PathTables[id(db)]
+    except KeyError:
+        pass
+    try:
+        paths = pickle.loads(db[PathTableKey])
+    except KeyboardInterrupt:
+        raise
+    except Exception:
+        # There's no table (a new database, or one written before
+        # there were tables).  Any entries that refer to one will be
+        # reported as corrupt when they're read.
+        paths = None
+    compacted = None
+    if isinstance(paths, tuple) and len(paths) == 2:
+        paths, compacted = paths
+    elif isinstance(paths, list):
+        # Written before the tables recorded when they were compacted.
+        compacted = len(paths)
+    if not isinstance(paths, list) or not isinstance(compacted, int):
+        paths = None
+        compacted = None
+    table = PathTables[id(db)] = PathTable(paths, compacted)
+    return table
+
+def rewrites_all(db):
+    """Return whether syncing the database db rewrites all of it."""
+    try:
+        method = db.rewrites_all
+    except AttributeError:
+        # Other dbm modules change the records in place.
+        return False
+    return method()
+
+def compact_path_table(db, table):
+    """Renumber the entries of all of the directories in the database
+    db with a new path table that only has the paths they still refer
+    to, and make that the contents of table."""
+    new = PathTable()
+    for key in db.keys():
+        if key == PathTableKey:
+            continue
+        try:
+            entries = pickle.loads(db[key])
+            if not isinstance(entries, dict):
+                raise TypeError
+            for name, entry in entries.items():
+                if name != HashFormatKey:
+                    entry.convert_from_sconsign(None, name, table)
+                    entry.convert_to_sconsign(new)
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            # The entries couldn't be read with the old table, either;
+            # make sure they don't end up referring to the wrong paths
+            # in the new one.
+            entries = {}
+        db[key] = pickle.dumps(entries, 1)
+    table.paths = new.paths
+    table.index = new.index
+    table.compacted = len(new)
+    table.dirty = True
+    table.stale = False
+
+def write_path_table(db):
+    try:
+        table = PathTables[id(db)]
+    except KeyError:
+        return
+    if table.compacted is None:
+        # A new table only has the paths of the entries written since.
+        table.compacted = len(table)
+    elif table.stale and \
+         len(table) > path_ratio * table.compacted + path_slack and \
+         rewrites_all(db):
+        compact_path_table(db, table)
+    if table.dirty:
+        db[PathTableKey] = pickle.dumps((table.paths, table.compacted), 1)
+        table.dirty = False
+
 def write():
     global sig_files
     for sig_file in sig_files:
         sig_file.write(sync=0)
+    for db in DB_sync_list:
+        write_path_table(db)
     for db in DB_sync_list:
         try:
             syncmethod = db.sync
@@ -127,10 +286,10 @@ class SConsignEntry(object):
         # Create an object attribute from the class attribute so it ends up
         # in the pickled data in the .sconsign file.
         _version_id = self.current_version_id
-    def convert_to_sconsign(self):
-        self.binfo.convert_to_sconsign()
-    def convert_from_sconsign(self, dir, name):
-        self.binfo.convert_from_sconsign(dir, name)
+    def convert_to_sconsign(self, paths=None):
+        self.binfo.convert_to_sconsign(paths)
+    def convert_from_sconsign(self, dir, name, paths=None):
+        self.binfo.convert_from_sconsign(dir, name, paths)
 
 class Base(object):
     """
@@ -145,6 +304,7 @@ class Base(object):
         self.entries = {}
         self.dirty = False
         self.to_be_merged = {}
+        self.paths = PathTable()
 
     def get_entry(self, filename):
         """
@@ -171,6 +331,60 @@ class Base(object):
     def do_not_store_info(self, filename, node):
         pass
 
+    def check_hash_format(self):
+        """
+        Discard the entries we read if their signatures were computed
+        with a different hash format than the current one, so the Nodes
+        get rescanned instead of comparing signatures of different kinds.
+        """
+        format = self.entries.pop(HashFormatKey, 'md5')
+        if format != (SCons.Util.get_hash_format() or 'md5'):
+            self.entries = {}
+
+    def entries_to_write(self, paths=None):
+        """
+        Return the entries to be pickled, tagged with the current hash
+        format if it isn't the default, and with the path table, if
+        one is given and it isn't empty.
+        """
+        format = SCons.Util.get_hash_format()
+        if format in ('md5', None):
+            format = None
+        if not format and not paths:
+            return self.entries
+        entries = self.entries.copy()
+        if format:
+            entries[HashFormatKey] = format
+        if paths:
+            entries[PathTableKey] = paths.paths
+        return entries
+
+    def convert_from_sconsign(self, dir):
+        """
+        Convert the entries just read for in-SCons use.  Entries that
+        refer to paths missing from the path table are discarded.
+        """
+        try:
+            for key, entry in self.entries.items():
+                entry.convert_from_sconsign(dir, key, self.paths)
+        except IndexError:
+            SCons.Warnings.warn(SCons.Warnings.CorruptSConsignWarning,
+                                "Ignoring corrupt sconsign entry : %s (missing dependency paths)\n"%dir.tpath)
+            self.entries = {}
+
+    def convert_to_sconsign(self):
+        for key, entry in self.entries.items():
+            entry.convert_to_sconsign(self.paths)
+
+    def convert_back(self):
+        """
+        Put the Nodes' entries back the way they were after they've
+        been pickled, in case they're looked at again (interactive
+        mode, for example).
+        """
+        for key, entry in self.entries.items():
+            entry.convert_from_sconsign(self.dir, key, self.paths)
+
     def merge(self):
         for key, node in self.to_be_merged.items():
             entry = node.get_stored_info()
@@ -198,6 +412,7 @@ class DB(Base):
         self.dir = dir
 
         db, mode = Get_DataBase(dir)
+        self.paths = Get_PathTable(db)
 
         # Read using the path relative to the top of the Repository
         # (self.dir.tpath) from which we're fetching the signature
@@ -218,8 +433,8 @@ class DB(Base):
             except Exception, e:
                 SCons.Warnings.warn(SCons.Warnings.CorruptSConsignWarning,
                                     "Ignoring corrupt sconsign entry : %s (%s)\n"%(self.dir.tpath, e))
-            for key, entry in self.entries.items():
-                entry.convert_from_sconsign(dir, key)
+            self.check_hash_format()
+            self.convert_from_sconsign(dir)
 
         if mode == "r":
             # This directory is actually under a repository, which means
@@ -245,11 +460,13 @@ class DB(Base):
         # the Repository; we only write to our own .sconsign file,
         # not to .sconsign files in Repositories.
         path = normcase(self.dir.path)
-        for key, entry in self.entries.items():
-            entry.convert_to_sconsign()
-        db[path] = pickle.dumps(self.entries, 1)
+        self.convert_to_sconsign()
+        db[path] = pickle.dumps(self.entries_to_write(), 1)
+        self.convert_back()
+        self.paths.stale = True
 
         if sync:
+            write_path_table(db)
             try:
                 syncmethod = db.sync
             except AttributeError:
@@ -273,9 +490,11 @@ class Dir(Base):
             self.entries = {}
             raise TypeError
 
+        self.paths = PathTable(self.entries.pop(PathTableKey, None))
+
         if dir:
-            for key, entry in self.entries.items():
-                entry.convert_from_sconsign(dir, key)
+            self.check_hash_format()
+            self.convert_from_sconsign(dir)
 
 class DirFile(Dir):
     """
@@ -333,10 +552,13 @@ class DirFile(Dir):
                 fname = self.sconsign
             except IOError:
                 return
-        for key, entry in self.entries.items():
-            entry.convert_to_sconsign()
-        pickle.dump(self.entries, file, 1)
+        # The whole file gets written, so start a new path table that
+        # only has the paths that are still used.
+        self.paths = PathTable()
+        self.convert_to_sconsign()
+        pickle.dump(self.entries_to_write(self.paths), file, 1)
         file.close()
+        self.convert_back()
         if fname != self.sconsign:
             try:
                 mode = os.stat(self.sconsign)[0]
@@ -24,13 +24,16 @@
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import os
+import pickle
 import sys
 import TestCmd
 import unittest
 
 import SCons.dblite
+import SCons.dblog
 
 import SCons.SConsign
+import SCons.Util
 
 class BuildInfo(object):
     def merge(self, object):
@@ -40,9 +43,9 @@ class DummySConsignEntry(object):
     def __init__(self, name):
         self.name = name
         self.binfo = BuildInfo()
-    def convert_to_sconsign(self):
+    def convert_to_sconsign(self, paths=None):
         self.c_to_s = 1
-    def convert_from_sconsign(self, dir, name):
+    def convert_from_sconsign(self, dir, name, paths=None):
         self.c_from_s = 1
 
 class FS(object):
@@ -212,8 +215,167 @@ class BaseTestCase(SConsignTestCase):
         assert e.name == 'fff', e.name
         assert e.arg == 'fff arg', e.arg
 
+class PathTableTestCase(unittest.TestCase):
+
+    def test_PathTable(self):
+        """Test adding paths to a PathTable"""
+        t = SCons.SConsign.PathTable()
+        assert len(t) == 0, len(t)
+        assert not t.dirty
+        assert t.add('a.h') == 0
+        assert t.add('b.h') == 1
+        assert t.add('a.h') == 0
+        assert t.dirty
+        assert t.paths == ['a.h', 'b.h'], t.paths
+        assert t[1] == 'b.h', t[1]
+
+        t = SCons.SConsign.PathTable(['a.h', 'b.h'])
+        assert t.add('b.h') == 1
+        assert t.add('c.h') == 2
+        assert t.paths == ['a.h', 'b.h', 'c.h'], t.paths
+
+class PathEntry(object):
+    """An entry that stores its dependency paths in the path table."""
+    def __init__(self, deps):
+        self.deps = deps
+    def convert_to_sconsign(self, paths=None):
+        self.deps = list(map(paths.add, self.deps))
+    def convert_from_sconsign(self, dir, name, paths=None):
+        self.deps = [paths[i] for i in self.deps]
+
 class SConsignDBTestCase(SConsignTestCase):
 
+    def test_path_table(self):
+        """Test sharing one path table among a database's directories"""
+        save_DataBase = SCons.SConsign.DataBase
+        SCons.SConsign.DataBase = {}
+        try:
+            top = DummyNode('.')
+            dir1 = DummyNode('dir1')
+            dir1.fs = top.fs
+            dir2 = DummyNode('dir2')
+            dir2.fs = top.fs
+
+            d1 = SCons.SConsign.DB(dir1)
+            d1.set_entry('aaa', PathEntry(['common.h', 'a.h']))
+            d2 = SCons.SConsign.DB(dir2)
+            d2.set_entry('bbb', PathEntry(['common.h']))
+            SCons.SConsign.write()
+
+            # The entries are left the way they were.
+            assert d1.get_entry('aaa').deps == ['common.h', 'a.h']
+
+            db = SCons.dblite.open('.sconsign', 'r')
+            paths, compacted = pickle.loads(db[SCons.SConsign.PathTableKey])
+            assert sorted(paths) == ['a.h', 'common.h'], paths
+            assert compacted == 2, compacted
+            entries = pickle.loads(db['dir2'])
+            assert entries['bbb'].deps == [paths.index('common.h')], entries
+
+            SCons.SConsign.Reset()
+            SCons.SConsign.DataBase = {}
+
+            d2 = SCons.SConsign.DB(dir2)
+            assert d2.get_entry('bbb').deps == ['common.h']
+            d1 = SCons.SConsign.DB(dir1)
+            aaa = d1.get_entry('aaa')
+            assert aaa.deps == ['common.h', 'a.h'], aaa.deps
+        finally:
+            SCons.SConsign.DataBase = save_DataBase
+
+    def _write_twice(self):
+        """Writes dir1 and dir2, then just dir1 again with one of its
+        paths replaced, and returns the paths and dir2's entries that
+        end up in the database."""
+        top = DummyNode('.')
+        dir1 = DummyNode('dir1')
+        dir1.fs = top.fs
+        dir2 = DummyNode('dir2')
+        dir2.fs = top.fs
+
+        d1 = SCons.SConsign.DB(dir1)
+        d1.set_entry('aaa', PathEntry(['common.h', 'a.h']))
+        d2 = SCons.SConsign.DB(dir2)
+        d2.set_entry('bbb', PathEntry(['common.h', 'b.h']))
+        SCons.SConsign.write()
+
+        SCons.SConsign.Reset()
+        SCons.SConsign.DataBase = {}
+
+        d1 = SCons.SConsign.DB(dir1)
+        d1.set_entry('aaa', PathEntry(['common.h', 'new.h']))
+        SCons.SConsign.write()
+
+        SCons.SConsign.Reset()
+        SCons.SConsign.DataBase = {}
+
+        d1 = SCons.SConsign.DB(dir1)
+        aaa = d1.get_entry('aaa')
+        assert aaa.deps == ['common.h', 'new.h'], aaa.deps
+        d2 = SCons.SConsign.DB(dir2)
+        bbb = d2.get_entry('bbb')
+        assert bbb.deps == ['common.h', 'b.h'], bbb.deps
+        return d1.paths.paths
+
+    def test_path_table_compaction(self):
+        """Test compacting the path table when the database is rewritten"""
+        save_DataBase = SCons.SConsign.DataBase
+        save_ratio = SCons.SConsign.path_ratio
+        save_slack = SCons.SConsign.path_slack
+        SCons.SConsign.DataBase = {}
+        try:
+            # The table hasn't grown enough to be worth compacting.
+            paths = self._write_twice()
+            assert sorted(paths) == ['a.h', 'b.h', 'common.h', 'new.h'], paths
+
+            os.unlink('.sconsign.dblite')
+            SCons.SConsign.path_ratio = 1
+            SCons.SConsign.path_slack = 0
+            paths = self._write_twice()
+            assert sorted(paths) == ['b.h', 'common.h', 'new.h'], paths
+
+            db = SCons.dblite.open('.sconsign', 'r')
+            paths, compacted = pickle.loads(db[SCons.SConsign.PathTableKey])
+            assert compacted == 3, compacted
+        finally:
+            SCons.SConsign.DataBase = save_DataBase
+            SCons.SConsign.path_ratio = save_ratio
+            SCons.SConsign.path_slack = save_slack
+
+    def test_path_table_dblog(self):
+        """Test that a dblog database only compacts its path table along
+        with the journal"""
+        save_DataBase = SCons.SConsign.DataBase
+        save_DB_Module = SCons.SConsign.DB_Module
+        save_DB_Name = SCons.SConsign.DB_Name
+        save_ForDirectory = SCons.SConsign.ForDirectory
+        save_ratio = SCons.dblog.compact_ratio
+        save_slack = SCons.dblog.compact_slack
+        save_path_ratio = SCons.SConsign.path_ratio
+        save_path_slack = SCons.SConsign.path_slack
+        SCons.SConsign.DataBase = {}
+        try:
+            SCons.SConsign.File('.sconsign', SCons.dblog)
+            SCons.SConsign.path_ratio = 1
+            SCons.SConsign.path_slack = 0
+            paths = self._write_twice()
+            assert sorted(paths) == ['a.h', 'b.h', 'common.h', 'new.h'], paths
+
+            os.unlink('.sconsign.dblog')
+            SCons.dblog.compact_ratio = 0
+            SCons.dblog.compact_slack = 0
+            paths = self._write_twice()
+            assert sorted(paths) == ['b.h', 'common.h', 'new.h'], paths
+        finally:
+            SCons.SConsign.DataBase = save_DataBase
+            SCons.SConsign.DB_Module = save_DB_Module
+            SCons.SConsign.DB_Name = save_DB_Name
+            SCons.SConsign.ForDirectory = save_ForDirectory
+            SCons.dblog.compact_ratio = save_ratio
+            SCons.dblog.compact_slack = save_slack
+            SCons.SConsign.path_ratio = save_path_ratio
+            SCons.SConsign.path_slack = save_path_slack
+
     def test_SConsignDB(self):
         save_DataBase = SCons.SConsign.DataBase
         SCons.SConsign.DataBase = {}
@@ -258,8 +420,75 @@ class SConsignDBTestCase(SConsignTestCase):
 
             SCons.SConsign.DataBase = save_DataBase
 
+    def test_lazy_dblog(self):
+        """Test that a dblog database only reads the directories asked for"""
+        save_DataBase = SCons.SConsign.DataBase
+        save_DB_Module = SCons.SConsign.DB_Module
+        save_DB_Name = SCons.SConsign.DB_Name
+        save_ForDirectory = SCons.SConsign.ForDirectory
+        SCons.SConsign.DataBase = {}
+        try:
+            SCons.SConsign.File('.sconsign', SCons.dblog)
+
+            top = DummyNode('.')
+            dir1 = DummyNode('dir1')
+            dir1.fs = top.fs
+            dir2 = DummyNode('dir2')
+            dir2.fs = top.fs
+
+            d1 = SCons.SConsign.DB(dir1)
+            d1.set_entry('aaa', DummySConsignEntry('aaa name'))
+            d2 = SCons.SConsign.DB(dir2)
+            d2.set_entry('bbb', DummySConsignEntry('bbb name'))
+            SCons.SConsign.write()
+
+            SCons.SConsign.Reset()
+            SCons.SConsign.DataBase = {}
+
+            d1 = SCons.SConsign.DB(dir1)
+            aaa = d1.get_entry('aaa')
+            assert aaa.name == 'aaa name', aaa.name
+            assert aaa.c_from_s, aaa
+
+            db = SCons.SConsign.DataBase[top]
+            assert isinstance(db, SCons.dblog.dblog), db
+            assert type(db._dict['dir2']) is tuple, db._dict['dir2']
+
+            d2 = SCons.SConsign.DB(dir2)
+            bbb = d2.get_entry('bbb')
+            assert bbb.name == 'bbb name', bbb.name
+        finally:
+            SCons.SConsign.DataBase = save_DataBase
+            SCons.SConsign.DB_Module = save_DB_Module
+            SCons.SConsign.DB_Name = save_DB_Name
+            SCons.SConsign.ForDirectory = save_ForDirectory
+
 class SConsignDirFileTestCase(SConsignTestCase):
 
+    def test_path_table(self):
+        """Test writing a per-directory file's path table"""
+        f = SCons.SConsign.DirFile(DummyNode('.'))
+        f.set_entry('foo', PathEntry(['common.h', 'foo.h']))
+        f.set_entry('bar', PathEntry(['common.h']))
+        f.write()
+        assert f.get_entry('foo').deps == ['common.h', 'foo.h']
+
+        entries = pickle.load(open('.sconsign', 'rb'))
+        paths = entries[SCons.SConsign.PathTableKey]
+        assert sorted(paths) == ['common.h', 'foo.h'], paths
+
+        f = SCons.SConsign.DirFile(DummyNode('.'))
+        assert sorted(f.entries.keys()) == ['bar', 'foo'], f.entries
+        assert f.get_entry('foo').deps == ['common.h', 'foo.h']
+        assert f.get_entry('bar').deps == ['common.h']
+
+        # Paths that aren't used any more are dropped.
+        f.set_entry('foo', PathEntry(['common.h']))
+        f.write()
+        entries = pickle.load(open('.sconsign', 'rb'))
+        paths = entries[SCons.SConsign.PathTableKey]
+        assert paths == ['common.h'], paths
+
     def test_SConsignDirFile(self):
         bi_foo = DummySConsignEntry('foo')
         bi_bar = DummySConsignEntry('bar')
@@ -286,6 +515,28 @@ class SConsignDirFileTestCase(SConsignTestCase):
         assert e.name == 'bbb', e.name
         assert e.arg == 'bbb arg', e.arg
 
+    def test_hash_format(self):
+        """Test discarding entries written with another hash format"""
+        f = SCons.SConsign.DirFile(DummyNode('.'))
+        f.set_entry('foo', DummySConsignEntry('foo'))
+        f.write()
+        f = SCons.SConsign.DirFile(DummyNode('.'))
+        assert list(f.entries.keys()) == ['foo'], f.entries
+
+        SCons.Util.set_hash_format('sha1')
+        try:
+            f = SCons.SConsign.DirFile(DummyNode('.'))
+            assert f.entries == {}, f.entries
+            f.set_entry('bar', DummySConsignEntry('bar'))
+            f.write()
+            f = SCons.SConsign.DirFile(DummyNode('.'))
+            assert list(f.entries.keys()) == ['bar'], f.entries
+        finally:
+            SCons.Util.set_hash_format('md5')
+
+        f = SCons.SConsign.DirFile(DummyNode('.'))
+        assert f.entries == {}, f.entries
+
 
 class SConsignFileTestCase(SConsignTestCase):
 
@@ -379,6 +630,7 @@ if __name__ == "__main__":
     suite = unittest.TestSuite()
     tclasses = [
         BaseTestCase,
+        PathTableTestCase,
         SConsignDBTestCase,
         SConsignDirFileTestCase,
         SConsignFileTestCase,
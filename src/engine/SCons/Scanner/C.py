@@ -52,7 +52,9 @@ class SConsCPPScanner(SCons.cpp.PreProcessor):
         return self.result[1:]
     def find_include_file(self, t):
         keyword, quote, fname = t
-        result = SCons.Node.FS.find_file(fname, self.searchpath[quote])
+        searchpath = self.searchpath['"']
+        result = SCons.Node.FS.find_include_file(fname, searchpath[0],
+                                                 searchpath[1:], quote != '"')
         if not result:
             self.missing.append((fname, self.current_file))
         return result
@@ -35,6 +35,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import re
 
 import SCons.Scanner
+import SCons.Util
 
 def DScanner():
     """Return a prototype Scanner instance for scanning D source files"""
@@ -50,14 +51,16 @@ class D(SCons.Scanner.Classic):
             regex = 'import\s+(?:[a-zA-Z0-9_.]+)\s*(?:,\s*(?:[a-zA-Z0-9_.]+)\s*)*;')
 
         self.cre2 = re.compile ('(?:import\s)?\s*([a-zA-Z0-9_.]+)\s*(?:,|;)', re.M)
+        self.include_names_key = SCons.Util.MD5signature(self.cre.pattern +
+                                                         self.cre2.pattern)
 
     def find_include(self, include, source_dir, path):
         # translate dots (package separators) to slashes
         inc = include.replace('.', '/')
 
-        i = SCons.Node.FS.find_file(inc + '.d', (source_dir,) + path)
+        i = SCons.Node.FS.find_include_file(inc + '.d', source_dir, tuple(path))
         if i is None:
-            i = SCons.Node.FS.find_file (inc + '.di', (source_dir,) + path)
+            i = SCons.Node.FS.find_include_file(inc + '.di', source_dir, tuple(path))
         return i, include
 
     def find_include_names(self, node):
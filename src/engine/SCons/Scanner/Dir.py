@@ -51,6 +51,8 @@ skip_entry_list = [
    '.sconsign',
    # Used by the native dblite.py module.
    '.sconsign.dblite',
+   # Used by the native dblog.py module.
+   '.sconsign.dblog',
    # Used by dbm and dumbdbm.
    '.sconsign.dir',
    # Used by dbm.
@@ -59,6 +59,10 @@ class F90Scanner(SCons.Scanner.Classic):
         self.cre_incl = re.compile(incl_regex, re.M)
         self.cre_def = re.compile(def_regex, re.M)
 
+        self.include_names_key = SCons.Util.MD5signature(use_regex +
+                                                         incl_regex +
+                                                         def_regex)
+
         def _scan(node, env, path, self=self):
             node = node.rfile()
 
@@ -75,25 +79,32 @@ class F90Scanner(SCons.Scanner.Classic):
 
         SCons.Scanner.Current.__init__(self, *args, **kw)
 
+    def find_include_names(self, node):
+        """Return the names of the files INCLUDEd by the node, and the
+        names of the modules it USEs that it doesn't define itself."""
+        # retrieve all included filenames
+        includes = self.cre_incl.findall(node.get_text_contents())
+        # retrieve all USE'd module names
+        modules = self.cre_use.findall(node.get_text_contents())
+        # retrieve all defined module names
+        defmodules = self.cre_def.findall(node.get_text_contents())
+
+        # Remove all USE'd module names that are defined in the same file
+        # (case-insensitively)
+        d = {}
+        for m in defmodules:
+            d[m.lower()] = 1
+        modules = [m for m in modules if m.lower() not in d]
+
+        return includes, modules
+
     def scan(self, node, env, path=()):
 
         # cache the includes list in node so we only scan it once:
         if node.includes != None:
             mods_and_includes = node.includes
         else:
-            # retrieve all included filenames
-            includes = self.cre_incl.findall(node.get_text_contents())
-            # retrieve all USE'd module names
-            modules = self.cre_use.findall(node.get_text_contents())
-            # retrieve all defined module names
-            defmodules = self.cre_def.findall(node.get_text_contents())
-
-            # Remove all USE'd module names that are defined in the same file
-            # (case-insensitively)
-            d = {}
-            for m in defmodules:
-                d[m.lower()] = 1
-            modules = [m for m in modules if m.lower() not in d]
+            includes, modules = self.get_include_names(node)
 
             # Convert module name to a .mod filename
             suffix = env.subst('$FORTRANMODSUFFIX')
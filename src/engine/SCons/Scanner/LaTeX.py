@@ -115,6 +115,47 @@ def PDFLaTeXScanner():
                recursive = 0)
     return ds
 
+class FindMultiPathDirs(object):
+    """The stock FindPathDirs function has the wrong granularity:
+    it is called once per target, while we need the path that depends
+    on what kind of included files is being searched. This wrapper
+    hides multiple instances of FindPathDirs, one per the LaTeX path
+    variable in the environment. When invoked, the function calculates
+    and returns all the required paths as a dictionary (converted into
+    a tuple to become hashable). Then the scan function converts it
+    back and uses a dictionary of tuples rather than a single tuple
+    of paths.
+    """
+    def __init__(self, dictionary):
+        self.dictionary = {}
+        for k,n in dictionary.items():
+            self.dictionary[k] = ( SCons.Scanner.FindPathDirs(n),
+                                   FindENVPathDirs(n) )
+
+    def __call__(self, env, dir=None, target=None, source=None,
+                            argument=None):
+        di = {}
+        for k,(c,cENV)  in self.dictionary.items():
+            di[k] = ( c(env, dir=None, target=None, source=None,
+                           argument=None) ,
+                      cENV(env, dir=None, target=None, source=None,
+                           argument=None) )
+        # To prevent "dict is not hashable error"
+        return tuple(di.items())
+
+class LaTeXScanCheck(object):
+    """Skip all but LaTeX source files, i.e., do not scan *.eps,
+    *.pdf, *.jpg, etc.
+    """
+    def __init__(self, suffixes):
+        self.suffixes = suffixes
+    def __call__(self, node, env):
+        current = not node.has_builder() or node.is_up_to_date()
+        scannable = node.get_suffix() in env.subst_list(self.suffixes)[0]
+        # Returning false means that the file is not scanned.
+        return scannable and current
+
+
 class LaTeX(SCons.Scanner.Base):
     """Class for scanning LaTeX files for included files.
 
@@ -184,46 +225,6 @@ class LaTeX(SCons.Scanner.Base):
                 return []
             return self.scan_recurse(node, path)
 
-        class FindMultiPathDirs(object):
-            """The stock FindPathDirs function has the wrong granularity:
-            it is called once per target, while we need the path that depends
-            on what kind of included files is being searched. This wrapper
-            hides multiple instances of FindPathDirs, one per the LaTeX path
-            variable in the environment. When invoked, the function calculates
-            and returns all the required paths as a dictionary (converted into
-            a tuple to become hashable). Then the scan function converts it
-            back and uses a dictionary of tuples rather than a single tuple
-            of paths.
-            """
-            def __init__(self, dictionary):
-                self.dictionary = {}
-                for k,n in dictionary.items():
-                    self.dictionary[k] = ( SCons.Scanner.FindPathDirs(n),
-                                           FindENVPathDirs(n) )
-
-            def __call__(self, env, dir=None, target=None, source=None,
-                                    argument=None):
-                di = {}
-                for k,(c,cENV)  in self.dictionary.items():
-                    di[k] = ( c(env, dir=None, target=None, source=None,
-                                   argument=None) ,
-                              cENV(env, dir=None, target=None, source=None,
-                                   argument=None) )
-                # To prevent "dict is not hashable error"
-                return tuple(di.items())
-
-        class LaTeXScanCheck(object):
-            """Skip all but LaTeX source files, i.e., do not scan *.eps,
-            *.pdf, *.jpg, etc.
-            """
-            def __init__(self, suffixes):
-                self.suffixes = suffixes
-            def __call__(self, node, env):
-                current = not node.has_builder() or node.is_up_to_date()
-                scannable = node.get_suffix() in env.subst_list(self.suffixes)[0]
-                # Returning false means that the file is not scanned.
-                return scannable and current
-
         kw['function'] = _scan
         kw['path_function'] = FindMultiPathDirs(LaTeX.keyword_paths)
         kw['recursive'] = 0
@@ -271,11 +272,11 @@ class LaTeX(SCons.Scanner.Base):
         try_names = self._latex_names(include)
         for n in try_names:
             # see if we find it using the path in env[var]
-            i = SCons.Node.FS.find_file(n, (source_dir,) + sub_path[0])
+            i = SCons.Node.FS.find_include_file(n, source_dir, sub_path[0])
             if i:
                 return i, include
             # see if we find it using the path in env['ENV'][var]
-            i = SCons.Node.FS.find_file(n, (source_dir,) + sub_path[1])
+            i = SCons.Node.FS.find_include_file(n, source_dir, sub_path[1])
             if i:
                 return i, include
         return i, include
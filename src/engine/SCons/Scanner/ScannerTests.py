@@ -450,11 +450,13 @@ class ClassicTestCase(unittest.TestCase):
         env = DummyEnvironment()
         s = SCons.Scanner.Classic("t", ['.suf'], 'MYPATH', '^my_inc (\S+)')
 
-        def _find_file(filename, paths):
-            return paths[0]+'/'+filename
+        def _find_include_file(filename, source_dir, paths, source_dir_last=0):
+            if source_dir_last:
+                return paths[0]+'/'+filename
+            return source_dir+'/'+filename
 
-        save = SCons.Node.FS.find_file
-        SCons.Node.FS.find_file = _find_file
+        save = SCons.Node.FS.find_include_file
+        SCons.Node.FS.find_include_file = _find_include_file
 
         try:
             n, i = s.find_include('aaa', 'foo', ('path',))
@@ -462,7 +464,7 @@ class ClassicTestCase(unittest.TestCase):
             assert i == 'aaa', i
 
         finally:
-            SCons.Node.FS.find_file = save
+            SCons.Node.FS.find_include_file = save
 
     def test_name(self):
         """Test setting the Scanner.Classic name"""
@@ -546,7 +548,44 @@ class ClassicTestCase(unittest.TestCase):
         ret = s.function(n, env, ('foo5',))
         assert ret == ['jkl', 'mno'], ret
 
-        
+    def test_get_include_names(self):
+        """Test the Scanner.Classic get_include_names() method"""
+        class MyNode(object):
+            def __init__(self, contents):
+                self.contents = contents
+                self.stored = {}
+            def get_text_contents(self):
+                return self.contents
+            def get_stored_include_names(self, key):
+                return self.stored.get((key, self.contents))
+            def store_include_names(self, key, names):
+                self.stored[(key, self.contents)] = names
+
+        s = SCons.Scanner.Classic("t", ['.suf'], 'MYPATH', '^my_inc (\S+)')
+
+        n = MyNode('my_inc abc\n')
+        names = s.get_include_names(n)
+        assert names == ['abc'], names
+        stored = list(n.stored.values())
+        assert stored == [['abc']], stored
+
+        # The stored names are reused as long as the node's contents
+        # (its csig, for real Nodes) stay the same.
+        n.stored[(s.include_names_key, n.contents)] = ['stored']
+        names = s.get_include_names(n)
+        assert names == ['stored'], names
+
+        n.contents = 'my_inc def\n'
+        names = s.get_include_names(n)
+        assert names == ['def'], names
+
+        # A scanner with a different regular expression doesn't use
+        # the names another one found.
+        s2 = SCons.Scanner.Classic("t", ['.suf'], 'MYPATH', '^inc (\S+)')
+        assert s2.include_names_key != s.include_names_key
+        names = s2.get_include_names(n)
+        assert names == [], names
+
 
 class ClassicCPPTestCase(unittest.TestCase):
     def test_find_include(self):
@@ -554,11 +593,13 @@ class ClassicCPPTestCase(unittest.TestCase):
         env = DummyEnvironment()
         s = SCons.Scanner.ClassicCPP("Test", [], None, "")
 
-        def _find_file(filename, paths):
-            return paths[0]+'/'+filename
+        def _find_include_file(filename, source_dir, paths, source_dir_last=0):
+            if source_dir_last:
+                return paths[0]+'/'+filename
+            return source_dir+'/'+filename
 
-        save = SCons.Node.FS.find_file
-        SCons.Node.FS.find_file = _find_file
+        save = SCons.Node.FS.find_include_file
+        SCons.Node.FS.find_include_file = _find_include_file
 
         try:
             n, i = s.find_include(('"', 'aaa'), 'foo', ('path',))
@@ -574,7 +615,7 @@ class ClassicCPPTestCase(unittest.TestCase):
             assert i == 'ccc', i
 
         finally:
-            SCons.Node.FS.find_file = save
+            SCons.Node.FS.find_include_file = save
 
 def suite():
     suite = unittest.TestSuite()
@@ -31,6 +31,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import re
 
+import SCons.Debug
 import SCons.Node.FS
 import SCons.Util
 
@@ -326,6 +327,10 @@ class Classic(Current):
 
         self.cre = re.compile(regex, re.M)
 
+        # Identifies the include names this scanner finds in the
+        # .sconsign file entries of the files it scans.
+        self.include_names_key = SCons.Util.MD5signature(regex)
+
         def _scan(node, env, path=(), self=self):
             node = node.rfile()
             if not node.exists():
@@ -341,7 +346,7 @@ class Classic(Current):
         Current.__init__(self, *args, **kw)
 
     def find_include(self, include, source_dir, path):
-        n = SCons.Node.FS.find_file(include, (source_dir,) + tuple(path))
+        n = SCons.Node.FS.find_include_file(include, source_dir, tuple(path))
         return n, include
 
     def sort_key(self, include):
@@ -350,13 +355,33 @@ class Classic(Current):
     def find_include_names(self, node):
         return self.cre.findall(node.get_text_contents())
 
+    def get_include_names(self, node):
+        """
+        Returns find_include_names() for the node, reusing the names
+        found by a previous build if the node's contents haven't
+        changed since, so we don't have to read the file and search
+        it again.
+        """
+        try:
+            names = node.get_stored_include_names(self.include_names_key)
+        except AttributeError:
+            # Not a file system Node, nothing stored.
+            return self.find_include_names(node)
+        if names is not None:
+            if __debug__: SCons.Debug.countEvent('include names cache hits')
+            return names
+        if __debug__: SCons.Debug.countEvent('include names cache misses')
+        names = self.find_include_names(node)
+        node.store_include_names(self.include_names_key, names)
+        return names
+
     def scan(self, node, path=()):
 
         # cache the includes list in node so we only scan it once:
         if node.includes is not None:
             includes = node.includes
         else:
-            includes = self.find_include_names (node)
+            includes = self.get_include_names(node)
             # Intern the names of the include files. Saves some memory
             # if the same header is included many times.
             node.includes = list(map(SCons.Util.silent_intern, includes))
@@ -393,12 +418,8 @@ class ClassicCPP(Classic):
     the contained filename in group 1.
     """
     def find_include(self, include, source_dir, path):
-        if include[0] == '"':
-            paths = (source_dir,) + tuple(path)
-        else:
-            paths = tuple(path) + (source_dir,)
-
-        n = SCons.Node.FS.find_file(include[1], paths)
+        n = SCons.Node.FS.find_include_file(include[1], source_dir, tuple(path),
+                                            include[0] != '"')
 
         i = SCons.Util.silent_intern(include[1])
         return n, i
@@ -0,0 +1,416 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+__doc__ = """
+SCons build daemon
+
+"scons --daemon" reads the SConscript files once and then waits for
+build requests on a Unix domain socket in the top-level SConstruct
+directory.  A later "scons" run in the same tree finds the socket and
+hands its command line to the daemon instead of reading the SConscript
+files itself.  The daemon builds with the Node tree it already has,
+the same way the "build" command of --interactive mode does, and
+sends the output and the exit status back.  Command-line options
+that affect how the SConscript files are read (-f, -I, --site-dir
+and the like) only take effect when the daemon is started.
+
+The client passes the daemon the names of two FIFOs to use as the
+standard output and standard error of the build, so the output of the
+commands goes straight to the client's terminal.
+
+The daemon notes what the SConscript files look at while it reads
+them, the same way --sconscript-cache does.  If any of the SConscript
+files, the files in the site_scons directories, the modules the
+SConscript files imported or the other files and directories they
+looked at have changed, the daemon re-executes itself to read them
+again, and the client waits for it.  Builds with different
+command-line variables (name=value arguments) than the ones the daemon
+was started with, or with different values for the environment
+variables or the options the SConscript files fetched, are run by the
+client.
+"""
+
+import copy
+import errno
+import os
+import pickle
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import SCons.Errors
+import SCons.Script
+import SCons.Script.SConscriptCache
+import SCons.Script.SConsOptions
+
+# The name of the daemon's socket in the top-level SConstruct directory.
+socket_name = '.sconsd'
+
+def socket_path(top):
+    return os.path.join(top, socket_name)
+
+def connect(path):
+    """Return a socket connected to the daemon listening on path,
+    or None if there's no daemon there."""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except socket.error:
+        s.close()
+        return None
+    return s
+
+def _send(sock, message):
+    sock.sendall(pickle.dumps(message, 1))
+
+def _receive(sock):
+    f = sock.makefile('rb')
+    try:
+        return pickle.load(f)
+    finally:
+        f.close()
+
+class Server(object):
+    """A build daemon for the SConscript files that have been read
+    into this process."""
+
+    def __init__(self, fs, parser, options, xmit_args, recorder, site_dirs=[]):
+        self.fs = fs
+        self.parser = parser
+        self.options = options
+        self.xmit_args = xmit_args
+        self.recorder = recorder
+        self.site_dirs = site_dirs
+        self.path = socket_path(fs.Top.get_abspath())
+        # The files the SConscript files read, other than themselves
+        # and the site_scons files.
+        files = list(recorder.opened.keys())
+        for name, path in recorder.new_modules():
+            files.append(path)
+        self.files = files
+        if recorder.environ_all:
+            self.environ = recorder.initial_environ.copy()
+        else:
+            self.environ = {}
+            for name in recorder.environ_keys.keys():
+                self.environ[name] = recorder.initial_environ.get(name)
+        self.sconscripts = self.stat_files()
+        self.sock = None
+
+    def stat_files(self):
+        """Returns what the SConscript files looked at in the file
+        system, to compare with what it was when they were read."""
+        paths = SCons.Script._SConscript.sconscript_files + \
+                SCons.Script.SConscriptCache.site_files(self.site_dirs) + \
+                self.files
+        result = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                result[path] = None
+            else:
+                result[path] = (st.st_mtime, st.st_size)
+        checks = {}
+        for name, path in self.recorder.checks.keys():
+            checks[(name, path)] = getattr(os.path, name)(path)
+        listdirs = {}
+        for path in self.recorder.listdirs.keys():
+            try:
+                listdirs[path] = sorted(os.listdir(path))
+            except OSError:
+                listdirs[path] = None
+        return result, checks, listdirs
+
+    def same_client(self, request):
+        """Returns whether the SConscript files would have seen the
+        same environment variables and options in the client."""
+        if request['xmit_args'] != self.xmit_args:
+            return False
+        environ = request['environ']
+        if self.recorder.environ_all:
+            if environ != self.environ:
+                return False
+        else:
+            for name, value in self.environ.items():
+                if environ.get(name) != value:
+                    return False
+        # Parse the client's command line from the defaults, so the
+        # options the daemon itself was started with don't count.
+        parser = self.parser
+        saved = (parser.values, parser.largs, parser.rargs)
+        values = SCons.Script.SConsOptions.SConsValues(parser.get_default_values())
+        try:
+            try:
+                values, args = parser.parse_args(request['argv'], values=values)
+            except SystemExit:
+                # Let the build report the bad command line.
+                return True
+        finally:
+            parser.values, parser.largs, parser.rargs = saved
+        for name, value in self.recorder.fetched.items():
+            try:
+                if getattr(values, name) != value:
+                    return False
+            except AttributeError:
+                return False
+        return True
+
+    def listen(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise SCons.Errors.UserError("--daemon is not supported on this platform.")
+        if os.path.exists(self.path):
+            s = connect(self.path)
+            if s is not None:
+                s.close()
+                msg = "A build daemon is already running in %s."
+                raise SCons.Errors.UserError(msg % os.path.dirname(self.path))
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(5)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def serve(self):
+        self.listen()
+        sys.stdout.write("scons: build daemon listening on %s (pid %d).\n"
+                         % (self.path, os.getpid()))
+        sys.stdout.flush()
+        restart = None
+        try:
+            while not restart:
+                try:
+                    conn, addr = self.sock.accept()
+                except socket.error, e:
+                    if e.args[0] == errno.EINTR:
+                        continue
+                    raise
+                try:
+                    try:
+                        restart = self.handle(conn)
+                    except (socket.error, EnvironmentError), e:
+                        sys.stdout.write("scons: lost build client: %s\n" % e)
+                finally:
+                    conn.close()
+        finally:
+            self.close()
+        if restart:
+            self.restart()
+
+    def handle(self, conn):
+        """Handle one request.  Returns true if the daemon has to
+        re-read the SConscript files."""
+        try:
+            request = _receive(conn)
+        except (EOFError, pickle.UnpicklingError):
+            return None
+        if self.stat_files() != self.sconscripts:
+            # Stop listening before telling the client, so it
+            # doesn't connect again until we're ready.
+            self.close()
+            _send(conn, ('restart', os.getpid()))
+            return 1
+        if not self.same_client(request):
+            _send(conn, ('fallback',))
+            return None
+
+        out = os.open(request['stdout'], os.O_WRONLY)
+        err = os.open(request['stderr'], os.O_WRONLY)
+        _send(conn, ('started',))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        save_out = os.dup(1)
+        save_err = os.dup(2)
+        os.dup2(out, 1)
+        os.dup2(err, 2)
+        os.close(out)
+        os.close(err)
+        try:
+            nodes, status = self.build(request['argv'],
+                                       request['target_top'])
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(save_out, 1)
+            os.dup2(save_err, 2)
+            os.close(save_out)
+            os.close(save_err)
+        _send(conn, ('status', status))
+
+        if nodes:
+            SCons.Script.Interactive.clear_nodes(nodes)
+        return None
+
+    def build(self, argv, target_top):
+        """Build the targets for a client's command line.  Returns the
+        Nodes that were built and the exit status."""
+        import SCons.Script.Main
+
+        SCons.Script.Main.exit_status = 0
+        del SCons.Script.Main._BuildFailures[:]
+
+        options = copy.deepcopy(self.options)
+        try:
+            options, args = self.parser.parse_args(argv, values=options)
+        except SystemExit, e:
+            return None, e.code
+        targets = [a for a in args if '=' not in a]
+
+        SCons.Script.COMMAND_LINE_TARGETS = targets
+        if targets:
+            SCons.Script.BUILD_TARGETS = targets
+        else:
+            SCons.Script.BUILD_TARGETS = SCons.Script._build_plus_default
+
+        try:
+            nodes = SCons.Script.Main._build_targets(self.fs, options,
+                                                     targets, target_top)
+        except SCons.Errors.UserError, e:
+            sys.stderr.write("scons: *** %s\n" % e)
+            return None, 2
+        if not nodes:
+            return None, 2
+        return nodes, SCons.Script.Main.exit_status
+
+    def restart(self):
+        sys.stdout.write("scons: SConscript files changed; restarting the build daemon.\n")
+        sys.stdout.flush()
+        os.chdir(SCons.Script._SConscript.launch_dir)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(fs, parser, options, xmit_args, recorder, site_dirs=[]):
+    server = Server(fs, parser, options, xmit_args, recorder, site_dirs)
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        sys.stdout.write("scons: build daemon stopped.\n")
+
+def _copy_output(fds):
+    """Copy everything written to the FIFOs to our own output until
+    the daemon closes them."""
+    while fds:
+        try:
+            ready = select.select(list(fds.keys()), [], [])[0]
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        for fd in ready:
+            data = os.read(fd, 65536)
+            if data:
+                fds[fd].write(data)
+                fds[fd].flush()
+            else:
+                os.close(fd)
+                del fds[fd]
+
+def _request(sock, argv, xmit_args, target_top):
+    tmpdir = tempfile.mkdtemp(prefix='scons-client-')
+    fds = {}
+    try:
+        out = os.path.join(tmpdir, 'stdout')
+        err = os.path.join(tmpdir, 'stderr')
+        os.mkfifo(out)
+        os.mkfifo(err)
+        # Open our ends without blocking, so the daemon can open
+        # the other ends when it's ready to start the build.
+        fds[os.open(out, os.O_RDONLY | os.O_NONBLOCK)] = sys.stdout
+        fds[os.open(err, os.O_RDONLY | os.O_NONBLOCK)] = sys.stderr
+        rfile = sock.makefile('rb')
+        _send(sock, {'argv' : argv,
+                     'xmit_args' : xmit_args,
+                     'environ' : dict(os.environ),
+                     'target_top' : target_top,
+                     'stdout' : out,
+                     'stderr' : err})
+        reply = pickle.load(rfile)
+        if reply[0] == 'started':
+            _copy_output(fds)
+            reply = pickle.load(rfile)
+        return reply
+    finally:
+        for fd in fds.keys():
+            os.close(fd)
+        shutil.rmtree(tmpdir, ignore_errors=1)
+
+def _wait_for_restart(path, pid):
+    """Wait for a daemon that's re-reading its SConscript files to
+    start listening again.  Returns None if the daemon has exited."""
+    while 1:
+        time.sleep(0.1)
+        sock = connect(path)
+        if sock is not None:
+            return sock
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return None
+
+def client(top, argv, xmit_args, target_top):
+    """Hand a build to the daemon running in the top directory, if
+    there is one.  Returns the exit status of the build, or None if
+    this process has to do the build itself."""
+    path = socket_path(top)
+    if not os.path.exists(path):
+        return None
+    sock = connect(path)
+    while sock is not None:
+        try:
+            try:
+                reply = _request(sock, argv, xmit_args, target_top)
+            except (EOFError, socket.error):
+                # The daemon went away.
+                return None
+        finally:
+            sock.close()
+        if reply[0] == 'status':
+            return reply[1]
+        if reply[0] != 'restart':
+            return None
+        sock = _wait_for_restart(path, reply[1])
+    return None
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
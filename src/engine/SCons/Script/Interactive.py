@@ -159,8 +159,6 @@ class SConsInteractiveCmd(cmd.Cmd):
         build [TARGETS]         Build the specified TARGETS and their
                                 dependencies.  'b' is a synonym.
         """
-        import SCons.Node
-        import SCons.SConsign
         import SCons.Script.Main
 
         options = copy.deepcopy(self.options)
@@ -184,87 +182,7 @@ class SConsInteractiveCmd(cmd.Cmd):
         if not nodes:
             return
 
-        # Call each of the Node's alter_targets() methods, which may
-        # provide additional targets that ended up as part of the build
-        # (the canonical example being a VariantDir() when we're building
-        # from a source directory) and which we therefore need their
-        # state cleared, too.
-        x = []
-        for n in nodes:
-            x.extend(n.alter_targets()[0])
-        nodes.extend(x)
-
-        # Clean up so that we can perform the next build correctly.
-        #
-        # We do this by walking over all the children of the targets,
-        # and clearing their state.
-        #
-        # We currently have to re-scan each node to find their
-        # children, because built nodes have already been partially
-        # cleared and don't remember their children.  (In scons
-        # 0.96.1 and earlier, this wasn't the case, and we didn't
-        # have to re-scan the nodes.)
-        #
-        # Because we have to re-scan each node, we can't clear the
-        # nodes as we walk over them, because we may end up rescanning
-        # a cleared node as we scan a later node.  Therefore, only
-        # store the list of nodes that need to be cleared as we walk
-        # the tree, and clear them in a separate pass.
-        #
-        # XXX: Someone more familiar with the inner workings of scons
-        # may be able to point out a more efficient way to do this.
-
-        SCons.Script.Main.progress_display("scons: Clearing cached node information ...")
-
-        seen_nodes = {}
-
-        def get_unseen_children(node, parent, seen_nodes=seen_nodes):
-            def is_unseen(node, seen_nodes=seen_nodes):
-                return node not in seen_nodes
-            return list(filter(is_unseen, node.children(scan=1)))
-
-        def add_to_seen_nodes(node, parent, seen_nodes=seen_nodes):
-            seen_nodes[node] = 1
-
-            # If this file is in a VariantDir and has a
-            # corresponding source file in the source tree, remember the
-            # node in the source tree, too.  This is needed in
-            # particular to clear cached implicit dependencies on the
-            # source file, since the scanner will scan it if the
-            # VariantDir was created with duplicate=0.
-            try:
-                rfile_method = node.rfile
-            except AttributeError:
-                return
-            else:
-                rfile = rfile_method()
-            if rfile != node:
-                seen_nodes[rfile] = 1
-
-        for node in nodes:
-            walker = SCons.Node.Walker(node,
-                                        kids_func=get_unseen_children,
-                                        eval_func=add_to_seen_nodes)
-            n = walker.get_next()
-            while n:
-                n = walker.get_next()
-
-        for node in seen_nodes.keys():
-            # Call node.clear() to clear most of the state
-            node.clear()
-            # node.clear() doesn't reset node.state, so call
-            # node.set_state() to reset it manually
-            node.set_state(SCons.Node.no_state)
-            node.implicit = None
-
-            # Debug:  Uncomment to verify that all Taskmaster reference
-            # counts have been reset to zero.
-            #if node.ref_count != 0:
-            #    from SCons.Debug import Trace
-            #    Trace('node %s, ref_count %s !!!\n' % (node, node.ref_count))
-
-        SCons.SConsign.Reset()
-        SCons.Script.Main.progress_display("scons: done clearing node information.")
+        clear_nodes(nodes)
 
     def do_clean(self, argv):
         """\
@@ -368,6 +286,105 @@ class SConsInteractiveCmd(cmd.Cmd):
         """
         sys.stdout.write(self.parser.version + '\n')
 
+def clear_nodes(nodes):
+    """Clear the state of the Nodes that were just built, and of
+    everything they depend on, so the next build starts fresh.
+    """
+    import SCons.Node
+    import SCons.Node.FS
+    import SCons.SConsign
+    import SCons.Script.Main
+
+    # Call each of the Node's alter_targets() methods, which may
+    # provide additional targets that ended up as part of the build
+    # (the canonical example being a VariantDir() when we're building
+    # from a source directory) and which we therefore need their
+    # state cleared, too.
+    x = []
+    for n in nodes:
+        x.extend(n.alter_targets()[0])
+    nodes.extend(x)
+
+    # Clean up so that we can perform the next build correctly.
+    #
+    # We do this by walking over all the children of the targets,
+    # and clearing their state.
+    #
+    # We currently have to re-scan each node to find their
+    # children, because built nodes have already been partially
+    # cleared and don't remember their children.  (In scons
+    # 0.96.1 and earlier, this wasn't the case, and we didn't
+    # have to re-scan the nodes.)
+    #
+    # Because we have to re-scan each node, we can't clear the
+    # nodes as we walk over them, because we may end up rescanning
+    # a cleared node as we scan a later node.  Therefore, only
+    # store the list of nodes that need to be cleared as we walk
+    # the tree, and clear them in a separate pass.
+    #
+    # XXX: Someone more familiar with the inner workings of scons
+    # may be able to point out a more efficient way to do this.
+
+    SCons.Script.Main.progress_display("scons: Clearing cached node information ...")
+
+    seen_nodes = {}
+
+    def get_unseen_children(node, parent, seen_nodes=seen_nodes):
+        def is_unseen(node, seen_nodes=seen_nodes):
+            return node not in seen_nodes
+        return list(filter(is_unseen, node.children(scan=1)))
+
+    def add_to_seen_nodes(node, parent, seen_nodes=seen_nodes):
+        seen_nodes[node] = 1
+
+        # If this file is in a VariantDir and has a
+        # corresponding source file in the source tree, remember the
+        # node in the source tree, too.  This is needed in
+        # particular to clear cached implicit dependencies on the
+        # source file, since the scanner will scan it if the
+        # VariantDir was created with duplicate=0.
+        try:
+            rfile_method = node.rfile
+        except AttributeError:
+            return
+        else:
+            rfile = rfile_method()
+        if rfile != node:
+            seen_nodes[rfile] = 1
+
+    for node in nodes:
+        walker = SCons.Node.Walker(node,
+                                    kids_func=get_unseen_children,
+                                    eval_func=add_to_seen_nodes)
+        n = walker.get_next()
+        while n:
+            n = walker.get_next()
+
+    for node in seen_nodes.keys():
+        # Call node.clear() to clear most of the state
+        node.clear()
+        # node.clear() doesn't reset node.state, so call
+        # node.set_state() to reset it manually
+        node.set_state(SCons.Node.no_state)
+        node.implicit = None
+        # Make the directory read its .sconsign information again,
+        # since SCons.SConsign.Reset() forgets what's been read.
+        for d in (node, getattr(node, 'dir', None)):
+            if getattr(d, '_sconsign', None) is not None:
+                d._sconsign = None
+
+        # Debug:  Uncomment to verify that all Taskmaster reference
+        # counts have been reset to zero.
+        #if node.ref_count != 0:
+        #    from SCons.Debug import Trace
+        #    Trace('node %s, ref_count %s !!!\n' % (node, node.ref_count))
+
+    SCons.SConsign.Reset()
+    # Files may have been added or removed since the directories
+    # were read.
+    SCons.Node.FS.invalidate_dir_snapshots()
+    SCons.Script.Main.progress_display("scons: done clearing node information.")
+
 def interact(fs, parser, options, targets, target_top):
     c = SConsInteractiveCmd(prompt = 'scons>>> ',
                             fs = fs,
@@ -64,9 +64,12 @@ import SCons.Platform
 import SCons.SConf
 import SCons.Script
 import SCons.Taskmaster
+import SCons.Tool
 import SCons.Util
 import SCons.Warnings
 
+import SCons.Script.Daemon
+import SCons.Script.SConscriptCache
 import SCons.Script.Interactive
 
 def fetch_win32_parallel_msg():
@@ -464,14 +467,21 @@ def AddOption(*args, **kw):
     if 'default' not in kw:
         kw['default'] = None
     result = OptionsParser.add_local_option(*args, **kw)
+    if result:
+        SCons.Script.SConscriptCache.option_added(args, kw, result)
     return result
 
 def GetOption(name):
-    return getattr(OptionsParser.values, name)
+    value = getattr(OptionsParser.values, name)
+    SCons.Script.SConscriptCache.option_fetched(name, value)
+    return value
 
 def SetOption(name, value):
     return OptionsParser.values.set_option(name, value)
 
+def SetHashFormat(name):
+    return OptionsParser.values.set_option('hash_format', name)
+
 #
 class Stats(object):
     def __init__(self):
@@ -513,6 +523,11 @@ class CountStats(Stats):
         for k in sorted(stats_table.keys()):
             r = stats_table[k][:l] + [k]
             self.outfp.write(fmt2 % tuple(r))
+        events = SCons.Debug.fetchEventCounts()
+        if events:
+            self.outfp.write("Event counts:\n")
+            for name, count in events:
+                self.outfp.write("    %7d   %s\n" % (count, name))
 
 count_stats = CountStats()
 
@@ -652,6 +667,8 @@ def _set_debug_values(options):
         options.tree_printers.append(TreePrinter(status=True))
     if "time" in debug_values:
         print_time = 1
+    if "tools" in debug_values:
+        SCons.Tool.print_tool_times = 1
     if "tree" in debug_values:
         options.tree_printers.append(TreePrinter())
     if "prepare" in debug_values:
@@ -668,6 +685,9 @@ def _create_path(plist):
             path = path + '/' + d
     return path
 
+# The site_scons directories that have been loaded.
+site_dirs = []
+
 def _load_site_scons_dir(topdir, site_dir_name=None):
     """Load the site_scons dir under topdir.
     Prepends site_scons to sys.path, imports site_scons/site_init.py,
@@ -683,6 +703,7 @@ def _load_site_scons_dir(topdir, site_dir_name=None):
         if err_if_not_found:
             raise SCons.Errors.UserError("site dir %s not found."%site_dir)
         return
+    site_dirs.append(site_dir)
 
     site_init_filename = "site_init.py"
     site_init_modname = "site_init"
@@ -846,6 +867,9 @@ def _main(parser):
     if options.diskcheck:
         SCons.Node.FS.set_diskcheck(options.diskcheck)
 
+    if options.hash_format:
+        SCons.Util.set_hash_format(options.hash_format)
+
     # Next, we want to create the FS object that represents the outside
     # world's file system, as that's central to a lot of initialization.
     # To do this, however, we need to be in the directory from which we
@@ -875,6 +899,18 @@ def _main(parser):
         except OSError:
             sys.stderr.write("Could not change directory to %s\n" % script_dir)
 
+    # If a build daemon is running in this directory, hand it the build
+    # instead of reading the SConscript files ourselves.
+    if not (options.daemon or options.interactive or options.help or
+            options.cache_prune):
+        argv = os.environ.get('SCONSFLAGS', '').split() + sys.argv[1:]
+        xmit_args = [a for a in parser.largs if a[:1] != '-' and '=' in a]
+        status = SCons.Script.Daemon.client(os.getcwd(), argv, xmit_args,
+                                            target_top)
+        if status is not None:
+            exit_status = status
+            return
+
     # Now that we're in the top-level SConstruct directory, go ahead
     # and initialize the FS object that represents the file system,
     # and make it the build engine default.
@@ -973,18 +1009,45 @@ def _main(parser):
     progress_display("scons: Reading SConscript files ...")
 
     start_time = time.time()
-    try:
-        for script in scripts:
-            SCons.Script._SConscript._SConscript(fs, script)
-    except SCons.Errors.StopError, e:
-        # We had problems reading an SConscript file, such as it
-        # couldn't be copied in to the VariantDir.  Since we're just
-        # reading SConscript files and haven't started building
-        # things yet, stop regardless of whether they used -i or -k
-        # or anything else.
-        sys.stderr.write("scons: *** %s  Stop.\n" % e)
-        exit_status = 2
-        sys.exit(exit_status)
+    cache = None
+    cached_fs = None
+    recorder = None
+    if options.sconscript_cache:
+        cache = SCons.Script.SConscriptCache.SConscriptCache(fs.Top.get_abspath(),
+                                                             parser,
+                                                             site_dirs)
+        if not options.daemon:
+            # The daemon has to see what the SConscript files look at.
+            cached_fs = cache.load()
+    if cached_fs is not None:
+        fs = cached_fs
+        progress_display("scons: using the cached SConscript state in %s" % cache.path)
+    else:
+        if cache:
+            cache.record()
+            recorder = cache.recorder
+        elif options.daemon:
+            recorder = SCons.Script.SConscriptCache.Recorder(parser.values,
+                                                             parser.largs[:])
+            recorder.start()
+        try:
+            try:
+                for script in scripts:
+                    SCons.Script._SConscript._SConscript(fs, script)
+            except SCons.Errors.StopError, e:
+                # We had problems reading an SConscript file, such as it
+                # couldn't be copied in to the VariantDir.  Since we're just
+                # reading SConscript files and haven't started building
+                # things yet, stop regardless of whether they used -i or -k
+                # or anything else.
+                sys.stderr.write("scons: *** %s  Stop.\n" % e)
+                exit_status = 2
+                sys.exit(exit_status)
+        finally:
+            if recorder is not None:
+                recorder.stop()
+        if cache:
+            cache.save(fs)
     global sconscript_time
     sconscript_time = time.time() - start_time
 
@@ -1054,6 +1117,7 @@ def _main(parser):
     fs.set_max_drift(options.max_drift)
 
     SCons.Job.explicit_stack_size = options.stack_size
+    SCons.Job.process_jobs = options.process_jobs
 
     if options.md5_chunksize:
         SCons.Node.FS.File.md5_chunksize = options.md5_chunksize
@@ -1064,6 +1128,13 @@ def _main(parser):
         SCons.Script.Interactive.interact(fs, OptionsParser, options,
                                           targets, target_top)
 
+    elif options.daemon:
+        SCons.Script.Daemon.serve(fs, OptionsParser, options, xmit_args,
+                                  recorder, site_dirs)
+
+    elif options.cache_prune:
+        _prune_caches()
+
     else:
 
         # Build the targets
@@ -1071,6 +1142,24 @@ def _main(parser):
         if not nodes:
             exit_status = 2
 
+def _prune_caches():
+    """Prune the cache directories the SConscript files configured
+    to the limits they were given."""
+    global exit_status
+    caches = SCons.CacheDir.configured_caches
+    if not caches:
+        display("scons: no CacheDir() to prune.")
+    for path in sorted(caches.keys()):
+        cd = SCons.CacheDir.CacheDir(path, **caches[path])
+        try:
+            removed, removed_bytes, left, left_bytes = cd.prune(scan=True)
+        except EnvironmentError, e:
+            sys.stderr.write("scons: *** Unable to prune cache %s: %s\n" % (path, e))
+            exit_status = 2
+            continue
+        display("scons: pruned %s: removed %d files (%d bytes), %d files (%d bytes) left."
+                % (path, removed, removed_bytes, left, left_bytes))
+
 def _build_targets(fs, options, targets, target_top):
 
     global this_build_status
@@ -1215,7 +1304,8 @@ def _build_targets(fs, options, targets, target_top):
         tmtrace = open(options.taskmastertrace_file, 'wb')
     else:
         tmtrace = None
-    taskmaster = SCons.Taskmaster.Taskmaster(nodes, task_class, order, tmtrace)
+    taskmaster = SCons.Taskmaster.Taskmaster(nodes, task_class, order, tmtrace,
+                                             options.critical_path)
 
     # Let the BuildTask objects get at the options to respond to the
     # various print_* settings, tree_printer list, etc.
@@ -1234,6 +1324,12 @@ def _build_targets(fs, options, targets, target_top):
         if msg:
             SCons.Warnings.warn(SCons.Warnings.NoParallelSupportWarning, msg)
 
+    if options.hash_jobs > 0 and task_class is BuildTask:
+        SCons.Node.FS.prefetch_csigs(nodes, options.hash_jobs)
+    if options.cache_prefetch > 0 and task_class is BuildTask and \
+       not options.no_exec:
+        SCons.CacheDir.prefetch(nodes, options.cache_prefetch)
+
     memory_stats.append('before building targets:')
     count_stats.append(('pre-', 'build'))
 
@@ -1259,6 +1355,10 @@ def _build_targets(fs, options, targets, target_top):
             if jobs.were_interrupted():
                 progress_display("scons: writing .sconsign file.")
             SCons.SConsign.write()
+            # Don't make an interrupted build wait for the files
+            # still to be pushed to the cache.
+            SCons.CacheDir.build_finished(options.cache_skip_flush or
+                                          jobs.were_interrupted())
 
     progress_display("scons: " + opening_message)
     jobs.run(postfunc = jobs_postfunc)
@@ -1374,6 +1474,9 @@ def main():
     if print_memoizer:
         SCons.Memoize.Dump("Memoizer (memory cache) hits and misses:")
 
+    if SCons.Tool.print_tool_times:
+        SCons.Tool.print_times()
+
     # Dump any development debug info that may have been enabled.
     # These are purely for internal debugging during development, so
     # there's no need to control them with --debug= options; they're
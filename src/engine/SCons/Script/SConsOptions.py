@@ -115,15 +115,20 @@ class SConsValues(optparse.Values):
                 return getattr(self.__dict__['__defaults__'], attr)
 
     settable = [
+        'cache_prefetch',
         'clean',
+        'critical_path',
         'diskcheck',
         'duplicate',
+        'hash_format',
+        'hash_jobs',
         'help',
         'implicit_cache',
         'max_drift',
         'md5_chunksize',
         'no_exec',
         'num_jobs',
+        'process_jobs',
         'random',
         'stack_size',
         'warn',
@@ -148,6 +153,33 @@ class SConsValues(optparse.Values):
                 value = int(value)
             except ValueError:
                 raise SCons.Errors.UserError("An integer is required: %s"%repr(value))
+        elif name == 'hash_format':
+            try:
+                value = str(value).lower()
+            except ValueError:
+                raise SCons.Errors.UserError("A string is required: %s"%repr(value))
+            if 'hash_format' not in self.__dict__:
+                # No --hash-format= option was specified on the command
+                # line.  Set this right away so any signatures computed
+                # while reading the SConscript files use it.
+                try:
+                    SCons.Util.set_hash_format(value)
+                except ValueError, e:
+                    raise SCons.Errors.UserError(str(e))
+        elif name == 'process_jobs':
+            try:
+                value = int(value)
+                if value < 0:
+                    raise ValueError
+            except ValueError:
+                raise SCons.Errors.UserError("A non-negative integer is required: %s"%repr(value))
+        elif name in ('hash_jobs', 'cache_prefetch'):
+            try:
+                value = int(value)
+                if value < 0:
+                    raise ValueError
+            except ValueError:
+                raise SCons.Errors.UserError("A non-negative integer is required: %s"%repr(value))
         elif name == 'duplicate':
             try:
                 value = str(value)
@@ -563,11 +595,28 @@ def Parser(version):
                   action="store_true",
                   help="Copy already-built targets into the CacheDir.")
 
+    op.add_option('--cache-prefetch',
+                  nargs=1, type="int",
+                  dest="cache_prefetch", default=0,
+                  action="store",
+                  help="Retrieve targets from CacheDir in N threads before building.",
+                  metavar="N")
+
+    op.add_option('--cache-prune',
+                  dest='cache_prune', default=False,
+                  action="store_true",
+                  help="Remove least recently used files from CacheDirs.")
+
     op.add_option('--cache-show',
                   dest='cache_show', default=False,
                   action="store_true",
                   help="Print build actions for files from CacheDir.")
 
+    op.add_option('--cache-skip-flush',
+                  dest='cache_skip_flush', default=False,
+                  action="store_true",
+                  help="Don't wait for queued CacheDir pushes at the end.")
+
     config_options = ["auto", "force" ,"cache"]
 
     def opt_config(option, opt, value, parser, c_options=config_options):
@@ -583,12 +632,22 @@ def Parser(version):
                   help = opt_config_help,
                   metavar="MODE")
 
+    op.add_option('--critical-path',
+                  dest="critical_path", default=False,
+                  action="store_true",
+                  help="Start targets on the longest path first.")
+
     op.add_option('-D',
                   dest="climb_up", default=None,
                   action="store_const", const=2,
                   help="Search up directory tree for SConstruct,       "
                        "build all Default() targets.")
 
+    op.add_option('--daemon',
+                  dest='daemon', default=False,
+                  action="store_true",
+                  help="Keep the SConscript files loaded and build for later scons runs.")
+
     deprecated_debug_options = {
         "dtree"         : '; please use --tree=derived instead',
         "nomemoizer"    : ' and has no effect',
@@ -599,7 +658,7 @@ def Parser(version):
     debug_options = ["count", "duplicate", "explain", "findlibs",
                      "includes", "memoizer", "memory", "objects",
                      "pdb", "prepare", "presub", "stacktrace",
-                     "time"] + list(deprecated_debug_options.keys())
+                     "time", "tools"] + list(deprecated_debug_options.keys())
 
     def opt_debug(option, opt, value, parser,
                   debug_options=debug_options,
@@ -672,6 +731,26 @@ def Parser(version):
                   action="help",
                   help="Print this message and exit.")
 
+    def opt_hash_format(option, opt, value, parser):
+        value = value.lower()
+        if SCons.Util.find_hash_function(value) is None:
+            raise OptionValueError("`%s' is not an available hash format" % value)
+        setattr(parser.values, option.dest, value)
+
+    op.add_option('--hash-format',
+                  nargs=1, type="string",
+                  dest='hash_format', default=None,
+                  action="callback", callback=opt_hash_format,
+                  help="Use digest NAME for content signatures.",
+                  metavar="NAME")
+
+    op.add_option('--hash-jobs',
+                  nargs=1, type="int",
+                  dest="hash_jobs", default=0,
+                  action="store",
+                  help="Compute source file signatures in N threads before building.",
+                  metavar="N")
+
     op.add_option('-i', '--ignore-errors',
                   dest='ignore_errors', default=False,
                   action="store_true",
@@ -744,6 +823,13 @@ def Parser(version):
                   action="store_true",
                   help="Don't search or use the usual site_scons dir.")
 
+    op.add_option('--process-jobs',
+                  nargs=1, type="int",
+                  dest="process_jobs", default=0,
+                  action="store",
+                  help="Run Python actions that allow it in N processes.",
+                  metavar="N")
+
     op.add_option('--profile',
                   nargs=1,
                   dest="profile_file", default=None,
@@ -771,6 +857,11 @@ def Parser(version):
                   action="store_true",
                   help="Don't print commands.")
 
+    op.add_option('--sconscript-cache',
+                  dest='sconscript_cache', default=False,
+                  action="store_true",
+                  help="Load the state of unchanged SConscript files from a cache.")
+
     op.add_option('--site-dir',
                   nargs=1,
                   dest='site_dir', default=None,
@@ -67,6 +67,11 @@ class SConscriptReturn(Exception):
 
 launch_dir = os.path.abspath(os.curdir)
 
+# The paths of the SConscript files that have been read (or looked for
+# and not found), so a build daemon or the SConscript cache can tell
+# when they have to be read again.
+sconscript_files = []
+
 GlobalDict = None
 
 # global exports set by Export():
@@ -203,6 +208,7 @@ def _SConscript(fs, *files, **kw):
                     if f.exists():
                         _file_ = open(f.get_abspath(), "r")
                 if _file_:
+                    sconscript_files.append(_file_.name)
                     # Chdir to the SConscript directory.  Use a path
                     # name relative to the SConstruct file so that if
                     # we're using the -f option, we're essentially
@@ -264,6 +270,7 @@ def _SConscript(fs, *files, **kw):
                         if old_file is not None:
                             call_stack[-1].globals.update({__file__:old_file})
                 else:
+                    sconscript_files.append(f.get_abspath())
                     SCons.Warnings.warn(SCons.Warnings.MissingSConscriptWarning,
                              "Ignoring missing SConscript '%s'" % f.path)
 
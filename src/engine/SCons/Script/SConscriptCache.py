@@ -0,0 +1,741 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+__doc__ = """
+SConscript evaluation cache
+
+"scons --sconscript-cache" saves what the SConscript files leave behind
+(the Node tree with its builders and construction environments, the
+default targets, the Help() text, the SetOption() settings and so on)
+in a file in the top-level SConstruct directory.  Later runs with the
+option load that file instead of reading the SConscript files again,
+as long as nothing the SConscript files looked at has changed.
+
+While the SConscript files are read, a Recorder notes what they look
+at:  the SConscript files themselves, the files under the site_scons
+directories, the Python modules they import and the other files they
+open, the os.environ variables they fetch, the directories they list,
+the files whose existence they check (which covers WhereIs() and tool
+detection), the command-line options they fetch with GetOption(), and
+the command-line targets and variables.  That record is the key that
+is stored at the front of the cache file; the state is only loaded if
+the key matches the current tree and command line.
+
+The state is saved with pickle.  Bound methods, modules and functions
+that can't be found by name (lambdas, closures and the functions
+defined in SConscript files) are pickled by value while the cache is
+written.  If something else in the state can't be pickled (an open
+file or a class defined in an SConscript file, say), or a Configure
+context ran checks while the SConscript files were read, the cache
+isn't written and the SConscript files are simply read every time.
+"""
+
+import UserDict
+import marshal
+import os
+import pickle
+import sys
+import types
+
+import copy_reg
+import __builtin__
+
+import SCons
+import SCons.Node.FS
+import SCons.SConf
+import SCons.Util
+import SCons.Warnings
+
+# The name of the cache file in the top-level SConstruct directory.
+cache_name = '.sconscript_cache'
+
+# The Recorder that's noting what the SConscript files look at, if
+# any.  Script/Main.py tells it about the options the SConscript
+# files add and fetch.
+recorder = None
+
+# Command-line options that always go into the key, because they
+# affect how the SConscript files are read even when they don't
+# look at them.
+key_options = [
+    'clean',
+    'config',
+    'file',
+    'help',
+    'include_dir',
+    'no_exec',
+    'no_site_dir',
+    'question',
+    'repository',
+    'site_dir',
+]
+
+# The module-level state the SConscript files leave behind, in
+# addition to the file system Nodes.
+module_state = [
+    ('SCons.CacheDir', 'configured_caches'),
+    ('SCons.Defaults', '_default_env'),
+    ('SCons.Environment', 'CleanTargets'),
+    ('SCons.Executor', '_batch_executors'),
+    ('SCons.Node.Alias', 'default_ans'),
+    ('SCons.SConsign', 'DB_Module'),
+    ('SCons.SConsign', 'DB_Name'),
+    ('SCons.SConsign', 'ForDirectory'),
+    ('SCons.Script', 'BUILD_TARGETS'),
+    ('SCons.Script', 'DEFAULT_TARGETS'),
+    ('SCons.Script', '_Get_Default_Targets'),
+    ('SCons.Script', '_build_plus_default'),
+    ('SCons.Script', 'help_text'),
+    ('SCons.Script.Main', 'ProgressObject'),
+    ('SCons.Script.SConscript', 'sconscript_files'),
+    ('SCons.Tool.install', '_INSTALLED_FILES'),
+    ('SCons.Tool.install', '_UNIQUE_INSTALLED_FILES'),
+    ('SCons.Warnings', '_enabled'),
+]
+
+# Node attributes that only hold state cached from the file system,
+# and the function that creates a fresh value for them (or None if
+# the attribute is simply deleted).
+transient_attributes = [
+    ('_memo', dict),
+    ('_sconsign', lambda: None),
+    ('on_disk_entries', None),
+]
+
+# The Python recursion limit while the state is pickled or unpickled.
+recursion_limit = 10000
+
+def option_added(args, kw, option):
+    """Called by AddOption() when an SConscript file adds an option."""
+    if recorder is not None:
+        recorder.local_options.append((args, kw))
+        recorder.local_dests.append(option.dest)
+
+def option_fetched(name, value):
+    """Called by GetOption() when an SConscript file fetches an option."""
+    if recorder is not None:
+        recorder.option_fetched(name, value)
+
+class _Environ(UserDict.IterableUserDict, object):
+    """A stand-in for os.environ that notes which variables the
+    SConscript files look at, and which ones they set.
+    """
+    def __init__(self, recorder, environ):
+        self.recorder = recorder
+        self.data = environ
+    def __getitem__(self, key):
+        self.recorder.environ_keys[key] = 1
+        return self.data[key]
+    def __setitem__(self, key, item):
+        self.recorder.environ_keys[key] = 1
+        self.data[key] = item
+        self.recorder.environ_changes.append((key, item))
+    def __delitem__(self, key):
+        self.recorder.environ_keys[key] = 1
+        del self.data[key]
+        self.recorder.environ_changes.append((key, None))
+    def __contains__(self, key):
+        self.recorder.environ_keys[key] = 1
+        return key in self.data
+    has_key = __contains__
+    def get(self, key, failobj=None):
+        self.recorder.environ_keys[key] = 1
+        return self.data.get(key, failobj)
+    def pop(self, key, *args):
+        if key in self:
+            self.recorder.environ_changes.append((key, None))
+        return self.data.pop(key, *args)
+    def update(self, dict=None, **kw):
+        if dict is not None:
+            for key in dict.keys():
+                self[key] = dict[key]
+        for key, item in kw.items():
+            self[key] = item
+    def clear(self):
+        for key in self.keys():
+            del self[key]
+    def popitem(self):
+        self.recorder.environ_all = 1
+        key, item = self.data.popitem()
+        self.recorder.environ_changes.append((key, None))
+        return key, item
+
+    # Everything else looks at all of the variables.
+    def keys(self):
+        self.recorder.environ_all = 1
+        return self.data.keys()
+    def items(self):
+        self.recorder.environ_all = 1
+        return self.data.items()
+    def values(self):
+        self.recorder.environ_all = 1
+        return self.data.values()
+    def iterkeys(self):
+        return iter(self.keys())
+    __iter__ = iterkeys
+    def iteritems(self):
+        return iter(self.items())
+    def itervalues(self):
+        return iter(self.values())
+    def __len__(self):
+        self.recorder.environ_all = 1
+        return len(self.data)
+    def __cmp__(self, other):
+        self.recorder.environ_all = 1
+        return cmp(self.data, other)
+    def __repr__(self):
+        self.recorder.environ_all = 1
+        return repr(self.data)
+    def copy(self):
+        self.recorder.environ_all = 1
+        return self.data.copy()
+    def __semi_deepcopy__(self):
+        self.recorder.environ_all = 1
+        return SCons.Util.semi_deepcopy(self.data)
+    def __reduce__(self):
+        # Anything that holds on to os.environ itself gets the real
+        # one back when the state is loaded.
+        self.recorder.environ_all = 1
+        return (_environ, ())
+
+def _environ():
+    return os.environ
+
+class Recorder(object):
+    """Notes what the SConscript files look at while they're read."""
+
+    def __init__(self, values, largs):
+        self.values = values
+        self.largs = largs
+        self.initial_environ = {}
+        self.environ_keys = {}
+        self.environ_all = 0
+        self.environ_changes = []
+        self.listdirs = {}
+        self.checks = {}
+        self.opened = {}
+        self.options = {}
+        self.fetched = {}
+        self.local_options = []
+        self.local_dests = []
+        self.modules = {}
+        self.saved = None
+
+    def start(self):
+        global recorder
+        self.initial_environ = dict(os.environ)
+        self.modules = dict(sys.modules)
+        for name in key_options:
+            self.options[name] = getattr(self.values, name)
+        self.saved = (os.environ, os.listdir, __builtin__.open,
+                      os.path.exists, os.path.isdir,
+                      os.path.isfile, os.path.islink)
+        os.environ = _Environ(self, os.environ)
+        os.listdir = self.listdir
+        __builtin__.open = self.open
+        os.path.exists = self.checker('exists')
+        os.path.isdir = self.checker('isdir')
+        os.path.isfile = self.checker('isfile')
+        os.path.islink = self.checker('islink')
+        recorder = self
+
+    def stop(self):
+        global recorder
+        recorder = None
+        (os.environ, os.listdir, __builtin__.open,
+         os.path.exists, os.path.isdir,
+         os.path.isfile, os.path.islink) = self.saved
+
+    def listdir(self, path):
+        try:
+            result = self.saved[1](path)
+        except OSError:
+            self.listdirs[os.path.abspath(path)] = None
+            raise
+        self.listdirs[os.path.abspath(path)] = sorted(result)
+        return result
+
+    def open(self, name, mode='r', *args):
+        if mode[:1] == 'r' and '+' not in mode:
+            self.opened[os.path.abspath(name)] = 1
+        return self.saved[2](name, mode, *args)
+
+    def checker(self, name):
+        func = getattr(os.path, name)
+        def check(path, name=name, func=func, checks=self.checks):
+            result = func(path)
+            checks[(name, os.path.abspath(path))] = result
+            return result
+        return check
+
+    def option_fetched(self, name, value):
+        settings = self.values.__dict__['__SConscript_settings__']
+        if name in settings:
+            # The value came from the SConscript files themselves.
+            return
+        if name not in self.fetched:
+            self.fetched[name] = value
+        if name in self.local_dests:
+            # The command line's local options are compared as a whole.
+            return
+        if name not in self.options:
+            self.options[name] = value
+
+    def new_modules(self):
+        """Returns (name, file name) pairs for the Python modules that
+        were imported while the SConscript files were read."""
+        result = []
+        for name, module in sys.modules.items():
+            if module is None or name in self.modules:
+                continue
+            try:
+                path = module.__file__
+            except AttributeError:
+                continue
+            result.append((name, _source_file(path)))
+        return result
+
+def _source_file(path):
+    base, ext = os.path.splitext(path)
+    if ext in ('.pyc', '.pyo') and os.path.exists(base + '.py'):
+        return base + '.py'
+    return path
+
+def _module_root(name, path):
+    """Returns the sys.path entry a module was imported from."""
+    result = os.path.dirname(os.path.abspath(path))
+    if os.path.splitext(os.path.basename(path))[0] == '__init__':
+        result = os.path.dirname(result)
+    for i in range(name.count('.')):
+        result = os.path.dirname(result)
+    return result
+
+def site_files(site_dirs):
+    result = []
+    for site_dir in site_dirs:
+        for dirpath, dirnames, filenames in os.walk(site_dir):
+            for name in filenames:
+                if os.path.splitext(name)[1] not in ('.pyc', '.pyo'):
+                    result.append(os.path.join(dirpath, name))
+    return result
+
+def engine_files():
+    """Returns the source files of the SCons modules that are loaded."""
+    result = []
+    for name, module in list(sys.modules.items()):
+        if module is None or (name != 'SCons' and name[:6] != 'SCons.'):
+            continue
+        try:
+            path = module.__file__
+        except AttributeError:
+            continue
+        result.append(_source_file(path))
+    return result
+
+def _signature(path):
+    try:
+        return SCons.Util.MD5filesignature(path)
+    except EnvironmentError:
+        return None
+
+def _listing(path):
+    try:
+        return sorted(os.listdir(path))
+    except OSError:
+        return None
+
+# Pickling helpers.  These are only registered with copy_reg while
+# the state is being written, so they don't change how anything else
+# in SCons pickles its data.
+
+def _reduce_method(method):
+    obj = method.im_self
+    if obj is None:
+        obj = method.im_class
+    name = method.im_func.__name__
+    try:
+        if getattr(obj, name) == method:
+            return (getattr, (obj, name))
+    except AttributeError:
+        pass
+    return (_make_method, (method.im_func, method.im_self, method.im_class))
+
+def _make_method(func, obj, cls):
+    return types.MethodType(func, obj, cls)
+
+def _reduce_module(module):
+    return (_import_module, (module.__name__,))
+
+def _import_module(name):
+    __import__(name)
+    return sys.modules[name]
+
+def _reduce_function(func):
+    # Only called for functions that can't be pickled by name.
+    module = sys.modules.get(func.__module__)
+    if module is not None and func.func_globals is module.__dict__:
+        globals = func.__module__
+    else:
+        # Defined in an SConscript file:  the SConscript file's
+        # global variables get pickled along with it.  Their
+        # __builtins__ is the dictionary of the __builtin__ module,
+        # which can't be pickled by name; the module itself will do
+        # until dumps() puts the dictionary back.
+        globals = func.func_globals
+        if globals.get('__builtins__') is __builtin__.__dict__:
+            globals['__builtins__'] = __builtin__
+            _builtins_replaced.append(globals)
+    closure = None
+    if func.func_closure:
+        closure = []
+        for cell in func.func_closure:
+            try:
+                closure.append(cell.cell_contents)
+            except ValueError:
+                msg = "Can't pickle function %s: empty closure cell" % func.__name__
+                raise pickle.PicklingError(msg)
+        closure = tuple(closure)
+    return (_make_function, (marshal.dumps(func.func_code), globals,
+                             func.__name__, func.func_defaults,
+                             closure, func.func_dict or None))
+
+# The SConscript global variables whose __builtins__ was replaced
+# while the state is being pickled.
+_builtins_replaced = []
+
+def _make_cell(value):
+    return (lambda: value).func_closure[0]
+
+def _make_function(code, globals, name, defaults, closure, dict):
+    if SCons.Util.is_String(globals):
+        globals = _import_module(globals).__dict__
+    if closure is not None:
+        closure = tuple(map(_make_cell, closure))
+    func = types.FunctionType(marshal.loads(code), globals, name,
+                              defaults, closure)
+    if dict:
+        func.__dict__.update(dict)
+    return func
+
+def _reduce_file(f):
+    for name in ('stdout', 'stderr', '__stdout__', '__stderr__'):
+        if f is getattr(sys, name):
+            return (getattr, (sys, name))
+    raise pickle.PicklingError("Can't pickle open file %s" % repr(f.name))
+
+reducers = [
+    (types.FileType, _reduce_file),
+    (types.FunctionType, _reduce_function),
+    (types.MethodType, _reduce_method),
+    (types.ModuleType, _reduce_module),
+]
+
+def dumps(obj):
+    """Pickles obj, with the helpers above to pickle the functions
+    and methods the state is full of."""
+    saved = {}
+    for t, reducer in reducers:
+        saved[t] = copy_reg.dispatch_table.get(t)
+        copy_reg.pickle(t, reducer)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, recursion_limit))
+    try:
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    finally:
+        sys.setrecursionlimit(limit)
+        for globals in _builtins_replaced:
+            globals['__builtins__'] = __builtin__.__dict__
+        del _builtins_replaced[:]
+        for t, reducer in saved.items():
+            if reducer is None:
+                del copy_reg.dispatch_table[t]
+            else:
+                copy_reg.dispatch_table[t] = reducer
+
+def _nodes(fs):
+    result = {}
+    for root in fs.Root.values():
+        for node in root._lookupDict.values():
+            result[id(node)] = node
+    import SCons.Node.Alias
+    for node in SCons.Node.Alias.default_ans.values():
+        result[id(node)] = node
+    return list(result.values())
+
+def _strip(nodes):
+    """Temporarily removes the transient attributes from the Nodes,
+    and returns what's needed to put them back."""
+    stripped = []
+    for node in nodes:
+        for attr, fresh in transient_attributes:
+            try:
+                value = getattr(node, attr)
+            except AttributeError:
+                continue
+            stripped.append((node, attr, value))
+            if fresh is None:
+                delattr(node, attr)
+            else:
+                setattr(node, attr, fresh())
+    return stripped
+
+def _unstrip(stripped):
+    for node, attr, value in stripped:
+        setattr(node, attr, value)
+
+def _restore(module, name, value):
+    """Sets a module variable, updating lists and dictionaries in
+    place so that anything else holding on to them sees the change."""
+    current = getattr(module, name, None)
+    if type(current) is type(value):
+        if isinstance(current, list):
+            current[:] = value
+            return
+        if isinstance(current, (dict, UserDict.UserDict)):
+            current.clear()
+            current.update(value)
+            return
+    setattr(module, name, value)
+
+class SConscriptCache(object):
+    """The cache of the state left behind by the SConscript files
+    of one tree."""
+
+    def __init__(self, top, parser, site_dirs=[]):
+        self.top = top
+        self.path = os.path.join(top, cache_name)
+        self.parser = parser
+        self.values = parser.values
+        self.site_dirs = site_dirs
+        self.recorder = None
+
+    def command_line(self):
+        import SCons.Script
+        return (list(SCons.Script.ARGLIST),
+                list(SCons.Script.COMMAND_LINE_TARGETS))
+
+    def key(self, fs):
+        """Returns the key for the SConscript files that were just
+        read, while the state is being saved."""
+        import SCons.Script
+        r = self.recorder
+        files = {}
+        for path in SCons.Script._SConscript.sconscript_files:
+            files[path] = None
+        for path in site_files(self.site_dirs):
+            files[path] = None
+        for path in r.opened.keys():
+            files[path] = None
+        roots = {}
+        for name, path in r.new_modules():
+            files[path] = None
+            roots[_module_root(name, path)] = None
+        # The engine itself:  SCons.__version__ doesn't change with
+        # local changes to it, and the state holds its objects.
+        for path in engine_files():
+            files[path] = None
+        for path in files.keys():
+            files[path] = _signature(path)
+        if r.environ_all:
+            environ = r.initial_environ.copy()
+        else:
+            environ = {}
+            for name in r.environ_keys.keys():
+                environ[name] = r.initial_environ.get(name)
+        largs = None
+        if r.local_options:
+            largs = r.largs
+        return {
+            'version' : (SCons.__version__, sys.version),
+            'top' : self.top,
+            'command_line' : self.command_line(),
+            'largs' : largs,
+            'options' : r.options,
+            'files' : files,
+            'environ' : (r.environ_all, environ),
+            'listdirs' : r.listdirs,
+            'checks' : r.checks,
+            'roots' : list(roots.keys()),
+        }
+
+    def current(self, key):
+        """Returns whether a key read from the cache file matches the
+        current tree and command line."""
+        if key['version'] != (SCons.__version__, sys.version):
+            return False
+        if key['top'] != self.top:
+            return False
+        if key['command_line'] != self.command_line():
+            return False
+        if key['largs'] is not None and key['largs'] != self.parser.largs:
+            return False
+        for name, value in key['options'].items():
+            try:
+                if getattr(self.values, name) != value:
+                    return False
+            except AttributeError:
+                return False
+        environ_all, environ = key['environ']
+        if environ_all:
+            if environ != dict(os.environ):
+                return False
+        else:
+            for name, value in environ.items():
+                if os.environ.get(name) != value:
+                    return False
+        for (name, path), result in key['checks'].items():
+            if getattr(os.path, name)(path) != result:
+                return False
+        for path, listing in key['listdirs'].items():
+            if _listing(path) != listing:
+                return False
+        for path, signature in key['files'].items():
+            if _signature(path) != signature:
+                return False
+        return True
+
+    def record(self):
+        """Starts noting what the SConscript files look at."""
+        self.recorder = Recorder(self.values, self.parser.largs[:])
+        self.recorder.start()
+
+    def stop(self):
+        self.recorder.stop()
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def save(self, fs):
+        """Saves the state the SConscript files left behind.  Returns
+        false and removes any old cache file if it can't be saved."""
+        if SCons.SConf._ac_build_counter or SCons.SConf._ac_config_logs:
+            self.remove()
+            msg = "Not caching the SConscript state:  Configure contexts must run their checks on every build."
+            SCons.Warnings.warn(SCons.Warnings.SConscriptCacheWarning, msg)
+            return False
+
+        state = []
+        for module_name, name in module_state:
+            try:
+                module = sys.modules[module_name]
+            except KeyError:
+                continue
+            state.append((module_name, name, getattr(module, name)))
+        body = {
+            'fs' : fs,
+            'state' : state,
+            'settings' : self.values.__dict__['__SConscript_settings__'],
+            'local_options' : self.recorder.local_options,
+            'environ_changes' : self.recorder.environ_changes,
+        }
+
+        stripped = _strip(_nodes(fs))
+        try:
+            try:
+                body = dumps(body)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except Exception, e:
+                self.remove()
+                msg = "Not caching the SConscript state:  %s" % e
+                SCons.Warnings.warn(SCons.Warnings.SConscriptCacheWarning, msg)
+                return False
+        finally:
+            _unstrip(stripped)
+
+        # The key goes first, so loading can stop there if it doesn't
+        # match.  It's computed after pickling the state, because
+        # pickling os.environ means the whole environment is the key.
+        key = pickle.dumps(self.key(fs), pickle.HIGHEST_PROTOCOL)
+        tmp = self.path + '.tmp'
+        try:
+            f = open(tmp, 'wb')
+            try:
+                f.write(key)
+                f.write(body)
+            finally:
+                f.close()
+            if sys.platform == 'win32':
+                self.remove()
+            os.rename(tmp, self.path)
+        except EnvironmentError, e:
+            msg = "Could not write the SConscript cache %s:  %s" % (self.path, e)
+            SCons.Warnings.warn(SCons.Warnings.SConscriptCacheWarning, msg)
+            return False
+        return True
+
+    def load(self):
+        """Loads the saved state if it's current.  Returns the file
+        system object (the root of the Node tree) that was loaded, or
+        None if the SConscript files have to be read."""
+        try:
+            f = open(self.path, 'rb')
+        except EnvironmentError:
+            return None
+        limit = sys.getrecursionlimit()
+        path = sys.path
+        try:
+            try:
+                key = pickle.load(f)
+                if not self.current(key):
+                    return None
+                sys.setrecursionlimit(max(limit, recursion_limit))
+                # Modules the SConscript files imported from their
+                # own directories have to be found again.
+                sys.path = key['roots'] + sys.path
+                body = pickle.load(f)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except Exception:
+                # A corrupt or out-of-date cache file:  read the
+                # SConscript files and write a new one.
+                return None
+        finally:
+            sys.path = path
+            sys.setrecursionlimit(limit)
+            f.close()
+
+        for name, value in body['environ_changes']:
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        for name, value in body['settings'].items():
+            self.values.set_option(name, value)
+        for args, kw in body['local_options']:
+            self.parser.add_local_option(*args, **kw)
+        for module_name, name, value in body['state']:
+            _restore(_import_module(module_name), name, value)
+        fs = body['fs']
+        SCons.Node.FS.default_fs = fs
+        return fs
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
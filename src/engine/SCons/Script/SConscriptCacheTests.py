@@ -0,0 +1,243 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import SCons.compat
+
+import os
+import pickle
+import sys
+import unittest
+
+import TestCmd
+
+import SCons.Script.SConscriptCache
+from SCons.Script.SConscriptCache import dumps
+
+def make_adder(n):
+    def add(x):
+        return x + n
+    return add
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+    def increment(self):
+        self.count = self.count + 1
+        return self.count
+
+class FakeValues(object):
+    def __init__(self):
+        self.__dict__['__SConscript_settings__'] = {}
+    def __getattr__(self, name):
+        return None
+
+class PickleTestCase(unittest.TestCase):
+
+    def test_lambda(self):
+        """Test pickling a lambda by value"""
+        f = pickle.loads(dumps(lambda x: x * 2))
+        assert f(3) == 6, f(3)
+
+    def test_closure(self):
+        """Test pickling a closure by value"""
+        f = pickle.loads(dumps(make_adder(5)))
+        assert f(1) == 6, f(1)
+
+    def test_method(self):
+        """Test pickling bound methods"""
+        c = Counter()
+        c.increment()
+        c2, m = pickle.loads(dumps((c, c.increment)))
+        assert m() == 2, c2.count
+        assert c2.count == 2, c2.count
+
+    def test_module(self):
+        """Test pickling modules by name"""
+        m = pickle.loads(dumps(os))
+        assert m is os, m
+
+    def test_sconscript_function(self):
+        """Test pickling a function defined in an SConscript file"""
+        g = {'__builtins__' : __builtins__, '__name__' : 'SCons.Script'}
+        if type(g['__builtins__']) != type({}):
+            g['__builtins__'] = g['__builtins__'].__dict__
+        exec "y = 10\ndef f(x):\n    return len([x]) + y\n" in g
+        f = pickle.loads(dumps(g['f']))
+        assert f(0) == 11, f(0)
+        assert f.func_globals['y'] == 10, f.func_globals['y']
+        # The SConscript's __builtins__ is put back.
+        assert type(g['__builtins__']) == type({}), g['__builtins__']
+
+    def test_open_file(self):
+        """Test that open files can't be pickled"""
+        f = open(__file__)
+        try:
+            try:
+                dumps(f)
+            except pickle.PicklingError:
+                pass
+            else:
+                raise Exception("did not catch expected PicklingError")
+        finally:
+            f.close()
+
+    def test_reducers_removed(self):
+        """Test that the pickling helpers are only used while dumping"""
+        import copy_reg
+        import types
+        dumps(None)
+        assert types.MethodType not in copy_reg.dispatch_table
+
+class RecorderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.test = TestCmd.TestCmd(workdir='')
+        self.recorder = SCons.Script.SConscriptCache.Recorder(FakeValues(), [])
+
+    def tearDown(self):
+        if SCons.Script.SConscriptCache.recorder is not None:
+            self.recorder.stop()
+
+    def test_environ(self):
+        """Test recording the os.environ variables fetched and set"""
+        environ = os.environ
+        r = self.recorder
+        r.start()
+        try:
+            os.environ.get('SCONSCRIPT_CACHE_TEST_X')
+            'SCONSCRIPT_CACHE_TEST_Y' in os.environ
+            os.environ['SCONSCRIPT_CACHE_TEST_Z'] = 'z'
+            assert not r.environ_all
+            os.environ.keys()
+            assert r.environ_all
+        finally:
+            r.stop()
+        assert os.environ is environ
+        assert os.environ['SCONSCRIPT_CACHE_TEST_Z'] == 'z'
+        del os.environ['SCONSCRIPT_CACHE_TEST_Z']
+        keys = sorted(r.environ_keys.keys())
+        assert keys == ['SCONSCRIPT_CACHE_TEST_X',
+                        'SCONSCRIPT_CACHE_TEST_Y',
+                        'SCONSCRIPT_CACHE_TEST_Z'], keys
+        assert r.environ_changes == [('SCONSCRIPT_CACHE_TEST_Z', 'z')], r.environ_changes
+
+    def test_environ_pickle(self):
+        """Test that pickling os.environ gets os.environ back"""
+        r = self.recorder
+        r.start()
+        try:
+            s = dumps(os.environ)
+        finally:
+            r.stop()
+        assert pickle.loads(s) is os.environ
+        assert r.environ_all
+
+    def test_files(self):
+        """Test recording directory listings and existence checks"""
+        self.test.subdir('d')
+        self.test.write(['d', 'f'], "f\n")
+        d = self.test.workpath('d')
+        f = self.test.workpath('d', 'f')
+        r = self.recorder
+        r.start()
+        try:
+            os.listdir(d)
+            os.path.isfile(f)
+            os.path.exists(self.test.workpath('nonexistent'))
+            open(f).close()
+        finally:
+            r.stop()
+        assert r.listdirs == {d : ['f']}, r.listdirs
+        expect = {
+            ('isfile', f) : True,
+            ('exists', self.test.workpath('nonexistent')) : False,
+        }
+        assert r.checks == expect, r.checks
+        assert list(r.opened.keys()) == [f], r.opened
+
+    def test_options(self):
+        """Test recording the options fetched by GetOption()"""
+        r = self.recorder
+        r.values.__dict__['__SConscript_settings__']['num_jobs'] = 4
+        r.start()
+        try:
+            SCons.Script.SConscriptCache.option_fetched('num_jobs', 4)
+            SCons.Script.SConscriptCache.option_fetched('silent', 0)
+        finally:
+            r.stop()
+        SCons.Script.SConscriptCache.option_fetched('random', 0)
+        assert r.options['silent'] == 0, r.options
+        assert 'num_jobs' not in r.options, r.options
+        assert 'random' not in r.options, r.options
+        assert r.fetched == {'silent' : 0}, r.fetched
+
+class restoreTestCase(unittest.TestCase):
+
+    def test_restore(self):
+        """Test restoring module variables in place"""
+        class M(object):
+            pass
+        m = M()
+        l = m.l = [1, 2]
+        d = m.d = {'a' : 1}
+        m.x = None
+        SCons.Script.SConscriptCache._restore(m, 'l', [3])
+        SCons.Script.SConscriptCache._restore(m, 'd', {'b' : 2})
+        SCons.Script.SConscriptCache._restore(m, 'x', 'x')
+        assert m.l is l and l == [3], m.l
+        assert m.d is d and d == {'b' : 2}, m.d
+        assert m.x == 'x', m.x
+
+class engine_filesTestCase(unittest.TestCase):
+
+    def test_engine_files(self):
+        """Test listing the source files of the loaded SCons modules"""
+        files = SCons.Script.SConscriptCache.engine_files()
+        expect = SCons.Script.SConscriptCache._source_file(
+                     SCons.Script.SConscriptCache.__file__)
+        assert expect in files, files
+        assert os.path.abspath(TestCmd.__file__) not in files, files
+        for f in files:
+            assert os.path.splitext(f)[1] != '.pyc' or \
+                   not os.path.exists(f[:-1]), f
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite()
+    tclasses = [ PickleTestCase,
+                 RecorderTestCase,
+                 restoreTestCase,
+                 engine_filesTestCase,
+               ]
+    for tclass in tclasses:
+        names = unittest.getTestCaseNames(tclass, 'test_')
+        suite.addTests(list(map(tclass, names)))
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -109,6 +109,7 @@ QuestionTask            = Main.QuestionTask
 AddOption               = Main.AddOption
 GetOption               = Main.GetOption
 SetOption               = Main.SetOption
+SetHashFormat           = Main.SetHashFormat
 Progress                = Main.Progress
 GetBuildFailures        = Main.GetBuildFailures
 
@@ -32,6 +32,7 @@ import collections
 import re
 
 import SCons.Errors
+import SCons.Util
 
 from SCons.Util import is_String, is_Sequence
 
@@ -383,6 +384,105 @@ _separate_args = re.compile(r'(%s|\s+|[^\s\$]+|\$)' % _dollar_exps_str)
 # space characters in the string result from the scons_subst() function.
 _space_sep = re.compile(r'[\t ]+(?![^{]*})')
 
+# The kinds of tokens a Template splits a string into.
+_LITERAL = 0            # text that's used as is
+_SPACE = 1              # white space between arguments
+_NEWLINE = 2            # white space that starts a new command line
+_DOLLAR = 3             # "$$"
+_OPEN_STRIP = 4         # "$("
+_CLOSE_STRIP = 5        # "$)"
+_VARIABLE = 6           # "$variable"
+_EXPRESSION = 7         # "${any stuff}" or "$variable.attribute"
+
+def _token(s):
+    """Return a token for a single string from a _separate_args split:
+    a tuple of its kind, the string itself, and, for variables and
+    expressions, the expression, the name of the variable that gets
+    blanked out while its value is expanded, and the expression
+    compiled to be passed to eval()."""
+    if s[0] in ' \t\n\r\f\v':
+        if '\n' in s:
+            return (_NEWLINE, s)
+        return (_SPACE, s)
+    try:
+        s0, s1 = s[:2]
+    except (IndexError, ValueError):
+        return (_LITERAL, s)
+    if s0 != '$':
+        return (_LITERAL, s)
+    if s1 == '$':
+        return (_DOLLAR, s)
+    if s1 == '(':
+        return (_OPEN_STRIP, s)
+    if s1 == ')':
+        return (_CLOSE_STRIP, s)
+    key = s[1:]
+    var = key.split('.')[0]
+    if key[0] == '{' or key.find('.') >= 0:
+        if key[0] == '{':
+            key = key[1:-1]
+            var = key.split('.')[0]
+        try:
+            # eval() ignores leading blanks; compile() doesn't.
+            code = compile(key.lstrip(' \t'), '<string>', 'eval')
+        except SyntaxError:
+            # Let eval() raise the error when the token is expanded.
+            code = key
+        return (_EXPRESSION, s, key, var, code)
+    return (_VARIABLE, s, key, var)
+
+class Template(object):
+    """A string to be substituted, split into tokens once.
+
+    Expanding the same construction variables over and over (the
+    $CCCOM of every object file, say) then only costs looking up
+    the values, not splitting the strings up again with the regular
+    expressions and compiling the ${} expressions for eval().  The
+    Templates for the most recently used strings are kept in the
+    _templates cache; use get_template() to fetch them.
+    """
+    def __init__(self, string):
+        self.string = string
+        self._words = None
+        self._parts = None
+
+    def words(self):
+        """Return the tokens of the string, white space included, as
+        split for scons_subst_list()."""
+        if self._words is None:
+            self._words = list(map(_token, _separate_args.findall(self.string)))
+        return self._words
+
+    def parts(self):
+        """Return the literal text before the first $-token and a
+        list of pairs of the $-tokens and the literal text following
+        them, as split for scons_subst()."""
+        if self._parts is None:
+            l = _dollar_exps.split(self.string)
+            pairs = []
+            for i in range(1, len(l), 2):
+                pairs.append((_token(l[i]), l[i+1]))
+            self._parts = (l[0], pairs)
+        return self._parts
+
+# The number of Templates kept in the cache.
+template_cache_size = 2048
+
+_templates = SCons.Util.LRUCache(template_cache_size)
+
+def get_template(string):
+    """Return the Template for string, from the cache if it's there."""
+    t = _templates.get(string)
+    if t is None:
+        t = _templates[string] = Template(string)
+    return t
+
+def set_template_cache_size(size):
+    """Change the number of Templates kept in the cache, emptying it."""
+    global template_cache_size, _templates
+    template_cache_size = size
+    _templates = SCons.Util.LRUCache(size)
+
 def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={}, lvars={}, conv=None):
     """Expand a string or list containing construction variable
     substitutions.
@@ -419,55 +519,9 @@ def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={
             re-evaluated separately, not smushed together.
             """
             if is_String(s):
-                try:
-                    s0, s1 = s[:2]
-                except (IndexError, ValueError):
-                    return s
-                if s0 != '$':
-                    return s
-                if s1 == '$':
-                    return '$'
-                elif s1 in '()':
+                if not s:
                     return s
-                else:
-                    key = s[1:]
-                    if key[0] == '{' or key.find('.') >= 0:
-                        if key[0] == '{':
-                            key = key[1:-1]
-                        try:
-                            s = eval(key, self.gvars, lvars)
-                        except KeyboardInterrupt:
-                            raise
-                        except Exception, e:
-                            if e.__class__ in AllowableExceptions:
-                                return ''
-                            raise_exception(e, lvars['TARGETS'], s)
-                    else:
-                        if key in lvars:
-                            s = lvars[key]
-                        elif key in self.gvars:
-                            s = self.gvars[key]
-                        elif not NameError in AllowableExceptions:
-                            raise_exception(NameError(key), lvars['TARGETS'], s)
-                        else:
-                            return ''
-    
-                    # Before re-expanding the result, handle
-                    # recursive expansion by copying the local
-                    # variable dictionary and overwriting a null
-                    # string for the value of the variable name
-                    # we just expanded.
-                    #
-                    # This could potentially be optimized by only
-                    # copying lvars when s contains more expansions,
-                    # but lvars is usually supposed to be pretty
-                    # small, and deeply nested variable expansions
-                    # are probably more the exception than the norm,
-                    # so it should be tolerable for now.
-                    lv = lvars.copy()
-                    var = key.split('.')[0]
-                    lv[var] = ''
-                    return self.substitute(s, lv)
+                return self.expand_token(_token(s), lvars)
             elif is_Sequence(s):
                 def func(l, conv=self.conv, substitute=self.substitute, lvars=lvars):
                     return conv(substitute(l, lvars))
@@ -491,6 +545,52 @@ def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={
             else:
                 return s
 
+        def expand_token(self, token, lvars):
+            """Expand a token from a Template, returning an appropriate
+            string containing the expansion."""
+            kind = token[0]
+            if kind < _DOLLAR:
+                return token[1]
+            if kind == _DOLLAR:
+                return '$'
+            if kind < _VARIABLE:
+                return token[1]
+            key = token[2]
+            if kind == _EXPRESSION:
+                try:
+                    s = eval(token[4], self.gvars, lvars)
+                except KeyboardInterrupt:
+                    raise
+                except Exception, e:
+                    if e.__class__ in AllowableExceptions:
+                        return ''
+                    raise_exception(e, lvars['TARGETS'], token[1])
+            else:
+                if key in lvars:
+                    s = lvars[key]
+                elif key in self.gvars:
+                    s = self.gvars[key]
+                elif not NameError in AllowableExceptions:
+                    raise_exception(NameError(key), lvars['TARGETS'], token[1])
+                else:
+                    return ''
+
+            # Before re-expanding the result, handle
+            # recursive expansion by copying the local
+            # variable dictionary and overwriting a null
+            # string for the value of the variable name
+            # we just expanded.
+            #
+            # This could potentially be optimized by only
+            # copying lvars when s contains more expansions,
+            # but lvars is usually supposed to be pretty
+            # small, and deeply nested variable expansions
+            # are probably more the exception than the norm,
+            # so it should be tolerable for now.
+            lv = lvars.copy()
+            lv[token[3]] = ''
+            return self.substitute(s, lv)
+
         def substitute(self, args, lvars):
             """Substitute expansions in an argument or list of arguments.
 
@@ -499,20 +599,26 @@ def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={
             """
             if is_String(args) and not isinstance(args, CmdStringHolder):
                 args = str(args)        # In case it's a UserString.
+                first, pairs = get_template(args).parts()
+                if not pairs:
+                    return args
+                conv = self.conv
+                expand_token = self.expand_token
+                result = [first]
+                for token, text in pairs:
+                    result.append(conv(expand_token(token, lvars)))
+                    result.append(text)
                 try:
-                    def sub_match(match):
-                        return self.conv(self.expand(match.group(1), lvars))
-                    result = _dollar_exps.sub(sub_match, args)
+                    result = ''.join(result)
                 except TypeError:
                     # If the internal conversion routine doesn't return
                     # strings (it could be overridden to return Nodes, for
-                    # example), then the 1.5.2 re module will throw this
-                    # exception.  Back off to a slower, general-purpose
-                    # algorithm that works for all data types.
-                    args = _separate_args.findall(args)
+                    # example), then they can't be joined.  Back off to a
+                    # slower, general-purpose algorithm that works for all
+                    # data types.
                     result = []
-                    for a in args:
-                        result.append(self.conv(self.expand(a, lvars)))
+                    for token in get_template(args).words():
+                        result.append(conv(expand_token(token, lvars)))
                     if len(result) == 1:
                         result = result[0]
                     else:
@@ -630,53 +736,15 @@ def scons_subst_list(strSubst, env, mode=SUBST_RAW, target=None, source=None, gv
             """
 
             if is_String(s):
-                try:
-                    s0, s1 = s[:2]
-                except (IndexError, ValueError):
+                if not s:
                     self.append(s)
                     return
-                if s0 != '$':
+                token = _token(s)
+                if token[0] < _DOLLAR:
+                    # White space is only split off by substitute().
                     self.append(s)
-                    return
-                if s1 == '$':
-                    self.append('$')
-                elif s1 == '(':
-                    self.open_strip('$(')
-                elif s1 == ')':
-                    self.close_strip('$)')
                 else:
-                    key = s[1:]
-                    if key[0] == '{' or key.find('.') >= 0:
-                        if key[0] == '{':
-                            key = key[1:-1]
-                        try:
-                            s = eval(key, self.gvars, lvars)
-                        except KeyboardInterrupt:
-                            raise
-                        except Exception, e:
-                            if e.__class__ in AllowableExceptions:
-                                return
-                            raise_exception(e, lvars['TARGETS'], s)
-                    else:
-                        if key in lvars:
-                            s = lvars[key]
-                        elif key in self.gvars:
-                            s = self.gvars[key]
-                        elif not NameError in AllowableExceptions:
-                            raise_exception(NameError(), lvars['TARGETS'], s)
-                        else:
-                            return
-
-                    # Before re-expanding the result, handle
-                    # recursive expansion by copying the local
-                    # variable dictionary and overwriting a null
-                    # string for the value of the variable name
-                    # we just expanded.
-                    lv = lvars.copy()
-                    var = key.split('.')[0]
-                    lv[var] = ''
-                    self.substitute(s, lv, 0)
-                    self.this_word()
+                    self.expand_token(token, lvars, within_list)
             elif is_Sequence(s):
                 for a in s:
                     self.substitute(a, lvars, 1)
@@ -701,6 +769,52 @@ def scons_subst_list(strSubst, env, mode=SUBST_RAW, target=None, source=None, gv
             else:
                 self.append(s)
 
+        def expand_token(self, token, lvars, within_list):
+            """Expand a $-token from a Template, appending the
+            expansion to the current result."""
+            kind = token[0]
+            if kind == _LITERAL:
+                self.append(token[1])
+                return
+            if kind == _DOLLAR:
+                self.append('$')
+                return
+            if kind == _OPEN_STRIP:
+                self.open_strip('$(')
+                return
+            if kind == _CLOSE_STRIP:
+                self.close_strip('$)')
+                return
+            key = token[2]
+            if kind == _EXPRESSION:
+                try:
+                    s = eval(token[4], self.gvars, lvars)
+                except KeyboardInterrupt:
+                    raise
+                except Exception, e:
+                    if e.__class__ in AllowableExceptions:
+                        return
+                    raise_exception(e, lvars['TARGETS'], token[1])
+            else:
+                if key in lvars:
+                    s = lvars[key]
+                elif key in self.gvars:
+                    s = self.gvars[key]
+                elif not NameError in AllowableExceptions:
+                    raise_exception(NameError(), lvars['TARGETS'], token[1])
+                else:
+                    return
+
+            # Before re-expanding the result, handle
+            # recursive expansion by copying the local
+            # variable dictionary and overwriting a null
+            # string for the value of the variable name
+            # we just expanded.
+            lv = lvars.copy()
+            lv[token[3]] = ''
+            self.substitute(s, lv, 0)
+            self.this_word()
+
         def substitute(self, args, lvars, within_list):
             """Substitute expansions in an argument or list of arguments.
 
@@ -710,17 +824,17 @@ def scons_subst_list(strSubst, env, mode=SUBST_RAW, target=None, source=None, gv
 
             if is_String(args) and not isinstance(args, CmdStringHolder):
                 args = str(args)        # In case it's a UserString.
-                args = _separate_args.findall(args)
-                for a in args:
-                    if a[0] in ' \t\n\r\f\v':
-                        if '\n' in a:
-                            self.next_line()
-                        elif within_list:
-                            self.append(a)
+                for token in get_template(args).words():
+                    kind = token[0]
+                    if kind == _SPACE:
+                        if within_list:
+                            self.append(token[1])
                         else:
                             self.next_word()
+                    elif kind == _NEWLINE:
+                        self.next_line()
                     else:
-                        self.expand(a, lvars, within_list)
+                        self.expand_token(token, lvars, within_list)
             else:
                 self.expand(args, lvars, within_list)
 
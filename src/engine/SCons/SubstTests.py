@@ -1162,6 +1162,70 @@ class SpecialAttrWrapperTestCase(unittest.TestCase):
         cmd_list = escape_list(cmd_list[0], escape_func)
         assert cmd_list == ['BAZ', '**BLEH**'], cmd_list
 
+class Template_TestCase(unittest.TestCase):
+
+    def tearDown(self):
+        set_template_cache_size(2048)
+
+    def test_words(self):
+        """Test splitting a Template into words"""
+        import SCons.Subst
+        t = Template('$CC -o ${TARGET.name} $$x $( $_INC $)\nls')
+        words = t.words()
+        kinds = [w[0] for w in words]
+        expect = [SCons.Subst._VARIABLE, SCons.Subst._SPACE,
+                  SCons.Subst._LITERAL, SCons.Subst._SPACE,
+                  SCons.Subst._EXPRESSION, SCons.Subst._SPACE,
+                  SCons.Subst._DOLLAR, SCons.Subst._LITERAL,
+                  SCons.Subst._SPACE, SCons.Subst._OPEN_STRIP,
+                  SCons.Subst._SPACE, SCons.Subst._VARIABLE,
+                  SCons.Subst._SPACE, SCons.Subst._CLOSE_STRIP,
+                  SCons.Subst._NEWLINE, SCons.Subst._LITERAL]
+        assert kinds == expect, kinds
+        assert words[0][2:] == ('CC', 'CC'), words[0]
+        assert words[4][2:4] == ('TARGET.name', 'TARGET'), words[4]
+        target = DummyNode('t')
+        assert eval(words[4][4], {}, {'TARGET' : target}) == target.name
+        assert t.words() is words
+
+    def test_parts(self):
+        """Test splitting a Template into literal text and $-tokens"""
+        t = Template('-I$DIR/${NAME}.h x')
+        first, pairs = t.parts()
+        assert first == '-I', first
+        assert [(p[0][1], p[1]) for p in pairs] == [('$DIR', '/'),
+                                                    ('${NAME}', '.h x')], pairs
+        assert Template('no expansions').parts() == ('no expansions', [])
+
+    def test_syntax_error(self):
+        """Test that bad expressions still fail when they're expanded"""
+        t = Template('${a b}')
+        assert t.words()[0][4] == 'a b', t.words()
+        env = DummyEnv({})
+        try:
+            scons_subst('${a b}', env, gvars=env.Dictionary())
+        except SCons.Errors.UserError, e:
+            assert str(e).startswith("SyntaxError `"), e
+            assert str(e).endswith("' trying to evaluate `${a b}'"), e
+        else:
+            raise AssertionError("did not catch expected UserError")
+
+    def test_get_template(self):
+        """Test caching Templates"""
+        set_template_cache_size(2)
+        t1 = get_template('$a')
+        assert get_template('$a') is t1
+        get_template('$b')
+        get_template('$c')
+        assert get_template('$a') is not t1
+        env = DummyEnv({'a' : '$b', 'b' : 'x'})
+        gvars = env.Dictionary()
+        for i in range(3):
+            r = scons_subst('$a $a', env, gvars=gvars)
+            assert r == 'x x', r
+            r = scons_subst_list('$a $a', env, gvars=gvars)
+            assert r == [['x', 'x']], r
+
 class subst_dict_TestCase(unittest.TestCase):
     def test_subst_dict(self):
         """Test substituting dictionary values in an Action
@@ -1221,6 +1285,7 @@ if __name__ == "__main__":
         scons_subst_TestCase,
         scons_subst_list_TestCase,
         scons_subst_once_TestCase,
+        Template_TestCase,
         subst_dict_TestCase,
     ]
     for tclass in tclasses:
@@ -49,9 +49,11 @@ interface and the SCons build engine.  There are two key classes here:
 
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
+import heapq
 from itertools import chain
 import operator
 import sys
+import time
 import traceback
 
 import SCons.Errors
@@ -240,7 +242,13 @@ class Task(object):
                     everything_was_cached = 0
                     break
             if not everything_was_cached:
+                start_time = time.time()
                 self.targets[0].build()
+                # Remember how long this took so it's stored with the
+                # build information for --critical-path scheduling.
+                duration = time.time() - start_time
+                for t in self.targets:
+                    t.duration = duration
         except SystemExit:
             exc_value = sys.exc_info()[1]
             raise SCons.Errors.ExplicitExit(self.targets[0], exc_value.code)
@@ -563,7 +571,8 @@ class Taskmaster(object):
     The Taskmaster for walking the dependency DAG.
     """
 
-    def __init__(self, targets=[], tasker=None, order=None, trace=None):
+    def __init__(self, targets=[], tasker=None, order=None, trace=None,
+                 critical_path=False):
         self.original_top = targets
         self.top_targets_left = targets[:]
         self.top_targets_left.reverse()
@@ -578,6 +587,16 @@ class Taskmaster(object):
         self.trace = trace
         self.next_candidate = self.find_next_candidate
         self.pending_children = set()
+        # With critical_path, ready Nodes are collected in a heap and
+        # handed out longest-remaining-path first instead of in DFS
+        # order.  The counter breaks ties in the order Nodes were found,
+        # which keeps the order given by --random.
+        if critical_path:
+            self.ready_heap = []
+            self.ready_heap_count = 0
+            self.ready_set = set()
+        else:
+            self.ready_heap = None
 
     def find_next_candidate(self):
         """
@@ -627,6 +646,72 @@ class Taskmaster(object):
             candidates = self.candidates
             self.candidates = []
             self.will_not_build(candidates)
+        if self.ready_heap:
+            ready = list(self.ready_set)
+            self.ready_heap = []
+            self.ready_set = set()
+            self.will_not_build(ready)
+        return None
+
+    def set_priority(self, parent, child):
+        """
+        Raises a child's critical-path priority so it's at least that of
+        the parent waiting on it plus the child's own build time from the
+        previous build.  Priorities only grow as more parents are found;
+        a raise is passed down to the children a pending Node is still
+        waiting on, and a Node already in the ready heap is re-queued.
+        """
+        stack = [(parent, child)]
+        while stack:
+            parent, child = stack.pop()
+            priority = parent.priority + child.get_stored_duration()
+            if priority <= child.priority:
+                continue
+            child.priority = priority
+            if child.get_state() != NODE_PENDING:
+                continue
+            if child in self.ready_set:
+                self.push_ready_node(child)
+            else:
+                for c in child.get_executor().get_all_children():
+                    if c.get_state() <= NODE_EXECUTING:
+                        stack.append((child, c))
+
+    def push_ready_node(self, node):
+        """
+        Adds a Node that's ready to be evaluated to the ready heap.
+        """
+        self.ready_set.add(node)
+        self.ready_heap_count = self.ready_heap_count + 1
+        heapq.heappush(self.ready_heap,
+                       (-node.priority, self.ready_heap_count, node))
+
+    def next_ready_node(self):
+        """
+        Returns the highest-priority Node from the ready heap that is
+        still waiting to be evaluated, or None.
+        """
+        T = self.trace
+        while self.ready_heap:
+            priority, count, node = heapq.heappop(self.ready_heap)
+            if -priority != node.priority:
+                # Superseded by an entry with a higher priority.
+                continue
+            self.ready_set.discard(node)
+            if node.get_state() > NODE_PENDING:
+                # Already handed out as another target of the same
+                # executor.
+                continue
+            wait_side_effects = False
+            for se in node.get_executor().get_action_side_effects():
+                if se.get_state() == NODE_EXECUTING:
+                    se.add_to_waiting_s_e(node)
+                    wait_side_effects = True
+            if wait_side_effects:
+                continue
+            if T: T.write(self.trace_message(u'Evaluating %s (priority %s)\n' %
+                                             (self.trace_node(node), node.priority)))
+            return node
         return None
 
     def _validate_pending_children(self):
@@ -746,6 +831,10 @@ class Taskmaster(object):
         while True:
             node = self.next_candidate()
             if node is None:
+                if self.ready_heap:
+                    node = self.next_ready_node()
+                    if node is not None:
+                        return node
                 if T: T.write(self.trace_message('No candidate anymore.') + u'\n')
                 return None
 
@@ -774,6 +863,9 @@ class Taskmaster(object):
             if state == NODE_NO_STATE:
                 # Mark this node as being on the execution stack:
                 node.set_state(NODE_PENDING)
+                if self.ready_heap is not None and node.priority == 0:
+                    # A top-level target, or one nobody has claimed yet.
+                    node.priority = node.get_stored_duration()
             elif state > NODE_PENDING:
                 # Skip this node if it has already been evaluated:
                 if S: S.already_handled = S.already_handled + 1
@@ -819,6 +911,8 @@ class Taskmaster(object):
 
                 if childstate <= NODE_EXECUTING:
                     children_not_ready.append(child)
+                    if self.ready_heap is not None:
+                        self.set_priority(node, child)
 
 
             # These nodes have not even been visited yet.  Add
@@ -893,6 +987,16 @@ class Taskmaster(object):
             # The default when we've gotten through all of the checks above:
             # this node is ready to be built.
             if S: S.build = S.build + 1
+
+            if self.ready_heap is not None:
+                # Keep walking so the ready Nodes can be handed out in
+                # priority order once all the candidates are examined.
+                if node not in self.ready_set:
+                    if T: T.write(self.trace_message(u'Adding %s to the ready heap (priority %s)\n' %
+                                                     (self.trace_node(node), node.priority)))
+                    self.push_ready_node(node)
+                continue
+
             if T: T.write(self.trace_message(u'Evaluating %s\n' %
                                              self.trace_node(node)))
 
@@ -68,6 +68,8 @@ class Node(object):
         self._bsig_val = None
         self._current_val = 0
         self.always_build = None
+        self.priority = 0
+        self.stored_duration = 0
 
     def disambiguate(self):
         return self
@@ -134,6 +136,9 @@ class Node(object):
     def get_state(self):
         return self.state
 
+    def get_stored_duration(self):
+        return self.stored_duration
+
     def set_state(self, state):
         self.state = state
 
@@ -1054,6 +1059,80 @@ class TaskmasterTestCase(unittest.TestCase):
         assert n2.postprocessed
         assert n3.postprocessed
 
+    def test_critical_path(self):
+        """Test handing out ready tasks longest path first
+        """
+        n1 = Node("n1")
+        n1.stored_duration = 1
+        n2 = Node("n2")
+        n2.stored_duration = 1
+        n3 = Node("n3", [n2])
+        n3.stored_duration = 10
+        n4 = Node("n4")
+        n4.stored_duration = 5
+        n5 = Node("n5", [n1, n3, n4])
+
+        tm = SCons.Taskmaster.Taskmaster([n5], critical_path=True)
+
+        t2 = tm.next_task()
+        assert t2.get_target() == n2, t2.get_target()
+        assert n2.priority == 11, n2.priority
+        t2.prepare()
+        t4 = tm.next_task()
+        assert t4.get_target() == n4, t4.get_target()
+        t4.prepare()
+
+        t2.execute()
+        assert n2.duration >= 0, n2.duration
+        t2.executed()
+        t2.postprocess()
+
+        # n3 is now ready, and outranks n1.
+        t = tm.next_task()
+        assert t.get_target() == n3, t.get_target()
+        t.prepare()
+        t.execute()
+        t.executed()
+        t.postprocess()
+
+        t = tm.next_task()
+        assert t.get_target() == n1, t.get_target()
+        t.prepare()
+        t.execute()
+        t.executed()
+        t.postprocess()
+
+        t4.execute()
+        t4.executed()
+        t4.postprocess()
+
+        t = tm.next_task()
+        assert t.get_target() == n5, t.get_target()
+        t.prepare()
+        t.execute()
+        t.executed()
+        t.postprocess()
+
+        assert tm.next_task() is None
+
+        # Without critical_path, the same graph is walked depth-first.
+        for n in [n1, n2, n3, n4, n5]:
+            n.set_state(SCons.Node.no_state)
+        tm = SCons.Taskmaster.Taskmaster([n5])
+        t = tm.next_task()
+        assert t.get_target() == n1, t.get_target()
+
+        # Stopping drops the Nodes that are ready but not handed out.
+        n1 = Node("n1")
+        n2 = Node("n2")
+        n3 = Node("n3", [n1, n2])
+        tm = SCons.Taskmaster.Taskmaster([n3], critical_path=True)
+        t = tm.next_task()
+        assert t.get_target() == n1, t.get_target()
+        tm.stop()
+        assert tm.next_task() is None
+        assert not tm.ready_heap, tm.ready_heap
+
     def test_trace(self):
         """Test Taskmaster tracing
         """
@@ -26,6 +26,8 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import sys
 import unittest
 
+import TestCmd
+
 import SCons.Errors
 import SCons.Tool
 
@@ -73,6 +75,59 @@ class ToolTestCase(unittest.TestCase):
         else:
             raise
 
+    def test_record_tool(self):
+        """Test recording and repeating what a tool does"""
+        import SCons.Environment
+        def generate(env):
+            env['OUT'] = env['IN'] + '.out'
+            env.Append(LIST = ['x'])
+        env = SCons.Environment.Base(tools = [], IN = 'a', LIST = [])
+        result = SCons.Tool.record_tool(env, lambda env=env: generate(env))
+        assert env['OUT'] == 'a.out', env['OUT']
+        assert env['LIST'] == ['x'], env['LIST']
+        assert type(env._dict) is dict, type(env._dict)
+        assert sorted(result.outputs.keys()) == ['LIST', 'OUT'], result.outputs
+
+        env2 = SCons.Environment.Base(tools = [], IN = 'a', LIST = [])
+        assert result.matches(env2)
+        result.apply(env2)
+        assert env2['OUT'] == 'a.out', env2['OUT']
+        assert env2['LIST'] == ['x'], env2['LIST']
+        env2['LIST'].append('y')
+        assert env['LIST'] == ['x'], env['LIST']
+
+        env3 = SCons.Environment.Base(tools = [], IN = 'b', LIST = [])
+        assert not result.matches(env3)
+        env4 = SCons.Environment.Base(tools = [], IN = 'a', LIST = ['z'])
+        assert not result.matches(env4)
+
+        # A value that refers to the environment itself can't be repeated.
+        def generate(env):
+            env['SELF'] = [env]
+        result = SCons.Tool.record_tool(env, lambda env=env: generate(env))
+        assert result is None, result
+
+        # Neither can creating targets.
+        def generate(env):
+            env.Command('tool_target', [], 'touch $TARGET')
+        result = SCons.Tool.record_tool(env, lambda env=env: generate(env))
+        assert result is None, result
+
+        # Tools that aren't shipped with SCons have to say they're
+        # cacheable.
+        assert SCons.Tool.Tool('g++').cacheable
+        test = TestCmd.TestCmd(workdir = '')
+        test.write('plain.py', """\
+def generate(env):
+    pass
+def exists(env):
+    return 1
+""")
+        test.write('opted_in.py', "cacheable = 1\n" + test.read('plain.py'))
+        toolpath = [test.workpath('')]
+        assert not SCons.Tool.Tool('plain', toolpath).cacheable
+        assert SCons.Tool.Tool('opted_in', toolpath).cacheable
+
 
 if __name__ == "__main__":
     suite = unittest.makeSuite(ToolTestCase, 'test_')
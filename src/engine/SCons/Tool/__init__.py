@@ -39,6 +39,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import imp
 import sys
+import time
 
 import SCons.Builder
 import SCons.Errors
@@ -48,9 +49,29 @@ import SCons.Scanner.C
 import SCons.Scanner.D
 import SCons.Scanner.LaTeX
 import SCons.Scanner.Prog
+import SCons.Util
 
 DefaultToolpath=[]
 
+# Set by the --debug=tools option.
+print_tool_times = 0
+
+# [calls, cached calls, seconds] for each tool name, for --debug=tools.
+ToolTimes = {}
+
+# What Tool() uses from the modules of the tools loaded so far, by
+# (name, toolpath).  It's taken as soon as a module is loaded, because
+# loading a module of the same name from another toolpath reuses the
+# same module object.
+ToolModules = {}
+
+# What applying each tool did to earlier construction environments,
+# by (name, toolpath).  See Tool.__call__().
+ToolCache = {}
+
+# How many different results we keep for each tool.
+max_tool_results = 8
+
 CScanner = SCons.Scanner.C.CScanner()
 DScanner = SCons.Scanner.D.DScanner()
 LaTeXScanner = SCons.Scanner.LaTeX.LaTeXScanner()
@@ -84,6 +105,342 @@ for suffix in LaTeXSuffixes:
     SourceFileScanner.add_scanner(suffix, LaTeXScanner)
     SourceFileScanner.add_scanner(suffix, PDFLaTeXScanner)
 
+class _Missing(object):
+    pass
+_missing = _Missing()
+
+class ToolRecord(object):
+    """The construction variables one tool looked at and set while
+    it was being applied."""
+    def __init__(self, keys):
+        # The variables the environment had when the tool was applied.
+        self.keys = keys
+        # The values of the variables the tool looked at, and of the
+        # variables it set, from before it did.
+        self.inputs = {}
+        self.written = {}
+        self.read_all = False
+
+class RecordingDict(dict):
+    """A construction variable dictionary that records which variables
+    are looked at and which are set while tools are being applied.
+    Tools apply other tools, so there's a ToolRecord for each tool
+    being applied.
+
+    Looking at all of the variables at once (by iterating over the
+    dictionary or copying it) makes all of them count as looked at.
+    So does substituting with it, since there's no telling what the
+    Python expressions in the substituted strings look at.
+    """
+    def __init__(self, data):
+        dict.__init__(self, data)
+        self.records = []
+
+    def _read(self, key):
+        snapshot = _missing
+        for r in self.records:
+            if key not in r.inputs and key not in r.written:
+                if snapshot is _missing:
+                    snapshot = _snapshot(key, dict.get(self, key, _missing))
+                r.inputs[key] = snapshot
+
+    def _write(self, key):
+        for r in self.records:
+            if key not in r.written:
+                if key in r.inputs:
+                    r.written[key] = r.inputs[key]
+                else:
+                    r.written[key] = _snapshot(key, dict.get(self, key, _missing))
+
+    def _read_all(self):
+        for r in self.records:
+            if not r.read_all:
+                r.read_all = True
+                for key in r.keys:
+                    if key in r.written:
+                        if key not in r.inputs:
+                            r.inputs[key] = r.written[key]
+                    elif key not in r.inputs:
+                        r.inputs[key] = _snapshot(key, dict.get(self, key, _missing))
+
+    def __getitem__(self, key):
+        self._read(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self._read(key)
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        self._read(key)
+        return dict.__contains__(self, key)
+
+    has_key = __contains__
+
+    def __setitem__(self, key, value):
+        if key == '__builtins__':
+            # scons_subst() and scons_subst_list() are about to eval()
+            # expressions with us as the global dictionary.
+            self._read_all()
+        else:
+            self._write(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key != '__builtins__':
+            self._read(key)
+            self._write(key)
+        dict.__delitem__(self, key)
+
+    def setdefault(self, key, default=None):
+        self._read(key)
+        self._write(key)
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *args):
+        self._read(key)
+        self._write(key)
+        return dict.pop(self, key, *args)
+
+    def update(self, *args, **kw):
+        d = dict(*args, **kw)
+        for key in d.keys():
+            self._write(key)
+        dict.update(self, d)
+
+    def __iter__(self):
+        self._read_all()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._read_all()
+        return dict.__len__(self)
+
+    def __cmp__(self, other):
+        self._read_all()
+        return cmp(dict(self), other)
+
+    def copy(self):
+        self._read_all()
+        return dict(self)
+
+    def keys(self):
+        self._read_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._read_all()
+        return dict.values(self)
+
+    def items(self):
+        self._read_all()
+        return dict.items(self)
+
+    def iterkeys(self):
+        self._read_all()
+        return dict.iterkeys(self)
+
+    def itervalues(self):
+        self._read_all()
+        return dict.itervalues(self)
+
+    def iteritems(self):
+        self._read_all()
+        return dict.iteritems(self)
+
+def _builders_state(builders):
+    names = {}
+    for name, builder in builders.items():
+        names[id(builder)] = name
+    state = {}
+    for name, builder in builders.items():
+        state[name] = SCons.Builder.builder_state(builder, names)
+    return state
+
+def _snapshot(key, value):
+    """Returns a copy of a construction variable value to compare
+    later values with."""
+    if value is _missing:
+        return value
+    if key == 'BUILDERS':
+        # Tools change the Builders in place (adding actions
+        # and emitters for their suffixes, for example).
+        return _builders_state(value)
+    return SCons.Util.semi_deepcopy(value)
+
+def _copy(key, value):
+    """Returns a copy of a construction variable value to keep, or to
+    give to an environment."""
+    if key == 'BUILDERS':
+        return SCons.Builder.copy_builders(value)
+    return SCons.Util.semi_deepcopy(value)
+
+def _same(key, value, snapshot):
+    if value is _missing or snapshot is _missing:
+        return value is snapshot
+    if key == 'BUILDERS':
+        value = _builders_state(value)
+    if type(value) is not type(snapshot):
+        return False
+    try:
+        return value == snapshot
+    except KeyboardInterrupt:
+        raise
+    except:
+        # Values that can't be compared count as different.
+        return False
+
+def _refers_to(value, env):
+    """Returns whether a construction variable value holds on to
+    the given environment, so that it can't be given to another one."""
+    if value is env or getattr(value, 'im_self', None) is env:
+        return True
+    if SCons.Util.is_Dict(value):
+        value = list(value.values())
+    if SCons.Util.is_Sequence(value):
+        for v in value:
+            if _refers_to(v, env):
+                return True
+    return False
+
+# The attributes a construction environment changes as a matter of
+# course when a tool is applied.
+_bookkeeping_attributes = ['_dict', '_memo', '_escaped', '_shared',
+                           'added_methods']
+
+class ToolResult(object):
+    """The changes applying a tool made to a construction environment,
+    along with the values of the construction variables the tool looked
+    at, so the changes can be repeated on another environment whose
+    variables have the same values.
+    """
+    def __init__(self, inputs, keys, outputs, methods):
+        self.inputs = inputs
+        self.keys = keys
+        self.outputs = outputs
+        self.methods = methods
+
+    def matches(self, env):
+        d = env._dict
+        if self.keys is not None:
+            if len(d) != len(self.keys):
+                return False
+            for key in d.keys():
+                if key not in self.keys:
+                    return False
+        for key, value in self.inputs.items():
+            if not _same(key, d.get(key, _missing), value):
+                return False
+        return True
+
+    def apply(self, env):
+        d = env._dict
+        for key, value in self.outputs.items():
+            if value is _missing:
+                if key in d:
+                    del d[key]
+            elif key == 'BUILDERS':
+                bd = d[key]
+                for name in list(bd.keys()):
+                    if name not in value:
+                        del bd[name]
+                bd.update(_copy(key, value))
+            else:
+                d[key] = _copy(key, value)
+        for method in self.methods:
+            env.added_methods.append(method.clone(env))
+        env.scanner_map_delete(self.outputs)
+
+def _creations(env):
+    """Returns how many Executors, Aliases and file system Nodes have
+    been created so far."""
+    import SCons.Executor
+    import SCons.Node.Alias
+    result = [SCons.Executor.executors_created,
+              len(SCons.Node.Alias.default_ans)]
+    fs = getattr(env, 'fs', None)
+    if fs is not None:
+        for root in fs.Root.values():
+            result.append(len(root._lookupDict))
+    return result
+
+def record_tool(env, apply):
+    """Calls apply() to apply a tool to the environment, and returns
+    a ToolResult describing what it did, or None if what it did can't
+    simply be repeated on another environment.
+    """
+    import SCons.Environment
+    MethodWrapper = SCons.Environment.MethodWrapper
+
+    creations = _creations(env)
+    attributes = env.__dict__.copy()
+    methods = list(env.added_methods)
+    d = env._dict
+    if isinstance(d, RecordingDict):
+        # Another tool applying this one is being recorded, too.
+        recorder = d
+    else:
+        recorder = RecordingDict(d)
+        env._dict = recorder
+    record = ToolRecord(frozenset(dict.keys(recorder)))
+    recorder.records.append(record)
+    try:
+        apply()
+    finally:
+        recorder.records.remove(record)
+        if recorder is not d:
+            env._dict = d
+            d.clear()
+            dict.update(d, recorder)
+
+    # Nor would any targets (or other Nodes) it created.
+    if _creations(env) != creations:
+        return None
+
+    # Anything besides construction variables and methods that the tool
+    # changed in the environment would not be repeated.
+    for name, value in env.__dict__.items():
+        if name in _bookkeeping_attributes:
+            continue
+        if attributes.get(name, _missing) is value:
+            continue
+        if isinstance(value, MethodWrapper) and value.object is env:
+            continue
+        return None
+    for name, value in attributes.items():
+        if name not in env.__dict__ and not isinstance(value, MethodWrapper):
+            return None
+    for method in methods:
+        if method not in env.added_methods:
+            return None
+    new_methods = [m for m in env.added_methods if m not in methods]
+
+    outputs = {}
+    for key, before in list(record.written.items()) + list(record.inputs.items()):
+        if key in outputs:
+            continue
+        value = dict.get(d, key, _missing)
+        if key in record.written or not _same(key, value, before):
+            if _refers_to(value, env):
+                return None
+            if value is not _missing:
+                value = _copy(key, value)
+            outputs[key] = value
+
+    keys = None
+    if record.read_all:
+        keys = record.keys
+    return ToolResult(record.inputs, keys, outputs, new_methods)
+
+def print_times():
+    """Prints the --debug=tools statistics."""
+    print "Tool application times (including the tools they apply):"
+    fmt = "%10s %10s %12s  %s"
+    print fmt % ('calls', 'cached', 'seconds', 'tool')
+    for name in sorted(ToolTimes.keys()):
+        calls, cached, seconds = ToolTimes[name]
+        print fmt % (calls, cached, '%f' % seconds, name)
+
 class Tool(object):
     def __init__(self, name, toolpath=[], **kw):
         self.name = name
@@ -91,11 +448,26 @@ class Tool(object):
         # remember these so we can merge them into the call
         self.init_kw = kw
 
-        module = self._tool_module()
-        self.generate = module.generate
-        self.exists = module.exists
-        if hasattr(module, 'options'):
-            self.options = module.options
+        self.key = (name, tuple(self.toolpath))
+        try:
+            attributes = ToolModules[self.key]
+        except KeyError:
+            module = self._tool_module()
+            attributes = {
+                'generate' : module.generate,
+                'exists' : module.exists,
+            }
+            if hasattr(module, 'options'):
+                attributes['options'] = module.options
+            # The tools that come with SCons are cacheable unless they
+            # say otherwise.  Tools from a toolpath (or site_scons/
+            # site_tools) have to say they are, since their generate()
+            # functions are more likely to do other things besides
+            # setting construction variables.
+            shipped = module.__name__ == 'SCons.Tool.' + self.name
+            attributes['cacheable'] = getattr(module, 'cacheable', shipped)
+            ToolModules[self.key] = attributes
+        self.__dict__.update(attributes)
 
     def _tool_module(self):
         # TODO: Interchange zipimport with normal initilization for better error reporting
@@ -166,6 +538,23 @@ class Tool(object):
                 kw.update(call_kw)
             else:
                 kw = self.init_kw
+        if print_tool_times:
+            start = time.time()
+        cached = 0
+        try:
+            if args or kw or hasattr(self, 'options') or \
+               not self.cacheable or '_dict' not in env.__dict__:
+                self._apply(env, *args, **kw)
+            else:
+                cached = self._apply_cached(env)
+        finally:
+            if print_tool_times:
+                t = ToolTimes.setdefault(self.name, [0, 0, 0.0])
+                t[0] = t[0] + 1
+                t[1] = t[1] + cached
+                t[2] = t[2] + time.time() - start
+
+    def _apply(self, env, *args, **kw):
         env.Append(TOOLS = [ self.name ])
         if hasattr(self, 'options'):
             import SCons.Variables
@@ -179,6 +568,22 @@ class Tool(object):
 
         self.generate(env, *args, **kw)
 
+    def _apply_cached(self, env):
+        """Applies the tool by repeating what it did to an earlier
+        environment whose construction variables had the same values
+        as this one's do, if there was one.  Returns whether there was.
+        """
+        results = ToolCache.setdefault(self.key, [])
+        for result in results:
+            if result.matches(env):
+                result.apply(env)
+                return 1
+        result = record_tool(env, lambda self=self, env=env: self._apply(env))
+        if result is not None:
+            results.insert(0, result)
+            del results[max_tool_results:]
+        return 0
+
     def __str__(self):
         return self.name
 
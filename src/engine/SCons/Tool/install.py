@@ -137,6 +137,23 @@ def installFunc(target, source, env):
 
     return 0
 
+def copyFiles(pairs):
+    """Install each (dest, source) pair of paths with copyFunc()."""
+    for dest, source in pairs:
+        if copyFunc(dest, source, None):
+            return 1
+    return 0
+
+def installPool(target, source, env):
+    """Hand the copies to a worker process when --process-jobs is used,
+    as long as INSTALL is the default copyFunc()."""
+    if env.get('INSTALL') is not copyFunc:
+        return None
+    assert len(target)==len(source), \
+           "Installing source %s into target %s: target and source lists must have same length."%(list(map(str, source)), list(map(str, target)))
+    pairs = [(t.get_abspath(), s.get_abspath()) for t, s in zip(target, source)]
+    return copyFiles, (pairs,)
+
 def stringFunc(target, source, env):
     installstr = env.get('INSTALLSTR')
     if installstr:
@@ -181,8 +198,10 @@ class DESTDIR_factory(object):
 #
 # The Builder Definition
 #
-install_action   = SCons.Action.Action(installFunc, stringFunc)
-installas_action = SCons.Action.Action(installFunc, stringFunc)
+install_action   = SCons.Action.Action(installFunc, stringFunc,
+                                       pool=installPool)
+installas_action = SCons.Action.Action(installFunc, stringFunc,
+                                       pool=installPool)
 
 BaseInstallBuilder               = None
 
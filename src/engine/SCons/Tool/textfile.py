@@ -55,21 +55,24 @@ from SCons.Node import Node
 from SCons.Node.Python import Value
 from SCons.Util import is_String, is_Sequence, is_Dict
 
-def _do_subst(node, subs):
+def _do_subst(contents, subs):
     """
-    Fetch the node contents and replace all instances of the keys with
-    their values.  For example, if subs is
+    Replace all instances of the keys with their values in the contents
+    of a source.  For example, if subs is
         {'%VERSION%': '1.2345', '%BASE%': 'MyProg', '%prefix%': '/bin'},
     then all instances of %VERSION% in the file will be replaced with
     1.2345 and so forth.
     """
-    contents = node.get_text_contents()
     if not subs: return contents
     for (k,v) in subs:
         contents = re.sub(k, v, contents)
     return contents
 
-def _action(target, source, env):
+def _action_args(target, source, env):
+    """
+    Collect everything _write_file() needs from the Nodes and the
+    construction environment, as plain strings that can be pickled.
+    """
     # prepare the line separator
     linesep = env['LINESEPARATOR']
     if linesep is None:
@@ -104,19 +107,33 @@ def _action(target, source, env):
                 v = str(v)
             subs.append((k,v))
 
+    contents = [s.get_text_contents() for s in source]
+    return target[0].get_path(), contents, subs, linesep
+
+def _write_file(path, contents, subs, linesep):
     # write the file
     try:
-        fd = open(target[0].get_path(), "wb")
+        fd = open(path, "wb")
     except (OSError,IOError), e:
-        raise SCons.Errors.UserError("Can't write target file %s" % target[0])
+        raise SCons.Errors.UserError("Can't write target file %s" % path)
     # separate lines by 'linesep' only if linesep is not empty
     lsep = None
-    for s in source:
+    for c in contents:
         if lsep: fd.write(lsep)
-        fd.write(_do_subst(s, subs))
+        fd.write(_do_subst(c, subs))
         lsep = linesep
     fd.close()
 
+def _action(target, source, env):
+    _write_file(*_action_args(target, source, env))
+
+def _pool(target, source, env):
+    # Do the substitutions and write the file in a worker process
+    # when --process-jobs is used.  Worker processes don't follow
+    # chdir, so hand them the absolute path.
+    args = _action_args(target, source, env)
+    return _write_file, (target[0].get_abspath(),) + args[1:]
+
 def _strfunc(target, source, env):
     return "Creating '%s'" % target[0]
 
@@ -139,7 +156,8 @@ _common_varlist = ['SUBST_DICT', 'LINESEPARATOR']
 
 _text_varlist = _common_varlist + ['TEXTFILEPREFIX', 'TEXTFILESUFFIX']
 _text_builder = SCons.Builder.Builder(
-    action = SCons.Action.Action(_action, _strfunc, varlist = _text_varlist),
+    action = SCons.Action.Action(_action, _strfunc, varlist = _text_varlist,
+                                 pool = _pool),
     source_factory = Value,
     emitter = _convert_list,
     prefix = '$TEXTFILEPREFIX',
@@ -148,7 +166,8 @@ _text_builder = SCons.Builder.Builder(
 
 _subst_varlist = _common_varlist + ['SUBSTFILEPREFIX', 'TEXTFILESUFFIX']
 _subst_builder = SCons.Builder.Builder(
-    action = SCons.Action.Action(_action, _strfunc, varlist = _subst_varlist),
+    action = SCons.Action.Action(_action, _strfunc, varlist = _subst_varlist,
+                                 pool = _pool),
     source_factory = SCons.Node.FS.File,
     emitter = _convert_list,
     prefix = '$SUBSTFILEPREFIX',
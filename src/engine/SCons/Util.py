@@ -30,6 +30,7 @@ import os
 import sys
 import copy
 import re
+import time
 import types
 
 from collections import UserDict, UserList, UserString
@@ -459,6 +460,17 @@ def _semi_deepcopy_tuple(x):
     return tuple(map(semi_deepcopy, x))
 d[tuple] = _semi_deepcopy_tuple
 
+def _semi_deepcopy_atom(x):
+    return x
+# Strings and numbers are returned as they are anyway; looking them up
+# here skips the (slow) checks below for each one.
+for t in (str, int, long, float, bool, type(None)):
+    d[t] = _semi_deepcopy_atom
+try:
+    d[unicode] = _semi_deepcopy_atom
+except NameError:
+    pass
+
 def semi_deepcopy(x):
     copier = _semi_deepcopy_dispatch.get(type(x))
     if copier:
@@ -515,6 +527,11 @@ class Proxy(object):
            attribute doesn't exist, AttributeError is raised"""
         return getattr(self._subject, name)
 
+    def __setstate__(self, state):
+        """Restore a pickled Proxy without looking for a __setstate__
+           method on a subject that isn't there yet"""
+        self.__dict__.update(state)
+
     def get(self):
         """Retrieve the entire wrapped object"""
         return self._subject
@@ -629,6 +646,132 @@ else:
     def RegOpenKeyEx(root, key):
         raise WindowsError
 
+class ExecutableIndex(object):
+    """An index of the names of the files in the directories of a
+    search path, so WhereIs() can go straight to the directories that
+    hold a program instead of looking for it in each of them.
+
+    The index is built from directory listings.  A search at least
+    check_interval seconds after the last check gives the directories
+    a stat() to see whether their modification times have changed
+    since they were listed, and lists them again if they have.  A
+    directory modified too recently for its modification time to show
+    another change within the same second or two is looked in directly
+    instead, until it can be listed.
+    """
+
+    # How long to go without checking the directories' modification
+    # times.
+    check_interval = 1
+
+    # How recently a directory can have been modified for its
+    # modification time to not show later changes.
+    racy_seconds = 2
+
+    def __init__(self, dirs):
+        self.dirs = dirs
+        self.mtimes = None
+        self.check_time = None
+        self.names = {}
+        self.unindexed = []
+        self.recheck_time = None
+
+    def _mtimes(self):
+        result = []
+        for d in self.dirs:
+            try:
+                result.append(os.stat(d or os.curdir).st_mtime)
+            except OSError:
+                result.append(None)
+        return result
+
+    def update(self):
+        """Lists the directories again if any of them changed."""
+        now = time.time()
+        if self.recheck_time is not None and now >= self.recheck_time:
+            # Time to list the recently modified directories.
+            self.mtimes = None
+        elif self.check_time is not None and now < self.check_time:
+            return
+        self.check_time = now + self.check_interval
+        mtimes = self._mtimes()
+        if mtimes == self.mtimes:
+            return
+        names = {}
+        unindexed = []
+        recheck_time = None
+        for i in range(len(self.dirs)):
+            mtime = mtimes[i]
+            if mtime is None:
+                continue
+            if mtime > now - self.racy_seconds:
+                unindexed.append(i)
+                recheck_time = mtime + self.racy_seconds
+                continue
+            try:
+                entries = os.listdir(self.dirs[i] or os.curdir)
+            except OSError:
+                unindexed.append(i)
+                continue
+            for name in entries:
+                name = os.path.normcase(name)
+                try:
+                    names[name].append(i)
+                except KeyError:
+                    names[name] = [i]
+        self.mtimes = mtimes
+        self.names = names
+        self.unindexed = unindexed
+        self.recheck_time = recheck_time
+
+    def candidates(self, file, exts):
+        """Returns the paths of the files named file plus one of the
+        extensions in exts that may exist in the directories, in the
+        order to try them:  by directory, then by extension.
+        """
+        self.update()
+        if os.path.dirname(file):
+            # Not a name the directory listings would have.
+            found = [(i, j) for i in range(len(self.dirs))
+                            for j in range(len(exts))]
+        else:
+            found = []
+            for j in range(len(exts)):
+                for i in self.names.get(os.path.normcase(file + exts[j]), []):
+                    found.append((i, j))
+            for i in self.unindexed:
+                for j in range(len(exts)):
+                    found.append((i, j))
+            found.sort()
+        return [os.path.join(self.dirs[i], file + exts[j]) for i, j in found]
+
+# The ExecutableIndex for each search path WhereIs() has looked in, by
+# the tuple of its directories.  Search paths with relative directories
+# have a dictionary of ExecutableIndexes by the current directory
+# instead.
+ExecutableIndexes = {}
+
+def get_executable_index(path):
+    """Returns the ExecutableIndex for a list of directories."""
+    key = tuple(path)
+    try:
+        result = ExecutableIndexes[key]
+    except KeyError:
+        result = ExecutableIndex(list(path))
+        for d in path:
+            if not os.path.isabs(d):
+                result = {}
+                break
+        ExecutableIndexes[key] = result
+    if isinstance(result, dict):
+        cwd = os.getcwd()
+        try:
+            return result[cwd]
+        except KeyError:
+            index = result[cwd] = ExecutableIndex(list(path))
+            return index
+    return result
+
 if sys.platform == 'win32':
 
     def WhereIs(file, path=None, pathext=None, reject=[]):
@@ -652,16 +795,12 @@ if sys.platform == 'win32':
                 break
         if not is_List(reject) and not is_Tuple(reject):
             reject = [reject]
-        for dir in path:
-            f = os.path.join(dir, file)
-            for ext in pathext:
-                fext = f + ext
-                if os.path.isfile(fext):
-                    try:
-                        reject.index(fext)
-                    except ValueError:
-                        return os.path.normpath(fext)
-                    continue
+        for fext in get_executable_index(path).candidates(file, pathext):
+            if os.path.isfile(fext):
+                try:
+                    reject.index(fext)
+                except ValueError:
+                    return os.path.normpath(fext)
         return None
 
 elif os.name == 'os2':
@@ -682,16 +821,12 @@ elif os.name == 'os2':
                 break
         if not is_List(reject) and not is_Tuple(reject):
             reject = [reject]
-        for dir in path:
-            f = os.path.join(dir, file)
-            for ext in pathext:
-                fext = f + ext
-                if os.path.isfile(fext):
-                    try:
-                        reject.index(fext)
-                    except ValueError:
-                        return os.path.normpath(fext)
-                    continue
+        for fext in get_executable_index(path).candidates(file, pathext):
+            if os.path.isfile(fext):
+                try:
+                    reject.index(fext)
+                except ValueError:
+                    return os.path.normpath(fext)
         return None
 
 else:
@@ -707,8 +842,7 @@ else:
             path = path.split(os.pathsep)
         if not is_List(reject) and not is_Tuple(reject):
             reject = [reject]
-        for d in path:
-            f = os.path.join(d, file)
+        for f in get_executable_index(path).candidates(file, ['']):
             if os.path.isfile(f):
                 try:
                     st = os.stat(f)
@@ -723,7 +857,6 @@ else:
                         reject.index(f)
                     except ValueError:
                         return os.path.normpath(f)
-                    continue
         return None
 
 def PrependPath(oldpath, newpath, sep = os.pathsep, 
@@ -931,6 +1064,10 @@ class CLVar(UserList):
     def __str__(self):
         return ' '.join(self.data)
 
+def _semi_deepcopy_CLVar(x):
+    return CLVar(_semi_deepcopy_list(x.data))
+_semi_deepcopy_dispatch[CLVar] = _semi_deepcopy_CLVar
+
 # A dictionary that preserves the order in which items are added.
 # Submitted by David Benjamin to ActiveState's Python Cookbook web site:
 #     http://aspn.activestate.com/ASPN/Cookbook/Python/Recipe/107747
@@ -1019,6 +1156,102 @@ class Selector(OrderedDict):
                 except KeyError:
                     return None
 
+class LRUCache(object):
+    """A dictionary-like cache that holds at most maxsize items.
+    Adding an item to a full cache drops the least recently used one.
+
+    The cache may be used from the worker threads of a parallel build,
+    so the list keeping track of the order of use is locked.
+    """
+    # The items are kept in a circular doubly-linked list of
+    # [previous, next, key, value] links, with the most recently
+    # used one at the end, just before the root.
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.links = {}
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+        try:
+            import threading
+        except ImportError:
+            self.lock = None
+        else:
+            self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.links)
+
+    def __contains__(self, key):
+        return key in self.links
+
+    def get(self, key, default=None):
+        """Return the value for key, or default if the key isn't in
+        the cache, and mark the item as the most recently used."""
+        lock = self.lock
+        if lock: lock.acquire()
+        try:
+            try:
+                link = self.links[key]
+            except KeyError:
+                return default
+            prev, next = link[0], link[1]
+            prev[1] = next
+            next[0] = prev
+            last = self.root[0]
+            last[1] = self.root[0] = link
+            link[0] = last
+            link[1] = self.root
+            return link[3]
+        finally:
+            if lock: lock.release()
+
+    def __getitem__(self, key):
+        result = self.get(key, self)
+        if result is self:
+            raise KeyError(key)
+        return result
+
+    def __setitem__(self, key, value):
+        if self.maxsize <= 0:
+            return
+        lock = self.lock
+        if lock: lock.acquire()
+        try:
+            link = self.links.get(key)
+            if link is not None:
+                # Unlink it; it's added back at the end.
+                link[0][1] = link[1]
+                link[1][0] = link[0]
+            elif len(self.links) >= self.maxsize:
+                oldest = self.root[1]
+                oldest[0][1] = oldest[1]
+                oldest[1][0] = oldest[0]
+                del self.links[oldest[2]]
+            last = self.root[0]
+            link = [last, self.root, key, value]
+            last[1] = self.root[0] = self.links[key] = link
+        finally:
+            if lock: lock.release()
+
+    def keys(self):
+        """Return the keys from the least to the most recently used."""
+        result = []
+        link = self.root[1]
+        while link is not self.root:
+            result.append(link[2])
+            link = link[1]
+        return result
+
+    def clear(self):
+        lock = self.lock
+        if lock: lock.acquire()
+        try:
+            self.links = {}
+            self.root[:] = [self.root, self.root, None, None]
+        finally:
+            if lock: lock.release()
+
 
 if sys.platform == 'cygwin':
     # On Cygwin, os.path.normcase() lies, so just report back the
@@ -1392,6 +1625,13 @@ def MD5filesignature(fname, chunksize=65536):
     f.close()
     return result
 
+# The name of the digest used by the MD5*() signature functions, and
+# the constructor that creates a new hash object for it.  Despite the
+# function names, these can be switched to another algorithm with
+# set_hash_format().
+hash_format = None
+_hash_function = None
+
 try:
     import hashlib
 except ImportError:
@@ -1399,13 +1639,16 @@ except ImportError:
 else:
     if hasattr(hashlib, 'md5'):
         md5 = True
+        hash_format = 'md5'
+        _hash_function = hashlib.md5
+
         def MD5signature(s):
-            m = hashlib.md5()
+            m = _hash_function()
             m.update(str(s))
             return m.hexdigest()
 
         def MD5filesignature(fname, chunksize=65536):
-            m = hashlib.md5()
+            m = _hash_function()
             f = open(fname, "rb")
             while True:
                 blck = f.read(chunksize)
@@ -1414,7 +1657,76 @@ else:
                 m.update(str(blck))
             f.close()
             return m.hexdigest()
-            
+
+def _digest_constructor(function):
+    """Returns function if calling it makes a digest object, else None."""
+    try:
+        digest = function()
+    except Exception:
+        return None
+    if not hasattr(digest, 'update') or not hasattr(digest, 'hexdigest'):
+        return None
+    return function
+
+def find_hash_function(name):
+    """
+    Returns a constructor for the named digest, or None if it isn't
+    available.  Names are looked up in hashlib first (md5, sha1,
+    sha256, blake2b...), then in the optional xxhash module (xxh64,
+    xxh128...).  Other attributes of those modules aren't digests,
+    so they aren't accepted.
+    """
+    try:
+        import hashlib
+    except ImportError:
+        pass
+    else:
+        algorithms = getattr(hashlib, 'algorithms_available',
+                             getattr(hashlib, 'algorithms', ()))
+        if name in algorithms:
+            function = getattr(hashlib, name, None)
+            if function is None:
+                function = lambda name=name, new=hashlib.new: new(name)
+            return _digest_constructor(function)
+        try:
+            hashlib.new(name)
+        except (ValueError, TypeError):
+            pass
+        else:
+            function = lambda name=name, new=hashlib.new: new(name)
+            return _digest_constructor(function)
+    if not name.startswith('xxh'):
+        return None
+    try:
+        import xxhash
+    except ImportError:
+        return None
+    function = getattr(xxhash, name, None)
+    if function is None:
+        return None
+    return _digest_constructor(function)
+
+def get_hash_format():
+    """
+    Returns the name of the digest used for content signatures.
+    """
+    return hash_format
+
+def set_hash_format(name):
+    """
+    Switches the content signature functions to the named digest.
+    Raises ValueError if the digest isn't available.
+    """
+    global hash_format, _hash_function
+    name = name.lower()
+    if name == hash_format:
+        return
+    function = find_hash_function(name)
+    if function is None or not md5:
+        raise ValueError("Hash format `%s' is not available." % name)
+    hash_format = name
+    _hash_function = function
+
 def MD5collect(signatures):
     """
     Collects a list of signatures into an aggregate signature.
@@ -1469,6 +1781,8 @@ class Null(object):
         return self
     def __delattr__(self, name):
         return self
+    def __reduce__(self):
+        return (self.__class__, ())
 
 class NullSeq(Null):
     def __len__(self):
@@ -28,6 +28,7 @@ import SCons.compat
 import io
 import os
 import sys
+import time
 import unittest
 from collections import UserDict, UserList, UserString
 
@@ -377,6 +378,67 @@ class UtilTestCase(unittest.TestCase):
         finally:
             os.environ['PATH'] = env_path
 
+    def test_ExecutableIndex(self):
+        """Test the ExecutableIndex of a search path"""
+        test = TestCmd.TestCmd(workdir = '')
+        test.subdir('sub1', 'sub2')
+        sub1 = test.workpath('sub1')
+        sub2 = test.workpath('sub2')
+        test.write(['sub2', 'prog'], "\n")
+
+        # Directories modified too recently are looked in directly.
+        index = ExecutableIndex([sub1, sub2])
+        index.check_interval = 0
+        c = index.candidates('prog', [''])
+        assert c == [os.path.join(sub1, 'prog'), os.path.join(sub2, 'prog')], c
+        assert index.unindexed == [0, 1], index.unindexed
+
+        old = time.time() - 100
+        os.utime(sub1, (old, old))
+        os.utime(sub2, (old, old))
+        c = index.candidates('prog', [''])
+        assert c == [os.path.join(sub2, 'prog')], c
+        assert index.unindexed == [], index.unindexed
+        c = index.candidates('other', ['', '.exe'])
+        assert c == [], c
+
+        # A changed directory is listed again.
+        test.write(['sub1', 'prog.exe'], "\n")
+        os.utime(sub1, (old + 1, old + 1))
+        c = index.candidates('prog', ['', '.exe'])
+        assert c == [os.path.join(sub1, 'prog.exe'),
+                     os.path.join(sub2, 'prog')], c
+
+        # The directories aren't checked again until check_interval
+        # seconds after they last were.
+        index.check_interval = 1000
+        index.candidates('prog', [''])
+        test.write(['sub2', 'prog.exe'], "\n")
+        os.utime(sub2, (old + 1, old + 1))
+        c = index.candidates('prog', ['.exe'])
+        assert c == [os.path.join(sub1, 'prog.exe')], c
+        index.check_time = 0
+        c = index.candidates('prog', ['.exe'])
+        assert c == [os.path.join(sub1, 'prog.exe'),
+                     os.path.join(sub2, 'prog.exe')], c
+
+        c = index.candidates(os.path.join('x', 'prog'), [''])
+        assert c == [os.path.join(sub1, 'x', 'prog'),
+                     os.path.join(sub2, 'x', 'prog')], c
+
+        assert get_executable_index([sub1, sub2]) is \
+               get_executable_index((sub1, sub2))
+        assert get_executable_index([sub1]) is not get_executable_index([sub2])
+        save_cwd = os.getcwd()
+        try:
+            os.chdir(sub1)
+            i1 = get_executable_index(['sub', sub2])
+            assert get_executable_index(['sub', sub2]) is i1
+            os.chdir(sub2)
+            assert get_executable_index(['sub', sub2]) is not i1
+        finally:
+            os.chdir(save_cwd)
+
     def test_get_env_var(self):
         """Testing get_environment_var()."""
         assert get_environment_var("$FOO") == "FOO", get_environment_var("$FOO")
@@ -636,6 +698,40 @@ class UtilTestCase(unittest.TestCase):
         ret = s(env, [MyNode('bar.g')])
         assert ret == 'GGG', ret
 
+    def test_LRUCache(self):
+        """Test the LRUCache class"""
+        c = LRUCache(3)
+        c['a'] = 1
+        c['b'] = 2
+        c['c'] = 3
+        assert len(c) == 3, len(c)
+        assert c.keys() == ['a', 'b', 'c'], c.keys()
+        assert c['a'] == 1, c['a']
+        assert c.keys() == ['b', 'c', 'a'], c.keys()
+        c['d'] = 4
+        assert c.keys() == ['c', 'a', 'd'], c.keys()
+        assert 'b' not in c
+        assert c.get('b') is None
+        assert c.get('b', 'x') == 'x'
+        try:
+            c['b']
+        except KeyError:
+            pass
+        else:
+            raise Exception("did not catch expected KeyError")
+        c['c'] = 5
+        assert c.keys() == ['a', 'd', 'c'], c.keys()
+        assert c['c'] == 5, c['c']
+        assert len(c) == 3, len(c)
+        c.clear()
+        assert len(c) == 0, len(c)
+        assert c.keys() == [], c.keys()
+        c['e'] = 6
+        assert c.keys() == ['e'], c.keys()
+        c = LRUCache(0)
+        c['a'] = 1
+        assert len(c) == 0, len(c)
+
     def test_adjustixes(self):
         """Test the adjustixes() function"""
         r = adjustixes('file', 'pre-', '-suf')
@@ -721,6 +817,34 @@ class MD5TestCase(unittest.TestCase):
         s = MD5signature('222')
         assert 'bcbe3365e6ac95ea2c0343a2395834dd' == s, s
 
+    def test_set_hash_format(self):
+        """Test switching the signature hash format"""
+        assert get_hash_format() == 'md5', get_hash_format()
+        set_hash_format('SHA1')
+        try:
+            assert get_hash_format() == 'sha1', get_hash_format()
+            s = MD5signature('111')
+            assert '6216f8a75fd5bb3d5f22b6f9958cdede3fc086c2' == s, s
+            s = MD5collect([s, s])
+            assert len(s) == 40, s
+        finally:
+            set_hash_format('md5')
+        s = MD5signature('111')
+        assert '698d51a19d8a121ce581499d7b701668' == s, s
+
+        # Attributes of hashlib that aren't digests aren't hash formats.
+        for name in ['no_such_hash', 'new', 'algorithms', 'xxhash']:
+            assert find_hash_function(name) is None, name
+            try:
+                set_hash_format(name)
+            except ValueError:
+                pass
+            else:
+                raise Exception("ValueError expected for %s." % name)
+            assert get_hash_format() == 'md5', get_hash_format()
+            s = MD5signature('111')
+            assert '698d51a19d8a121ce581499d7b701668' == s, s
+
 class NodeListTestCase(unittest.TestCase):
     def test_simple_attributes(self):
         """Test simple attributes of a NodeList class"""
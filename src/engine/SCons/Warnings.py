@@ -81,6 +81,9 @@ class NoParallelSupportWarning(WarningOnByDefault):
 class ReservedVariableWarning(WarningOnByDefault):
     pass
 
+class SConscriptCacheWarning(WarningOnByDefault):
+    pass
+
 class StackSizeWarning(WarningOnByDefault):
     pass
 
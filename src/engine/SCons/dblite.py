@@ -137,6 +137,10 @@ class dblite(object):
         self._file_name,
         self._file_name + "_" + str(int(self._time_time())))
 
+  def rewrites_all(self):
+    # sync() always writes out the whole dictionary.
+    return 1
+
   def _check_writable(self):
     if (self._flag == "r"):
       raise IOError("Read-only database: %s" % self._file_name)
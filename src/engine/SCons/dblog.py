@@ -0,0 +1,430 @@
+"""SCons.dblog
+
+An append-only, journaling replacement for the dblite module.
+
+The dblite module keeps its whole database in one pickled dictionary
+and rewrites the entire file every time it is synchronized, so the
+cost of saving the signature database after a build is proportional
+to the size of the tree, not to the amount of work that was actually
+done.  This module offers the same (anydbm-like) interface, but each
+call to sync() only appends the records that changed since the last
+sync() to the end of the file.  The file is compacted (rewritten with
+just the live records) when the journal grows too large relative to
+the amount of live data it holds.
+
+The on-disk format is a short magic header, followed by an index of
+all of the keys (directories) present when the file was last
+compacted, the values for those keys, and then a journal of records
+appended since.  Each index entry holds the key and the offset and
+length of its value; each journal record is a fixed-size struct header
+holding a flags byte and the lengths of the key and value strings,
+followed by the key and value strings themselves.  A later record for
+the same key supersedes an earlier one.
+
+Opening the file only reads the index and the journal record headers
+from a memory-mapped view of the file.  A value is sliced out of the
+map the first time it's fetched, so SConsign only pays to read (and
+unpickle) the entries for the directories whose Dir.sconsign() method
+is actually called, which keeps builds of a few leaf targets in a big
+tree from decoding the whole database.
+
+A record that was truncated by an interrupted write (Ctrl-C, a full
+disk) is discarded when the file is read, and the next sync() rewrites
+the file from scratch so the damaged tail does not persist.
+
+Select it with:
+
+    import SCons.dblog
+    SConsignFile('.sconsign', SCons.dblog)
+"""
+
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import SCons.compat
+
+import builtins
+import mmap
+import os
+import struct
+
+ignore_corrupt_dbfiles = 0
+
+def corruption_warning(filename):
+    print "Warning: Discarding corrupt database:", filename
+
+try: unicode
+except NameError:
+    def is_string(s):
+        return isinstance(s, str)
+    def is_unicode(s):
+        return False
+else:
+    def is_string(s):
+        return type(s) in (str, unicode)
+    def is_unicode(s):
+        return type(s) is unicode
+
+dblog_suffix = '.dblog'
+tmp_suffix = '.tmp'
+
+# Version 1 files hold only journal records; version 2 files start
+# with an index of the compacted keys and their values.
+magic_v1 = 'SConsDBLog\x01\n'
+magic = 'SConsDBLog\x02\n'
+magic_size = len(magic)
+
+# The index header holds the number of index entries and the offset
+# at which the journal starts.
+index_format = '>II'
+index_size = struct.calcsize(index_format)
+
+# Each index entry is a flags byte, the length of the key, and the
+# offset and length of the value, followed by the key itself.
+entry_format = '>BIII'
+entry_size = struct.calcsize(entry_format)
+
+# Each journal record starts with a flags byte followed by the lengths
+# of the key and value strings.
+record_format = '>BII'
+record_size = struct.calcsize(record_format)
+
+KEY_UNICODE = 0x01
+VALUE_UNICODE = 0x02
+
+# Compact the journal when it holds more than compact_ratio times as
+# many records as there are live keys (plus a little slack so that
+# small databases aren't rewritten on every sync).
+compact_ratio = 2
+compact_slack = 100
+
+def _encode(s, flag):
+    if is_unicode(s):
+        return s.encode('utf-8'), flag
+    return s, 0
+
+def _decode(s, flags, flag):
+    if flags & flag:
+        return s.decode('utf-8')
+    return s
+
+def pack_record(key, value):
+    """Returns the journal record for the specified key and value."""
+    key, kflag = _encode(key, KEY_UNICODE)
+    value, vflag = _encode(value, VALUE_UNICODE)
+    return struct.pack(record_format, kflag | vflag, len(key), len(value)) + \
+           key + value
+
+class CorruptDatabase(Exception):
+    pass
+
+class dblog(object):
+
+    # Squirrel away references to the functions we'll use when our
+    # __del__() method calls our sync() method during shutdown; see
+    # the discussion in the dblite module.
+
+    _open = builtins.open
+    _os_chmod = os.chmod
+    _os_fsync = getattr(os, 'fsync', None)
+    _os_rename = os.rename
+    _os_unlink = os.unlink
+
+    def __init__(self, file_base_name, flag, mode):
+        assert flag in (None, "r", "w", "c", "n")
+        if flag is None:
+            flag = "r"
+        base, ext = os.path.splitext(file_base_name)
+        if ext == dblog_suffix:
+            # There's already a suffix on the file name, don't add one.
+            self._file_name = file_base_name
+            self._tmp_name = base + tmp_suffix
+        else:
+            self._file_name = file_base_name + dblog_suffix
+            self._tmp_name = file_base_name + tmp_suffix
+        self._flag = flag
+        self._mode = mode
+        # Maps each key to its value or, for values that haven't been
+        # fetched yet, to a (flags, start, end) tuple locating the value
+        # in self._buf.
+        self._dict = {}
+        self._buf = None
+        self._mapped = False
+        self._pending = {}
+        self._nrecords = 0
+        # Whether the file on disk can be appended to as it stands.
+        self._appendable = False
+        if self._flag == "n":
+            self._write_empty()
+        else:
+            try:
+                f = self._open(self._file_name, "rb")
+            except IOError, e:
+                if self._flag != "c":
+                    raise e
+                self._write_empty()
+            else:
+                try:
+                    self._load(f)
+                except CorruptDatabase:
+                    if ignore_corrupt_dbfiles == 0: raise
+                    if ignore_corrupt_dbfiles == 1:
+                        corruption_warning(self._file_name)
+                    self._release()
+                    self._dict = {}
+                    self._nrecords = 0
+                    self._appendable = False
+                f.close()
+
+    def _write_empty(self):
+        f = self._open(self._file_name, "wb", self._mode)
+        f.write(magic + struct.pack(index_format, 0, magic_size + index_size))
+        f.close()
+        self._appendable = True
+
+    def _load(self, f):
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # An empty file (e.g. from an interrupted first write)
+            # can't be mapped; treat it like a fresh database.
+            return
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            buf = f.read()
+        else:
+            self._mapped = True
+        self._buf = buf
+        header = buf[:magic_size]
+        if header == magic:
+            offset = self._load_index(buf, size)
+        elif header == magic_v1:
+            offset = magic_size
+        else:
+            raise CorruptDatabase(self._file_name)
+        d = self._dict
+        hsize = record_size
+        unpack = struct.unpack
+        nrecords = 0
+        while offset + hsize <= size:
+            flags, klen, vlen = unpack(record_format, buf[offset:offset+hsize])
+            start = offset + hsize
+            end = start + klen + vlen
+            if end > size:
+                break
+            key = _decode(buf[start:start+klen], flags, KEY_UNICODE)
+            d[key] = (flags, start+klen, end)
+            nrecords = nrecords + 1
+            offset = end
+        self._nrecords = self._nrecords + nrecords
+        # A short trailing record means a write was interrupted; only
+        # keep appending if everything we read was whole.  Version 1
+        # files get rewritten in the current format.
+        self._appendable = (offset == size) and header == magic
+
+    def _load_index(self, buf, size):
+        """Reads the index of compacted keys, returning the offset of
+        the first journal record."""
+        offset = magic_size
+        if offset + index_size > size:
+            raise CorruptDatabase(self._file_name)
+        count, journal = struct.unpack(index_format,
+                                       buf[offset:offset+index_size])
+        if journal > size:
+            raise CorruptDatabase(self._file_name)
+        offset = offset + index_size
+        d = self._dict
+        esize = entry_size
+        unpack = struct.unpack
+        for i in range(count):
+            if offset + esize > journal:
+                raise CorruptDatabase(self._file_name)
+            flags, klen, start, vlen = unpack(entry_format,
+                                              buf[offset:offset+esize])
+            offset = offset + esize
+            end = start + vlen
+            if offset + klen > journal or end > journal:
+                raise CorruptDatabase(self._file_name)
+            key = _decode(buf[offset:offset+klen], flags, KEY_UNICODE)
+            d[key] = (flags, start, end)
+            offset = offset + klen
+        self._nrecords = count
+        return journal
+
+    def _fetch(self, key, value):
+        flags, start, end = value
+        value = _decode(self._buf[start:end], flags, VALUE_UNICODE)
+        self._dict[key] = value
+        return value
+
+    def _release(self):
+        """Drops our view of the file, once all of the values we still
+        need have been fetched from it."""
+        buf = self._buf
+        self._buf = None
+        if self._mapped:
+            self._mapped = False
+            buf.close()
+
+    def close(self):
+        if self._pending:
+            self.sync()
+        self._release()
+
+    def __del__(self):
+        self.close()
+
+    def _needs_compaction(self):
+        if not self._appendable:
+            return True
+        nrecords = self._nrecords + len(self._pending)
+        return nrecords > compact_ratio * len(self._dict) + compact_slack
+
+    def sync(self):
+        self._check_writable()
+        if not self._pending and self._appendable:
+            return
+        if self._needs_compaction():
+            self._compact()
+        else:
+            self._append()
+        self._pending = {}
+
+    def _append(self):
+        records = [pack_record(k, v) for k, v in self._pending.items()]
+        f = self._open(self._file_name, "ab")
+        f.write(''.join(records))
+        f.close()
+        self._nrecords = self._nrecords + len(records)
+
+    def _compact(self):
+        items = []
+        for key in list(self._dict.keys()):
+            key_string, kflag = _encode(key, KEY_UNICODE)
+            value, vflag = _encode(self[key], VALUE_UNICODE)
+            items.append((kflag | vflag, key_string, value))
+        # We've fetched everything, so we no longer need the old file
+        # (and Windows won't let us replace it while it's mapped).
+        self._release()
+
+        offset = magic_size + index_size
+        for flags, key, value in items:
+            offset = offset + entry_size + len(key)
+        index = []
+        for flags, key, value in items:
+            index.append(struct.pack(entry_format,
+                                     flags, len(key), offset, len(value)))
+            index.append(key)
+            offset = offset + len(value)
+
+        f = self._open(self._tmp_name, "wb", self._mode)
+        f.write(magic)
+        f.write(struct.pack(index_format, len(items), offset))
+        f.write(''.join(index))
+        for flags, key, value in items:
+            f.write(value)
+        f.flush()
+        if self._os_fsync is not None:
+            self._os_fsync(f.fileno())
+        f.close()
+        # Windows doesn't allow renaming if the file exists, so unlink
+        # it first, chmod'ing it to make sure we can do so.
+        try: self._os_chmod(self._file_name, 0777)
+        except OSError: pass
+        try: self._os_unlink(self._file_name)
+        except OSError: pass
+        self._os_rename(self._tmp_name, self._file_name)
+        self._nrecords = len(items)
+        self._appendable = True
+
+    def rewrites_all(self):
+        """Returns whether the next sync() will rewrite the whole file
+        instead of appending to it."""
+        if not self._pending and self._appendable:
+            return False
+        return self._needs_compaction()
+
+    def _check_writable(self):
+        if self._flag == "r":
+            raise IOError("Read-only database: %s" % self._file_name)
+
+    def __getitem__(self, key):
+        value = self._dict[key]
+        if type(value) is tuple:
+            value = self._fetch(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._check_writable()
+        if not is_string(key):
+            raise TypeError("key `%s' must be a string but is %s" % (key, type(key)))
+        if not is_string(value):
+            raise TypeError("value `%s' must be a string but is %s" % (value, type(value)))
+        try:
+            if self[key] == value:
+                # Nothing changed, so there's nothing to journal.
+                return
+        except KeyError:
+            pass
+        self._dict[key] = value
+        self._pending[key] = value
+
+    def keys(self):
+        return list(self._dict.keys())
+
+    def has_key(self, key):
+        return key in self._dict
+
+    def __contains__(self, key):
+        return key in self._dict
+
+    def iterkeys(self):
+        # Wrapping name in () prevents fixer from "fixing" this
+        return (self._dict.iterkeys)()
+
+    __iter__ = iterkeys
+
+    def __len__(self):
+        return len(self._dict)
+
+def open(file, flag=None, mode=0666):
+    return dblog(file, flag, mode)
+
+def is_dblog(filename):
+    """Returns whether the specified file looks like a dblog database."""
+    try:
+        f = builtins.open(filename, "rb")
+    except IOError:
+        return False
+    try:
+        return f.read(magic_size) in (magic, magic_v1)
+    finally:
+        f.close()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
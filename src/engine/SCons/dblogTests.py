@@ -0,0 +1,253 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import SCons.compat
+
+import os
+import sys
+import unittest
+
+import TestCmd
+
+import SCons.dblog
+
+class dblogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.save_cwd = os.getcwd()
+        self.test = TestCmd.TestCmd(workdir = '')
+        os.chdir(self.test.workpath(''))
+        self.save_ignore = SCons.dblog.ignore_corrupt_dbfiles
+
+    def tearDown(self):
+        SCons.dblog.ignore_corrupt_dbfiles = self.save_ignore
+        os.chdir(self.save_cwd)
+        self.test.cleanup()
+
+    def test_round_trip(self):
+        """Test storing and re-reading dblog entries"""
+        db = SCons.dblog.open("tmp", "n")
+        assert len(db) == 0, len(db)
+        db["foo"] = "bar"
+        db[u"ufoo"] = u"ubar"
+        db.sync()
+        assert os.path.exists("tmp.dblog")
+
+        db = SCons.dblog.open("tmp", "c")
+        assert len(db) == 2, len(db)
+        assert db["foo"] == "bar", db["foo"]
+        assert db[u"ufoo"] == u"ubar", db[u"ufoo"]
+        assert type(db[u"ufoo"]) is type(u""), type(db[u"ufoo"])
+        assert "foo" in db
+        assert sorted(db.keys()) == ["foo", u"ufoo"], db.keys()
+
+        db = SCons.dblog.open("tmp.dblog", "r")
+        assert len(db) == 2, len(db)
+        try:
+            db.sync()
+        except IOError, e:
+            assert str(e) == "Read-only database: tmp.dblog", str(e)
+        else:
+            raise Exception("IOError expected.")
+
+    def test_type_errors(self):
+        """Test that dblog keys and values must be strings"""
+        db = SCons.dblog.open("tmp", "n")
+        try:
+            db[(1, 2)] = "tuple"
+        except TypeError:
+            pass
+        else:
+            raise Exception("TypeError expected.")
+        try:
+            db["list"] = [1, 2]
+        except TypeError:
+            pass
+        else:
+            raise Exception("TypeError expected.")
+
+    def test_append(self):
+        """Test that sync() only appends the changed entries"""
+        db = SCons.dblog.open("tmp", "n")
+        for i in range(10):
+            db["key%d" % i] = "value %d" % i
+        db.sync()
+        size = os.path.getsize("tmp.dblog")
+
+        db = SCons.dblog.open("tmp", "c")
+        db["key3"] = "value 3"
+        db.sync()
+        assert os.path.getsize("tmp.dblog") == size, \
+               "rewriting an unchanged value grew the file"
+
+        db["key3"] = "new value 3"
+        db.sync()
+        new_size = os.path.getsize("tmp.dblog")
+        record = SCons.dblog.record_size + len("key3") + len("new value 3")
+        assert new_size == size + record, (size, new_size, record)
+
+        db = SCons.dblog.open("tmp", "r")
+        assert len(db) == 10, len(db)
+        assert db["key3"] == "new value 3", db["key3"]
+        assert db["key4"] == "value 4", db["key4"]
+
+    def test_compaction(self):
+        """Test that the journal gets compacted when it grows too large"""
+        save_slack = SCons.dblog.compact_slack
+        SCons.dblog.compact_slack = 0
+        try:
+            db = SCons.dblog.open("tmp", "n")
+            db["key"] = "value 0"
+            db.sync()
+            db["key"] = "value 1"
+            db.sync()
+            size = os.path.getsize("tmp.dblog")
+            db["key"] = "value 2"
+            db.sync()
+            assert os.path.getsize("tmp.dblog") < size, \
+                   "journal was not compacted"
+            assert not os.path.exists("tmp.tmp")
+            db = SCons.dblog.open("tmp", "r")
+            assert len(db) == 1, len(db)
+            assert db["key"] == "value 2", db["key"]
+        finally:
+            SCons.dblog.compact_slack = save_slack
+
+    def test_rewrites_all(self):
+        """Test telling whether sync() will rewrite the whole file"""
+        save_slack = SCons.dblog.compact_slack
+        SCons.dblog.compact_slack = 0
+        try:
+            db = SCons.dblog.open("tmp", "n")
+            assert not db.rewrites_all()
+            db["key"] = "value 0"
+            assert not db.rewrites_all()
+            db.sync()
+            db["key"] = "value 1"
+            db.sync()
+            assert not db.rewrites_all()
+            db["key"] = "value 2"
+            assert db.rewrites_all()
+        finally:
+            SCons.dblog.compact_slack = save_slack
+
+    def test_truncated(self):
+        """Test reading a journal with a truncated final record"""
+        db = SCons.dblog.open("tmp", "n")
+        db["foo"] = "foo value"
+        db.sync()
+        db["bar"] = "bar value"
+        db.sync()
+        contents = self.test.read("tmp.dblog")
+        self.test.write("tmp.dblog", contents[:-3])
+
+        db = SCons.dblog.open("tmp", "c")
+        assert db.keys() == ["foo"], db.keys()
+        db["baz"] = "baz value"
+        db.sync()
+
+        db = SCons.dblog.open("tmp", "r")
+        assert sorted(db.keys()) == ["baz", "foo"], db.keys()
+
+    def test_lazy(self):
+        """Test that values are only read from the file when fetched"""
+        db = SCons.dblog.open("tmp", "n")
+        for i in range(10):
+            db["dir%d" % i] = "entries %d" % i
+        db.sync()
+        db = SCons.dblog.open("tmp", "c")
+        # Force compaction so the values come from the index.
+        db._compact()
+        db["dir9"] = "new entries 9"
+        db.sync()
+
+        db = SCons.dblog.open("tmp", "r")
+        assert len(db) == 10, len(db)
+        assert "dir3" in db
+        fetched = [k for k, v in db._dict.items() if type(v) is not tuple]
+        assert fetched == [], fetched
+        assert db["dir3"] == "entries 3", db["dir3"]
+        assert db["dir9"] == "new entries 9", db["dir9"]
+        fetched = sorted([k for k, v in db._dict.items() if type(v) is not tuple])
+        assert fetched == ["dir3", "dir9"], fetched
+
+    def test_version_1(self):
+        """Test reading and upgrading a version 1 (journal-only) file"""
+        record = SCons.dblog.pack_record("foo", "bar")
+        self.test.write("tmp.dblog", SCons.dblog.magic_v1 + record)
+        assert SCons.dblog.is_dblog("tmp.dblog")
+        db = SCons.dblog.open("tmp", "c")
+        assert db["foo"] == "bar", db["foo"]
+        db["baz"] = "quux"
+        db.sync()
+        contents = self.test.read("tmp.dblog")
+        assert contents.startswith(SCons.dblog.magic), repr(contents)
+        db = SCons.dblog.open("tmp", "r")
+        assert db["foo"] == "bar", db["foo"]
+        assert db["baz"] == "quux", db["baz"]
+
+    def test_corrupt(self):
+        """Test reading a file that isn't a dblog journal"""
+        self.test.write("tmp.dblog", "not a journal\n")
+        try:
+            SCons.dblog.open("tmp", "r")
+        except SCons.dblog.CorruptDatabase:
+            pass
+        else:
+            raise Exception("CorruptDatabase expected.")
+
+        SCons.dblog.ignore_corrupt_dbfiles = 2
+        db = SCons.dblog.open("tmp", "c")
+        assert len(db) == 0, len(db)
+        db["foo"] = "bar"
+        db.sync()
+        assert SCons.dblog.is_dblog("tmp.dblog")
+        db = SCons.dblog.open("tmp", "r")
+        assert db["foo"] == "bar", db["foo"]
+
+    def test_missing(self):
+        """Test opening a non-existent dblog file"""
+        try:
+            SCons.dblog.open("tmp", "w")
+        except IOError:
+            pass
+        else:
+            raise Exception("IOError expected.")
+        db = SCons.dblog.open("tmp", "c")
+        assert len(db) == 0, len(db)
+        assert SCons.dblog.is_dblog("tmp.dblog")
+        assert not SCons.dblog.is_dblog("no_such_file.dblog")
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(dblogTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
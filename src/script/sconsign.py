@@ -177,16 +177,21 @@ import pickle
 import imp
 
 import SCons.SConsign
+import SCons.dblog
 
 def my_whichdb(filename):
     if filename[-7:] == ".dblite":
         return "SCons.dblite"
+    if filename[-6:] == ".dblog":
+        return "SCons.dblog"
     try:
         f = open(filename + ".dblite", "rb")
         f.close()
         return "SCons.dblite"
     except IOError:
         pass
+    if SCons.dblog.is_dblog(filename + ".dblog"):
+        return "SCons.dblog"
     return _orig_whichdb(filename)
 
 _orig_whichdb = whichdb.whichdb
@@ -278,7 +283,7 @@ def field(name, entry, verbose=Verbose):
 def nodeinfo_raw(name, ninfo, prefix=""):
     # This just formats the dictionary, which we would normally use str()
     # to do, except that we want the keys sorted for deterministic output.
-    d = ninfo.__dict__
+    d = ninfo.__getstate__()
     try:
         keys = ninfo.field_list + ['_version_id']
     except AttributeError:
@@ -336,6 +341,8 @@ def printentries(entries, location):
                 printfield(name, entry.binfo)
     else:
         for name in sorted(entries.keys()):
+            if name == SCons.SConsign.HashFormatKey:
+                continue
             entry = entries[name]
             try:
                 ninfo = entry.ninfo
@@ -345,10 +352,21 @@ def printentries(entries, location):
                 print nodeinfo_string(name, entry.ninfo)
             printfield(name, entry.binfo)
 
+def expand_paths(entries, paths):
+    """Put the dependency paths from the path table back in place of
+    their indexes in the entries' build info."""
+    for name, entry in entries.items():
+        try:
+            binfo = entry.binfo
+        except AttributeError:
+            continue
+        binfo.convert_from_sconsign(None, name, paths)
+
 class Do_SConsignDB(object):
     def __init__(self, dbm_name, dbm):
         self.dbm_name = dbm_name
         self.dbm = dbm
+        self.paths = None
 
     def __call__(self, fname):
         # The *dbm modules stick their own file suffixes on the names
@@ -390,6 +408,8 @@ class Do_SConsignDB(object):
             sys.stderr.write("sconsign: ignoring invalid `%s' file `%s': %s\n" % (self.dbm_name, fname, e))
             return
 
+        self.paths = SCons.SConsign.Get_PathTable(db)
+
         if Print_Directories:
             for dir in Print_Directories:
                 try:
@@ -400,11 +420,15 @@ class Do_SConsignDB(object):
                     self.printentries(dir, val)
         else:
             for dir in sorted(db.keys()):
+                if dir == SCons.SConsign.PathTableKey:
+                    continue
                 self.printentries(dir, db[dir])
 
     def printentries(self, dir, val):
         print '=== ' + dir + ':'
-        printentries(pickle.loads(val), dir)
+        entries = pickle.loads(val)
+        expand_paths(entries, self.paths)
+        printentries(entries, dir)
 
 def Do_SConsignDir(name):
     try:
@@ -422,6 +446,7 @@ def Do_SConsignDir(name):
     except Exception, e:
         sys.stderr.write("sconsign: ignoring invalid .sconsign file `%s': %s\n" % (name, e))
         return
+    expand_paths(sconsign.entries, sconsign.paths)
     printentries(sconsign.entries, args[0])
 
 ##############################################################################
@@ -464,6 +489,7 @@ for o, a in opts:
         Print_Entries.append(a)
     elif o in ('-f', '--format'):
         Module_Map = {'dblite'   : 'SCons.dblite',
+                      'dblog'    : 'SCons.dblog',
                       'sconsign' : None}
         dbm_name = Module_Map.get(a, a)
         if dbm_name:
@@ -499,7 +525,8 @@ else:
     for a in args:
         dbm_name = whichdb.whichdb(a)
         if dbm_name:
-            Map_Module = {'SCons.dblite' : 'dblite'}
+            Map_Module = {'SCons.dblite' : 'dblite',
+                          'SCons.dblog'  : 'dblog'}
             dbm = my_import(dbm_name)
             Do_SConsignDB(Map_Module.get(dbm_name, dbm_name), dbm)(a)
         else:
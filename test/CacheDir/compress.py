@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify the compress and compress_level arguments of CacheDir():  built
+files are compressed into the cache and decompressed out of it, builds
+that don't compress still retrieve the compressed files, and
+--cache-debug reports how many bytes compressing saved.
+"""
+
+import os
+import re
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+CacheDir('cache', compress = ARGUMENTS.get('compress'), compress_level = 9)
+Command('big.out', 'big.in', Copy('$TARGET', '$SOURCE'))
+Command('small.out', 'small.in', Copy('$TARGET', '$SOURCE'))
+""")
+
+big = ''.join(['line %d\n' % i for i in range(10000)])
+test.write('big.in', big)
+test.write('small.in', "small.in\n")
+
+def cache_files():
+    result = []
+    for dirpath, dirnames, filenames in os.walk(test.workpath('cache')):
+        result.extend([f for f in filenames if f[0] != '.'])
+    return result
+
+test.run(arguments = '--cache-debug=- compress=gzip .')
+files = cache_files()
+test.fail_test(len(files) != 2)
+test.fail_test([f for f in files if not f.endswith('.gz')])
+stats = re.search(r'CacheStats\(cache\):  pushed 2 files, (\d+) bytes as (\d+) bytes \((\d+) saved\)',
+                  test.stdout())
+test.fail_test(stats is None)
+size, stored, saved = list(map(int, stats.groups()))
+test.fail_test(size != len(big) + len("small.in\n"))
+test.fail_test(saved != size - stored or stored * 3 > size)
+
+test.run(arguments = '-c .')
+test.run(arguments = 'compress=gzip .')
+test.fail_test(test.stdout().count('Retrieved') != 2)
+test.must_match('big.out', big)
+test.must_match('small.out', "small.in\n")
+
+# A build that doesn't compress adds uncompressed files to the same
+# cache, and retrieves the compressed ones.
+test.write('small.in', "small.in 2\n")
+test.run(arguments = '-c .')
+test.run(arguments = '.')
+test.fail_test(test.stdout().count('Retrieved') != 1)
+test.must_match('big.out', big)
+test.must_match('small.out', "small.in 2\n")
+files = cache_files()
+test.fail_test(len(files) != 3)
+test.fail_test(len([f for f in files if f.endswith('.gz')]) != 2)
+
+test.run(arguments = '-c .')
+test.run(arguments = 'compress=gzip .')
+test.fail_test(test.stdout().count('Retrieved') != 2)
+test.must_match('small.out', "small.in 2\n")
+
+test.run(arguments = 'compress=lzw .', status = 2,
+         stderr = None)
+test.fail_test(test.stderr().find("Unsupported CacheDir compress codec 'lzw'") == -1)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
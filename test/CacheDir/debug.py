@@ -25,7 +25,9 @@
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 """
-Test the --cache-debug option to see if it prints the expected messages.
+Test the --cache-debug option to see if it prints the expected messages,
+including the summary of what was pushed and retrieved at the end of
+the build.
 
 Note that we don't check for the "race condition" message when someone
 else's build populates the CacheDir with a file in between the time we
@@ -111,6 +113,7 @@ CachePush\(ccc.out\):  pushing to [0-9a-fA-F]+
 CacheRetrieve\(all\):  [0-9a-fA-F]+ not in cache
 cat\(\["all"\], \["aaa.out", "bbb.out", "ccc.out"\]\)
 CachePush\(all\):  pushing to [0-9a-fA-F]+
+CacheStats\(.*cache\):  pushed 4 files, 42 bytes as 42 bytes \(0 saved\) in [0-9.]+ seconds
 """
 
 test.run(chdir='src',
@@ -165,6 +168,7 @@ r"""CacheRetrieve\(aaa.out\):  retrieving from [0-9a-fA-F]+
 CacheRetrieve\(bbb.out\):  retrieving from [0-9a-fA-F]+
 CacheRetrieve\(ccc.out\):  retrieving from [0-9a-fA-F]+
 CacheRetrieve\(all\):  retrieving from [0-9a-fA-F]+
+CacheStats\(.*cache\):  retrieved 4 files, 42 bytes as 42 bytes \(0 saved\) in [0-9.]+ seconds
 """
 
 test.must_match(debug_out, expect, mode='r')
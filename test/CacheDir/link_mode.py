@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify the link_mode argument of CacheDir():  hard-linked files share
+the cache entry and can't be written in place, and files that can't
+be linked or cloned are copied.
+"""
+
+import os
+import stat
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+if not hasattr(os, 'link'):
+    import sys
+    test.skip_test('%s has no os.link() method; skipping test\n' % sys.executable)
+
+test.write('build.py', r"""
+import sys
+open(sys.argv[1], 'wb').write(open(sys.argv[2], 'rb').read())
+""")
+
+test.write('SConstruct', """\
+CacheDir('cache', link_mode = ARGUMENTS.get('mode', 'hardlink'))
+Command('out.txt', 'in.txt', r'%(_python_)s build.py $TARGET $SOURCE')
+Precious(Command('precious.txt', 'in.txt',
+                 r'%(_python_)s build.py $TARGET $SOURCE'))
+""" % locals())
+
+test.write('in.txt', "in.txt\n")
+
+def cache_entry(name):
+    for dirpath, dirnames, filenames in os.walk(test.workpath('cache')):
+        for f in filenames:
+            path = os.path.join(dirpath, f)
+            if test.read(path) == test.read(name) and \
+               os.path.samefile(path, test.workpath(name)):
+                return path
+    return None
+
+def writable(name):
+    return os.stat(test.workpath(name))[stat.ST_MODE] & stat.S_IWUSR
+
+test.run(arguments = '.')
+test.must_match('out.txt', "in.txt\n")
+test.fail_test(cache_entry('out.txt') is None)
+test.fail_test(writable('out.txt'))
+test.fail_test(cache_entry('precious.txt') is not None)
+test.fail_test(not writable('precious.txt'))
+
+test.run(arguments = '-c .')
+test.must_not_exist('out.txt')
+
+test.run(arguments = '.', stdout = test.wrap_stdout("""\
+Retrieved `out.txt' from cache
+Retrieved `precious.txt' from cache
+"""))
+test.must_match('out.txt', "in.txt\n")
+test.fail_test(cache_entry('out.txt') is None)
+test.fail_test(cache_entry('precious.txt') is not None)
+test.up_to_date(arguments = '.')
+
+# Rebuilding writes a new file, and leaves the cache entry alone.
+entry = cache_entry('out.txt')
+test.write('in.txt', "in.txt 2\n")
+test.run(arguments = '.')
+test.must_match('out.txt', "in.txt 2\n")
+test.fail_test(test.read(entry) != "in.txt\n")
+
+# Files that can't be cloned get copied.
+test.run(arguments = '-c .')
+test.run(arguments = 'mode=reflink .')
+test.must_match('out.txt', "in.txt 2\n")
+test.fail_test(cache_entry('out.txt') is not None)
+
+expect = TestSCons.re_escape("""
+scons: *** Unknown CacheDir link_mode 'symlink'; expected one of copy, hardlink, reflink.
+""") + TestSCons.file_expr
+test.run(arguments = 'mode=symlink .', status = 2, stderr = expect,
+         match = TestSCons.match_re_dotall)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
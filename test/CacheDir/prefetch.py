@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --cache-prefetch retrieves the targets from the cache
+before the build starts, including targets built from other retrieved
+targets and targets built together by one action, and that targets
+that aren't in the cache are left to be built as usual.
+"""
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+CacheDir('cache')
+SetOption('cache_prefetch', int(ARGUMENTS.get('prefetch', 0)))
+env = Environment()
+env.Command('a.mid', 'a.in', Copy('$TARGET', '$SOURCE'))
+env.Command('a.out', 'a.mid', Copy('$TARGET', '$SOURCE'))
+env.Command('b.out', 'b.in', Copy('$TARGET', '$SOURCE'))
+env.Command(['c1.out', 'c2.out'], 'b.in',
+            [Copy('${TARGETS[0]}', '$SOURCE'),
+             Copy('${TARGETS[1]}', '$SOURCE')])
+env.Command('d.out', ['a.out', 'c2.out'], Copy('$TARGET', '$SOURCE'))
+NoCache(env.Command('e.out', 'a.in', Copy('$TARGET', '$SOURCE')))
+""")
+
+test.write('a.in', "a.in\n")
+test.write('b.in', "b.in\n")
+
+test.run(arguments = '.')
+
+# Everything but the NoCache target is retrieved, in three rounds,
+# before the Taskmaster builds anything.
+test.run(arguments = '-c .')
+test.run(arguments = '--cache-prefetch=4 --cache-debug=debug.txt .')
+stdout = test.stdout()
+test.fail_test(stdout.count('Retrieved') != 6)
+test.fail_test(stdout.find('Copy("e.out", "a.in")') == -1)
+test.fail_test(stdout.find('Retrieved') > stdout.find('Copy('))
+test.fail_test(test.read('debug.txt').find(
+    'CachePrefetch(cache):  retrieved 6 of 6 targets in 3 rounds') == -1)
+test.must_match('d.out', "a.in\n")
+test.must_match('c1.out', "b.in\n")
+test.must_match('c2.out', "b.in\n")
+
+test.up_to_date(options = '--cache-prefetch=4', arguments = '.')
+
+# Targets depending on a changed source aren't in the cache yet, so
+# they're built, and nothing else is retrieved again.
+test.write('b.in', "b.in 2\n")
+test.run(arguments = '--cache-prefetch=4 .')
+stdout = test.stdout()
+test.fail_test(stdout.find('Retrieved') != -1)
+test.fail_test(stdout.find('Copy("b.out", "b.in")') == -1)
+test.fail_test(stdout.find('Copy("d.out", "a.out")') == -1)
+test.fail_test(stdout.find('Copy("a.out", "a.mid")') != -1)
+
+# SetOption() works, too, and the targets that were just built can be
+# retrieved.
+test.run(arguments = '-c .')
+test.run(arguments = '--cache-debug=debug.txt prefetch=2 .')
+test.fail_test(test.stdout().count('Retrieved') != 6)
+test.fail_test(test.read('debug.txt').find('CachePrefetch(cache):') == -1)
+
+test.up_to_date(arguments = '.')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify the max_entries and max_size arguments of CacheDir():  builds
+remove the least recently used files from a cache that grows past its
+limits, and --cache-prune prunes the cache without building anything,
+indexing files put there by builds without limits first.
+"""
+
+import os
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+max_entries = ARGUMENTS.get('max_entries')
+if max_entries:
+    max_entries = int(max_entries)
+CacheDir('cache', max_entries = max_entries, max_size = ARGUMENTS.get('max_size'))
+for i in range(5):
+    Command('out%d.txt' % i, 'in%d.txt' % i, Copy('$TARGET', '$SOURCE'))
+""")
+
+for i in range(5):
+    test.write('in%d.txt' % i, "in%d.txt\n" % i)
+
+def cache_entries():
+    result = []
+    for dirpath, dirnames, filenames in os.walk(test.workpath('cache')):
+        result.extend([f for f in filenames if f[0] != '.'])
+    return len(result)
+
+# A cache without limits keeps everything, and has no index.
+test.run(arguments = '.')
+test.fail_test(cache_entries() != 5)
+test.must_not_exist(['cache', '.scons_index'])
+
+# --cache-prune indexes what's there, and doesn't build anything.
+test.run(arguments = '-c .')
+test.run(arguments = '-Q --cache-prune max_entries=3', stdout = """\
+scons: pruned cache: removed 3 files (24 bytes), 2 files (16 bytes) left.
+""")
+test.fail_test(cache_entries() != 2)
+test.must_exist(['cache', '.scons_index'])
+for i in range(5):
+    test.must_not_exist('out%d.txt' % i)
+
+# The build retrieves what's left, and prunes what it pushes.
+test.run(arguments = 'max_entries=3 .')
+test.fail_test(test.stdout().count('Retrieved') != 2)
+test.fail_test(cache_entries() != 2)
+for i in range(5):
+    test.must_match('out%d.txt' % i, "in%d.txt\n" % i)
+
+test.run(arguments = '-Q --cache-prune max_size=10', stdout = """\
+scons: pruned cache: removed 1 files (8 bytes), 1 files (8 bytes) left.
+""")
+test.fail_test(cache_entries() != 1)
+
+test.run(arguments = '-Q --cache-prune max_size=10', stdout = """\
+scons: pruned cache: removed 0 files (0 bytes), 1 files (8 bytes) left.
+""")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
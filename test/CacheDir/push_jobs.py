@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify the push_jobs argument of CacheDir():  built files are pushed
+to the cache by background threads, the build waits for them unless
+--cache-skip-flush is used, and failed pushes are reported as
+cache-write-error warnings.
+"""
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+CacheDir(ARGUMENTS.get('cache', 'cache'), push_jobs = 2)
+for i in range(20):
+    Command('out%d.txt' % i, 'in%d.txt' % i, Copy('$TARGET', '$SOURCE'))
+""")
+
+for i in range(20):
+    test.write('in%d.txt' % i, "in%d.txt\n" % i)
+
+test.run(arguments = '-j 4 .')
+
+test.run(arguments = '-c .')
+test.run(arguments = '-j 4 .')
+test.fail_test(test.stdout().count('Retrieved') != 20)
+for i in range(20):
+    test.must_match('out%d.txt' % i, "in%d.txt\n" % i)
+
+test.run(arguments = '-c .')
+test.run(arguments = '--cache-skip-flush .')
+test.fail_test(test.stdout().count('Retrieved') != 20)
+
+test.write('not_a_dir', "not_a_dir\n")
+test.run(arguments = '-c .')
+test.run(arguments = '--warn=cache-write-error cache=not_a_dir .',
+         stderr = None)
+test.fail_test(test.stderr().count('scons: warning: Unable to copy') != 20)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -106,6 +106,7 @@ scons>>> Removed foo.out
 scons>>> Touch\("4"\)
 scons>>> Retrieved `foo.out' from cache
 CacheRetrieve\(foo.out\):  retrieving from [0-9A-za-z]+
+CacheStats\(cache\):  retrieved 1 files, 7 bytes as 7 bytes \(0 saved\) in [0-9.]+ seconds
 scons>>> Touch\("5"\)
 scons>>> 
 """
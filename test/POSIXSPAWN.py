@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Test using the POSIXSPAWN function as the SPAWN construction variable,
+for command lines that need the shell and ones that don't.
+"""
+
+import os
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+if os.name != 'posix':
+    test.skip_test('POSIXSPAWN is only used on POSIX systems; skipping test.\n')
+
+test.write('cat.py', """\
+import sys
+ofp = open(sys.argv[1], 'wb')
+for s in sys.argv[2:]:
+    ofp.write(open(s, 'rb').read())
+ofp.close()
+""")
+
+test.write('type.py', """\
+import sys
+for s in sys.argv[1:]:
+    sys.stdout.write(open(s, 'rb').read())
+""")
+
+test.write('SConstruct', """
+env = Environment(SPAWN = '$POSIXSPAWN')
+env.Command('file1.out', 'file1.in', r'%(_python_)s cat.py $TARGET $SOURCES')
+env.Command('file2.out', 'file2.in', r'%(_python_)s type.py $SOURCES > $TARGET')
+env.Command('file3.out', 'file3.in', 'exit 3')
+""" % locals())
+
+test.write('file1.in', "file1.in\n")
+test.write('file2.in', "file2.in\n")
+test.write('file3.in', "file3.in\n")
+
+test.run(arguments = '-k .', status = 2, stderr = None)
+
+test.must_match('file1.out', "file1.in\n")
+test.must_match('file2.out', "file2.in\n")
+test.must_not_exist('file3.out')
+test.fail_test(test.stderr().find('Error 3') == -1)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that the include names the C scanner finds in a file are stored
+in the .sconsign file and reused by later builds until the file's
+contents change, and that the stored names are still looked up along
+the current CPPPATH.
+"""
+
+import re
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.subdir('inc', 'inc2')
+
+test.write('SConstruct', """
+env = Environment(CPPPATH = [ARGUMENTS.get('inc', 'inc')])
+env.Command('main.out', 'main.c', Copy('$TARGET', '$SOURCE'),
+            source_scanner = CScanner)
+""")
+
+test.write('main.c', """\
+#include "a.h"
+#include <b.h>
+""")
+test.write(['inc', 'a.h'], "a.h 1\n")
+test.write(['inc', 'b.h'], "b.h 1\n")
+test.write(['inc2', 'b.h'], "inc2/b.h 1\n")
+
+def events(stdout):
+    result = {}
+    for count, name in re.findall('(\d+)   include names cache (\w+)', stdout):
+        result[name] = int(count)
+    return result
+
+def check(arguments, expect):
+    test.run(arguments = '--debug=count ' + arguments)
+    e = events(test.stdout())
+    if e != expect:
+        print "Expected include names cache events %s, got %s" % (expect, e)
+        test.fail_test(1)
+
+check('.', {'misses' : 3})
+test.must_match('main.out', '#include "a.h"\n#include <b.h>\n')
+
+# Nothing has changed, so no file is searched again.
+check('.', {'hits' : 3})
+test.fail_test(test.stdout().find("`.' is up to date.") == -1)
+
+# Only the changed file is searched again, and what it includes now
+# becomes a dependency.
+test.write(['inc', 'a.h'], '#include "c.h"\n')
+test.write(['inc', 'c.h'], "c.h 1\n")
+check('.', {'hits' : 2, 'misses' : 2})
+
+test.up_to_date(arguments = '.')
+test.write(['inc', 'c.h'], "c.h 2\n")
+check('.', {'hits' : 3, 'misses' : 1})
+test.fail_test(test.stdout().find('Copy("main.out", "main.c")') == -1)
+
+# The stored names are looked up along the new CPPPATH.
+check('inc=inc2 .', {'hits' : 1, 'misses' : 1})
+test.fail_test(test.stdout().find('Copy("main.out", "main.c")') == -1)
+
+test.up_to_date(options = 'inc=inc2', arguments = '.')
+test.write(['inc2', 'b.h'], "inc2/b.h 2\n")
+check('inc=inc2 .', {'hits' : 1, 'misses' : 1})
+test.fail_test(test.stdout().find('Copy("main.out", "main.c")') == -1)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that includes are found in the first CPPPATH directory that has
+them when the directories are searched through an index, including
+headers that are only built later and headers that shadow others, and
+that --debug=memoizer reports the index lookups.
+"""
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+dirs = ['inc%d' % i for i in range(8)]
+test.subdir(*dirs)
+
+test.write('SConstruct', """
+env = Environment(CPPPATH = %s)
+env.Command('main.out', 'main.c', Copy('$TARGET', '$SOURCE'),
+            source_scanner = CScanner)
+env.Command('inc5/gen.h', 'gen.in', Copy('$TARGET', '$SOURCE'))
+""" % repr(dirs))
+
+test.write('main.c', """\
+#include "a.h"
+#include <b.h>
+#include "gen.h"
+#include "missing.h"
+""")
+test.write(['inc6', 'a.h'], "inc6/a.h\n")
+test.write(['inc2', 'b.h'], '#include "c.h"\n')
+test.write(['inc7', 'b.h'], "inc7/b.h\n")
+test.write(['inc4', 'c.h'], "inc4/c.h\n")
+test.write(['inc7', 'c.h'], "inc7/c.h\n")
+test.write(['inc6', 'gen.h'], "inc6/gen.h\n")
+test.write('gen.in', "gen.h\n")
+
+test.run(arguments = '--debug=memoizer --tree=prune main.out')
+
+expect = """\
++-main.out
+  +-main.c
+  +-inc6/a.h
+  +-inc5/gen.h
+  | +-gen.in
+  +-inc2/b.h
+  +-inc4/c.h
+"""
+test.must_contain_all_lines(test.stdout(), [expect])
+test.must_contain_all_lines(test.stdout(), ['FileFinder.index_lookup()'])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --critical-path and SetOption('critical_path') start the
+targets that took longest in the previous build first, and that the
+scheduling shows up in --taskmastertrace output.
+"""
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.write('build.py', r"""
+import sys
+import time
+target = sys.argv[1]
+if target.startswith('slow'):
+    time.sleep(1)
+open(target, 'wb').write(open(sys.argv[2], 'rb').read())
+open('order.log', 'ab').write(target + '\n')
+""")
+
+test.write('SConstruct', """
+B = Builder(action = r'%(_python_)s build.py $TARGET $SOURCE')
+env = Environment(BUILDERS = { 'B' : B })
+env.B(target = 'a.out', source = 'a.in')
+env.B(target = 'b.out', source = 'b.in')
+env.B(target = 'slow.out', source = 'slow.in')
+""" % locals())
+
+for name in ['a', 'b', 'slow']:
+    test.write(name + '.in', name + ".in\n")
+
+test.run(arguments = '.')
+test.must_match('order.log', "a.out\nb.out\nslow.out\n")
+
+test.up_to_date(options = '--critical-path', arguments = '.')
+
+# The durations from the previous build put slow.out first.
+for name in ['a', 'b', 'slow']:
+    test.write(name + '.in', name + ".in 2\n")
+test.unlink('order.log')
+
+test.run(arguments = '--critical-path --taskmastertrace=trace.out .')
+# a.out and b.out take about as long as each other, so only check
+# that slow.out came first.
+order = test.read('order.log').split('\n')
+test.fail_test(order[0] != 'slow.out')
+test.must_contain('trace.out', "Adding <pending    0   'slow.out'> to the ready heap")
+
+test.up_to_date(options = '--critical-path', arguments = '.')
+
+test.write('SConstruct', """
+SetOption('critical_path', True)
+B = Builder(action = r'%(_python_)s build.py $TARGET $SOURCE')
+env = Environment(BUILDERS = { 'B' : B })
+env.B(target = 'a.out', source = 'a.in')
+env.B(target = 'b.out', source = 'b.in')
+env.B(target = 'slow.out', source = 'slow.in')
+""" % locals())
+
+for name in ['a', 'b', 'slow']:
+    test.write(name + '.in', name + ".in 3\n")
+test.unlink('order.log')
+
+test.run(arguments = '-j 2 .')
+test.must_contain('order.log', "slow.out\n")
+
+test.run(arguments = '--random --critical-path .')
+test.up_to_date(options = '--random --critical-path', arguments = '.')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that the build daemon leaves builds to the client when the
+environment variables or the options the SConscript files fetched are
+different in the client, and that it reads the SConscript files again
+when site_scons files or modules they imported change.
+"""
+
+import os
+import signal
+
+import TestSCons
+
+if not hasattr(os, 'mkfifo'):
+    TestSCons.TestSCons().skip_test('No FIFOs on this platform; skipping test.\n')
+
+test = TestSCons.TestSCons()
+
+test.subdir('site_scons', 'lib')
+
+test.write(['site_scons', 'site_init.py'], "site_word = 'one'\n")
+test.write(['lib', 'wordmod.py'], "word = 'a'\n")
+
+test.write('SConstruct', """\
+import os
+import sys
+print "reading SConstruct"
+sys.path.append('lib')
+import wordmod
+AddOption('--greeting', dest='greeting', default='hello')
+def write(target, source, env):
+    open(str(target[0]), 'w').write(env['GREETING'] + '\\n')
+env = Environment(GREETING = ' '.join([GetOption('greeting'),
+                                       os.environ.get('DAEMON_NAME', 'world'),
+                                       site_word,
+                                       wordmod.word]))
+env.Command('greeting.txt', [], Action(write, varlist = ['GREETING']))
+""")
+
+daemon = test.start(arguments = '--daemon')
+
+test.wait_for(test.workpath('.sconsd'), popen=daemon)
+
+built = 'write(["greeting.txt"], [])\n'
+read = 'reading SConstruct\n'
+
+test.run(arguments = '-Q greeting.txt', stdout = built)
+test.must_match('greeting.txt', "hello world one a\n")
+
+# A different value for an environment variable the SConstruct fetched.
+os.environ['DAEMON_NAME'] = 'there'
+test.run(arguments = '-Q greeting.txt', stdout = read + built)
+test.must_match('greeting.txt', "hello there one a\n")
+del os.environ['DAEMON_NAME']
+
+# A different value for an option the SConstruct fetched.
+test.run(arguments = '-Q --greeting=hi greeting.txt', stdout = read + built)
+test.must_match('greeting.txt', "hi world one a\n")
+
+test.run(arguments = '-Q greeting.txt', stdout = built)
+test.must_match('greeting.txt', "hello world one a\n")
+
+# A changed site_init.py, or a changed module, is read again by the
+# daemon.
+test.write(['site_scons', 'site_init.py'], "site_word = 'three'\n")
+test.run(arguments = '-Q greeting.txt', stdout = built)
+test.must_match('greeting.txt', "hello world three a\n")
+
+test.write(['lib', 'wordmod.py'], "word = 'bb'\n")
+test.run(arguments = '-Q greeting.txt', stdout = built)
+test.must_match('greeting.txt', "hello world three bb\n")
+
+os.kill(daemon.pid, signal.SIGTERM)
+test.finish(daemon, stdout = None)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
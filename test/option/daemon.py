@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that "scons --daemon" keeps the SConscript files loaded and
+builds for later scons invocations in the same directory, re-reads
+the SConscript files when they change, and removes its socket when
+it's stopped.
+"""
+
+import os
+import signal
+import sys
+
+import TestSCons
+
+if not hasattr(os, 'mkfifo'):
+    TestSCons.TestSCons().skip_test('No FIFOs on this platform; skipping test.\n')
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+def fail(target, source, env):
+    return 3
+env = Environment()
+env.Command('out.txt', 'in.txt', Copy('$TARGET', '$SOURCE'))
+env.Command('fail', [], fail)
+Default('out.txt')
+""")
+
+test.write('in.txt', "in.txt 1\n")
+
+daemon = test.start(arguments = '--daemon')
+
+test.wait_for(test.workpath('.sconsd'), popen=daemon)
+
+# The SConscript files aren't read again.
+expect = """\
+scons: Building targets ...
+Copy("out.txt", "in.txt")
+scons: done building targets.
+"""
+
+test.run(stdout = expect)
+test.must_match('out.txt', "in.txt 1\n")
+
+test.run(arguments = '-Q', stdout = "scons: `out.txt' is up to date.\n")
+
+test.write('in.txt', "in.txt 2\n")
+
+test.run(arguments = '-Q', stdout = 'Copy("out.txt", "in.txt")\n')
+test.must_match('out.txt', "in.txt 2\n")
+
+test.run(arguments = '-Q fail',
+         stdout = 'fail(["fail"], [])\n',
+         stderr = "scons: *** [fail] Error 3\n",
+         status = 2)
+
+test.run(arguments = '--daemon', status = 2, stderr = None)
+test.must_contain_all_lines(test.stderr(),
+                            ["scons: *** A build daemon is already running"])
+
+# A changed SConstruct is read again before building.
+test.write('SConstruct', """\
+env = Environment()
+env.Command('out.txt', 'in.txt', Copy('$TARGET', '$SOURCE'))
+env.Command('two.txt', 'in.txt', Copy('$TARGET', '$SOURCE'))
+Default('out.txt')
+""")
+
+test.run(arguments = '-Q two.txt', stdout = 'Copy("two.txt", "in.txt")\n')
+test.must_match('two.txt', "in.txt 2\n")
+
+# Different command-line variables are built without the daemon.
+test.run(arguments = '-Q X=1 .', stdout = "scons: `.' is up to date.\n")
+
+os.kill(daemon.pid, signal.SIGTERM)
+test.finish(daemon, stdout = None)
+test.must_contain_all_lines(test.stdout(), ["scons: build daemon stopped."])
+
+test.must_not_exist('.sconsd')
+
+test.up_to_date(arguments = '.')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Test the --debug=tools option, and that applying a tool to a construction
+environment with the same construction variable values as an earlier
+one repeats what the tool did instead of calling its generate() again,
+if the tool module sets cacheable = 1.
+"""
+
+import re
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.subdir('tools')
+
+test.write(['tools', 'mytool.py'], """\
+cacheable = 1
+def generate(env):
+    print "generate mytool", env['MYTOOL_IN']
+    env['MYTOOL_OUT'] = env['MYTOOL_IN'] + '.out'
+    env.AppendUnique(MYTOOL_LIST = ['x'])
+def exists(env):
+    return 1
+""")
+
+test.write(['tools', 'uncached.py'], """\
+def generate(env):
+    print "generate uncached"
+def exists(env):
+    return 1
+""")
+
+test.write('SConstruct', """\
+def make(value):
+    env = Environment(tools = ['mytool', 'uncached'], toolpath = ['tools'],
+                      MYTOOL_IN = value)
+    print env['MYTOOL_IN'], env['MYTOOL_OUT'], env['MYTOOL_LIST']
+make('a')
+make('a')
+make('b')
+""")
+
+expect_read = """\
+generate mytool a
+generate uncached
+a a.out ['x']
+generate uncached
+a a.out ['x']
+generate mytool b
+generate uncached
+b b.out ['x']
+"""
+
+test.run(arguments = '-Q --debug=tools .')
+stdout = test.stdout()
+test.fail_test(stdout[:len(expect_read)] != expect_read)
+test.must_contain_all_lines(stdout, [
+    "Tool application times (including the tools they apply):",
+])
+test.fail_test(not re.search(r'\n +3 +1 +\d+\.\d+  mytool\n', stdout))
+test.fail_test(not re.search(r'\n +3 +0 +\d+\.\d+  uncached\n', stdout))
+
+# Without the option, the tools are still only generated when needed,
+# but the times aren't printed.
+test.run(arguments = '-Q .')
+test.fail_test(test.stdout()[:len(expect_read)] != expect_read)
+test.fail_test(test.stdout().find('Tool application times') != -1)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --hash-format and SetHashFormat() switch the digest used
+for signatures, that changing the format forces a rebuild instead of
+comparing signatures of different kinds, and that CacheDir() keeps
+entries for each format apart.
+"""
+
+import os
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.write('build.py', r"""
+import sys
+file = open(sys.argv[1], 'wb')
+for src in sys.argv[2:]:
+    file.write(open(src, 'rb').read())
+file.close()
+""")
+
+SConstruct = """
+B = Builder(action = r'%(_python_)s build.py $TARGETS $SOURCES')
+env = Environment(BUILDERS = { 'B' : B })
+env.B(target = 'f1.out', source = 'f1.in')
+env.B(target = 'f2.out', source = 'f2.in')
+"""
+
+test.write('SConstruct', SConstruct % locals())
+
+test.write('f1.in', "f1.in\n")
+test.write('f2.in', "f2.in\n")
+
+expected_stdout = test.wrap_stdout("""\
+%(_python_)s build.py f1.out f1.in
+%(_python_)s build.py f2.out f2.in
+""" % locals())
+
+test.run(arguments = '.', stdout = expected_stdout)
+
+test.up_to_date(arguments = '.')
+
+test.run(arguments = '--hash-format=sha1 .', stdout = expected_stdout)
+
+test.up_to_date(options = '--hash-format=sha1', arguments = '.')
+
+test.write('SConstruct', "SetHashFormat('sha1')\n" + SConstruct % locals())
+
+test.up_to_date(arguments = '.')
+
+test.write('f1.in', "f1.in 2\n")
+
+test.run(arguments = '.', stdout = test.wrap_stdout("""\
+%(_python_)s build.py f1.out f1.in
+""" % locals()))
+
+test.up_to_date(arguments = '.')
+
+# The command line takes precedence over SetHashFormat().
+test.run(arguments = '--hash-format=md5 .', stdout = expected_stdout)
+
+test.run(arguments = '--hash-format=no_such_hash .',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(),
+                            ["`no_such_hash' is not an available hash format"])
+
+test.write('SConstruct', """
+SetHashFormat('no_such_hash')
+""")
+
+test.run(arguments = '.',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(),
+                            ["Hash format `no_such_hash' is not available."])
+
+# Each hash format gets its own part of the cache.
+test.write('SConstruct', "CacheDir('cache')\n" + SConstruct % locals())
+
+test.run(arguments = '--cache-force .')
+test.run(arguments = '--hash-format=sha1 .')
+
+md5_entries = [d for d in os.listdir(test.workpath('cache')) if len(d) == 1]
+assert md5_entries, os.listdir(test.workpath('cache'))
+test.must_exist(test.workpath('cache', 'sha1'))
+for d in os.listdir(test.workpath('cache', 'sha1')):
+    for f in os.listdir(test.workpath('cache', 'sha1', d)):
+        assert len(f) == 40, f
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --hash-jobs and SetOption('hash_jobs') compute the source
+file signatures up front without changing what gets rebuilt.
+"""
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.write('build.py', r"""
+import sys
+file = open(sys.argv[1], 'wb')
+for src in sys.argv[2:]:
+    file.write(open(src, 'rb').read())
+file.close()
+""")
+
+test.write('SConstruct', """
+B = Builder(action = r'%(_python_)s build.py $TARGETS $SOURCES')
+env = Environment(BUILDERS = { 'B' : B })
+env.B(target = 'f1.out', source = ['f1.in', 'common.in'])
+env.B(target = 'f2.out', source = ['f2.in', 'common.in'])
+env.B(target = 'all.out', source = ['f1.out', 'f2.out'])
+""" % locals())
+
+test.write('f1.in', "f1.in\n")
+test.write('f2.in', "f2.in\n" * 10000)
+test.write('common.in', "common.in\n")
+
+test.run(arguments = '--hash-jobs=4 .')
+test.must_match('all.out', "f1.in\ncommon.in\n" + "f2.in\n" * 10000 + "common.in\n")
+
+test.up_to_date(options = '--hash-jobs=4', arguments = '.')
+
+test.write('common.in', "common.in 2\n")
+
+expected_stdout = test.wrap_stdout("""\
+%(_python_)s build.py f1.out f1.in common.in
+%(_python_)s build.py f2.out f2.in common.in
+%(_python_)s build.py all.out f1.out f2.out
+""" % locals())
+
+test.run(arguments = '--hash-jobs=4 .', stdout = expected_stdout)
+
+test.up_to_date(arguments = '.')
+
+test.write('f1.in', "f1.in 2\n")
+
+test.write('SConstruct', """
+SetOption('hash_jobs', 2)
+B = Builder(action = r'%(_python_)s build.py $TARGETS $SOURCES')
+env = Environment(BUILDERS = { 'B' : B })
+env.B(target = 'f1.out', source = ['f1.in', 'common.in'])
+env.B(target = 'f2.out', source = ['f2.in', 'common.in'])
+env.B(target = 'all.out', source = ['f1.out', 'f2.out'])
+""" % locals())
+
+expected_stdout = test.wrap_stdout("""\
+%(_python_)s build.py f1.out f1.in common.in
+%(_python_)s build.py all.out f1.out f2.out
+""" % locals())
+
+test.run(arguments = '.', stdout = expected_stdout)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --process-jobs and SetOption('process_jobs') run the
+Textfile, Substfile and Install actions, and any Python function
+action with a pool= argument, in worker processes.
+"""
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+# Worker processes can only run functions they can import.
+test.subdir('site_scons')
+
+test.write(['site_scons', 'pidfile.py'], """
+import os
+
+def write_pid(path):
+    open(path, 'w').write(str(os.getpid()))
+    return 0
+""")
+
+test.write('SConstruct', """
+import os
+from pidfile import write_pid
+
+def pid_action(target, source, env):
+    return write_pid(target[0].get_abspath())
+
+def pid_pool(target, source, env):
+    return write_pid, (target[0].get_abspath(),)
+
+open('main.pid', 'w').write(str(os.getpid()))
+
+env = Environment(tools = ['textfile', 'install'])
+env.Command('worker.pid', [], Action(pid_action, pool = pid_pool))
+env.Textfile('text', ['line 1', 'line 2'])
+env.Substfile('subst.txt', 'subst.in', SUBST_DICT = {'@VERSION@' : '1.0'})
+env.Install('inst', ['text.txt', 'subst.txt'])
+""")
+
+test.write('subst.in', "version @VERSION@\n")
+
+test.run(arguments = '-j 2 --process-jobs=2 .')
+
+test.must_match('text.txt', "line 1\nline 2")
+test.must_match('subst.txt', "version 1.0\n")
+test.must_match(['inst', 'text.txt'], "line 1\nline 2")
+test.must_match(['inst', 'subst.txt'], "version 1.0\n")
+
+main_pid = test.read('main.pid')
+worker_pid = test.read('worker.pid')
+test.fail_test(main_pid == worker_pid)
+
+test.up_to_date(options = '-j 2 --process-jobs=2', arguments = '.')
+
+# Without --process-jobs, the action runs in the main process.
+test.run(arguments = '-c worker.pid')
+test.run(arguments = '-j 2 worker.pid')
+test.must_match('worker.pid', test.read('main.pid'))
+
+test.write('SConstruct', """
+SetOption('process_jobs', 2)
+env = Environment(tools = ['textfile'])
+env.Substfile('subst.txt', 'subst.in', SUBST_DICT = {'@VERSION@' : '2.0'})
+""")
+
+test.run(arguments = '-j 2 .')
+
+test.must_match('subst.txt', "version 2.0\n")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that the --sconscript-cache option loads the state left behind
+by the SConscript files instead of reading them again, and that the
+SConscript files are read again when a file they read, an environment
+variable they fetched, a command-line variable or an option they
+fetched changes.
+"""
+
+import os
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.subdir('sub')
+
+test.write('SConstruct', """\
+import os
+print "reading SConstruct"
+def cat(target, source, env):
+    f = open(str(target[0]), 'wb')
+    f.write(env['PREFIX'])
+    for s in source:
+        f.write(open(str(s), 'rb').read())
+    f.close()
+env = Environment(PREFIX = os.environ.get('SCONSCRIPT_CACHE_PREFIX', '') +
+                           ARGUMENTS.get('suffix', '') +
+                           str(GetOption('silent')) + '\\n')
+env.Command('out.txt', 'in.txt', Action(cat, varlist = ['PREFIX']))
+env.Command('copy.txt', 'in.txt', Copy('$TARGET', '$SOURCE'))
+Default('out.txt', 'copy.txt')
+Help("Help text\\n")
+SConscript('sub/SConscript', exports = 'env')
+""")
+
+test.write(['sub', 'SConscript'], """\
+Import('env')
+print "reading sub/SConscript 1"
+Alias('sub', env.Command('sub.txt', 'sub.in', Copy('$TARGET', '$SOURCE')))
+""")
+
+test.write('in.txt', "in.txt 1\n")
+test.write(['sub', 'sub.in'], "sub.in 1\n")
+
+expect_read = test.wrap_stdout(read_str = """\
+reading SConstruct
+reading sub/SConscript 1
+""", build_str = """\
+cat(["out.txt"], ["in.txt"])
+Copy("copy.txt", "in.txt")
+""")
+
+test.run(arguments = '--sconscript-cache', stdout = expect_read)
+test.must_exist('.sconscript_cache')
+test.must_match('out.txt', "False\nin.txt 1\n")
+
+# Nothing changed, so the SConscript files aren't read.
+expect = test.wrap_stdout(read_str = """\
+scons: using the cached SConscript state in %s
+""" % test.workpath('.sconscript_cache'), build_str = """\
+scons: `out.txt' is up to date.
+scons: `copy.txt' is up to date.
+""")
+
+test.run(arguments = '--sconscript-cache', stdout = expect)
+
+# The loaded dependency graph rebuilds changed sources.
+test.write('in.txt', "in.txt 2\n")
+
+expect = test.wrap_stdout(read_str = """\
+scons: using the cached SConscript state in %s
+""" % test.workpath('.sconscript_cache'), build_str = """\
+cat(["out.txt"], ["in.txt"])
+Copy("copy.txt", "in.txt")
+""")
+
+test.run(arguments = '--sconscript-cache', stdout = expect)
+test.must_match('out.txt', "False\nin.txt 2\n")
+test.must_match('copy.txt', "in.txt 2\n")
+
+# The Help() text and aliases come from the cache, too.  The cache
+# holds the state for one command line, and -h is part of it.
+test.run(arguments = '--sconscript-cache -Q -h')
+test.fail_test(test.stdout().find('reading SConstruct') == -1)
+test.run(arguments = '--sconscript-cache -Q -h')
+test.fail_test(test.stdout().find('reading SConstruct') != -1)
+test.fail_test(test.stdout().find('Help text') == -1)
+
+test.run(arguments = '--sconscript-cache -Q sub',
+         stdout = "reading SConstruct\n"
+                  "reading sub/SConscript 1\n"
+                  "Copy(\"sub/sub.txt\", \"sub/sub.in\")\n")
+
+test.run(arguments = '--sconscript-cache -Q sub',
+         stdout = "scons: `sub' is up to date.\n")
+
+# Changing an SConscript file reads them again.
+test.write(['sub', 'SConscript'], """\
+Import('env')
+print "reading sub/SConscript 2"
+Alias('sub', env.Command('sub.txt', 'sub.in', Copy('$TARGET', '$SOURCE')))
+""")
+
+test.run(arguments = '--sconscript-cache -Q sub',
+         stdout = "reading SConstruct\n"
+                  "reading sub/SConscript 2\n"
+                  "scons: `sub' is up to date.\n")
+
+test.run(arguments = '--sconscript-cache -Q sub',
+         stdout = "scons: `sub' is up to date.\n")
+
+# So does changing an environment variable they fetched...
+test.run(arguments = '--sconscript-cache -Q')
+os.environ['SCONSCRIPT_CACHE_PREFIX'] = 'env '
+test.run(arguments = '--sconscript-cache -Q',
+         stdout = "reading SConstruct\n"
+                  "reading sub/SConscript 2\n"
+                  "cat([\"out.txt\"], [\"in.txt\"])\n"
+                  "scons: `copy.txt' is up to date.\n")
+test.must_match('out.txt', "env False\nin.txt 2\n")
+
+test.run(arguments = '--sconscript-cache -Q',
+         stdout = "scons: `out.txt' is up to date.\n"
+                  "scons: `copy.txt' is up to date.\n")
+
+# ...a command-line variable...
+test.run(arguments = '--sconscript-cache -Q suffix=x',
+         stdout = "reading SConstruct\n"
+                  "reading sub/SConscript 2\n"
+                  "cat([\"out.txt\"], [\"in.txt\"])\n"
+                  "scons: `copy.txt' is up to date.\n")
+test.must_match('out.txt', "env xFalse\nin.txt 2\n")
+
+# ...or an option they fetched.
+test.run(arguments = '--sconscript-cache -Q -s suffix=x',
+         stdout = "reading SConstruct\n"
+                  "reading sub/SConscript 2\n")
+test.must_match('out.txt', "env xTrue\nin.txt 2\n")
+
+test.run(arguments = '--sconscript-cache -Q -s suffix=x', stdout = "")
+
+# State that can't be saved leaves the SConscript files to be read.
+test.write(['sub', 'SConscript'], """\
+Import('env')
+print "reading sub/SConscript 3"
+env['FILE'] = open('sub.in')
+""")
+
+expect_stderr = """
+scons: warning: Not caching the SConscript state:  Can't pickle open file 'sub.in'
+""" + TestSCons.file_expr
+
+test.run(arguments = '--sconscript-cache -Q -s suffix=x',
+         stdout = "reading SConstruct\nreading sub/SConscript 3\n",
+         stderr = expect_stderr,
+         match = TestSCons.match_re_dotall)
+test.must_not_exist('.sconscript_cache')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -155,7 +155,7 @@ test.run_sconsign(arguments = "-e hello.exe -e hello.obj sub1/.sconsign",
         fake_link\.py: None \d+ \d+
         %(sig_re)s \[.*\]
 hello.obj: %(sig_re)s \d+ \d+
-        %(sub1_hello_c)s: None \d+ \d+
+        %(sub1_hello_c)s: [0-9a-fA-F]{32} \d+ \d+
         fake_cc\.py: None \d+ \d+
         %(sig_re)s \[.*\]
 """ % locals())
@@ -166,7 +166,7 @@ test.run_sconsign(arguments = "-e hello.exe -e hello.obj -r sub1/.sconsign",
         fake_link\.py: None '%(date_re)s' \d+
         %(sig_re)s \[.*\]
 hello.obj: %(sig_re)s '%(date_re)s' \d+
-        %(sub1_hello_c)s: None '%(date_re)s' \d+
+        %(sub1_hello_c)s: [0-9a-fA-F]{32} '%(date_re)s' \d+
         fake_cc\.py: None '%(date_re)s' \d+
         %(sig_re)s \[.*\]
 """ % locals())
@@ -121,7 +121,7 @@ hello.exe: %(sig_re)s \d+ \d+
         %(LINK)s: None \d+ \d+
         %(sig_re)s \[.*%(manifest)s\]
 hello.obj: %(sig_re)s \d+ \d+
-        %(sub1_hello_c)s: None \d+ \d+
+        %(sub1_hello_c)s: [0-9a-fA-F]{32} \d+ \d+
         %(CC)s: None \d+ \d+
         %(sig_re)s \[.*\]
 """ % locals()
@@ -132,7 +132,7 @@ hello.exe: %(sig_re)s '%(date_re)s' \d+
         %(LINK)s: None '%(date_re)s' \d+
         %(sig_re)s \[.*%(manifest)s\]
 hello.obj: %(sig_re)s '%(date_re)s' \d+
-        %(sub1_hello_c)s: None '%(date_re)s' \d+
+        %(sub1_hello_c)s: [0-9a-fA-F]{32} '%(date_re)s' \d+
         %(CC)s: None '%(date_re)s' \d+
         %(sig_re)s \[.*\]
 """ % locals()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that an sconsign file written with the journaling dblog module
+is kept up to date across builds and can be read by the sconsign script.
+"""
+
+import TestSConsign
+
+_python_ = TestSConsign._python_
+
+test = TestSConsign.TestSConsign(match = TestSConsign.match_re)
+
+test.subdir('sub1')
+
+test.write('cat.py', r"""
+import sys
+open(sys.argv[1], 'wb').write(open(sys.argv[2], 'rb').read())
+""")
+
+test.write('SConstruct', """
+import SCons.dblog
+SConsignFile('my_sconsign', SCons.dblog)
+env = Environment()
+env.Command('sub1/f1.out', 'sub1/f1.in', r'%(_python_)s cat.py $TARGET $SOURCE')
+env.Command('sub1/f2.out', 'sub1/f2.in', r'%(_python_)s cat.py $TARGET $SOURCE')
+""" % locals())
+
+test.write(['sub1', 'f1.in'], "sub1/f1.in\n")
+test.write(['sub1', 'f2.in'], "sub1/f2.in\n")
+
+test.run(arguments = '.')
+
+test.must_exist('my_sconsign.dblog')
+test.must_not_exist('my_sconsign.dblite')
+
+test.up_to_date(arguments = '.')
+
+test.write(['sub1', 'f2.in'], "sub1/f2.in 2\n")
+
+test.not_up_to_date(arguments = 'sub1/f2.out')
+
+test.up_to_date(arguments = '.')
+
+sig_re = r'[0-9a-fA-F]{32}'
+
+expect = r"""=== sub1:
+f1.in: %(sig_re)s \d+ \d+
+f1.out: %(sig_re)s \d+ \d+
+        sub1/f1.in: %(sig_re)s \d+ \d+
+        \S+: \S+ \d+ \d+
+        %(sig_re)s \[.*\]
+""" % locals()
+
+common_flags = '-e f1.in -e f1.out -d sub1'
+
+test.run_sconsign(arguments = "%s my_sconsign" % common_flags,
+                  stdout = expect)
+
+test.run_sconsign(arguments = "%s my_sconsign.dblog" % common_flags,
+                  stdout = expect)
+
+test.run_sconsign(arguments = "%s -f dblog my_sconsign" % common_flags,
+                  stdout = expect)
+
+test.run_sconsign(arguments = "%s -f dblog my_sconsign.dblog" % common_flags,
+                  stdout = expect)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that a site_scons/site_tools tool whose generate() creates
+targets creates them in every environment it's applied to, including
+when it says it's cacheable.
+"""
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.subdir('site_scons', ['site_scons', 'site_tools'], 'a', 'b')
+
+tool = """\
+def generate(env):
+    env.Command('version.h', [], 'echo "#define VERSION 1" > $TARGET')
+def exists(env):
+    return 1
+"""
+
+test.write(['site_scons', 'site_tools', 'version.py'], tool)
+test.write(['site_scons', 'site_tools', 'cached_version.py'],
+           "cacheable = 1\n" + tool)
+
+test.write('SConstruct', """\
+SConscript(['a/SConscript', 'b/SConscript'])
+""")
+
+test.write(['a', 'SConscript'], """\
+env = Environment(tools = ['version', 'cached_version'])
+""")
+
+test.write(['b', 'SConscript'], """\
+env = Environment(tools = ['version', 'cached_version'])
+""")
+
+test.run(arguments = 'a/version.h b/version.h')
+
+test.must_match(['a', 'version.h'], "#define VERSION 1\n")
+test.must_match(['b', 'version.h'], "#define VERSION 1\n")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4: